@@ -1,3 +1,12 @@
-from app.vertex_ai_agent import root_agent
+from typing import Any
 
 __all__ = ["root_agent"]
+
+
+def __getattr__(name: str) -> Any:
+    """root_agentは初回アクセス時に構築（import app を軽量に保つ）"""
+    if name == "root_agent":
+        from app.vertex_ai_agent import get_root_agent
+
+        return get_root_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
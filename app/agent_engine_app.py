@@ -13,74 +13,361 @@
 # limitations under the License.
 
 # mypy: disable-error-code="attr-defined"
-import copy
 import datetime
 import json
 import logging
 import os
-from collections.abc import Mapping, Sequence
+import threading
+from collections.abc import Callable, Iterator, Mapping, Sequence
 from typing import Any
 
 import google.auth
+import google.cloud.storage as storage
 import vertexai
 from google.cloud import logging as google_cloud_logging
 from opentelemetry import trace
-from opentelemetry.sdk.trace import TracerProvider, export
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import (
+    ReadableSpan,
+    Span,
+    SpanProcessor,
+    TracerProvider,
+    export,
+)
 from vertexai import agent_engines
 from vertexai.preview.reasoning_engines import AdkApp
 
+from app.agents.stub_backends import is_stub_backend
+from app.utils.deploy_artifacts import (
+    build_manifest,
+    load_deployed_layers,
+    save_manifest,
+)
+from app.utils.feedback_writer import FeedbackWriter
 from app.utils.gcs import create_bucket_if_not_exists
-from app.utils.tracing import CloudTraceLoggingSpanExporter
+from app.utils.local_tracing import configure_local_tracing
+from app.utils.tracing import CloudTraceLoggingSpanExporter, TailSamplingSpanProcessor
 from app.utils.typing import Feedback
-from app.vertex_ai_agent import root_agent
+from app.vertex_ai_agent import get_root_agent
+
+# ワーカー並列数の既定値と上限（Agent Engineの1インスタンスあたり）
+DEFAULT_NUM_WORKERS = 1
+MAX_NUM_WORKERS = 8
+# 1ワーカー内で同時に実行するリクエスト数の既定値と上限
+DEFAULT_WORKER_CONCURRENCY = 4
+MAX_WORKER_CONCURRENCY = 32
+
+
+def validate_worker_settings(num_workers: int, worker_concurrency: int) -> None:
+    """
+    ワーカー数と同時実行数を検証
+
+    Args:
+        num_workers: インスタンスあたりのワーカープロセス数
+        worker_concurrency: ワーカーあたりの同時実行リクエスト数
+
+    Raises:
+        ValueError: 範囲外の値が指定された場合
+    """
+    if not 1 <= num_workers <= MAX_NUM_WORKERS:
+        raise ValueError(
+            f"num_workers must be between 1 and {MAX_NUM_WORKERS}: {num_workers}"
+        )
+    if not 1 <= worker_concurrency <= MAX_WORKER_CONCURRENCY:
+        raise ValueError(
+            f"worker_concurrency must be between 1 and {MAX_WORKER_CONCURRENCY}: "
+            f"{worker_concurrency}"
+        )
+
+
+def get_worker_concurrency() -> int:
+    """環境変数 WORKER_CONCURRENCY からワーカーあたりの同時実行数を取得"""
+    concurrency = int(
+        os.environ.get("WORKER_CONCURRENCY", str(DEFAULT_WORKER_CONCURRENCY))
+    )
+    validate_worker_settings(1, concurrency)
+    return concurrency
+
+
+class WorkerLocalSpanProcessor(SpanProcessor):
+    """
+    ワーカープロセスごとに下位のスパンプロセッサを作り直すスパンプロセッサ
+
+    グローバルのトレーサープロバイダーはプロセスごとに1度しか設定できず、
+    fork後の子プロセスには親の設定が引き継がれる。エクスポーターが持つ
+    クライアント（gRPC/HTTP接続）を親子で共有しないよう、PIDが変わったら
+    factoryで作り直す。
+    """
+
+    def __init__(self, factory: Callable[[], SpanProcessor]):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+        self._processor: SpanProcessor | None = None
+
+    def _current(self) -> SpanProcessor:
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._processor = self._factory()
+                    self._pid = pid
+        return self._processor
+
+    def on_start(self, span: Span, parent_context: Context | None = None) -> None:
+        self._current().on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        self._current().on_end(span)
+
+    def shutdown(self) -> None:
+        if self._processor is not None and self._pid == os.getpid():
+            self._processor.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        if self._processor is None or self._pid != os.getpid():
+            return True
+        return self._processor.force_flush(timeout_millis)
+
+
+class _LocalLogger:
+    """標準のloggingへ書き込むCloud Loggingロガーの代替"""
+
+    def __init__(self, name: str, client: "LocalLoggingClient"):
+        self.name = name
+        self.client = client
+        self._logger = logging.getLogger(name)
+
+    def log_struct(
+        self, info: Mapping[str, Any], severity: str | None = None, **kwargs: Any
+    ) -> None:
+        level = logging.getLevelName(severity or "INFO")
+        self._logger.log(
+            level if isinstance(level, int) else logging.INFO,
+            json.dumps(info, ensure_ascii=False, default=str),
+        )
+
+    def batch(self) -> "_LocalBatch":
+        return _LocalBatch(self)
+
+
+class _LocalBatch:
+    """_LocalLogger.batch() の戻り値（commit時にまとめて書き込む）"""
+
+    def __init__(self, logger: _LocalLogger):
+        self._logger = logger
+        self._entries: list[tuple[Mapping[str, Any], str | None]] = []
+
+    def log_struct(
+        self, info: Mapping[str, Any], severity: str | None = None, **kwargs: Any
+    ) -> None:
+        self._entries.append((info, severity))
+
+    def commit(self) -> None:
+        entries, self._entries = self._entries, []
+        for info, severity in entries:
+            self._logger.log_struct(info, severity=severity)
+
+
+class LocalLoggingClient:
+    """
+    認証情報なしで使えるロギングクライアント
+
+    スタブバックエンド（AGENT_BACKEND=stub）ではCloud Loggingの代わりに使い、
+    ログとフィードバックを標準のloggingへ書き込む
+    """
+
+    def logger(self, name: str) -> _LocalLogger:
+        return _LocalLogger(name, self)
+
+
+_worker_lock = threading.Lock()
+_worker_logging_clients: dict[
+    int, google_cloud_logging.Client | LocalLoggingClient
+] = {}
+_worker_feedback_writers: dict[int, FeedbackWriter] = {}
+_worker_samplers: dict[int, TailSamplingSpanProcessor] = {}
+_worker_request_slots: dict[int, tuple[int, threading.BoundedSemaphore]] = {}
+_tracing_configured = False
+
+
+def _get_worker_logging_client() -> google_cloud_logging.Client | LocalLoggingClient:
+    """
+    ワーカープロセスごとに1つのロギングクライアントを取得
+
+    スタブバックエンドでは認証情報を必要としないローカルのクライアントを使う
+    """
+    pid = os.getpid()
+    with _worker_lock:
+        client = _worker_logging_clients.get(pid)
+        if client is None:
+            # fork前に作られた他プロセスのクライアントは使わない
+            _worker_logging_clients.clear()
+            client = _worker_logging_clients[pid] = (
+                LocalLoggingClient()
+                if is_stub_backend()
+                else google_cloud_logging.Client()
+            )
+        return client
+
+
+def _get_worker_feedback_writer() -> FeedbackWriter:
+    """ワーカープロセスごとに1つのフィードバックライターを取得"""
+    client = _get_worker_logging_client()
+    pid = os.getpid()
+    with _worker_lock:
+        writer = _worker_feedback_writers.get(pid)
+        if writer is None:
+            _worker_feedback_writers.clear()
+            writer = _worker_feedback_writers[pid] = FeedbackWriter(
+                client.logger(__name__)
+            )
+        return writer
+
+
+def _get_worker_request_slots() -> threading.BoundedSemaphore:
+    """
+    ワーカープロセスごとに1つの同時実行数制限用セマフォを取得
+
+    WORKER_CONCURRENCY が変わった場合は新しい上限で作り直す
+    """
+    concurrency = get_worker_concurrency()
+    pid = os.getpid()
+    with _worker_lock:
+        entry = _worker_request_slots.get(pid)
+        if entry is None or entry[0] != concurrency:
+            _worker_request_slots.clear()
+            entry = _worker_request_slots[pid] = (
+                concurrency,
+                threading.BoundedSemaphore(concurrency),
+            )
+        return entry[1]
+
+
+def _create_span_processor() -> SpanProcessor:
+    """
+    ワーカープロセス用のスパンプロセッサを作成
+
+    トレース単位のテールサンプリング（TRACE_* 環境変数で設定）を通してから
+    Cloud Trace / Cloud Loggingへバッチでエクスポートする。
+    """
+    sampler = TailSamplingSpanProcessor.from_env(
+        export.BatchSpanProcessor(
+            CloudTraceLoggingSpanExporter(
+                project_id=os.environ.get("GOOGLE_CLOUD_PROJECT")
+            )
+        )
+    )
+    _worker_samplers.clear()
+    _worker_samplers[os.getpid()] = sampler
+    return sampler
+
+
+def get_sampling_stats() -> dict[str, Any]:
+    """現在のワーカープロセスのサンプリング統計を取得（未設定なら空）"""
+    sampler = _worker_samplers.get(os.getpid())
+    return sampler.stats() if sampler is not None else {}
+
+
+def _configure_tracing() -> None:
+    """トレーサープロバイダーをプロセスで1度だけ設定"""
+    global _tracing_configured
+    with _worker_lock:
+        if _tracing_configured:
+            return
+        provider = TracerProvider()
+        provider.add_span_processor(WorkerLocalSpanProcessor(_create_span_processor))
+        trace.set_tracer_provider(provider)
+        _tracing_configured = True
+
+
+# cloneで引き継ぐテンプレート設定（set_upで作られる実行時の状態は含めない）
+_TEMPLATE_ATTRIBUTES = (
+    "project",
+    "location",
+    "agent",
+    "enable_tracing",
+    "session_service_builder",
+    "artifact_service_builder",
+    "app_name",
+    "env_vars",
+)
 
 
 class AgentEngineApp(AdkApp):
     def set_up(self) -> None:
-        """Set up logging and tracing for the agent engine app."""
+        """Set up logging and tracing for the agent engine app.
+
+        NUM_WORKERS > 1 では各ワーカーがクローンに対してset_upを呼ぶため、
+        ロギングクライアント・トレーサープロバイダー・同時実行数の制限は
+        プロセス単位で共有する。
+        """
         super().set_up()
-        logging_client = google_cloud_logging.Client()
-        self.logger = logging_client.logger(__name__)
+        self.logger = _get_worker_logging_client().logger(__name__)
+        self.feedback_writer = _get_worker_feedback_writer()
+        self._request_slots = _get_worker_request_slots()
+
+        # LOCAL_TRACE_DIR があれば認証情報なしでスパンをローカルに記録
+        if configure_local_tracing():
+            return
 
         # テスト環境ではトレーシングを無効化
         if os.environ.get("DISABLE_TRACING") == "true":
             return
 
-        provider = TracerProvider()
-        processor = export.BatchSpanProcessor(
-            CloudTraceLoggingSpanExporter(
-                project_id=os.environ.get("GOOGLE_CLOUD_PROJECT")
-            )
-        )
-        provider.add_span_processor(processor)
-        trace.set_tracer_provider(provider)
+        _configure_tracing()
+
+    def stream_query(self, **kwargs: Any) -> Iterator[dict[str, Any]]:
+        """同時実行数を WORKER_CONCURRENCY 以下に制限してストリーミング実行"""
+        if not self._tmpl_attrs.get("runner"):
+            self.set_up()
+        with self._request_slots:
+            yield from super().stream_query(**kwargs)
 
     def register_feedback(self, feedback: dict[str, Any]) -> None:
-        """Collect and log feedback."""
+        """Collect and log feedback.
+
+        書き込みはバックグラウンドでバッチ化されるため、Cloud Loggingの
+        レイテンシはリクエスト処理に影響しない。
+        """
         feedback_obj = Feedback.model_validate(feedback)
-        self.logger.log_struct(feedback_obj.model_dump(), severity="INFO")
+        if not self.feedback_writer.submit(feedback_obj.model_dump(), severity="INFO"):
+            logging.warning(
+                f"Feedback dropped (invocation_id={feedback_obj.invocation_id})"
+            )
+
+    def get_telemetry_stats(self) -> dict[str, Any]:
+        """Return the trace sampling statistics of this worker.
+
+        TRACE_SAMPLE_RATE などの環境変数を調整する際の判断材料として、
+        保持・破棄したトレース数とスパン数、属性の切り詰め件数を返す。
+        """
+        return get_sampling_stats()
 
     def register_operations(self) -> Mapping[str, Sequence]:
         """Registers the operations of the Agent.
 
-        Extends the base operations to include feedback registration functionality.
+        Extends the base operations to include feedback registration and
+        telemetry statistics.
         """
         operations = super().register_operations()
-        operations[""] = operations[""] + ["register_feedback"]
+        operations[""] = operations[""] + ["register_feedback", "get_telemetry_stats"]
         return operations
 
     def clone(self) -> "AgentEngineApp":
-        """Returns a clone of the ADK application."""
-        template_attributes = self._tmpl_attrs
-        return self.__class__(
-            agent=copy.deepcopy(template_attributes.get("agent")),
-            enable_tracing=template_attributes.get("enable_tracing"),
-            session_service_builder=template_attributes.get("session_service_builder"),
-            artifact_service_builder=template_attributes.get(
-                "artifact_service_builder"
-            ),
-            env_vars=template_attributes.get("env_vars"),
-        )
+        """Returns a clone of the ADK application.
+
+        エージェント定義（指示文・ツール・コールバック）は実行中に変更されない
+        共有設定として参照を共有し、深いコピーはしない。会話ごとの状態は
+        セッション状態に、実行時の状態（runner・セッションサービス等）は
+        set_upで各クローンに作られるため、テンプレート設定のみを引き継ぐ。
+        """
+        cloned = self.__class__.__new__(self.__class__)
+        cloned._tmpl_attrs = {
+            key: self._tmpl_attrs.get(key) for key in _TEMPLATE_ATTRIBUTES
+        }
+        cloned._tmpl_attrs["env_vars"] = dict(self._tmpl_attrs.get("env_vars") or {})
+        return cloned
 
 
 def deploy_agent_engine_app(
@@ -90,8 +377,17 @@ def deploy_agent_engine_app(
     requirements_file: str = ".requirements.txt",
     extra_packages: list[str] | None = None,
     env_vars: dict[str, str] | None = None,
+    num_workers: int = DEFAULT_NUM_WORKERS,
+    worker_concurrency: int = DEFAULT_WORKER_CONCURRENCY,
+    storage_client: storage.Client | None = None,
 ) -> agent_engines.AgentEngine:
-    """Deploy the agent engine app to Vertex AI."""
+    """Deploy the agent engine app to Vertex AI.
+
+    成果物をレイヤーごとのコンテンツハッシュで管理し、同名のエージェントが
+    あれば変更のあったレイヤーだけをアップロードしてその場で更新する
+    （変更がなければ何もしない）。
+    """
+    validate_worker_settings(num_workers, worker_concurrency)
     if extra_packages is None:
         extra_packages = ["./app"]
     if env_vars is None:
@@ -99,8 +395,11 @@ def deploy_agent_engine_app(
 
     staging_bucket = f"gs://{project}-agent-engine"
 
-    create_bucket_if_not_exists(
-        bucket_name=staging_bucket, project=project, location=location
+    bucket = create_bucket_if_not_exists(
+        bucket_name=staging_bucket,
+        project=project,
+        location=location,
+        storage_client=storage_client,
     )
     vertexai.init(project=project, location=location, staging_bucket=staging_bucket)
 
@@ -108,10 +407,11 @@ def deploy_agent_engine_app(
     with open(requirements_file) as f:
         requirements = f.read().strip().split("\n")
 
-    agent_engine = AgentEngineApp(agent=root_agent)
+    agent_engine = AgentEngineApp(agent=get_root_agent())
 
-    # Set worker parallelism to 1
-    env_vars["NUM_WORKERS"] = "1"
+    # ワーカー並列数とワーカーあたりの同時実行数を設定
+    env_vars["NUM_WORKERS"] = str(num_workers)
+    env_vars["WORKER_CONCURRENCY"] = str(worker_concurrency)
 
     # Common configuration for agent creation
     agent_config = {
@@ -124,21 +424,45 @@ def deploy_agent_engine_app(
     logging.info(f"Agent config: {agent_config}")
     agent_config["requirements"] = requirements
 
+    manifest = build_manifest(requirements, extra_packages, AgentEngineApp.__name__)
+    logging.info(f"Release {manifest.release}: {manifest.layers}")
+
     # Check if an agent with this name already exists
     existing_agents = list(agent_engines.list(filter=f"display_name={agent_name}"))
+    uploaded = True
     if existing_agents:
-        # Delete existing agent first to avoid conflicts with new tools/structure
-        logging.info(f"Deleting existing agent: {agent_name}")
-        for agent in existing_agents:
-            try:
-                agent.delete()
-                logging.info(f"Deleted agent: {agent.resource_name}")
-            except Exception as e:
-                logging.warning(f"Failed to delete agent {agent.resource_name}: {e}")
-
-    # Create a new agent
-    logging.info(f"Creating new agent: {agent_name}")
-    remote_agent = agent_engines.create(**agent_config)
+        remote_agent = existing_agents[0]
+        spec = remote_agent.gca_resource.spec
+        changed = manifest.changed_layers(
+            load_deployed_layers(bucket, spec.package_spec)
+        )
+        deployed_env = {env.name: env.value for env in spec.deployment_spec.env}
+        uploaded = bool(changed)
+        if not changed and deployed_env == env_vars:
+            logging.info(f"Agent {remote_agent.resource_name} is up to date")
+        else:
+            # 削除→作成ではなくその場で更新し、エージェント不在の時間をなくす
+            logging.info(
+                f"Updating agent {remote_agent.resource_name} "
+                f"(changed layers: {sorted(changed) or 'none'})"
+            )
+            remote_agent = remote_agent.update(
+                **{name: agent_config[name] for name in changed},
+                env_vars=env_vars,
+                gcs_dir_name=manifest.gcs_dir_name,
+            )
+        for duplicate in existing_agents[1:]:
+            logging.warning(
+                f"Duplicate agent named {agent_name}: {duplicate.resource_name}"
+            )
+    else:
+        logging.info(f"Creating new agent: {agent_name}")
+        remote_agent = agent_engines.create(
+            **agent_config, gcs_dir_name=manifest.gcs_dir_name
+        )
+
+    if uploaded:
+        save_manifest(bucket, manifest)
 
     config = {
         "remote_agent_engine_id": remote_agent.resource_name,
@@ -184,11 +508,29 @@ if __name__ == "__main__":
         default=["./app"],
         help="Additional packages to include",
     )
+    parser.add_argument(
+        "--num-workers",
+        type=int,
+        default=DEFAULT_NUM_WORKERS,
+        help=f"Worker processes per instance (1-{MAX_NUM_WORKERS}, "
+        f"defaults to {DEFAULT_NUM_WORKERS})",
+    )
+    parser.add_argument(
+        "--worker-concurrency",
+        type=int,
+        default=DEFAULT_WORKER_CONCURRENCY,
+        help=f"Concurrent requests per worker (1-{MAX_WORKER_CONCURRENCY}, "
+        f"defaults to {DEFAULT_WORKER_CONCURRENCY})",
+    )
     parser.add_argument(
         "--set-env-vars",
         help="Comma-separated list of environment variables in KEY=VALUE format",
     )
     args = parser.parse_args()
+    try:
+        validate_worker_settings(args.num_workers, args.worker_concurrency)
+    except ValueError as e:
+        parser.error(str(e))
 
     # Parse environment variables if provided
     env_vars = {}
@@ -215,4 +557,6 @@ if __name__ == "__main__":
         requirements_file=args.requirements_file,
         extra_packages=args.extra_packages,
         env_vars=env_vars,
+        num_workers=args.num_workers,
+        worker_concurrency=args.worker_concurrency,
     )
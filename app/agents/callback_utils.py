@@ -0,0 +1,91 @@
+"""
+ADKコールバック共通ユーティリティ
+"""
+
+from collections.abc import Callable
+from typing import Any
+
+from opentelemetry import trace
+
+
+def extract_text(content: Any) -> str:
+    """
+    ADK/genaiのContentからテキスト部分を連結して取得
+
+    Args:
+        content: types.Content（Noneも可）
+
+    Returns:
+        テキスト部分を改行で連結した文字列
+    """
+    if content is None or not getattr(content, "parts", None):
+        return ""
+    return "\n".join(part.text for part in content.parts if getattr(part, "text", None))
+
+
+def set_span_attributes(prefix: str, values: dict[str, Any]) -> None:
+    """
+    現在のトレーススパンに属性を記録
+
+    Args:
+        prefix: 属性名のプレフィックス
+        values: 記録する値（数値・文字列・真偽値）
+    """
+    span = trace.get_current_span()
+    if not span.is_recording():
+        return
+    for key, value in values.items():
+        if isinstance(value, bool | int | float | str):
+            span.set_attribute(f"{prefix}.{key}", value)
+
+
+def has_retrieval_tool(llm_request: Any) -> bool:
+    """
+    リクエストにリトリーバル（Vertex AI Search）設定が含まれるか
+
+    Args:
+        llm_request: LlmRequest
+
+    Returns:
+        リトリーバル設定が含まれる場合True
+    """
+    config = getattr(llm_request, "config", None)
+    tools = getattr(config, "tools", None) or []
+    return any(getattr(tool, "retrieval", None) for tool in tools)
+
+
+def remove_retrieval_tools(llm_request: Any) -> None:
+    """
+    リクエストからリトリーバル設定を外す
+
+    Args:
+        llm_request: LlmRequest
+    """
+    config = llm_request.config
+    config.tools = [
+        tool for tool in config.tools or [] if not getattr(tool, "retrieval", None)
+    ] or None
+
+
+def chain_tool_callbacks(*callbacks: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    複数のツールコールバックを1つにまとめる
+
+    ADKのbefore/after_tool_callbackは1つしか登録できないため、順に呼び出し、
+    最初にNone以外を返したコールバックの結果を返す
+
+    Args:
+        callbacks: ツールコールバック
+
+    Returns:
+        まとめたコールバック
+    """
+
+    def chained(**kwargs: Any) -> Any:
+        for callback in callbacks:
+            result = callback(**kwargs)
+            if result is not None:
+                return result
+        return None
+
+    return chained
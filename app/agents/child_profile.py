@@ -0,0 +1,120 @@
+"""
+子どものプロフィール（セッション状態）
+
+年齢・アレルギー・苦手な食材をセッション状態 child_profile に型付きで保持し、
+毎ターンの発話から推測し直す代わりに以下へ反映する。
+
+- プロンプト: 短いプロフィールヘッダーをシステム指示に追加
+- ツール呼び出し: age_group / allergens 引数を持つツールに自動で注入
+
+プロフィールはストリーミング関数がチャットリクエストの childProfile を
+状態差分（stateDelta）として追記することで更新される。
+"""
+
+import inspect
+from typing import Any
+
+from pydantic import BaseModel, Field, ValidationError
+
+from app.agents.callback_utils import set_span_attributes
+
+STATE_KEY = "child_profile"
+
+
+class ChildProfile(BaseModel):
+    """子どものプロフィール"""
+
+    name: str | None = None
+    age_months: int | None = Field(default=None, ge=0, le=72)
+    # None は未入力（不明）、空リストは保護者が「アレルギーなし」と入力した場合
+    allergens: list[str] | None = None
+    dislikes: list[str] = Field(default_factory=list)
+
+    @property
+    def age_group(self) -> str | None:
+        """栄養基準の年齢区分（NUTRITION_TARGETSのキー）"""
+        if self.age_months is None:
+            return None
+        return "1-2歳" if self.age_months < 36 else "3歳"
+
+    @property
+    def age_label(self) -> str | None:
+        """「○歳○ヶ月」形式の年齢"""
+        if self.age_months is None:
+            return None
+        return f"{self.age_months // 12}歳{self.age_months % 12}ヶ月"
+
+    def to_header(self) -> str:
+        """システム指示用の短いプロフィールヘッダー"""
+        items = []
+        if self.age_label:
+            items.append(f"年齢: {self.age_label}（{self.age_group}）")
+        if self.allergens is None:
+            items.append("アレルギー: 不明（未確認）")
+        else:
+            items.append(f"アレルギー: {'、'.join(self.allergens) or 'なし'}")
+        if self.dislikes:
+            items.append(f"苦手: {'、'.join(self.dislikes)}")
+        return "## 【お子さまのプロフィール】\n" + " / ".join(items)
+
+
+def load_profile(state: Any) -> ChildProfile | None:
+    """
+    セッション状態からプロフィールを取得
+
+    Args:
+        state: セッション状態
+
+    Returns:
+        プロフィール（未設定・不正な場合はNone）
+    """
+    data = state.get(STATE_KEY)
+    if not data:
+        return None
+    try:
+        return ChildProfile.model_validate(data)
+    except ValidationError:
+        return None
+
+
+def _tool_parameters(tool: Any) -> set[str]:
+    """ツール関数の引数名を取得"""
+    func = getattr(tool, "func", None)
+    if func is None:
+        return set()
+    try:
+        return set(inspect.signature(func).parameters)
+    except (TypeError, ValueError):
+        return set()
+
+
+def before_model_callback(callback_context: Any, llm_request: Any) -> None:
+    """プロフィールヘッダーをシステム指示に追加"""
+    profile = load_profile(callback_context.state)
+    if profile is None:
+        return None
+    llm_request.append_instructions([profile.to_header()])
+    return None
+
+
+def before_tool_callback(tool: Any, args: dict[str, Any], tool_context: Any) -> None:
+    """age_group / allergens 引数をプロフィールから注入"""
+    profile = load_profile(tool_context.state)
+    if profile is None:
+        return None
+
+    parameters = _tool_parameters(tool)
+    injected = []
+    if "age_group" in parameters and profile.age_group:
+        args["age_group"] = profile.age_group
+        injected.append("age_group")
+    if "allergens" in parameters:
+        args["allergens"] = sorted(
+            {*(args.get("allergens") or []), *(profile.allergens or [])}
+        )
+        injected.append("allergens")
+    if injected:
+        set_span_attributes(
+            "kids_food_advisor.child_profile", {"injected": ",".join(injected)}
+        )
+    return None
@@ -0,0 +1,79 @@
+"""
+初回相談の構造化出力
+
+CONSULTATION_OUTPUT_MODE=structured の場合、初回相談の回答を
+固定マークダウンの代わりにコンパクトなJSON（レスポンススキーマ指定）で生成させる。
+マークダウンへの整形はストリーミング関数側（utils/consultation_renderer.py）で行う。
+Geminiの制御付き生成はリトリーバルと併用できないため、PDF検索が必要と判定された
+初回相談では検索を優先し、従来のマークダウン形式で回答させる。
+"""
+
+import os
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+from app.agents.callback_utils import (
+    has_retrieval_tool,
+    remove_retrieval_tools,
+    set_span_attributes,
+)
+from app.agents.intent_router import CONSULTATION
+
+STRUCTURED_MODE = "structured"
+
+
+class NutrientAdvice(BaseModel):
+    """補強したい栄養素1件分"""
+
+    name: str = Field(description="栄養素名（例: 鉄分）")
+    reason: str = Field(description="今日の食事で不足している理由（1文）")
+    foods: list[str] = Field(description="補強できる食材（3つ）")
+
+
+class ConsultationReport(BaseModel):
+    """初回相談の回答（フィールド順に生成・表示される）"""
+
+    age: str = Field(description="子どもの年齢（例: 1歳8ヶ月）")
+    praise: str = Field(description="食事の良い点（1文）")
+    concern: str = Field(description="不足している点（1文）")
+    suggestion: str = Field(description="夕食などですぐできる具体的な補い方（1文）")
+    nutrients: list[NutrientAdvice] = Field(description="補強したい栄養素（3つ）")
+
+
+_STRUCTURED_INSTRUCTION = """## 【出力形式：構造化モード】
+初回相談では固定フォーマットのマークダウンを書かず、指定のJSONスキーマで回答してください。
+- 絵文字・見出し・記号は不要（表示側で整形します）
+- 各文は短く、プレースホルダーは使わない
+- nutrients は3件、foods は各3つ"""
+
+
+def is_structured_mode() -> bool:
+    """構造化出力モードが有効か"""
+    return os.environ.get("CONSULTATION_OUTPUT_MODE", "markdown") == STRUCTURED_MODE
+
+
+def before_model_callback(callback_context: Any, llm_request: Any) -> None:
+    """検索が不要な初回相談のときにレスポンススキーマを設定"""
+    if not is_structured_mode():
+        return None
+    if callback_context.state.get("turn_type") != CONSULTATION:
+        return None
+
+    if callback_context.state.get("needs_grounding", True) and has_retrieval_tool(
+        llm_request
+    ):
+        # 検索結果に基づく回答を優先し、スキーマは設定しない
+        set_span_attributes(
+            "kids_food_advisor.consultation", {"output_mode": "markdown"}
+        )
+        return None
+
+    # 制御付き生成と併用できないため、残っているリトリーバル設定を外す
+    remove_retrieval_tools(llm_request)
+    llm_request.set_output_schema(ConsultationReport)
+    llm_request.append_instructions([_STRUCTURED_INSTRUCTION])
+    set_span_attributes(
+        "kids_food_advisor.consultation", {"output_mode": STRUCTURED_MODE}
+    )
+    return None
@@ -0,0 +1,211 @@
+"""
+会話履歴のコンパクション
+
+長い会話でも1ターンあたりのプロンプトサイズが一定になるよう、
+直近Nターンのみをそのままモデルに渡し、それより古いターンは
+構造化された要約（子どもの年齢・アレルギー・提案済みの食材・未解決の悩み）に畳み込む。
+要約はセッション状態に保存し、新たに畳み込むターンの分だけ差分更新する。
+"""
+
+import re
+from typing import Any
+
+from app.agents.callback_utils import extract_text, set_span_attributes
+from app.data.foods import FOOD_DATABASE
+
+STATE_KEY = "history_summary"
+
+_AGE_PATTERN = re.compile(r"(\d+)\s*歳\s*(?:(\d+)\s*[ヶかカケ]\s*月)?")
+_ALLERGY_FIELD_PATTERN = re.compile(r"アレルギー\s*[:：]\s*([^\n]+)")
+# 発話中の「〜アレルギーがある」の〜部分（文・読点・助詞で区切った直前の語句）
+_ALLERGY_MENTION_PATTERN = re.compile(
+    r"([^\s、。，,！？!?「」はがを]{1,12})(?:の)?アレルギー(?:がある|があり|持ち|です)"
+)
+_ALLERGY_NONE_PATTERN = re.compile(r"アレルギー(?:は|が)?(?:ない|ありません|なし|無し)")
+# 発話から拾うアレルゲンの語彙（特定原材料と主な準ずるもの。長い語を優先して照合する）
+_ALLERGENS = [
+    "卵", "鶏卵", "乳", "牛乳", "乳製品", "小麦", "えび", "エビ", "かに", "カニ",
+    "くるみ", "そば", "落花生", "ピーナッツ", "大豆", "ごま", "魚", "さば", "鮭",
+    "いくら", "キウイ", "バナナ", "りんご", "もも", "やまいも", "ナッツ",
+    "アーモンド", "カシューナッツ", "牛肉", "豚肉", "鶏肉", "ゼラチン",
+]  # fmt: skip
+_ALLERGEN_PATTERN = re.compile(
+    "|".join(re.escape(name) for name in sorted(_ALLERGENS, key=len, reverse=True))
+)
+_SUGGESTION_PATTERN = re.compile(r"→\s*([^\n]+)")
+_FOOD_PATTERN = re.compile(
+    "|".join(re.escape(name) for name in sorted(FOOD_DATABASE, key=len, reverse=True))
+)
+_CONCERN_PATTERN = re.compile(
+    r"心配|悩み|困って|食べてくれ|食べない|嫌い|苦手|不足|便秘|偏"
+)
+_NONE_VALUES = {"なし", "無し", "ない", "特になし"}
+
+
+def _empty_summary() -> dict[str, Any]:
+    """空の要約"""
+    return {
+        "child_age": None,
+        "allergens": [],
+        "allergies_declared_none": False,
+        "suggested_foods": [],
+        "open_concerns": [],
+        "folded_turns": 0,
+    }
+
+
+def _append_unique(items: list[str], values: list[str], limit: int) -> list[str]:
+    """重複を除いて追加し、新しいものから limit 件を残す"""
+    merged = [item for item in items if item not in values] + list(
+        dict.fromkeys(values)
+    )
+    return merged[-limit:]
+
+
+def split_turns(contents: list[Any]) -> list[list[Any]]:
+    """
+    履歴をターン単位に分割
+
+    テキストを含むユーザー発話からターンが始まり、
+    続くモデル応答・関数呼び出し/応答は同じターンに含める
+
+    Args:
+        contents: LlmRequest.contents
+
+    Returns:
+        ターンごとのContentリスト
+    """
+    turns: list[list[Any]] = []
+    for content in contents:
+        starts_turn = content.role == "user" and extract_text(content)
+        if starts_turn or not turns:
+            turns.append([content])
+        else:
+            turns[-1].append(content)
+    return turns
+
+
+def fold_turn(
+    summary: dict[str, Any], turn: list[Any], max_items: int
+) -> dict[str, Any]:
+    """
+    1ターン分の内容を要約に畳み込み
+
+    Args:
+        summary: 現在の要約
+        turn: ターンのContentリスト
+        max_items: 各リストの最大件数
+
+    Returns:
+        更新後の要約（新しい辞書）
+    """
+    summary = {**summary}
+    user_text = "\n".join(extract_text(c) for c in turn if c.role == "user")
+    model_text = "\n".join(extract_text(c) for c in turn if c.role != "user")
+
+    age = _AGE_PATTERN.search(user_text)
+    if age:
+        summary["child_age"] = (
+            f"{age.group(1)}歳{age.group(2)}ヶ月"
+            if age.group(2)
+            else f"{age.group(1)}歳"
+        )
+
+    allergens = []
+    for field in _ALLERGY_FIELD_PATTERN.findall(user_text):
+        names = [name.strip() for name in re.split(r"[、,，/]", field) if name.strip()]
+        if names and all(name in _NONE_VALUES for name in names):
+            summary["allergies_declared_none"] = True
+        allergens += [name for name in names if name not in _NONE_VALUES]
+    for mention in _ALLERGY_MENTION_PATTERN.findall(user_text):
+        allergens += _ALLERGEN_PATTERN.findall(mention)
+    if _ALLERGY_NONE_PATTERN.search(user_text):
+        summary["allergies_declared_none"] = True
+    summary["allergens"] = _append_unique(summary["allergens"], allergens, max_items)
+
+    foods = _FOOD_PATTERN.findall(model_text)
+    for line in _SUGGESTION_PATTERN.findall(model_text):
+        foods += [name.strip() for name in line.split("/") if name.strip()]
+    summary["suggested_foods"] = _append_unique(
+        summary["suggested_foods"], foods, max_items * 3
+    )
+
+    concerns = [
+        sentence.strip()[:60]
+        for sentence in re.split(r"[。！？!?\n]", user_text)
+        if _CONCERN_PATTERN.search(sentence)
+    ]
+    summary["open_concerns"] = _append_unique(
+        summary["open_concerns"], concerns, max_items
+    )
+    summary["folded_turns"] = summary["folded_turns"] + 1
+    return summary
+
+
+def format_summary(summary: dict[str, Any]) -> str:
+    """要約をシステム指示用のテキストに整形"""
+    lines = ["## 【これまでの会話の要約】"]
+    if summary.get("child_age"):
+        lines.append(f"- 子どもの年齢: {summary['child_age']}")
+    # 「なし」は保護者が明言した場合だけ。抽出できなかっただけなら不明として扱う
+    if summary["allergens"]:
+        allergies = "、".join(summary["allergens"])
+    elif summary.get("allergies_declared_none"):
+        allergies = "なし"
+    else:
+        allergies = "不明（未確認）"
+    lines.append(f"- アレルギー: {allergies}")
+    if summary["suggested_foods"]:
+        lines.append(f"- 提案済みの食材: {'、'.join(summary['suggested_foods'])}")
+    if summary["open_concerns"]:
+        lines.append(f"- 保護者の悩み: {' / '.join(summary['open_concerns'])}")
+    return "\n".join(lines)
+
+
+class HistoryCompactor:
+    """直近ターン＋要約で履歴を圧縮するbefore_model_callback"""
+
+    def __init__(self, keep_turns: int = 4, max_items: int = 5):
+        """
+        初期化
+
+        Args:
+            keep_turns: そのまま渡す直近のターン数（現在のターンを含む）
+            max_items: 要約の各リストの最大件数
+        """
+        self.keep_turns = keep_turns
+        self.max_items = max_items
+
+    def __call__(self, callback_context: Any, llm_request: Any) -> None:
+        """古いターンを要約に畳み込み、直近ターンのみをリクエストに残す"""
+        turns = split_turns(llm_request.contents)
+        if len(turns) <= self.keep_turns:
+            return None
+
+        fold_until = len(turns) - self.keep_turns
+        summary = callback_context.state.get(STATE_KEY) or _empty_summary()
+        if summary["folded_turns"] > fold_until:
+            # 履歴が巻き戻った場合（セッションの作り直しなど）は作り直す
+            summary = _empty_summary()
+
+        if summary["folded_turns"] < fold_until:
+            for turn in turns[summary["folded_turns"] : fold_until]:
+                summary = fold_turn(summary, turn, self.max_items)
+            callback_context.state[STATE_KEY] = summary
+
+        llm_request.contents = [
+            content for turn in turns[fold_until:] for content in turn
+        ]
+        llm_request.append_instructions([format_summary(summary)])
+        set_span_attributes(
+            "kids_food_advisor.history",
+            {
+                "total_turns": len(turns),
+                "kept_turns": self.keep_turns,
+                "folded_turns": summary["folded_turns"],
+            },
+        )
+        return None
+
+
+history_compactor = HistoryCompactor()
@@ -0,0 +1,241 @@
+"""
+発話意図ルーター
+
+エージェント実行前にユーザー発話をローカルで分類し、
+初回相談/会話モードの判定とPDF検索（グラウンディング）の要否を
+セッション状態に記録する。不要な検索を省き、モデルによる判定の手間を減らす。
+
+- ルール: 定型の相談フォーマット・あいさつ等の明確なケースを判定
+- 線形モデル: 文字n-gramのロジスティック回帰（ラベル付きサンプルで学習）
+"""
+
+import math
+import re
+import unicodedata
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Any
+
+from app.agents.callback_utils import (
+    extract_text,
+    has_retrieval_tool,
+    remove_retrieval_tools,
+    set_span_attributes,
+)
+from app.data.intent_samples import INTENT_SAMPLES
+
+CONSULTATION = "consultation"
+FOLLOW_UP = "follow_up"
+
+# 相談フォーマットの項目（「朝食: …」など）
+_MEAL_FIELD_PATTERN = re.compile(
+    r"(朝食|昼食|夕食|おやつ|朝ごはん|昼ごはん|夕ごはん|晩ごはん|年齢|アレルギー)\s*[:：]"
+)
+_CONSULTATION_PATTERN = re.compile(r"栄養分析|食事内容について|栄養バランスの分析")
+# 食事の時間帯への言及（「朝はバナナ」「昼にうどん」など）
+_MEAL_TIME_PATTERN = re.compile(r"(朝|昼|夕|夜|晩)(食|ごはん|ご飯|に|は|[:：])")
+# あいさつ・相づち
+_SMALL_TALK_PATTERN = re.compile(
+    r"^(ありがとう|助かりました|了解|わかりました|分かりました|なるほど|こんにちは|こんばんは|はい)"
+)
+# 栄養素・アレルギーの話題（PDF検索が必要）
+_GROUNDING_PATTERN = re.compile(
+    r"鉄分?|カルシウム|たんぱく質|タンパク質|ビタミン|食物繊維|亜鉛|dha|アレルギー|何歳から"
+    r"|代わり|代用|量|何グラム|どれくらい(あげ|飲ませ|食べさせ)|1日"
+)
+# 調理法・食べ方の悩み（PDF検索不要）
+_NO_GROUNDING_PATTERN = re.compile(
+    r"茹で|ゆで|煮込|刻|作り方|電子レンジ|冷凍|作り置き|料理|嫌い|食べてくれ|遊び食べ|食べムラ"
+)
+
+
+@dataclass
+class IntentDecision:
+    """発話の判定結果"""
+
+    turn_type: str  # consultation / follow_up
+    needs_grounding: bool
+    confidence: float
+    source: str  # rule / model
+
+
+def _normalize(text: str) -> str:
+    """NFKC正規化・小文字化・空白除去"""
+    return "".join(unicodedata.normalize("NFKC", text).lower().split())
+
+
+def char_ngrams(text: str, sizes: tuple[int, ...] = (1, 2, 3)) -> set[str]:
+    """
+    文字n-gramの特徴量を抽出
+
+    Args:
+        text: 入力テキスト
+        sizes: n-gramの長さ
+
+    Returns:
+        n-gramの集合
+    """
+    normalized = _normalize(text)
+    return {
+        normalized[i : i + n] for n in sizes for i in range(len(normalized) - n + 1)
+    }
+
+
+class LinearClassifier:
+    """文字n-gramの二値ロジスティック回帰"""
+
+    def __init__(self, epochs: int = 40, learning_rate: float = 0.5, l2: float = 1e-4):
+        """
+        初期化
+
+        Args:
+            epochs: 学習エポック数
+            learning_rate: 学習率
+            l2: L2正則化係数
+        """
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.weights: dict[str, float] = {}
+        self.bias = 0.0
+
+    def fit(self, texts: list[str], labels: list[bool]) -> "LinearClassifier":
+        """
+        確率的勾配降下法で学習（サンプル順で決定的に学習）
+
+        Args:
+            texts: 学習テキスト
+            labels: 正解ラベル
+
+        Returns:
+            学習済みの自身
+        """
+        features = [char_ngrams(text) for text in texts]
+        for _ in range(self.epochs):
+            for feature_set, label in zip(features, labels, strict=True):
+                error = self._probability(feature_set) - (1.0 if label else 0.0)
+                step = self.learning_rate / math.sqrt(len(feature_set) or 1)
+                for feature in feature_set:
+                    weight = self.weights.get(feature, 0.0)
+                    self.weights[feature] = weight - step * (error + self.l2 * weight)
+                self.bias -= step * error
+        return self
+
+    def _probability(self, feature_set: set[str]) -> float:
+        """正例である確率"""
+        score = self.bias + sum(self.weights.get(f, 0.0) for f in feature_set)
+        score = max(min(score, 30.0), -30.0)
+        return 1.0 / (1.0 + math.exp(-score))
+
+    def predict_proba(self, text: str) -> float:
+        """
+        正例である確率を予測
+
+        Args:
+            text: 入力テキスト
+
+        Returns:
+            0〜1の確率
+        """
+        return self._probability(char_ngrams(text))
+
+
+class IntentRouter:
+    """ルールと線形モデルによる発話意図ルーター"""
+
+    def __init__(self, samples: list[tuple[str, str, bool]] | None = None):
+        """
+        初期化（サンプルでモデルを学習）
+
+        Args:
+            samples: (メッセージ, 発話種別, PDF検索の要否) のリスト
+        """
+        samples = INTENT_SAMPLES if samples is None else samples
+        texts = [text for text, _, _ in samples]
+        self.turn_model = LinearClassifier().fit(
+            texts, [turn_type == CONSULTATION for _, turn_type, _ in samples]
+        )
+        self.grounding_model = LinearClassifier().fit(
+            texts, [needs_grounding for _, _, needs_grounding in samples]
+        )
+
+    def classify(self, message: str) -> IntentDecision:
+        """
+        発話を分類
+
+        Args:
+            message: ユーザー発話
+
+        Returns:
+            判定結果
+        """
+        text = message.strip()
+
+        if (
+            len(_MEAL_FIELD_PATTERN.findall(text)) >= 2
+            or len({m.group(1) for m in _MEAL_TIME_PATTERN.finditer(text)}) >= 2
+            or _CONSULTATION_PATTERN.search(text)
+        ):
+            return IntentDecision(CONSULTATION, True, 1.0, "rule")
+        if len(text) <= 20 and _SMALL_TALK_PATTERN.match(text):
+            return IntentDecision(FOLLOW_UP, False, 1.0, "rule")
+
+        consultation_p = self.turn_model.predict_proba(text)
+        turn_type = CONSULTATION if consultation_p >= 0.5 else FOLLOW_UP
+        if turn_type == CONSULTATION:
+            return IntentDecision(turn_type, True, consultation_p, "model")
+
+        normalized = _normalize(text)
+        if _GROUNDING_PATTERN.search(normalized):
+            return IntentDecision(FOLLOW_UP, True, 1.0 - consultation_p, "rule")
+        if _NO_GROUNDING_PATTERN.search(normalized):
+            return IntentDecision(FOLLOW_UP, False, 1.0 - consultation_p, "rule")
+
+        grounding_p = self.grounding_model.predict_proba(text)
+        return IntentDecision(
+            FOLLOW_UP,
+            grounding_p >= 0.5,
+            min(1.0 - consultation_p, max(grounding_p, 1.0 - grounding_p)),
+            "model",
+        )
+
+
+@lru_cache(maxsize=1)
+def get_intent_router() -> IntentRouter:
+    """学習済みの既定ルーターを取得（初回呼び出し時に学習）"""
+    return IntentRouter()
+
+
+_TURN_TYPE_INSTRUCTIONS = {
+    CONSULTATION: "この発言は初回相談（食事内容の分析依頼）です。初回相談の固定フォーマットで回答してください。",
+    FOLLOW_UP: "この発言は追加質問・会話です。会話モードで回答してください。",
+}
+
+
+def before_agent_callback(callback_context: Any) -> None:
+    """ユーザー発話を分類してセッション状態に記録"""
+    message = extract_text(callback_context.user_content)
+    if not message:
+        return None
+
+    decision = get_intent_router().classify(message)
+    callback_context.state["turn_type"] = decision.turn_type
+    callback_context.state["needs_grounding"] = decision.needs_grounding
+    set_span_attributes("kids_food_advisor.intent", asdict(decision))
+    return None
+
+
+def before_model_callback(callback_context: Any, llm_request: Any) -> None:
+    """判定結果に応じて検索を省き、発話種別を指示に追加"""
+    turn_type = callback_context.state.get("turn_type")
+    if turn_type not in _TURN_TYPE_INSTRUCTIONS:
+        return None
+
+    if not callback_context.state.get("needs_grounding", True) and has_retrieval_tool(
+        llm_request
+    ):
+        remove_retrieval_tools(llm_request)
+    llm_request.append_instructions(
+        [f"## 【事前判定】\n{_TURN_TYPE_INSTRUCTIONS[turn_type]}"]
+    )
+    return None
@@ -0,0 +1,308 @@
+"""
+オフライン性能テスト用のスタブバックエンド
+
+AGENT_BACKEND=stub の場合、create_unified_nutrition_agent は Gemini と
+Vertex AI Search の代わりに以下を使う。認証情報やネットワークは不要。
+
+- ScriptedLlm: 定型の応答を設定したトークンレート・遅延で再生するモデル
+- FakeVertexAiSearchTool / FakeSearchBackend: 固定コーパスから
+  グラウンディング結果を返す検索（遅延は設定可能）
+
+シミュレートしたモデル・検索時間は get_stub_stats() で取得でき、
+エンドツーエンドの計測値から差し引くことでフレームワーク自体の
+オーバーヘッドを求められる。
+
+環境変数:
+    AGENT_BACKEND: "stub" でスタブを使用（既定は "vertex"）
+    STUB_LLM_TOKENS_PER_SECOND: 生成速度（既定 200）
+    STUB_LLM_FIRST_TOKEN_DELAY: 最初のトークンまでの遅延秒数（既定 0.3）
+    STUB_SEARCH_LATENCY: 検索の遅延秒数（既定 0.2）
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections.abc import AsyncGenerator
+from typing import Any
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.tools import VertexAiSearchTool
+from google.genai import types
+from pydantic import BaseModel, Field
+
+from app.agents.callback_utils import extract_text, has_retrieval_tool
+from app.tools.search_compaction import estimate_tokens
+
+STUB_BACKEND = "stub"
+FAKE_DATASTORE = "fake-nutrition-datastore"
+
+CONSULTATION_RESPONSE = """🥗 **栄養アドバイザーより**
+1歳8ヶ月の食事を拝見しました！
+✨ 牛乳とバナナでカルシウムとエネルギーがしっかり摂れています
+ただし鉄分とたんぱく質がもう少し必要かもしれません💕
+夕食に鶏ひき肉と小松菜のそぼろ丼にすると鉄分とたんぱく質が補えますよ
+
+📈 補強したい栄養素
+
+**鉄分**
+- 主食と果物中心で鉄分を含む食材がありません
+
+**たんぱく質**
+- 昼食のうどんはたんぱく質のおかずが少なめです
+
+**ビタミンC**
+- 野菜がにんじんのみでビタミンCが不足気味です
+
+🥄 栄養素が補強出来る食材
+
+**鉄分の食材**
+→ 小松菜/赤身の牛肉/納豆
+
+**たんぱく質の食材**
+→ 鶏ささみ/豆腐/鮭
+
+**ビタミンCの食材**
+→ ブロッコリー/いちご/じゃがいも
+"""
+
+STRUCTURED_RESPONSE = {
+    "age": "1歳8ヶ月",
+    "praise": "牛乳とバナナでカルシウムとエネルギーがしっかり摂れています",
+    "concern": "ただし鉄分とたんぱく質がもう少し必要かもしれません",
+    "suggestion": "夕食に鶏ひき肉と小松菜のそぼろ丼にすると鉄分とたんぱく質が補えますよ",
+    "nutrients": [
+        {
+            "name": "鉄分",
+            "reason": "主食と果物中心で鉄分を含む食材がありません",
+            "foods": ["小松菜", "赤身の牛肉", "納豆"],
+        },
+        {
+            "name": "たんぱく質",
+            "reason": "昼食のうどんはたんぱく質のおかずが少なめです",
+            "foods": ["鶏ささみ", "豆腐", "鮭"],
+        },
+        {
+            "name": "ビタミンC",
+            "reason": "野菜がにんじんのみでビタミンCが不足気味です",
+            "foods": ["ブロッコリー", "いちご", "じゃがいも"],
+        },
+    ],
+}
+
+FOLLOW_UP_RESPONSES = [
+    "1歳のお子さんなら2-3分茹でて、柔らかくなったら細かく刻んでくださいね。",
+    "それでしたら小松菜や大根の葉っぱでも同じように鉄分が摂れますよ。無理せず少しずつ慣らしていきましょう。",
+    "最初は小さじ1杯程度から始めて、慣れてきたら徐々に増やしてくださいね。心配なときはかかりつけの先生にも相談してみてください。",
+]
+
+FAKE_CORPUS = [
+    {
+        "keywords": ["鉄", "小松菜", "ほうれん草", "レバー"],
+        "text": "鉄の推奨量は1〜2歳で4.5mg/日。赤身の肉や魚、小松菜などの緑黄色野菜を組み合わせる。",
+        "uri": "gs://fake/MHLW_DietaryReferenceIntakes_2025_InfantChild.pdf",
+    },
+    {
+        "keywords": ["カルシウム", "牛乳", "しらす", "乳製品"],
+        "text": "カルシウムの推奨量は1〜2歳で男児450mg/日。牛乳・乳製品や小魚から摂取しやすい。",
+        "uri": "gs://fake/MHLW_DietaryReferenceIntakes_2025_InfantChild.pdf",
+    },
+    {
+        "keywords": ["アレルギー", "卵", "小麦", "代替"],
+        "text": "食物アレルギーのある子どもには、除去した食品の栄養を他の食品で補う代替食を提供する。",
+        "uri": "gs://fake/MHLW_NurserySchool_MealProvisionGuideline_2012.pdf",
+    },
+    {
+        "keywords": ["量", "目安", "ビタミン", "たんぱく質"],
+        "text": "1〜2歳の食事は1日3回の食事と1〜2回の間食で、主食・主菜・副菜をそろえることが目安となる。",
+        "uri": "gs://fake/MHLW_NurserySchool_MealProvisionGuideline_2012.pdf",
+    },
+]
+
+_stats_lock = threading.Lock()
+_stats = {"llm_calls": 0, "llm_seconds": 0.0, "searches": 0, "search_seconds": 0.0}
+
+
+def is_stub_backend() -> bool:
+    """スタブバックエンドが選択されているか"""
+    return os.environ.get("AGENT_BACKEND", "vertex") == STUB_BACKEND
+
+
+def _record(key: str, seconds_key: str, seconds: float) -> None:
+    """シミュレート時間を記録"""
+    with _stats_lock:
+        _stats[key] += 1
+        _stats[seconds_key] += seconds
+
+
+def get_stub_stats() -> dict[str, Any]:
+    """
+    スタブでシミュレートした呼び出し回数と時間を取得
+
+    Returns:
+        LLM・検索の呼び出し回数と合計シミュレート秒数
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stub_stats() -> None:
+    """統計をリセット"""
+    with _stats_lock:
+        _stats.update(llm_calls=0, llm_seconds=0.0, searches=0, search_seconds=0.0)
+
+
+class FakeSearchBackend(BaseModel):
+    """固定コーパスを返す検索バックエンド"""
+
+    latency: float = 0.2
+    corpus: list[dict[str, Any]] = Field(default_factory=lambda: list(FAKE_CORPUS))
+    max_results: int = 3
+
+    async def search(self, query: str) -> types.GroundingMetadata:
+        """
+        クエリに含まれるキーワードで抜粋を選び、グラウンディング結果として返す
+
+        Args:
+            query: 検索クエリ（ユーザー発話）
+
+        Returns:
+            グラウンディングメタデータ
+        """
+        await asyncio.sleep(self.latency)
+        _record("searches", "search_seconds", self.latency)
+
+        scored = sorted(
+            self.corpus,
+            key=lambda doc: -sum(1 for keyword in doc["keywords"] if keyword in query),
+        )
+        chunks = [
+            types.GroundingChunk(
+                retrieved_context=types.GroundingChunkRetrievedContext(
+                    uri=doc["uri"],
+                    title=doc["uri"].rsplit("/", 1)[-1],
+                    text=doc["text"],
+                )
+            )
+            for doc in scored[: self.max_results]
+        ]
+        return types.GroundingMetadata(grounding_chunks=chunks)
+
+
+class FakeVertexAiSearchTool(VertexAiSearchTool):
+    """モデル名に関係なくリトリーバル設定を追加する偽のVertex AI Searchツール"""
+
+    def __init__(self):
+        super().__init__(data_store_id=FAKE_DATASTORE)
+
+    async def process_llm_request(
+        self, *, tool_context: Any, llm_request: LlmRequest
+    ) -> None:
+        llm_request.config = llm_request.config or types.GenerateContentConfig()
+        llm_request.config.tools = llm_request.config.tools or []
+        llm_request.config.tools.append(
+            types.Tool(
+                retrieval=types.Retrieval(
+                    vertex_ai_search=types.VertexAISearch(datastore=FAKE_DATASTORE)
+                )
+            )
+        )
+
+
+class ScriptedLlm(BaseLlm):
+    """定型の応答を設定したトークンレートで再生するモデル"""
+
+    model: str = "scripted-llm"
+    tokens_per_second: float = 200.0
+    first_token_delay: float = 0.3
+    chunk_tokens: int = 8
+    search_backend: FakeSearchBackend = Field(default_factory=FakeSearchBackend)
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return [r"scripted-.*"]
+
+    @classmethod
+    def from_env(cls) -> "ScriptedLlm":
+        """環境変数の設定でインスタンスを作成"""
+        return cls(
+            tokens_per_second=float(
+                os.environ.get("STUB_LLM_TOKENS_PER_SECOND", "200")
+            ),
+            first_token_delay=float(
+                os.environ.get("STUB_LLM_FIRST_TOKEN_DELAY", "0.3")
+            ),
+            search_backend=FakeSearchBackend(
+                latency=float(os.environ.get("STUB_SEARCH_LATENCY", "0.2"))
+            ),
+        )
+
+    def _select_response(self, llm_request: LlmRequest) -> str:
+        """リクエストに応じた定型応答を選択（同じ入力には同じ応答）"""
+        if llm_request.config and llm_request.config.response_schema:
+            return json.dumps(STRUCTURED_RESPONSE, ensure_ascii=False)
+
+        user_text = ""
+        for content in reversed(llm_request.contents):
+            if content.role == "user" and extract_text(content):
+                user_text = extract_text(content)
+                break
+        if "栄養分析" in user_text or "食事内容" in user_text:
+            return CONSULTATION_RESPONSE
+
+        digest = hashlib.sha256(user_text.encode("utf-8")).digest()
+        return FOLLOW_UP_RESPONSES[digest[0] % len(FOLLOW_UP_RESPONSES)]
+
+    def _split_chunks(self, text: str) -> list[str]:
+        """おおよそchunk_tokensトークンごとに分割"""
+        chunks, start = [], 0
+        for end in range(1, len(text) + 1):
+            if estimate_tokens(text[start:end]) >= self.chunk_tokens:
+                chunks.append(text[start:end])
+                start = end
+        if start < len(text):
+            chunks.append(text[start:])
+        return chunks
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        """定型応答を生成速度に合わせて返す（stream時は部分応答→集約応答）"""
+        grounding = None
+        if has_retrieval_tool(llm_request):
+            query = next(
+                (
+                    extract_text(c)
+                    for c in reversed(llm_request.contents)
+                    if c.role == "user" and extract_text(c)
+                ),
+                "",
+            )
+            grounding = await self.search_backend.search(query)
+
+        text = self._select_response(llm_request)
+        await asyncio.sleep(self.first_token_delay)
+        generation_seconds = estimate_tokens(text) / self.tokens_per_second
+        _record("llm_calls", "llm_seconds", self.first_token_delay + generation_seconds)
+
+        if not stream:
+            await asyncio.sleep(generation_seconds)
+            yield LlmResponse(
+                content=types.ModelContent(parts=[types.Part.from_text(text=text)]),
+                grounding_metadata=grounding,
+            )
+            return
+
+        for chunk in self._split_chunks(text):
+            await asyncio.sleep(estimate_tokens(chunk) / self.tokens_per_second)
+            yield LlmResponse(
+                content=types.ModelContent(parts=[types.Part.from_text(text=chunk)]),
+                partial=True,
+            )
+        yield LlmResponse(
+            content=types.ModelContent(parts=[types.Part.from_text(text=text)]),
+            grounding_metadata=grounding,
+        )
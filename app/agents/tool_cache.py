@@ -0,0 +1,295 @@
+"""
+セッション単位の検索結果キャッシュ
+
+同一会話内で繰り返される検索（例: 「鉄分って何に含まれてますか？」の後の
+「鉄分の多い食材をもう一度」）をセッション状態に保存した結果で応答し、
+検索の再実行を省く。
+
+- 関数ツール: before/after_tool_callback でツール結果をキャッシュ
+- VertexAiSearchTool: モデル組み込みのリトリーバルのため tool callback が
+  呼ばれない。after_model_callback でグラウンディング結果の抜粋を保存し、
+  before_model_callback でキャッシュヒット時にリトリーバル設定を外して
+  保存済みの抜粋をシステム指示に差し込む
+"""
+
+import json
+import re
+import time
+import unicodedata
+from typing import Any
+
+from app.agents.callback_utils import (
+    extract_text,
+    has_retrieval_tool,
+    remove_retrieval_tools,
+    set_span_attributes,
+)
+from app.tools.search_compaction import compact_search_result
+from app.utils.single_flight import normalize_key
+
+STATE_KEY = "tool_cache"
+
+# 主題として扱う栄養素名（表記ゆれは同じ語に寄せる。NFKC・小文字化後の表記）
+_NUTRIENT_ALIASES = {
+    "鉄": "鉄分",
+    "鉄分": "鉄分",
+    "タンパク質": "たんぱく質",
+    "蛋白質": "たんぱく質",
+    "たんぱく質": "たんぱく質",
+    "カルシウム": "カルシウム",
+    "亜鉛": "亜鉛",
+    "食物繊維": "食物繊維",
+    "ビタミンa": "ビタミンa",
+    "ビタミンb1": "ビタミンb1",
+    "ビタミンb2": "ビタミンb2",
+    "ビタミンc": "ビタミンc",
+    "ビタミンd": "ビタミンd",
+    "dha": "dha",
+}
+_NUTRIENT_PATTERN = re.compile(
+    "|".join(
+        re.escape(term) for term in sorted(_NUTRIENT_ALIASES, key=len, reverse=True)
+    )
+)
+# 質問の観点（主題と観点が同じ質問は同じ検索結果で答えられる）
+_ASPECT_PATTERNS = (
+    ("foods", re.compile(r"含まれ|含む|食材|食べ物|食品|摂れる|とれる")),
+    ("age", re.compile(r"何歳|歳から|いつから|何ヶ月|何か月|月齢")),
+    ("amount", re.compile(r"どのくらい|どれくらい|量|何g|グラム|目安")),
+    ("cooking", re.compile(r"調理|茹で|ゆで|レシピ|作り方|加熱")),
+)
+_FILLER_PATTERN = re.compile(r"[\s、。，,！？!?「」（）()・…〜~]+")
+# 主題を示す助詞の言い換え（「鉄分って何」「鉄分とは何」→「鉄分は何」）
+_TOPIC_MARKER_PATTERN = re.compile(
+    r"(?:については|について|(?:って|とは)(?=何|なに|どう|いつ|どれ|どの|どんな|いくつ))"
+)
+# 意味を変えない文末表現（丁寧語・依頼・確認）
+_ENDING_PATTERN = re.compile(
+    r"(?:を?教えて(?:ください|下さい)?|でしょうか|ですか|ますか|ですね|(?:です)?よね|"
+    r"ください|下さい|です|ます|かな|ね|よ)$"
+)
+
+
+def _question_aspect(text: str) -> str | None:
+    """正規化済みの質問の観点（該当なし・複数該当の場合はNone）"""
+    aspects = [name for name, pattern in _ASPECT_PATTERNS if pattern.search(text)]
+    return aspects[0] if len(aspects) == 1 else None
+
+
+def query_key(tool_name: str, query: str) -> str:
+    """
+    検索クエリからキャッシュキーを生成
+
+    栄養素名（主題）と質問の観点（含まれる食材・年齢・量・調理）が読み取れる
+    場合は、その組をキーとする（「鉄分って何に含まれてますか？」と
+    「鉄分の多い食材をもう一度」は同じキー、「鉄分は何歳から？」は別のキー）。
+    読み取れない場合は質問全体を正規化してキーとし、全角/半角・大文字/小文字・
+    句読点、栄養素名の表記ゆれ、「って/は」などの助詞や文末の丁寧表現の違い
+    だけを吸収する
+
+    Args:
+        tool_name: ツール名
+        query: 検索クエリ（ユーザーの質問またはツール引数）
+
+    Returns:
+        キャッシュキー
+    """
+    text = unicodedata.normalize("NFKC", query).lower()
+    text = _FILLER_PATTERN.sub("", text)
+    text = _NUTRIENT_PATTERN.sub(lambda m: _NUTRIENT_ALIASES[m.group(0)], text)
+
+    topics = sorted(set(_NUTRIENT_PATTERN.findall(text)))
+    aspect = _question_aspect(text)
+    if topics and aspect is not None:
+        return normalize_key(tool_name, "+".join(topics), aspect)
+
+    text = _TOPIC_MARKER_PATTERN.sub("は", text)
+    text = text.replace("ています", "てます").replace("ている", "てる")
+    text = _ENDING_PATTERN.sub("", text)
+    return normalize_key(tool_name, text)
+
+
+class SessionToolCache:
+    """セッション状態に保存する検索結果キャッシュ"""
+
+    def __init__(
+        self,
+        cacheable_tools: tuple[str, ...] = ("vertex_ai_search",),
+        max_entries: int = 16,
+        max_entry_chars: int = 4000,
+    ):
+        """
+        初期化
+
+        Args:
+            cacheable_tools: キャッシュ対象のツール名
+            max_entries: セッションあたりの最大エントリ数（超過分は古い順に削除）
+            max_entry_chars: 1エントリの最大サイズ（JSON文字数）
+        """
+        self.cacheable_tools = cacheable_tools
+        self.max_entries = max_entries
+        self.max_entry_chars = max_entry_chars
+
+    # ---------- セッション状態の読み書き ----------
+
+    def _load(self, state: Any) -> dict[str, Any]:
+        """状態からキャッシュを取得（更新用にコピーを返す）"""
+        cache = state.get(STATE_KEY) or {}
+        return {
+            "entries": dict(cache.get("entries", {})),
+            "hits": cache.get("hits", 0),
+            "misses": cache.get("misses", 0),
+            "counted": list(cache.get("counted", [])),
+        }
+
+    def _save(self, state: Any, cache: dict[str, Any]) -> None:
+        """キャッシュを状態に書き戻し（差分として記録される）"""
+        state[STATE_KEY] = cache
+        lookups = cache["hits"] + cache["misses"]
+        set_span_attributes(
+            "kids_food_advisor.tool_cache",
+            {
+                "hits": cache["hits"],
+                "misses": cache["misses"],
+                "hit_rate": cache["hits"] / lookups if lookups else 0.0,
+                "entries": len(cache["entries"]),
+            },
+        )
+
+    def _lookup(self, state: Any, key: str, invocation_id: str | None) -> Any | None:
+        """
+        キャッシュを検索してヒット/ミスを記録
+
+        1回の呼び出し（invocation）の中ではモデル呼び出しのたびに検索されるため、
+        同じ呼び出し・同じキーのヒット/ミスは最初の1回だけ数える
+        """
+        cache = self._load(state)
+        entry = cache["entries"].get(key)
+        marker = f"{invocation_id}\x1f{key}"
+        if marker not in cache["counted"]:
+            if entry is None:
+                cache["misses"] += 1
+            else:
+                cache["hits"] += 1
+            # 記録は直近の呼び出しの分だけ残す
+            cache["counted"] = [
+                counted
+                for counted in cache["counted"]
+                if counted.startswith(f"{invocation_id}\x1f")
+            ] + [marker]
+            self._save(state, cache)
+        return None if entry is None else entry["value"]
+
+    def _store(self, state: Any, key: str, value: Any) -> None:
+        """サイズ制限内でキャッシュに保存"""
+        if (
+            len(json.dumps(value, ensure_ascii=False, default=str))
+            > self.max_entry_chars
+        ):
+            return
+        cache = self._load(state)
+        entries = cache["entries"]
+        entries.pop(key, None)
+        entries[key] = {"value": value, "stored_at": time.time()}
+        while len(entries) > self.max_entries:
+            oldest = min(entries, key=lambda k: entries[k]["stored_at"])
+            entries.pop(oldest)
+        self._save(state, cache)
+
+    @staticmethod
+    def stats(state: Any) -> dict[str, Any]:
+        """セッションのキャッシュ統計を取得"""
+        cache = state.get(STATE_KEY) or {}
+        hits = cache.get("hits", 0)
+        misses = cache.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": len(cache.get("entries", {})),
+        }
+
+    # ---------- 関数ツール用コールバック ----------
+
+    def _tool_query(self, args: dict[str, Any]) -> str:
+        """ツール引数からキー生成用の文字列を作成"""
+        return " ".join(str(args[name]) for name in sorted(args))
+
+    def before_tool_callback(
+        self, tool: Any, args: dict[str, Any], tool_context: Any
+    ) -> dict | None:
+        """キャッシュヒット時はツールを実行せず保存済みの結果を返す"""
+        if tool.name not in self.cacheable_tools:
+            return None
+        key = query_key(tool.name, self._tool_query(args))
+        return self._lookup(tool_context.state, key, tool_context.invocation_id)
+
+    def after_tool_callback(
+        self,
+        tool: Any,
+        args: dict[str, Any],
+        tool_context: Any,
+        tool_response: dict,
+    ) -> dict | None:
+        """ツール結果をキャッシュに保存"""
+        if tool.name in self.cacheable_tools and tool_response:
+            key = query_key(tool.name, self._tool_query(args))
+            self._store(tool_context.state, key, tool_response)
+        return None
+
+    # ---------- 組み込みリトリーバル用コールバック ----------
+
+    def before_model_callback(self, callback_context: Any, llm_request: Any) -> None:
+        """キャッシュヒット時はリトリーバルを外し、保存済みの抜粋を指示に追加"""
+        if "vertex_ai_search" not in self.cacheable_tools:
+            return None
+        if not has_retrieval_tool(llm_request):
+            return None
+        query = extract_text(callback_context.user_content)
+        if not query:
+            return None
+
+        cached = self._lookup(
+            callback_context.state,
+            query_key("vertex_ai_search", query),
+            callback_context.invocation_id,
+        )
+        if cached is None:
+            return None
+
+        remove_retrieval_tools(llm_request)
+        passages = "\n".join(
+            f"- {passage['text']}（出典: {passage.get('source') or '資料'}）"
+            for passage in cached.get("passages", [])
+        )
+        llm_request.append_instructions(
+            [
+                "## 【検索済み資料】\n"
+                "この会話で既にPDF検索済みの内容です。再検索せずに以下の抜粋を根拠に回答してください。\n"
+                f"{passages}"
+            ]
+        )
+        return None
+
+    def after_model_callback(self, callback_context: Any, llm_response: Any) -> None:
+        """グラウンディング結果の抜粋をキャッシュに保存"""
+        metadata = getattr(llm_response, "grounding_metadata", None)
+        if metadata is None or "vertex_ai_search" not in self.cacheable_tools:
+            return None
+        query = extract_text(callback_context.user_content)
+        if not query:
+            return None
+
+        compacted = compact_search_result(
+            metadata.model_dump(exclude_none=True, mode="json")
+        )
+        if compacted["passages"]:
+            self._store(
+                callback_context.state,
+                query_key("vertex_ai_search", query),
+                compacted,
+            )
+        return None
+
+
+session_tool_cache = SessionToolCache()
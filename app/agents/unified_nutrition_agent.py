@@ -6,32 +6,68 @@
 """
 
 import logging
+import os
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
 
-import google.auth
-from google.adk.agents import LlmAgent
-from google.adk.tools import VertexAiSearchTool
+if TYPE_CHECKING:
+    from google.adk.agents import LlmAgent
 
 # AFC関連のINFOログを非表示に設定
 logging.getLogger("google_genai.models").setLevel(logging.WARNING)
 
-_, project_id = google.auth.default()
+
+@lru_cache(maxsize=1)
+def _get_project_id() -> str:
+    """認証情報からプロジェクトIDを取得（初回のみ解決）"""
+    import google.auth
+
+    _, project_id = google.auth.default()
+    return project_id
+
+
+def _configure_environment(project_id: str) -> None:
+    """Vertex AI利用のための環境変数の既定値を設定"""
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", project_id)
+    os.environ.setdefault("GOOGLE_CLOUD_LOCATION", "global")
+    os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "True")
 
 
 # 統合栄養エージェントの作成
-def create_unified_nutrition_agent():
+def create_unified_nutrition_agent() -> "LlmAgent":
     """統合栄養エージェントを作成"""
-
-    # Vertex AI Search Tool を作成
-    vertex_search_tool = VertexAiSearchTool(
-        data_store_id=f"projects/{project_id}/locations/global/collections/default_collection/dataStores/kids-food-advisor-nutrition-datastore"
-    )
+    # ADK/genaiと各コールバックのインポートは初回構築時まで遅延する
+    from google.adk.agents import LlmAgent
+    from google.adk.tools import VertexAiSearchTool
+
+    from app.agents import child_profile, consultation_output, intent_router
+    from app.agents.callback_utils import chain_tool_callbacks
+    from app.agents.history_compaction import history_compactor
+    from app.agents.stub_backends import is_stub_backend
+    from app.agents.tool_cache import session_tool_cache
+
+    if is_stub_backend():
+        # オフライン性能テスト用: 定型応答モデルと固定コーパス検索を使用
+        from app.agents.stub_backends import FakeVertexAiSearchTool, ScriptedLlm
+
+        model = ScriptedLlm.from_env()
+        vertex_search_tool = FakeVertexAiSearchTool()
+    else:
+        project_id = _get_project_id()
+        _configure_environment(project_id)
+        model = "gemini-2.0-flash"
+
+        # Vertex AI Search Tool を作成
+        vertex_search_tool = VertexAiSearchTool(
+            data_store_id=f"projects/{project_id}/locations/global/collections/default_collection/dataStores/kids-food-advisor-nutrition-datastore"
+        )
 
     available_tools = [
         vertex_search_tool,
     ]
 
     return LlmAgent(
-        model="gemini-2.0-flash",
+        model=model,
         name="KidsFoodAdvisor",
         description="1歳〜3歳の幼児向け栄養相談の専門家。栄養分析、食材提案、レシピアドバイスを総合的に提供",
         instruction="""あなたは1歳半〜3歳の幼児向け栄養相談専門家です。
@@ -113,8 +149,31 @@ def create_unified_nutrition_agent():
 - 「どうやって」「どのくらい」「代わりに」などの質問 → 会話モード""",
         tools=available_tools,
         include_contents="default",
+        before_agent_callback=intent_router.before_agent_callback,
+        before_model_callback=[
+            history_compactor,
+            child_profile.before_model_callback,
+            intent_router.before_model_callback,
+            consultation_output.before_model_callback,
+            session_tool_cache.before_model_callback,
+        ],
+        after_model_callback=[session_tool_cache.after_model_callback],
+        before_tool_callback=chain_tool_callbacks(
+            child_profile.before_tool_callback,
+            session_tool_cache.before_tool_callback,
+        ),
+        after_tool_callback=session_tool_cache.after_tool_callback,
     )
 
 
-# エージェントインスタンスの作成
-unified_nutrition_agent = create_unified_nutrition_agent()
+@lru_cache(maxsize=1)
+def get_unified_nutrition_agent() -> "LlmAgent":
+    """共有のエージェントインスタンスを取得（初回呼び出し時に1度だけ構築）"""
+    return create_unified_nutrition_agent()
+
+
+def __getattr__(name: str) -> Any:
+    """unified_nutrition_agent属性へのアクセス時にエージェントを構築"""
+    if name == "unified_nutrition_agent":
+        return get_unified_nutrition_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
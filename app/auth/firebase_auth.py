@@ -2,59 +2,23 @@
 Firebase認証関連のユーティリティとミドルウェア
 """
 
-import json
 import logging
 import os
 from functools import wraps
-from typing import Optional
 
-import firebase_admin
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from firebase_admin import auth, credentials
+from firebase_admin import auth
 
-logger = logging.getLogger(__name__)
-
-# Firebase Admin SDK初期化
-_firebase_app: Optional[firebase_admin.App] = None
-
-
-def initialize_firebase():
-    """Firebase Admin SDKを初期化"""
-    global _firebase_app
-
-    if _firebase_app is not None:
-        logger.info("Firebase Admin SDK is already initialized")
-        return _firebase_app
-
-    try:
-        # サービスアカウントキーの取得方法
-        service_account_key_path = os.getenv("FIREBASE_SERVICE_ACCOUNT_KEY_PATH")
-        service_account_key_json = os.getenv("FIREBASE_SERVICE_ACCOUNT_KEY_JSON")
-
-        if service_account_key_path and os.path.exists(service_account_key_path):
-            # ファイルパスから読み込み
-            cred = credentials.Certificate(service_account_key_path)
-            logger.info(
-                f"Firebase initialized with service account key file: {service_account_key_path}"
-            )
-        elif service_account_key_json:
-            # JSON文字列から読み込み
-            service_account_info = json.loads(service_account_key_json)
-            cred = credentials.Certificate(service_account_info)
-            logger.info("Firebase initialized with service account key JSON")
-        else:
-            # Application Default Credentials (ADC) を使用
-            cred = credentials.ApplicationDefault()
-            logger.info("Firebase initialized with Application Default Credentials")
-
-        _firebase_app = firebase_admin.initialize_app(cred)
-        logger.info("Firebase Admin SDK initialized successfully")
-        return _firebase_app
+from app.auth.firebase_tokens import (  # noqa: F401
+    RevokedTokenError,
+    get_token_cache_stats,
+    initialize_firebase,
+    user_info_from_claims,
+    verify_id_token_async,
+)
 
-    except Exception as e:
-        logger.error(f"Failed to initialize Firebase Admin SDK: {e}")
-        raise RuntimeError(f"Firebase initialization failed: {e}")
+logger = logging.getLogger(__name__)
 
 
 class FirebaseAuthBearer(HTTPBearer):
@@ -63,9 +27,7 @@ class FirebaseAuthBearer(HTTPBearer):
     def __init__(self, auto_error: bool = True):
         super().__init__(auto_error=auto_error)
 
-    async def __call__(
-        self, request: Request
-    ) -> Optional[HTTPAuthorizationCredentials]:
+    async def __call__(self, request: Request) -> HTTPAuthorizationCredentials | None:
         return await super().__call__(request)
 
 
@@ -74,8 +36,8 @@ firebase_scheme = FirebaseAuthBearer()
 
 
 async def get_current_user(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(firebase_scheme),
-) -> Optional[dict]:
+    credentials: HTTPAuthorizationCredentials | None = Depends(firebase_scheme),
+) -> dict | None:
     """
     Firebase ID Tokenを検証し、現在のユーザー情報を取得
 
@@ -92,41 +54,29 @@ async def get_current_user(
         return None
 
     try:
-        # Firebase Admin SDKが初期化されていない場合は初期化
-        if _firebase_app is None:
-            initialize_firebase()
-
-        # ID Tokenを検証
-        decoded_token = auth.verify_id_token(credentials.credentials)
-
-        user_info = {
-            "uid": decoded_token["uid"],
-            "email": decoded_token.get("email"),
-            "name": decoded_token.get("name"),
-            "picture": decoded_token.get("picture"),
-            "email_verified": decoded_token.get("email_verified", False),
-            "provider": decoded_token.get("firebase", {}).get("sign_in_provider"),
-        }
+        # ID Tokenを検証（署名検証はスレッドプールで行い、イベントループを止めない）
+        decoded_token = await verify_id_token_async(credentials.credentials)
+        user_info = user_info_from_claims(decoded_token)
 
         logger.info(
             f"User authenticated: {user_info['uid']} ({user_info.get('email', 'no email')})"
         )
         return user_info
 
-    except auth.InvalidIdTokenError as e:
+    except (auth.InvalidIdTokenError, RevokedTokenError) as e:
         logger.warning(f"Invalid Firebase ID token: {e}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication token",
             headers={"WWW-Authenticate": "Bearer"},
-        )
+        ) from e
     except Exception as e:
         logger.error(f"Firebase token verification error: {e}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Authentication failed",
             headers={"WWW-Authenticate": "Bearer"},
-        )
+        ) from e
 
 
 async def get_current_user_required(
@@ -177,8 +127,8 @@ BYPASS_AUTH = os.getenv("BYPASS_AUTH", "false").lower() == "true"
 
 
 async def get_current_user_optional_bypass(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(firebase_scheme),
-) -> Optional[dict]:
+    credentials: HTTPAuthorizationCredentials | None = Depends(firebase_scheme),
+) -> dict | None:
     """
     開発用：認証をバイパス可能なユーザー取得関数
     BYPASS_AUTH=true の場合、ダミーユーザーを返す
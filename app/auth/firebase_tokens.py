@@ -0,0 +1,345 @@
+"""
+Firebase ID Token検証の共通処理
+
+FastAPI（app/auth/firebase_auth.py）と2つのCloud Functions
+（firebase_auth_utils.py）から共通で使用する。フレームワークに依存せず、
+同期APIと、イベントループを止めないよう検証をスレッドプールで行う非同期APIを提供する。
+トークンキャッシュと公開鍵キャッシュはプロセス内の全エントリポイントで共有される
+"""
+
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Protocol
+
+import firebase_admin
+from firebase_admin import auth, credentials
+
+from app.auth.google_public_keys import FirebaseTokenVerifier, GooglePublicKeyStore
+from app.auth.token_cache import RevokedTokenError, VerifiedTokenCache
+
+logger = logging.getLogger(__name__)
+
+# Firebase Admin SDK初期化
+_firebase_app: firebase_admin.App | None = None
+
+
+def initialize_firebase():
+    """Firebase Admin SDKを初期化"""
+    global _firebase_app
+
+    if _firebase_app is not None:
+        logger.info("Firebase Admin SDK is already initialized")
+        return _firebase_app
+
+    try:
+        # サービスアカウントキーの取得方法
+        service_account_key_path = os.getenv("FIREBASE_SERVICE_ACCOUNT_KEY_PATH")
+        service_account_key_json = os.getenv("FIREBASE_SERVICE_ACCOUNT_KEY_JSON")
+
+        if service_account_key_path and os.path.exists(service_account_key_path):
+            # ファイルパスから読み込み
+            cred = credentials.Certificate(service_account_key_path)
+            logger.info(
+                f"Firebase initialized with service account key file: {service_account_key_path}"
+            )
+        elif service_account_key_json:
+            # JSON文字列から読み込み
+            service_account_info = json.loads(service_account_key_json)
+            cred = credentials.Certificate(service_account_info)
+            logger.info("Firebase initialized with service account key JSON")
+        else:
+            # Application Default Credentials (ADC) を使用
+            cred = credentials.ApplicationDefault()
+            logger.info("Firebase initialized with Application Default Credentials")
+
+        _firebase_app = firebase_admin.initialize_app(cred)
+        logger.info("Firebase Admin SDK initialized successfully")
+        return _firebase_app
+
+    except Exception as e:
+        logger.error(f"Failed to initialize Firebase Admin SDK: {e}")
+        raise RuntimeError(f"Firebase initialization failed: {e}") from e
+
+
+# Googleの公開鍵キャッシュ（期限前にバックグラウンドで更新）
+public_keys = GooglePublicKeyStore()
+_local_verifier: FirebaseTokenVerifier | None = None
+
+
+def _get_local_verifier() -> FirebaseTokenVerifier | None:
+    """
+    公開鍵キャッシュでID Tokenを検証するベリファイアを取得
+
+    FIREBASE_LOCAL_TOKEN_VERIFY=false の場合、Authエミュレーター使用時、
+    プロジェクトIDが分からない場合はNone（Firebase Admin SDKで検証）
+    """
+    global _local_verifier
+
+    if _local_verifier is not None:
+        return _local_verifier
+    if os.getenv("FIREBASE_LOCAL_TOKEN_VERIFY", "true").lower() != "true":
+        return None
+    if os.getenv("FIREBASE_AUTH_EMULATOR_HOST"):
+        return None
+
+    project_id = os.getenv("FIREBASE_PROJECT_ID") or _firebase_app.project_id
+    if not project_id:
+        return None
+    _local_verifier = FirebaseTokenVerifier(project_id, key_store=public_keys)
+    return _local_verifier
+
+
+def _verify_id_token(token: str) -> dict:
+    """ID Tokenの署名と有効期限を検証（通信は公開鍵の更新時のみ）"""
+    # Firebase Admin SDKが初期化されていない場合は初期化
+    if _firebase_app is None:
+        initialize_firebase()
+    verifier = _get_local_verifier()
+    if verifier is not None:
+        return verifier.verify(token)
+    return auth.verify_id_token(token)
+
+
+def _check_revoked(claims: dict) -> bool:
+    """Firebase上でトークンが失効しているか確認（ユーザー情報の取得で通信が発生）"""
+    user = auth.get_user(claims["uid"])
+    valid_after = (user.tokens_valid_after_timestamp or 0) / 1000
+    return claims.get("auth_time", 0) < valid_after
+
+
+# 検証済みトークンのキャッシュ（同じトークンの再検証を省略）
+# FIREBASE_CHECK_REVOKED=true の場合はキャッシュ済みのトークンも定期的に失効を確認
+CHECK_REVOKED = os.getenv("FIREBASE_CHECK_REVOKED", "false").lower() == "true"
+token_cache = VerifiedTokenCache(
+    _verify_id_token, revocation_check=_check_revoked if CHECK_REVOKED else None
+)
+
+
+def get_token_cache_stats() -> dict:
+    """トークンキャッシュと公開鍵キャッシュのメトリクスを取得"""
+    return {**token_cache.stats(), "public_keys": public_keys.stats()}
+
+
+# 署名検証・鍵の取得・失効確認を行うスレッドプール（イベントループから切り離す）
+_verify_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("FIREBASE_AUTH_WORKERS", "8")),
+    thread_name_prefix="firebase-auth",
+)
+
+# 開発環境（DEVELOPMENT_MODE=adk）で認証をスキップした場合のユーザー
+DEVELOPMENT_USER = {
+    "uid": "dev_user",
+    "email": "dev@example.com",
+    "name": "Development User",
+    "picture": None,
+    "email_verified": True,
+    "provider": "development",
+}
+
+
+class RequestWithHeaders(Protocol):
+    """headers.get を持つリクエスト（Flask / Starlette）"""
+
+    headers: Any
+
+
+def user_info_from_claims(decoded_token: dict) -> dict:
+    """検証済みのクレームからユーザー情報を作成"""
+    return {
+        "uid": decoded_token["uid"],
+        "email": decoded_token.get("email"),
+        "name": decoded_token.get("name"),
+        "picture": decoded_token.get("picture"),
+        "email_verified": decoded_token.get("email_verified", False),
+        "provider": decoded_token.get("firebase", {}).get("sign_in_provider"),
+    }
+
+
+def verify_id_token(token: str) -> dict:
+    """
+    ID Tokenを検証してクレームを返す（検証済みのトークンはキャッシュから取得）
+
+    Args:
+        token: Firebase ID Token
+
+    Returns:
+        デコード済みのクレーム
+
+    Raises:
+        auth.InvalidIdTokenError: トークンが無効な場合
+        RevokedTokenError: トークンが失効している場合
+    """
+    return token_cache.verify(token)
+
+
+async def verify_id_token_async(token: str) -> dict:
+    """
+    ID Tokenを検証してクレームを返す（非同期版）
+
+    キャッシュ済みのトークンはその場で返し、署名検証が必要な場合だけ
+    スレッドプールで実行してイベントループを止めない
+
+    Args:
+        token: Firebase ID Token
+
+    Returns:
+        デコード済みのクレーム
+
+    Raises:
+        auth.InvalidIdTokenError: トークンが無効な場合
+        RevokedTokenError: トークンが失効している場合
+    """
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_verify_executor, token_cache.verify, token)
+
+
+def _log_authenticated(user_info: dict) -> None:
+    logger.info(
+        f"User authenticated: {user_info['uid']} ({user_info.get('email', 'no email')})"
+    )
+
+
+def verify_firebase_token(token: str) -> dict | None:
+    """
+    Firebase ID Tokenを検証し、ユーザー情報を取得
+
+    Args:
+        token: Firebase ID Token
+
+    Returns:
+        ユーザー情報のdict、または認証失敗時はNone
+    """
+    try:
+        user_info = user_info_from_claims(verify_id_token(token))
+    except (auth.InvalidIdTokenError, RevokedTokenError) as e:
+        logger.warning(f"Invalid Firebase ID token: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"Firebase token verification error: {e}")
+        return None
+    _log_authenticated(user_info)
+    return user_info
+
+
+async def verify_firebase_token_async(token: str) -> dict | None:
+    """
+    Firebase ID Tokenを検証し、ユーザー情報を取得（非同期版）
+
+    Args:
+        token: Firebase ID Token
+
+    Returns:
+        ユーザー情報のdict、または認証失敗時はNone
+    """
+    try:
+        user_info = user_info_from_claims(await verify_id_token_async(token))
+    except (auth.InvalidIdTokenError, RevokedTokenError) as e:
+        logger.warning(f"Invalid Firebase ID token: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"Firebase token verification error: {e}")
+        return None
+    _log_authenticated(user_info)
+    return user_info
+
+
+def extract_auth_token(request: RequestWithHeaders) -> str | None:
+    """
+    リクエストのAuthorizationヘッダーからBearerトークンを抽出
+
+    Args:
+        request: Flask / Starlette のリクエスト
+
+    Returns:
+        Bearer トークンまたはNone
+    """
+    auth_header = request.headers.get("Authorization")
+    if not auth_header:
+        return None
+
+    if not auth_header.startswith("Bearer "):
+        return None
+
+    return auth_header[7:]  # "Bearer " を除去
+
+
+def _development_user() -> dict | None:
+    """開発環境（DEVELOPMENT_MODE=adk）では認証をスキップ"""
+    if os.getenv("DEVELOPMENT_MODE") == "adk":
+        logger.info("Development mode: Skipping Firebase authentication")
+        return dict(DEVELOPMENT_USER)
+    return None
+
+
+_MISSING_TOKEN_ERROR = {
+    "success": False,
+    "error": "Authorization header missing or invalid",
+    "detail": "Bearer token required",
+}
+_INVALID_TOKEN_ERROR = {
+    "success": False,
+    "error": "Invalid authentication token",
+    "detail": "Firebase token verification failed",
+}
+
+
+def authenticate_request(
+    request: RequestWithHeaders,
+) -> tuple[dict | None, dict | None]:
+    """
+    リクエストの認証を実行
+
+    Args:
+        request: Flask / Starlette のリクエスト
+
+    Returns:
+        (user_info, error_response) のタプル
+        - user_info: 認証成功時のユーザー情報、失敗時はNone
+        - error_response: 認証失敗時のエラーレスポンス辞書、成功時はNone
+    """
+    user_info = _development_user()
+    if user_info is not None:
+        return user_info, None
+
+    token = extract_auth_token(request)
+    if not token:
+        return None, dict(_MISSING_TOKEN_ERROR)
+
+    user_info = verify_firebase_token(token)
+    if not user_info:
+        return None, dict(_INVALID_TOKEN_ERROR)
+
+    return user_info, None
+
+
+async def authenticate_request_async(
+    request: RequestWithHeaders,
+) -> tuple[dict | None, dict | None]:
+    """
+    リクエストの認証を実行（非同期版）
+
+    Args:
+        request: Flask / Starlette のリクエスト
+
+    Returns:
+        (user_info, error_response) のタプル
+    """
+    user_info = _development_user()
+    if user_info is not None:
+        return user_info, None
+
+    token = extract_auth_token(request)
+    if not token:
+        return None, dict(_MISSING_TOKEN_ERROR)
+
+    user_info = await verify_firebase_token_async(token)
+    if not user_info:
+        return None, dict(_INVALID_TOKEN_ERROR)
+
+    return user_info, None
@@ -0,0 +1,321 @@
+"""
+Googleの公開鍵キャッシュとFirebase ID Tokenのローカル検証
+
+Firebase ID Tokenの署名用公開鍵（X.509証明書）をメモリに保持し、
+Cache-Control: max-age の期限が切れる前にバックグラウンドスレッドで更新する。
+トークンの検証は保持している鍵だけで行い、通信は鍵の更新時にのみ発生する
+"""
+
+import logging
+import re
+import threading
+import time
+from collections.abc import Callable, Mapping
+from typing import Any
+
+import jwt
+import requests
+from cryptography.x509 import load_pem_x509_certificate
+from firebase_admin import auth
+
+logger = logging.getLogger(__name__)
+
+# Firebase ID Tokenの署名に使われる証明書の公開URL
+FIREBASE_CERTS_URL = (
+    "https://www.googleapis.com/robot/v1/metadata/x509/"
+    "securetoken@system.gserviceaccount.com"
+)
+# Cache-Controlが無い場合の有効期間（秒）
+DEFAULT_MAX_AGE = 3600
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+def parse_max_age(headers: Mapping[str, str]) -> int:
+    """
+    レスポンスヘッダーから残りの有効期間（秒）を取得
+
+    Args:
+        headers: HTTPレスポンスヘッダー
+
+    Returns:
+        Cache-Control の max-age から Age を引いた秒数
+    """
+    match = _MAX_AGE.search(headers.get("Cache-Control", ""))
+    if match is None:
+        return DEFAULT_MAX_AGE
+    try:
+        age = int(headers.get("Age", 0))
+    except ValueError:
+        age = 0
+    return max(int(match.group(1)) - age, 0)
+
+
+def fetch_certificates(url: str) -> tuple[dict[str, str], Mapping[str, str]]:
+    """証明書（kid -> PEM）とレスポンスヘッダーを取得"""
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()
+    return response.json(), response.headers
+
+
+class GooglePublicKeyStore:
+    """期限前にバックグラウンドで更新されるGoogleの公開鍵キャッシュ"""
+
+    def __init__(
+        self,
+        url: str = FIREBASE_CERTS_URL,
+        fetch: Callable[[str], tuple[dict[str, str], Mapping[str, str]]] = (
+            fetch_certificates
+        ),
+        refresh_margin: float = 300.0,
+        retry_interval: float = 30.0,
+        min_refresh_interval: float = 60.0,
+        max_stale_age: float = 3600.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        初期化
+
+        Args:
+            url: 証明書の取得先URL
+            fetch: URLから (kid -> PEM, ヘッダー) を取得する関数
+            refresh_margin: 期限の何秒前に更新するか
+            retry_interval: 更新に失敗した場合の再試行間隔（秒）
+            min_refresh_interval: 未知のkidによる更新の最短間隔（秒）
+            max_stale_age: 更新に失敗し続けた場合に、期限切れの鍵を使い続ける最長時間（秒）。
+                超えた後は鍵を返さず、検証は失敗する
+            clock: 現在時刻（UNIX時間）を返す関数
+        """
+        self.url = url
+        self._fetch = fetch
+        self._refresh_margin = refresh_margin
+        self._retry_interval = retry_interval
+        self._min_refresh_interval = min_refresh_interval
+        self._max_stale_age = max_stale_age
+        self._clock = clock
+        # 参照は常に丸ごと差し替えるため、読み取り側はロック不要
+        self._keys: dict[str, Any] = {}
+        self._expires_at = 0.0
+        self._fetched_at = float("-inf")
+        self._attempted_at = float("-inf")
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._refreshes = 0
+        self._refresh_failures = 0
+        self._foreground_refreshes = 0
+
+    def get_key(self, kid: str) -> Any:
+        """
+        kidに対応する公開鍵を取得
+
+        鍵をまだ持っていない場合と未知のkidの場合だけ、その場で更新する。
+        期限切れから max_stale_age 秒を超えた鍵は使わない（更新できなければNone）
+
+        Args:
+            kid: トークンヘッダーのkid
+
+        Returns:
+            公開鍵、見つからない・鍵が古すぎる場合はNone
+        """
+        if self.is_stale():
+            return self._get_key_after_stale_refresh(kid)
+
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+
+        with self._refresh_lock:
+            # 待っている間に他のスレッドが更新していれば取得し直さない
+            key = self._keys.get(kid)
+            if key is None and (
+                not self._keys
+                or self._clock() - self._fetched_at >= self._min_refresh_interval
+            ):
+                self._foreground_refreshes += 1
+                self._refresh_locked()
+                key = self._keys.get(kid)
+        # 以降の更新はバックグラウンドで行う
+        self.start()
+        return key
+
+    def is_stale(self) -> bool:
+        """保持している鍵が期限切れから max_stale_age 秒を超えているか"""
+        return (
+            bool(self._keys) and self._clock() > self._expires_at + self._max_stale_age
+        )
+
+    def _get_key_after_stale_refresh(self, kid: str) -> Any:
+        """古すぎる鍵をその場で更新し、更新できなければNoneを返す"""
+        with self._refresh_lock:
+            if (
+                self.is_stale()
+                and self._clock() - self._attempted_at >= self._retry_interval
+            ):
+                self._foreground_refreshes += 1
+                try:
+                    self._refresh_locked()
+                except Exception as e:
+                    logger.warning(f"Failed to refresh stale Google public keys: {e}")
+            if self.is_stale():
+                logger.error(
+                    "Google public keys expired more than "
+                    f"{self._max_stale_age:.0f}s ago; rejecting ID tokens"
+                )
+                return None
+            key = self._keys.get(kid)
+        self.start()
+        return key
+
+    def refresh(self) -> None:
+        """証明書を取得して鍵を差し替える（失敗時は例外、保持中の鍵は残る）"""
+        with self._refresh_lock:
+            self._refresh_locked()
+
+    def _refresh_locked(self) -> None:
+        self._attempted_at = self._clock()
+        try:
+            certificates, headers = self._fetch(self.url)
+            keys = {
+                kid: load_pem_x509_certificate(pem.encode()).public_key()
+                for kid, pem in certificates.items()
+            }
+        except Exception:
+            self._refresh_failures += 1
+            raise
+        now = self._clock()
+        self._keys = keys
+        self._fetched_at = now
+        self._expires_at = now + parse_max_age(headers)
+        self._refreshes += 1
+        logger.info(f"Google public keys refreshed: {len(keys)} keys")
+        self._wakeup.set()
+
+    def start(self) -> None:
+        """バックグラウンド更新スレッドを開始（開始済みなら何もしない）"""
+        if self._thread is not None:
+            return
+        with self._refresh_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="google-public-keys", daemon=True
+                )
+                self._thread.start()
+
+    def close(self) -> None:
+        """バックグラウンド更新スレッドを停止"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        """期限の refresh_margin 秒前に更新し、失敗したら間隔を空けて再試行"""
+        while not self._stop.is_set():
+            wait = self._expires_at - self._refresh_margin - self._clock()
+            if wait > 0:
+                self._wakeup.clear()
+                self._wakeup.wait(wait)
+                continue
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Failed to refresh Google public keys: {e}")
+                self._stop.wait(self._retry_interval)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        鍵キャッシュのメトリクスを取得
+
+        Returns:
+            鍵の数・期限までの秒数・更新回数・失敗回数・鍵が古すぎるかを含む辞書
+        """
+        return {
+            "keys": len(self._keys),
+            "expires_in": max(self._expires_at - self._clock(), 0.0),
+            "refreshes": self._refreshes,
+            "refresh_failures": self._refresh_failures,
+            "foreground_refreshes": self._foreground_refreshes,
+            "stale": self.is_stale(),
+        }
+
+
+class FirebaseTokenVerifier:
+    """保持している公開鍵だけでFirebase ID Tokenを検証するクラス"""
+
+    def __init__(
+        self,
+        project_id: str,
+        key_store: GooglePublicKeyStore | None = None,
+        clock_skew_seconds: int = 0,
+    ):
+        """
+        初期化
+
+        Args:
+            project_id: FirebaseプロジェクトID（aud と iss の検証に使用）
+            key_store: 公開鍵キャッシュ（省略時はFirebaseの証明書URLから取得）
+            clock_skew_seconds: exp / iat の検証で許容する時刻のずれ（秒）
+        """
+        self.project_id = project_id
+        self.issuer = f"https://securetoken.google.com/{project_id}"
+        self.key_store = key_store or GooglePublicKeyStore()
+        self._clock_skew_seconds = clock_skew_seconds
+
+    def verify(self, token: str) -> dict[str, Any]:
+        """
+        ID Tokenの署名とクレームを検証
+
+        firebase_admin.auth.verify_id_token と同じ条件で検証し、
+        同じ例外を送出する
+
+        Args:
+            token: Firebase ID Token
+
+        Returns:
+            デコード済みのクレーム（uid を含む）
+
+        Raises:
+            auth.ExpiredIdTokenError: トークンの期限切れ
+            auth.InvalidIdTokenError: 署名やクレームが不正な場合
+        """
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.InvalidTokenError as e:
+            raise auth.InvalidIdTokenError(f"Malformed ID token: {e}", cause=e) from e
+        if header.get("alg") != "RS256":
+            raise auth.InvalidIdTokenError(
+                f"ID token has incorrect algorithm: {header.get('alg')}"
+            )
+        kid = header.get("kid")
+        key = self.key_store.get_key(kid) if kid else None
+        if key is None and self.key_store.is_stale():
+            raise auth.InvalidIdTokenError(
+                "Google public keys are stale and could not be refreshed"
+            )
+        if key is None:
+            raise auth.InvalidIdTokenError(f"ID token has unknown kid: {kid}")
+
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=["RS256"],
+                audience=self.project_id,
+                issuer=self.issuer,
+                leeway=self._clock_skew_seconds,
+                options={"require": ["exp", "iat", "sub"]},
+            )
+        except jwt.ExpiredSignatureError as e:
+            raise auth.ExpiredIdTokenError("ID token has expired", cause=e) from e
+        except jwt.InvalidTokenError as e:
+            raise auth.InvalidIdTokenError(f"Invalid ID token: {e}", cause=e) from e
+
+        subject = claims["sub"]
+        if not isinstance(subject, str) or not 0 < len(subject) <= 128:
+            raise auth.InvalidIdTokenError('ID token has invalid "sub" claim')
+        if claims.get("auth_time", 0) > time.time() + self._clock_skew_seconds:
+            raise auth.InvalidIdTokenError("ID token has future auth_time")
+        claims["uid"] = subject
+        return claims
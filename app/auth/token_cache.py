@@ -0,0 +1,229 @@
+"""
+検証済みFirebase ID Tokenのキャッシュ
+
+SPAは同じID Tokenを有効期限（1時間）まで繰り返し送ってくるため、
+署名検証済みのクレームをトークンのハッシュをキーに exp（から余裕を引いた時刻）
+まで保持し、2回目以降の検証を辞書の参照だけで済ませる。
+キャッシュにないトークンが同時に届いた場合も署名の検証は1回にまとめる
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+from app.utils.single_flight import SingleFlight
+
+# 失効記録の保持時間（ID Tokenの有効期間は1時間のため、それより古い記録は不要）
+MAX_TOKEN_LIFETIME = 3600
+
+
+class RevokedTokenError(Exception):
+    """失効したトークンが提示された場合の例外"""
+
+
+def token_key(token: str) -> bytes:
+    """トークンをそのまま保持しないためのキャッシュキー"""
+    return hashlib.sha256(token.encode()).digest()
+
+
+class VerifiedTokenCache:
+    """署名検証済みのクレームを有効期限まで保持するLRUキャッシュ"""
+
+    def __init__(
+        self,
+        verifier: Callable[[str], dict[str, Any]],
+        max_entries: int = 10_000,
+        skew_seconds: float = 30.0,
+        revocation_check: Callable[[dict[str, Any]], bool] | None = None,
+        revocation_check_interval: float = 300.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        初期化
+
+        Args:
+            verifier: トークンを検証してクレームを返す関数（無効なら例外を送出）
+            max_entries: 保持するトークン数の上限（超えると古い順に破棄）
+            skew_seconds: exp より何秒前にキャッシュを無効にするか
+            revocation_check: クレームを受け取り失効していればTrueを返す関数
+            revocation_check_interval: キャッシュ済みトークンの失効を再確認する間隔（秒）
+            clock: 現在時刻（UNIX時間）を返す関数
+        """
+        self._verifier = verifier
+        self._max_entries = max_entries
+        self._skew_seconds = skew_seconds
+        self._revocation_check = revocation_check
+        self._revocation_check_interval = revocation_check_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        # キー -> (クレーム, キャッシュの有効期限, 最後に失効を確認した時刻)
+        self._entries: OrderedDict[bytes, tuple[dict[str, Any], float, float]] = (
+            OrderedDict()
+        )
+        # uid -> この時刻より前に認証されたトークンを拒否する
+        self._revoked_before: dict[str, float] = {}
+        # 同じトークンの同時の検証を1回にまとめる
+        self._verifications = SingleFlight("verified_token")
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+        self._revoked = 0
+        self._revocation_checks = 0
+
+    def verify(self, token: str) -> dict[str, Any]:
+        """
+        トークンを検証してクレームを返す
+
+        キャッシュに有効なクレームがあれば検証を省略する。キャッシュにない
+        同じトークンの検証が実行中なら、その結果（または例外）を共有する。
+        返すクレームはキャッシュと共有されるため変更しないこと
+
+        Args:
+            token: Firebase ID Token
+
+        Returns:
+            デコード済みのクレーム
+
+        Raises:
+            RevokedTokenError: トークンが失効している場合
+            Exception: verifier が送出した検証エラー
+        """
+        key = token_key(token)
+        now = self._clock()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now >= entry[1]:
+                del self._entries[key]
+                self._expired += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._entries.move_to_end(key)
+                claims, _, checked_at = entry
+                if (
+                    self._revocation_check is None
+                    or now - checked_at < self._revocation_check_interval
+                ):
+                    return claims
+
+        # キャッシュにない場合は署名を検証し、前回の失効確認から時間が経った場合は
+        # 失効確認だけをやり直す
+        if entry is None:
+            claims = self._verifications.do(key, lambda: self._verifier(token))
+        if self._is_revoked(claims) or (
+            self._revocation_check is not None and self._check_revocation(claims)
+        ):
+            with self._lock:
+                self._entries.pop(key, None)
+                self._revoked += 1
+            raise RevokedTokenError(f"Token revoked for uid {claims.get('uid')}")
+
+        expires_at = float(claims.get("exp", 0)) - self._skew_seconds
+        if expires_at > now:
+            with self._lock:
+                self._entries[key] = (claims, expires_at, now)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+                    self._evictions += 1
+        return claims
+
+    def get(self, token: str) -> dict[str, Any] | None:
+        """
+        検証も失効確認も不要なキャッシュ済みのクレームだけを返す
+
+        ブロックする処理を含まないため、イベントループ上から呼び出せる
+
+        Args:
+            token: Firebase ID Token
+
+        Returns:
+            キャッシュ済みのクレーム、検証が必要な場合はNone
+        """
+        key = token_key(token)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now >= entry[1]:
+                return None
+            if (
+                self._revocation_check is not None
+                and now - entry[2] >= self._revocation_check_interval
+            ):
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def _check_revocation(self, claims: dict[str, Any]) -> bool:
+        with self._lock:
+            self._revocation_checks += 1
+        return bool(self._revocation_check(claims))
+
+    def _is_revoked(self, claims: dict[str, Any]) -> bool:
+        """revoke_user で失効させたユーザーのトークンかどうか"""
+        revoked_before = self._revoked_before.get(claims.get("uid"))
+        if revoked_before is None:
+            return False
+        return claims.get("auth_time", claims.get("iat", 0)) < revoked_before
+
+    def revoke_user(self, uid: str, revoked_at: float | None = None) -> None:
+        """
+        ユーザーのトークンを失効させる（サインアウトやトークン失効API呼び出し後に使用）
+
+        Args:
+            uid: ユーザーID
+            revoked_at: この時刻より前に認証されたトークンを拒否する（既定は現在時刻）
+        """
+        now = self._clock()
+        with self._lock:
+            self._revoked_before[uid] = now if revoked_at is None else revoked_at
+            for uid_, revoked in list(self._revoked_before.items()):
+                if revoked < now - MAX_TOKEN_LIFETIME:
+                    del self._revoked_before[uid_]
+            for key in [
+                key
+                for key, (claims, _, _) in self._entries.items()
+                if claims.get("uid") == uid
+            ]:
+                del self._entries[key]
+
+    def invalidate(self, token: str) -> None:
+        """トークン1件をキャッシュから除去"""
+        with self._lock:
+            self._entries.pop(token_key(token), None)
+
+    def clear(self) -> None:
+        """キャッシュを空にする"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """
+        キャッシュのメトリクスを取得
+
+        Returns:
+            ヒット数・ミス数・ヒット率・期限切れ数・破棄数・失効数・
+            同時の検証をまとめた数を含む辞書
+        """
+        collapsed = self._verifications.stats()["collapsed"]
+        with self._lock:
+            hits, misses = self._hits, self._misses
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+                "expired": self._expired,
+                "evictions": self._evictions,
+                "revoked": self._revoked,
+                "revocation_checks": self._revocation_checks,
+                "collapsed_verifications": collapsed,
+                "size": len(self._entries),
+            }
@@ -0,0 +1,129 @@
+"""
+意図判定のラベル付きサンプル
+
+(メッセージ, 発話種別, PDF検索の要否) の組。
+発話種別は "consultation"（初回相談）/ "follow_up"（会話モード）。
+PDF検索の要否はエージェント指示の「PDF検索実行」の基準に合わせる
+（栄養素・食材の代替・量・アレルギー・安全性は要、調理法・食べない悩み・雑談は不要）
+
+- INTENT_SAMPLES: ルーターの学習とルール（正規表現）の調整に使うサンプル
+- INTENT_HOLDOUT_SAMPLES: 評価専用のサンプル。学習にもルールの調整にも使わない
+  （scripts/evaluate_intent_router.py はこちらでのみ指標を報告する）
+"""
+
+INTENT_SAMPLES: list[tuple[str, str, bool]] = [
+    # ---------- 初回相談（食事内容の分析依頼） ----------
+    (
+        "はなちゃん（1歳8ヶ月）の栄養分析をお願いします。\n\n年齢: 1-2歳\n朝食: 食パン、バナナ、牛乳\n"
+        "昼食: うどん、にんじん\nアレルギー: なし\n特別な事情: なし\n"
+        "上記の食事内容について栄養バランスの分析と夕食での補完提案をお願いします。",
+        "consultation",
+        True,
+    ),
+    (
+        "お子さま（2歳3ヶ月）の栄養分析をお願いします。\n\n年齢: 1-2歳\n身長: 88cm\n体重: 12kg\n"
+        "朝食: ごはん、納豆\n昼食: まだ食べていません\nアレルギー: 卵\n特別な事情: なし",
+        "consultation",
+        True,
+    ),
+    (
+        "そうたくん（3歳0ヶ月）の栄養分析をお願いします。\n\n年齢: 3歳\n朝食: おにぎり\n昼食: カレー\n"
+        "夕食: 鮭、ブロッコリー\nアレルギー: 小麦\n特別な事情: 風邪気味",
+        "consultation",
+        True,
+    ),
+    ("朝食: ヨーグルト、りんご\n昼食: 焼きそば\n夕食の補完提案をお願いします", "consultation", True),
+    ("今日は朝にパンと牛乳、昼にうどんを食べました。夕食は何を足せばいいですか？", "consultation", True),
+    ("1歳10ヶ月です。朝ごはんはおかゆ、昼ごはんはミートソースでした。栄養バランスを見てください", "consultation", True),
+    ("2歳の子の今日の食事を分析してください。朝：トースト、昼：チャーハン、おやつ：せんべい", "consultation", True),
+    ("今日の献立をチェックしてほしいです。朝はバナナだけ、昼は肉じゃがとごはん", "consultation", True),
+    ("1歳半の娘、朝食は食パンと卵、昼食はうどんでした。足りない栄養素は？", "consultation", True),
+    ("3歳の息子の一日の食事です。朝：納豆ごはん 昼：ハンバーグ 夜：焼き魚とみそ汁。分析お願いします", "consultation", True),
+    ("2歳5ヶ月、アレルギーなし。朝はシリアル、昼はパスタ。夕食の提案をください", "consultation", True),
+    ("今日食べたもの：朝 おにぎり、昼 からあげ。栄養が偏っていないか見てください", "consultation", True),
+    # ---------- 会話モード・PDF検索必要 ----------
+    ("鉄分って何に含まれてますか？", "follow_up", True),
+    ("鉄分の多い食材をもう一度教えてください", "follow_up", True),
+    ("ほうれん草が嫌いなんですが代わりの食材はありますか", "follow_up", True),
+    ("どのくらいの量をあげればいいですか？", "follow_up", True),
+    ("卵アレルギーがあるんですが、何で代用すればいいですか", "follow_up", True),
+    ("はちみつは1歳に与えても大丈夫ですか？", "follow_up", True),
+    ("ビタミンDを摂るのに良い食材は？", "follow_up", True),
+    ("カルシウムが豊富な幼児向けの食材を知りたい", "follow_up", True),
+    ("タンパク質を上手に摂る方法は？", "follow_up", True),
+    ("幼児の便秘に良い食事を知りたい", "follow_up", True),
+    ("牛乳は1日どれくらい飲ませていいですか", "follow_up", True),
+    ("小松菜にも鉄分はありますか", "follow_up", True),
+    ("2歳にお刺身はまだ早いですか？", "follow_up", True),
+    ("ナッツは何歳から食べさせていいですか", "follow_up", True),
+    ("魚が苦手な場合、DHAは何から摂れますか", "follow_up", True),
+    ("食物繊維を増やすにはどうしたらいい？", "follow_up", True),
+    ("小麦アレルギーでも食べられる主食は？", "follow_up", True),
+    ("ブロッコリーの代わりになる野菜はありますか", "follow_up", True),
+    ("亜鉛が不足するとどうなりますか", "follow_up", True),
+    ("チーズは1日何グラムまでですか", "follow_up", True),
+    ("おやつに果物はどれくらいあげていいですか", "follow_up", True),
+    ("納豆は毎日食べても大丈夫？", "follow_up", True),
+    ("ビタミンCが多い果物を教えて", "follow_up", True),
+    ("塩分はどのくらいまでなら平気ですか", "follow_up", True),
+    # ---------- 会話モード・PDF検索不要 ----------
+    ("ほうれん草はどのくらい茹でればいいですか？", "follow_up", False),
+    ("野菜を全然食べてくれません", "follow_up", False),
+    ("ありがとうございます！", "follow_up", False),
+    ("わかりました、やってみます", "follow_up", False),
+    ("細かく刻むのとすりつぶすのはどっちがいいですか", "follow_up", False),
+    ("野菜嫌いを克服する方法は？", "follow_up", False),
+    ("遊び食べをしてしまいます", "follow_up", False),
+    ("電子レンジで作っても大丈夫ですか", "follow_up", False),
+    ("冷凍して作り置きしてもいいですか", "follow_up", False),
+    ("もう少し簡単な作り方はありますか", "follow_up", False),
+    ("助かりました、また相談します", "follow_up", False),
+    ("スプーンを嫌がるときはどうすればいいですか", "follow_up", False),
+    ("なるほど", "follow_up", False),
+    ("味付けは薄めのほうがいいですか", "follow_up", False),
+    ("食事に時間がかかりすぎてしまいます", "follow_up", False),
+    ("すみません、さっきの説明をもう少し短くしてもらえますか", "follow_up", False),
+    ("こんにちは", "follow_up", False),
+    ("食べムラがあって心配です", "follow_up", False),
+    ("一緒に料理すると食べてくれますか", "follow_up", False),
+    ("お皿を投げてしまうのですがどうしたらいいですか", "follow_up", False),
+    ("煮込む時間はどれくらいがいいですか", "follow_up", False),
+    ("了解です！", "follow_up", False),
+]  # fmt: skip
+
+INTENT_HOLDOUT_SAMPLES: list[tuple[str, str, bool]] = [
+    # ---------- 初回相談（食事内容の分析依頼） ----------
+    (
+        "ゆいちゃん（2歳0ヶ月）の栄養分析をお願いします。\n\n年齢: 1-2歳\n朝食: ロールパン、ヨーグルト\n"
+        "昼食: 親子丼\nアレルギー: えび\n特別な事情: なし",
+        "consultation",
+        True,
+    ),
+    ("朝食: おかゆ、しらす\n昼食: 煮込みうどん\n不足している栄養を教えてください", "consultation", True),
+    ("4歳の娘です。朝はコーンフレーク、昼は給食でカレーでした。晩ごはんで何を補えばいい？", "consultation", True),
+    ("1歳3ヶ月の息子、今日は朝ごはんにバナナ粥、お昼ごはんにかぼちゃの煮物を食べました。バランスどうでしょう", "consultation", True),
+    ("きょうのメニュー 朝：食パン 昼：焼きうどん 夜：ハンバーグ。偏ってますか？", "consultation", True),
+    ("2歳半の子の今日の食事記録です。朝ごはん 卵焼き、昼ごはん ミートボール。見てもらえますか", "consultation", True),
+    # ---------- 会話モード・PDF検索必要 ----------
+    ("貧血予防にはどんな食べ物がいいですか", "follow_up", True),
+    ("えびアレルギーの子でも食べられるおかずは？", "follow_up", True),
+    ("ヨーグルトは1日どのくらいまで？", "follow_up", True),
+    ("生卵は何歳から大丈夫ですか", "follow_up", True),
+    ("ひじきに鉄分はどれくらい入っていますか", "follow_up", True),
+    ("牛乳が飲めない子のカルシウム源は？", "follow_up", True),
+    ("肉を食べないのですがたんぱく質は足りていますか", "follow_up", True),
+    ("ビタミンAが多い野菜を知りたいです", "follow_up", True),
+    ("もちは何歳から食べさせていいですか", "follow_up", True),
+    ("ジュースは毎日飲ませても平気ですか", "follow_up", True),
+    # ---------- 会話モード・PDF検索不要 ----------
+    ("かぼちゃを柔らかくするコツは？", "follow_up", False),
+    ("ありがとう、参考になりました", "follow_up", False),
+    ("座って食べてくれないのが悩みです", "follow_up", False),
+    ("おにぎりを小さく握るのはどうですか", "follow_up", False),
+    ("はい、お願いします", "follow_up", False),
+    ("お弁当に入れるなら前の晩に作っておいてもいい？", "follow_up", False),
+    ("もう少し詳しく説明してもらえますか", "follow_up", False),
+    ("手づかみ食べはさせたほうがいいですか", "follow_up", False),
+    ("白いごはんしか食べないときはどうしたら？", "follow_up", False),
+    ("おはようございます", "follow_up", False),
+]  # fmt: skip
@@ -0,0 +1,159 @@
+"""
+検索結果コンパクション
+
+Vertex AI Searchの生の検索結果から上位の抜粋のみを取り出し、
+トークン予算内に切り詰めて出典情報と共に返す。
+ツール応答・モデルコンテキスト・トレースに載るペイロードを小さく保つ。
+"""
+
+from typing import Any
+
+from app.utils.typing import get_pdf_display_name
+
+# 抜粋テキストとして扱うキー（Vertex AI Search / グラウンディング応答の両形式）
+_TEXT_KEYS = ("snippet", "content", "text", "chunk_text")
+# 出典情報として扱うキー
+_URI_KEYS = ("link", "uri", "url", "source")
+_TITLE_KEYS = ("title", "displayName", "display_name")
+
+DEFAULT_MAX_PASSAGES = 3
+DEFAULT_TOKEN_BUDGET = 400
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    トークン数の概算
+
+    日本語は1文字≒1トークン、ASCIIは4文字≒1トークンとして見積もる
+    """
+    ascii_chars = sum(1 for ch in text if ch.isascii())
+    return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
+
+
+def _truncate_to_tokens(text: str, budget: int) -> str:
+    """トークン予算内に収まるようにテキストを切り詰め"""
+    used = 0
+    for index, ch in enumerate(text):
+        used += 1 if not ch.isascii() else 0.25
+        if used > budget:
+            return text[:index].rstrip() + "…"
+    return text
+
+
+def _find_first(node: dict[str, Any], keys: tuple[str, ...]) -> str | None:
+    """候補キーのうち最初に見つかった文字列値を返す"""
+    for key in keys:
+        value = node.get(key)
+        if isinstance(value, str) and value:
+            return value
+    return None
+
+
+def extract_passages(result: Any) -> list[dict[str, str | None]]:
+    """
+    検索結果から抜粋を出現順（＝ランキング順）に抽出
+
+    Args:
+        result: 検索ツールの生の結果（dict/list/str）
+
+    Returns:
+        {"text", "title", "uri"} を持つ抜粋のリスト
+    """
+    passages: list[dict[str, str | None]] = []
+
+    def walk(node: Any, title: str | None, uri: str | None) -> None:
+        if isinstance(node, str):
+            if node.strip():
+                passages.append({"text": node.strip(), "title": title, "uri": uri})
+        elif isinstance(node, dict):
+            title = _find_first(node, _TITLE_KEYS) or title
+            uri = _find_first(node, _URI_KEYS) or uri
+            text = _find_first(node, _TEXT_KEYS)
+            if text and text.strip():
+                passages.append({"text": text.strip(), "title": title, "uri": uri})
+            for value in node.values():
+                if isinstance(value, dict | list):
+                    walk(value, title, uri)
+        elif isinstance(node, list | tuple):
+            for item in node:
+                walk(item, title, uri)
+
+    walk(result, None, None)
+    return passages
+
+
+def _source_label(passage: dict[str, str | None]) -> str | None:
+    """出典の表示名を取得（PDFは日本語名に変換）"""
+    reference = passage.get("uri") or passage.get("title")
+    if not reference:
+        return None
+    filename = reference.rstrip("/").rsplit("/", 1)[-1]
+    return get_pdf_display_name(filename)
+
+
+def compact_search_result(
+    result: Any,
+    max_passages: int = DEFAULT_MAX_PASSAGES,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+) -> dict[str, Any]:
+    """
+    1クエリ分の検索結果をコンパクト化
+
+    Args:
+        result: 検索ツールの生の結果
+        max_passages: 保持する抜粋の最大数
+        token_budget: 抜粋テキスト全体のトークン予算
+
+    Returns:
+        上位の抜粋と出典参照を含む辞書
+    """
+    passages = extract_passages(result)
+    compacted = []
+    remaining = token_budget
+    truncated = len(passages) > max_passages
+
+    for passage in passages[:max_passages]:
+        if remaining <= 0:
+            truncated = True
+            break
+        text = passage["text"] or ""
+        cost = estimate_tokens(text)
+        if cost > remaining:
+            text = _truncate_to_tokens(text, remaining)
+            truncated = True
+        remaining -= min(cost, remaining)
+        compacted.append(
+            {
+                "text": text,
+                "source": _source_label(passage),
+                "uri": passage.get("uri"),
+            }
+        )
+
+    return {
+        "passages": compacted,
+        "total_passages": len(passages),
+        "truncated": truncated,
+    }
+
+
+def compact_nutrition_knowledge(
+    nutrition_knowledge: dict[str, Any],
+    max_passages: int = DEFAULT_MAX_PASSAGES,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+) -> dict[str, dict[str, Any]]:
+    """
+    クエリ種別ごとの検索結果をまとめてコンパクト化
+
+    Args:
+        nutrition_knowledge: {クエリ種別: 生の検索結果} の辞書
+        max_passages: クエリごとに保持する抜粋の最大数
+        token_budget: クエリごとのトークン予算
+
+    Returns:
+        {クエリ種別: コンパクト化された結果} の辞書
+    """
+    return {
+        query_type: compact_search_result(result, max_passages, token_budget)
+        for query_type, result in nutrition_knowledge.items()
+    }
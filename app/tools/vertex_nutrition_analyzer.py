@@ -9,17 +9,48 @@ from typing import Any
 import google.auth
 from google.adk.tools import VertexAiSearchTool
 
+from app.tools.search_compaction import (
+    DEFAULT_MAX_PASSAGES,
+    DEFAULT_TOKEN_BUDGET,
+    compact_nutrition_knowledge,
+)
+from app.utils.single_flight import SingleFlight, normalize_key
+
 _, project_id = google.auth.default()
 
+# 同時に発生した同一の検索・分析リクエストを1回の実行にまとめる
+_search_flight = SingleFlight("vertex_ai_search")
+_analysis_flight = SingleFlight("vertex_nutrition_analysis")
+
+
+def get_single_flight_stats() -> dict[str, dict[str, Any]]:
+    """検索・分析呼び出しの重複抑止メトリクスを取得"""
+    return {
+        "search": _search_flight.stats(),
+        "analysis": _analysis_flight.stats(),
+    }
+
 
 class VertexNutritionAnalyzer:
     """Vertex AI Search統合栄養分析クラス"""
 
-    def __init__(self):
-        """初期化"""
+    def __init__(
+        self,
+        max_passages_per_query: int = DEFAULT_MAX_PASSAGES,
+        token_budget_per_query: int = DEFAULT_TOKEN_BUDGET,
+    ):
+        """
+        初期化
+
+        Args:
+            max_passages_per_query: detailed_analysisに残すクエリごとの抜粋数
+            token_budget_per_query: detailed_analysisのクエリごとのトークン予算
+        """
         self.search_tool = VertexAiSearchTool(
             data_store_id=f"projects/{project_id}/locations/global/collections/default_collection/dataStores/kids-food-advisor-nutrition-datastore"
         )
+        self.max_passages_per_query = max_passages_per_query
+        self.token_budget_per_query = token_budget_per_query
 
     def analyze_meal_nutrition(
         self,
@@ -28,6 +59,7 @@ class VertexNutritionAnalyzer:
         age_group: str = "1-2歳",
         allergens: list[str] | None = None,
         special_notes: str = "",
+        include_full_payload: bool = False,
     ) -> dict[str, Any]:
         """
         Vertex AI Searchを使用した栄養分析
@@ -38,6 +70,7 @@ class VertexNutritionAnalyzer:
             age_group: 年齢グループ
             allergens: アレルギー情報
             special_notes: 特別な事情
+            include_full_payload: 生の検索結果を raw_analysis として含めるか
 
         Returns:
             栄養分析結果の辞書
@@ -45,6 +78,38 @@ class VertexNutritionAnalyzer:
         if allergens is None:
             allergens = []
 
+        key = normalize_key(
+            breakfast,
+            lunch,
+            age_group,
+            sorted(allergens),
+            special_notes,
+            include_full_payload,
+            self.max_passages_per_query,
+            self.token_budget_per_query,
+        )
+        return _analysis_flight.do(
+            key,
+            lambda: self._analyze_meal_nutrition(
+                breakfast,
+                lunch,
+                age_group,
+                allergens,
+                special_notes,
+                include_full_payload,
+            ),
+        )
+
+    def _analyze_meal_nutrition(
+        self,
+        breakfast: str,
+        lunch: str,
+        age_group: str,
+        allergens: list[str],
+        special_notes: str,
+        include_full_payload: bool,
+    ) -> dict[str, Any]:
+        """栄養分析の本体（重複抑止の内側で実行）"""
         try:
             # 検索クエリの構築
             search_queries = self._build_search_queries(
@@ -54,8 +119,7 @@ class VertexNutritionAnalyzer:
             # 栄養知識ベースから情報検索
             nutrition_knowledge = {}
             for query_type, query in search_queries.items():
-                result = self.search_tool.run(query)
-                nutrition_knowledge[query_type] = result
+                nutrition_knowledge[query_type] = self._search(query)
 
             # 分析結果の統合
             analysis_result = self._integrate_analysis_results(
@@ -67,6 +131,9 @@ class VertexNutritionAnalyzer:
                 special_notes,
             )
 
+            if include_full_payload:
+                analysis_result["raw_analysis"] = nutrition_knowledge
+
             return analysis_result
 
         except Exception as e:
@@ -77,6 +144,12 @@ class VertexNutritionAnalyzer:
                 "missing_nutrients": [],
             }
 
+    def _search(self, query: str) -> Any:
+        """同一クエリの同時実行をまとめて検索を実行"""
+        return _search_flight.do(
+            normalize_key(query), lambda: self.search_tool.run(query)
+        )
+
     def _build_search_queries(
         self, breakfast: str, lunch: str, age_group: str, allergens: list[str]
     ) -> dict[str, str]:
@@ -157,7 +230,12 @@ class VertexNutritionAnalyzer:
             "missing_nutrients": missing_nutrients,
             "recommendations": recommendations,
             "allergy_warnings": allergy_warnings,
-            "detailed_analysis": nutrition_knowledge,
+            # 生の検索結果は数KBになるため上位の抜粋のみ保持
+            "detailed_analysis": compact_nutrition_knowledge(
+                nutrition_knowledge,
+                max_passages=self.max_passages_per_query,
+                token_budget=self.token_budget_per_query,
+            ),
             "meal_summary": {
                 "breakfast": breakfast,
                 "lunch": lunch,
@@ -206,7 +284,7 @@ class VertexNutritionAnalyzer:
             "grains": ["ご飯", "パン", "うどん", "そうめん", "米"],
         }
 
-        for category, keywords in categories.items():
+        for keywords in categories.values():
             if any(keyword in breakfast + lunch for keyword in keywords):
                 score += 5
 
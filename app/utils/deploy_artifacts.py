@@ -0,0 +1,228 @@
+"""
+デプロイ成果物のコンテンツハッシュ管理
+
+Agent Engineのデプロイ成果物（pickle化したアプリ・requirements・ソースパッケージ）を
+レイヤーごとのコンテンツハッシュで識別し、ステージングバケットの
+`agent_engine/<release>/manifest.json` に記録する。再デプロイ時は現在の
+エージェントが参照している成果物のマニフェストと比較し、変更のあった
+レイヤーだけをアップロードする。
+
+- ソースパッケージは再現可能なtar.gz（ファイル順・タイムスタンプ・所有者を固定）で
+  ハッシュを計算する
+- pickleはインタプリタ起動ごとにバイト列が変わり得る（集合の順序など）ため、
+  生成元であるソースとrequirementsのハッシュから導出する
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import tarfile
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+MANIFEST_FILENAME = "manifest.json"
+GCS_DIR_PREFIX = "agent_engine"
+
+# レイヤー名（agent_engines.create/update の引数名）とパッケージ仕様のURIフィールド
+LAYER_URI_FIELDS = {
+    "agent_engine": "pickle_object_gcs_uri",
+    "requirements": "requirements_gcs_uri",
+    "extra_packages": "dependency_files_gcs_uri",
+}
+
+_EXCLUDED_NAMES = {"__pycache__", ".DS_Store", ".pytest_cache", ".mypy_cache"}
+_EXCLUDED_SUFFIXES = {".pyc", ".pyo"}
+
+
+def content_digest(*parts: bytes) -> str:
+    """
+    コンテンツハッシュ（SHA-256の先頭16桁）を計算
+
+    Args:
+        parts: ハッシュ対象のバイト列
+
+    Returns:
+        16進数のハッシュ文字列
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(hashlib.sha256(part).digest())
+    return digest.hexdigest()[:16]
+
+
+def iter_package_files(paths: Sequence[str]) -> list[Path]:
+    """
+    パッケージに含めるファイルを決定的な順序で列挙
+
+    Args:
+        paths: ファイルまたはディレクトリのパス
+
+    Returns:
+        キャッシュ等を除いたファイルパスのソート済みリスト
+    """
+    files = set()
+    for path in map(Path, paths):
+        candidates = [path] if path.is_file() else path.rglob("*")
+        for candidate in candidates:
+            if not candidate.is_file():
+                continue
+            if _EXCLUDED_NAMES.intersection(candidate.parts):
+                continue
+            if candidate.suffix in _EXCLUDED_SUFFIXES:
+                continue
+            files.add(candidate)
+    return sorted(files, key=lambda p: p.as_posix())
+
+
+def build_package_archive(paths: Sequence[str]) -> bytes:
+    """
+    再現可能なtar.gzを作成（同じ内容からは常に同じバイト列）
+
+    Args:
+        paths: ファイルまたはディレクトリのパス
+
+    Returns:
+        tar.gzのバイト列
+    """
+    tar_buffer = io.BytesIO()
+    with tarfile.open(fileobj=tar_buffer, mode="w", format=tarfile.PAX_FORMAT) as tar:
+        for file_path in iter_package_files(paths):
+            data = file_path.read_bytes()
+            info = tarfile.TarInfo(name=file_path.as_posix())
+            info.size = len(data)
+            info.mtime = 0
+            info.mode = 0o755 if file_path.stat().st_mode & 0o111 else 0o644
+            info.uid = info.gid = 0
+            info.uname = info.gname = ""
+            tar.addfile(info, io.BytesIO(data))
+
+    gz_buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=gz_buffer, mode="wb", mtime=0) as gz:
+        gz.write(tar_buffer.getvalue())
+    return gz_buffer.getvalue()
+
+
+@dataclass(frozen=True)
+class DeploymentManifest:
+    """レイヤーごとのコンテンツハッシュ"""
+
+    layers: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def release(self) -> str:
+        """全レイヤーから導出したリリースID"""
+        return content_digest(
+            *(
+                f"{name}={digest}".encode()
+                for name, digest in sorted(self.layers.items())
+            )
+        )
+
+    @property
+    def gcs_dir_name(self) -> str:
+        """成果物を配置するステージングバケット内のディレクトリ"""
+        return f"{GCS_DIR_PREFIX}/{self.release}"
+
+    def changed_layers(self, deployed: dict[str, str]) -> set[str]:
+        """
+        デプロイ済みのハッシュと異なるレイヤーを取得
+
+        Args:
+            deployed: デプロイ済みのレイヤーごとのハッシュ（不明なレイヤーは変更扱い）
+
+        Returns:
+            変更のあったレイヤー名
+        """
+        return {
+            name for name, digest in self.layers.items() if deployed.get(name) != digest
+        }
+
+    def to_json(self) -> str:
+        return json.dumps({"release": self.release, "layers": self.layers}, indent=2)
+
+    @classmethod
+    def from_json(cls, text: str) -> "DeploymentManifest":
+        return cls(layers=json.loads(text)["layers"])
+
+
+def build_manifest(
+    requirements: Sequence[str], extra_packages: Sequence[str], app_name: str
+) -> DeploymentManifest:
+    """
+    デプロイ成果物のマニフェストを作成
+
+    Args:
+        requirements: requirementsの各行
+        extra_packages: パッケージに含めるパス
+        app_name: pickle化するアプリのクラス名
+
+    Returns:
+        マニフェスト
+    """
+    requirements_digest = content_digest("\n".join(requirements).encode())
+    package_digest = content_digest(build_package_archive(extra_packages))
+    return DeploymentManifest(
+        layers={
+            "requirements": requirements_digest,
+            "extra_packages": package_digest,
+            "agent_engine": content_digest(
+                app_name.encode(), requirements_digest.encode(), package_digest.encode()
+            ),
+        }
+    )
+
+
+def _blob_dir(bucket: Any, gcs_uri: str) -> str | None:
+    """gs://bucket/dir/file からバケット内のディレクトリを取得"""
+    prefix = f"gs://{bucket.name}/"
+    if not gcs_uri or not gcs_uri.startswith(prefix):
+        return None
+    return gcs_uri[len(prefix) :].rsplit("/", 1)[0]
+
+
+def load_deployed_layers(bucket: Any, package_spec: Any) -> dict[str, str]:
+    """
+    デプロイ済みエージェントが参照している各レイヤーのハッシュを取得
+
+    レイヤーごとに参照先ディレクトリのマニフェストを読むため、一部のレイヤーだけを
+    更新したリリースが混在していても正しく判定できる。
+
+    Args:
+        bucket: ステージングバケット
+        package_spec: デプロイ済みエージェントのパッケージ仕様
+
+    Returns:
+        レイヤー名とハッシュ（マニフェストがないレイヤーは含まない）
+    """
+    layers = {}
+    manifests: dict[str, DeploymentManifest | None] = {}
+    for name, uri_field in LAYER_URI_FIELDS.items():
+        directory = _blob_dir(bucket, getattr(package_spec, uri_field, ""))
+        if directory is None:
+            continue
+        if directory not in manifests:
+            blob = bucket.blob(f"{directory}/{MANIFEST_FILENAME}")
+            manifests[directory] = (
+                DeploymentManifest.from_json(blob.download_as_text())
+                if blob.exists()
+                else None
+            )
+        manifest = manifests[directory]
+        if manifest is not None and name in manifest.layers:
+            layers[name] = manifest.layers[name]
+    return layers
+
+
+def save_manifest(bucket: Any, manifest: DeploymentManifest) -> None:
+    """
+    マニフェストをリリースディレクトリに保存
+
+    Args:
+        bucket: ステージングバケット
+        manifest: 保存するマニフェスト
+    """
+    blob = bucket.blob(f"{manifest.gcs_dir_name}/{MANIFEST_FILENAME}")
+    blob.upload_from_string(manifest.to_json(), content_type="application/json")
@@ -0,0 +1,207 @@
+"""
+フィードバックの非同期バッファ書き込み
+
+register_feedback のリクエスト処理からCloud Loggingへの書き込みを切り離す。
+エントリは上限付きのキューに積み、バックグラウンドスレッドが件数または
+時間の条件でまとめて Logger.batch() で書き込む。
+
+- キューが満杯の場合は破棄して dropped を加算（送信側はブロックしない）
+- 書き込み失敗時は指数バックオフで再試行し、上限を超えたら failed を加算
+- プロセス終了時（atexit）に残りを書き込む
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# キューが空のときにクローズ要求を確認する間隔（秒）
+_POLL_INTERVAL = 0.1
+
+
+class FeedbackWriter:
+    """Cloud Loggingへのバッチ書き込みを行うフィードバックライター"""
+
+    def __init__(
+        self,
+        cloud_logger: Any,
+        max_queue_size: int = 1000,
+        batch_size: int = 50,
+        flush_interval: float = 2.0,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+    ):
+        """
+        Args:
+            cloud_logger: batch() を持つCloud Loggingのロガー
+            max_queue_size: キューに保持する最大件数
+            batch_size: 1回のバッチ書き込みの最大件数
+            flush_interval: 最初のエントリからバッチを書き込むまでの最大秒数
+            max_retries: 書き込み失敗時の再試行回数
+            retry_backoff: 再試行の初回待機秒数（試行ごとに倍）
+        """
+        self._logger = cloud_logger
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._queue: queue.Queue[tuple[dict[str, Any], str]] = queue.Queue(
+            maxsize=max_queue_size
+        )
+        self._flush_requested = threading.Event()
+        self._closed = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "submitted": 0,
+            "written": 0,
+            "batches": 0,
+            "dropped": 0,
+            "retries": 0,
+            "failed": 0,
+        }
+
+    def submit(self, entry: dict[str, Any], severity: str = "INFO") -> bool:
+        """
+        エントリをキューに追加（ブロックしない）
+
+        Args:
+            entry: 構造化ログとして書き込む内容
+            severity: ログの重要度
+
+        Returns:
+            キューに追加できた場合True（満杯・クローズ済みの場合False）
+        """
+        if self._closed.is_set():
+            self._count("dropped")
+            return False
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((entry, severity))
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("submitted")
+        return True
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        キュー内のエントリをすべて書き込むまで待機
+
+        Args:
+            timeout: 最大待機秒数（Noneの場合は無制限）
+
+        Returns:
+            時間内に書き込みが完了した場合True
+        """
+        self._flush_requested.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        """
+        残りのエントリを書き込んでバックグラウンドスレッドを停止
+
+        Args:
+            timeout: 最大待機秒数
+        """
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._flush_requested.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        metrics = self.metrics()
+        if metrics["dropped"] or metrics["failed"]:
+            logger.warning(f"フィードバック書き込みの未完了があります: {metrics}")
+
+    def metrics(self) -> dict[str, int]:
+        """
+        書き込み状況のメトリクスを取得
+
+        Returns:
+            submitted / written / batches / dropped / retries / failed と現在のキュー長
+        """
+        with self._metrics_lock:
+            return {**self._metrics, "queued": self._queue.qsize()}
+
+    def _count(self, key: str, value: int = 1) -> None:
+        with self._metrics_lock:
+            self._metrics[key] += value
+
+    def _ensure_started(self) -> None:
+        """初回投入時にバックグラウンドスレッドを起動（fork後のワーカーで起動するため）"""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="feedback-writer", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self) -> None:
+        while True:
+            entries = self._next_batch()
+            if entries:
+                self._write(entries)
+                for _ in entries:
+                    self._queue.task_done()
+            if self._closed.is_set() and self._queue.empty():
+                return
+
+    def _next_batch(self) -> list[tuple[dict[str, Any], str]]:
+        """件数が batch_size に達するか flush_interval 経過までエントリを集める"""
+        try:
+            first = self._queue.get(timeout=min(self.flush_interval, _POLL_INTERVAL))
+        except queue.Empty:
+            return []
+
+        entries = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(entries) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if self._flush_requested.is_set() or remaining <= 0:
+                    entries.append(self._queue.get_nowait())
+                else:
+                    entries.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        if self._queue.empty() and not self._closed.is_set():
+            self._flush_requested.clear()
+        return entries
+
+    def _write(self, entries: list[tuple[dict[str, Any], str]]) -> None:
+        """バッチ書き込み（失敗時は指数バックオフで再試行）"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                batch = self._logger.batch()
+                for entry, severity in entries:
+                    batch.log_struct(entry, severity=severity)
+                batch.commit()
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self._count("failed", len(entries))
+                    logger.error(f"フィードバックのバッチ書き込みに失敗: {e}")
+                    return
+                self._count("retries")
+                time.sleep(self.retry_backoff * 2**attempt)
+            else:
+                self._count("written", len(entries))
+                self._count("batches")
+                return
@@ -18,20 +18,29 @@ import google.cloud.storage as storage
 from google.api_core import exceptions
 
 
-def create_bucket_if_not_exists(bucket_name: str, project: str, location: str) -> None:
+def create_bucket_if_not_exists(
+    bucket_name: str,
+    project: str,
+    location: str,
+    storage_client: storage.Client | None = None,
+) -> storage.Bucket:
     """Creates a new bucket if it doesn't already exist.
 
     Args:
         bucket_name: Name of the bucket to create
         project: Google Cloud project ID
         location: Location to create the bucket in (defaults to us-central1)
+        storage_client: Storage client to use (defaults to a new client for the project)
+
+    Returns:
+        The existing or newly created bucket
     """
-    storage_client = storage.Client(project=project)
+    storage_client = storage_client or storage.Client(project=project)
 
     if bucket_name.startswith("gs://"):
         bucket_name = bucket_name[5:]
     try:
-        storage_client.get_bucket(bucket_name)
+        bucket = storage_client.get_bucket(bucket_name)
         logging.info(f"Bucket {bucket_name} already exists")
     except exceptions.NotFound:
         bucket = storage_client.create_bucket(
@@ -40,3 +49,4 @@ def create_bucket_if_not_exists(bucket_name: str, project: str, location: str) -
             project=project,
         )
         logging.info(f"Created bucket {bucket.name} in {bucket.location}")
+    return bucket
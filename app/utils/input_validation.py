@@ -1,12 +1,65 @@
 """
 入力バリデーションユーティリティモジュール
 XSS攻撃対策と入力サニタイズ機能を提供
+
+正規表現はモジュール読み込み時にコンパイルし、サニタイズは入力長に対して
+線形時間で終わるようにする（バックトラックで遅くなる細工された入力への対策）。
 """
 
 import html
 import re
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import Any
 
+_JAVASCRIPT_URL = re.compile(r"javascript:", re.IGNORECASE)
+# イベントハンドラー属性（on〜=）。'=' が続かない場合も単語の末尾まで消費して
+# 同じ単語内の次の "on" から再照合しないようにする（先読みと後方参照で
+# アトミックグループを再現し、単語部分はバックトラックしない）ため、
+# 入力長に対して線形時間で終わる。Python 3.10 は絶対最大量指定子に未対応
+_EVENT_HANDLER = re.compile(
+    r"on(?=(?P<word>\w+))(?P=word)(?P<assign>\s*=)?", re.IGNORECASE
+)
+_SCRIPT_OPEN = re.compile(r"<script\b", re.IGNORECASE)
+_SCRIPT_CLOSE = re.compile(r"</script>", re.IGNORECASE)
+
+# 食材名: 日本語、英数字、一般的な記号
+FOOD_NAME_PATTERN = re.compile(
+    r"^[ぁ-んァ-ヶー一-龯a-zA-Z0-9\s\u3099\u309A\u30FC()（）・※]+$"
+)
+# メモ: 改行、句読点等も許可
+NOTES_PATTERN = re.compile(
+    r"^[ぁ-んァ-ヶー一-龯a-zA-Z0-9\s\u3099\u309A\u30FC()（）・※\n\r.,!?！？。、]+$"
+)
+# チャット: 制御文字と山括弧以外のほぼ全ての文字（フロントエンドと統一）
+CHAT_MESSAGE_PATTERN = re.compile(r"^[^\x00-\x08\x0B\x0C\x0E-\x1F\x7F<>]+$")
+
+MEAL_TYPES = frozenset({"breakfast", "lunch", "dinner", "snack"})
+FOOD_NAME_MAX_LENGTH = 200
+NOTES_MAX_LENGTH = 500
+QUANTITY_RANGE = (1.0, 1000.0)
+
+# 一括検証のエラーコードと表示用メッセージ（validate_meal_data と同じ文言）
+MEAL_ERROR_MESSAGES = {
+    "invalid_meal_type": "有効な食事タイプを選択してください",
+    "no_foods": "少なくとも1つの食材を追加してください",
+    "food_name_required": "入力が必要です",
+    "food_name_too_long": f"{FOOD_NAME_MAX_LENGTH}文字以内で入力してください",
+    "food_name_invalid_chars": "使用できない文字が含まれています",
+    "quantity_not_number": "有効な数値を入力してください",
+    "quantity_out_of_range": (
+        f"{QUANTITY_RANGE[0]}以上{QUANTITY_RANGE[1]}以下の値を入力してください"
+    ),
+    "notes_too_long": f"{NOTES_MAX_LENGTH}文字以内で入力してください",
+    "notes_invalid_chars": "使用できない文字が含まれています",
+}
+
+
+@lru_cache(maxsize=64)
+def _compile_pattern(pattern: str) -> re.Pattern[str]:
+    return re.compile(pattern)
+
 
 def escape_html(text: Any) -> str:
     """
@@ -19,41 +72,85 @@ def escape_html(text: Any) -> str:
     return html.escape(text, quote=True)
 
 
+def strip_markup(text: str) -> str:
+    """
+    HTMLタグとscript要素（内容を含む）を除去
+
+    '<' から次の '>' までをタグとして扱い、<script> は対応する </script> までを
+    まとめて除去する（閉じタグがなければ開始タグのみ除去）。str.find で前方にのみ
+    走査し、以降に '>' や </script> がないと分かった時点で探索を打ち切るため、
+    入力長に対して線形時間で終わる。
+
+    Args:
+        text: 入力文字列
+
+    Returns:
+        タグを除去した文字列
+    """
+    if "<" not in text:
+        return text
+    pieces = []
+    position = 0
+    script_close_missing = False
+    while True:
+        start = text.find("<", position)
+        if start == -1:
+            break
+        end = text.find(">", start)
+        if end == -1:
+            # 以降に '>' がなければタグは成立しない
+            break
+        pieces.append(text[position:start])
+        position = end + 1
+        # タグ内の最後の '<' が要素の開始（"<<script>" なども script 要素として扱う）
+        opener = text.rfind("<", start, end)
+        if not script_close_missing and _SCRIPT_OPEN.match(text, opener, position):
+            close = _SCRIPT_CLOSE.search(text, position)
+            if close is None:
+                script_close_missing = True
+            else:
+                position = close.end()
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+
+def _strip_event_handler(match: re.Match[str]) -> str:
+    return "" if match.group("assign") else match.group()
+
+
 def sanitize_input(input_text: Any) -> str:
     """
     入力サニタイズ処理
     HTMLタグとスクリプトを除去してHTMLエスケープを適用
+
+    タグ、JavaScript URL、イベントハンドラー属性の順にそれぞれ1回の走査で
+    除去する（いずれも入力長に対して線形時間）。
     """
     if not isinstance(input_text, str):
         input_text = str(input_text)
 
-    # HTMLタグとスクリプトを除去
-    # scriptタグを除去
-    sanitized = re.sub(
-        r"<script\b[^<]*(?:(?!<\/script>)<[^<]*)*<\/script>",
-        "",
-        input_text,
-        flags=re.IGNORECASE,
-    )
-
-    # その他のHTMLタグを除去
-    sanitized = re.sub(r"<[^>]*>", "", sanitized)
-
-    # JavaScript URLを除去
-    sanitized = re.sub(r"javascript:", "", sanitized, flags=re.IGNORECASE)
-
-    # イベントハンドラー属性を除去
-    sanitized = re.sub(r"on\w+\s*=", "", sanitized, flags=re.IGNORECASE)
+    sanitized = strip_markup(input_text)
+    # JavaScript URLは ':'、イベントハンドラーは '=' を含まなければ走査しない
+    if ":" in sanitized:
+        sanitized = _JAVASCRIPT_URL.sub("", sanitized)
+    if "=" in sanitized:
+        sanitized = _EVENT_HANDLER.sub(_strip_event_handler, sanitized)
 
     # HTMLエスケープを適用
     return escape_html(sanitized)
 
 
+def contains_markup(text: str) -> bool:
+    """'<' の後に '>' が続く（HTMLタグになり得る）部分を含むかどうか"""
+    start = text.find("<")
+    return start != -1 and text.find(">", start) != -1
+
+
 def validate_text_input(
     value: str,
     max_length: int | None = None,
     min_length: int | None = None,
-    allowed_pattern: str | None = None,
+    allowed_pattern: str | re.Pattern[str] | None = None,
     required: bool = False,
 ) -> dict[str, Any]:
     """
@@ -63,7 +160,7 @@ def validate_text_input(
         value: 検証する値
         max_length: 最大文字数
         min_length: 最小文字数
-        allowed_pattern: 許可する文字パターン（正規表現）
+        allowed_pattern: 許可する文字パターン（正規表現。文字列はコンパイルしてキャッシュ）
         required: 必須フィールドかどうか
 
     Returns:
@@ -90,8 +187,11 @@ def validate_text_input(
         errors.append(f"{max_length}文字以内で入力してください")
 
     # パターンマッチング
-    if allowed_pattern and not re.match(allowed_pattern, sanitized_value):
-        errors.append("使用できない文字が含まれています")
+    if allowed_pattern:
+        if isinstance(allowed_pattern, str):
+            allowed_pattern = _compile_pattern(allowed_pattern)
+        if not allowed_pattern.match(sanitized_value):
+            errors.append("使用できない文字が含まれています")
 
     return {
         "is_valid": len(errors) == 0,
@@ -102,30 +202,22 @@ def validate_text_input(
 
 def validate_food_name(name: str) -> dict[str, Any]:
     """食材名のバリデーション"""
-    # 日本語、英数字、一般的な記号を許可
-    allowed_pattern = r"^[ぁ-んァ-ヶー一-龯a-zA-Z0-9\s\u3099\u309A\u30FC()（）・※]+$"
-
     return validate_text_input(
         value=name,
         max_length=200,
         min_length=1,
-        allowed_pattern=allowed_pattern,
+        allowed_pattern=FOOD_NAME_PATTERN,
         required=True,
     )
 
 
 def validate_notes(notes: str) -> dict[str, Any]:
     """メモのバリデーション"""
-    # より多くの文字を許可（改行、句読点等）
-    allowed_pattern = (
-        r"^[ぁ-んァ-ヶー一-龯a-zA-Z0-9\s\u3099\u309A\u30FC()（）・※\n\r.,!?！？。、]+$"
-    )
-
     return validate_text_input(
         value=notes,
         max_length=500,
         min_length=0,
-        allowed_pattern=allowed_pattern,
+        allowed_pattern=NOTES_PATTERN,
         required=False,
     )
 
@@ -133,7 +225,7 @@ def validate_notes(notes: str) -> dict[str, Any]:
 def validate_chat_message(message: str) -> dict[str, Any]:
     """チャットメッセージのバリデーション"""
     # HTMLタグとスクリプトを含む危険な文字列を事前に検出
-    if re.search(r"<[^>]*>", message):
+    if contains_markup(message):
         return {
             "is_valid": False,
             "errors": ["HTMLタグは使用できません"],
@@ -142,13 +234,11 @@ def validate_chat_message(message: str) -> dict[str, Any]:
 
     # 制御文字以外のほぼ全ての文字を許可（フロントエンドと統一）
     # 食材成分表示、栄養情報など自由度の高い入力を受け付ける
-    allowed_pattern = r"^[^\x00-\x08\x0B\x0C\x0E-\x1F\x7F<>]+$"
-
     return validate_text_input(
         value=message,
         max_length=1000,  # テストと統一
         min_length=1,
-        allowed_pattern=allowed_pattern,
+        allowed_pattern=CHAT_MESSAGE_PATTERN,
         required=True,
     )
 
@@ -242,3 +332,180 @@ def validate_meal_data(meal_data: dict[str, Any]) -> dict[str, Any]:
         "errors": errors,
         "sanitized_data": sanitized_data,
     }
+
+
+@dataclass(frozen=True, slots=True)
+class MealRejection:
+    """一括検証で不合格になった行"""
+
+    row: int  # 入力の0始まりの行番号
+    errors: tuple[tuple[str, str], ...]  # (エラーコード, フィールド名)
+
+    @property
+    def messages(self) -> list[str]:
+        """表示用のエラーメッセージ"""
+        return [f"{field}: {MEAL_ERROR_MESSAGES[code]}" for code, field in self.errors]
+
+
+# 一括検証で合格した食材名・メモを覚えておく上限（同じ献立が繰り返し現れるため）
+_BULK_CACHE_SIZE = 4096
+# 合格した数量として覚えておく型（boolはintと等価なので含めない）
+_CACHED_QUANTITY_TYPES = frozenset({int, float, str})
+
+
+def _food_name_error(name: Any) -> str | None:
+    """食材名のエラーコード（問題がなければNone）"""
+    name = name.strip() if isinstance(name, str) else str(name or "").strip()
+    if not name:
+        return "food_name_required"
+    if len(name) > FOOD_NAME_MAX_LENGTH:
+        return "food_name_too_long"
+    if not FOOD_NAME_PATTERN.match(name):
+        return "food_name_invalid_chars"
+    return None
+
+
+def _quantity_error(quantity: Any) -> str | None:
+    """数量のエラーコード（問題がなければNone）"""
+    try:
+        value = float(quantity)
+    except (ValueError, TypeError):
+        return "quantity_not_number"
+    # NaNは範囲比較がすべて偽になるため不合格になる
+    if QUANTITY_RANGE[0] <= value <= QUANTITY_RANGE[1]:
+        return None
+    return "quantity_out_of_range"
+
+
+def _notes_error(notes: Any) -> str | None:
+    """メモのエラーコード（問題がなければNone）"""
+    notes = notes.strip() if isinstance(notes, str) else str(notes)
+    if len(notes) > NOTES_MAX_LENGTH:
+        return "notes_too_long"
+    if notes and not NOTES_PATTERN.match(notes):
+        return "notes_invalid_chars"
+    return None
+
+
+def _meal_record_errors(
+    record: Mapping[str, Any],
+    valid_names: set[str],
+    valid_quantities: set[Any],
+    valid_notes: set[str],
+) -> tuple[tuple[str, str], ...]:
+    """
+    1行分の食事記録を検証してエラーを返す（合格した値はキャッシュに加える）
+
+    Args:
+        record: 食事記録の1行
+        valid_names: 合格した食材名
+        valid_quantities: 合格した数量（数値またはCSVの文字列）
+        valid_notes: 合格したメモ
+
+    Returns:
+        (エラーコード, フィールド名) のタプル（合格なら空）
+    """
+    errors = []
+
+    meal_type = record.get("type")
+    if meal_type.__class__ is not str or meal_type not in MEAL_TYPES:
+        errors.append(("invalid_meal_type", "type"))
+
+    foods = record.get("foods")
+    if foods is None and "food_name" in record:
+        # 1行1食材の形式は行そのものを食材として扱う
+        foods, name_key, flat = (record,), "food_name", True
+    else:
+        name_key, flat = "name", False
+        if not foods:
+            errors.append(("no_foods", "foods"))
+            foods = ()
+
+    for index, food in enumerate(foods):
+        field = "food" if flat else f"foods[{index}]"
+        name = food.get(name_key)
+        if name.__class__ is not str or name not in valid_names:
+            code = _food_name_error(name)
+            if code is not None:
+                errors.append((code, f"{field}.name"))
+            elif name.__class__ is str and len(valid_names) < _BULK_CACHE_SIZE:
+                valid_names.add(name)
+
+        quantity = food.get("quantity", 0)
+        if quantity.__class__ not in _CACHED_QUANTITY_TYPES or (
+            quantity not in valid_quantities
+        ):
+            code = _quantity_error(quantity)
+            if code is not None:
+                errors.append((code, f"{field}.quantity"))
+            elif (
+                quantity.__class__ in _CACHED_QUANTITY_TYPES
+                and len(valid_quantities) < _BULK_CACHE_SIZE
+            ):
+                valid_quantities.add(quantity)
+
+    notes = record.get("notes")
+    if notes and (notes.__class__ is not str or notes not in valid_notes):
+        code = _notes_error(notes)
+        if code is not None:
+            errors.append((code, "notes"))
+        elif notes.__class__ is str and len(valid_notes) < _BULK_CACHE_SIZE:
+            valid_notes.add(notes)
+
+    return tuple(errors)
+
+
+def iter_meal_rejections(
+    records: Iterable[Mapping[str, Any]],
+) -> Iterator[MealRejection]:
+    """
+    食事記録を一括で検証し、不合格の行だけを順に返す
+
+    保育施設からのCSV取り込みなど数千件の記録向け。validate_meal_data と同じ
+    規則で検証するが、合格した行は結果を作らず、サニタイズもしない
+    （保存時に sanitize_input を適用すること）。一度合格した食材名・数量・メモは
+    覚えておき、すべての値が合格済みの行は集合の検索だけで通す。
+
+    各行は validate_meal_data と同じ形式（"foods" に食材のリスト）か、
+    csv.DictReader の行のような1行1食材の形式（type, food_name, quantity,
+    unit, notes 列）のどちらでもよい。
+
+    Args:
+        records: 食事記録の反復可能オブジェクト
+
+    Yields:
+        不合格の行（行番号とエラーコード）
+    """
+    # 一度合格した値（食材名・数量・メモ）
+    valid_names: set[str] = set()
+    valid_quantities: set[Any] = set()
+    valid_notes: set[str] = set()
+
+    for row, record in enumerate(records):
+        # 合格済みの値だけでできた行はここで通す（ハッシュできない値は下で検証）
+        try:
+            if record.get("type") in MEAL_TYPES and (
+                not (notes := record.get("notes")) or notes in valid_notes
+            ):
+                foods = record.get("foods")
+                if foods is None and "food_name" in record:
+                    if (
+                        record["food_name"] in valid_names
+                        and record.get("quantity", 0) in valid_quantities
+                    ):
+                        continue
+                elif foods:
+                    for food in foods:
+                        if (
+                            food.get("name") not in valid_names
+                            or food.get("quantity", 0) not in valid_quantities
+                        ):
+                            break
+                    else:
+                        continue
+        except TypeError:
+            pass
+
+        errors = _meal_record_errors(record, valid_names, valid_quantities, valid_notes)
+        if errors:
+            yield MealRejection(row=row, errors=errors)
@@ -0,0 +1,433 @@
+"""
+ローカル環境向けのスパン記録とプロファイル集計
+
+GCPの認証情報がない環境でも本番と同じ計装（ADKのスパン）でエージェントを
+プロファイルできるよう、スパンをローカルディレクトリのJSONLセグメントに書き出す。
+
+- セグメントは固定サイズでメモリマップし、満杯になったら次のセグメントへ切り替える
+- セグメント数が上限を超えたら古いものから削除するため、ディスク使用量は
+  segment_bytes * max_segments に収まる
+- 集計CLIでスパン名ごとのレイテンシのパーセンタイルと、呼び出し階層ごとの
+  所要時間（フレームグラフ形式）を表示する
+
+使い方:
+    LOCAL_TRACE_DIR=.traces make dev-backend-stub
+    python -m app.utils.local_tracing summary .traces
+    python -m app.utils.local_tracing flame .traces
+    python -m app.utils.local_tracing flame .traces --collapsed > stacks.txt
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import threading
+from collections import defaultdict
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+from typing import Any
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    SpanExporter,
+    SpanExportResult,
+)
+
+DEFAULT_SEGMENT_BYTES = 4 * 1024 * 1024
+DEFAULT_MAX_SEGMENTS = 8
+DEFAULT_MAX_ATTRIBUTE_CHARS = 1024
+SEGMENT_PREFIX = "spans-"
+SEGMENT_SUFFIX = ".jsonl"
+
+_configure_lock = threading.Lock()
+_local_tracing_configured = False
+
+
+def _segment_path(directory: Path, index: int) -> Path:
+    return directory / f"{SEGMENT_PREFIX}{index:06d}{SEGMENT_SUFFIX}"
+
+
+def list_segments(directory: str | Path) -> list[Path]:
+    """
+    セグメントファイルを古い順に列挙
+
+    Args:
+        directory: スパンの出力ディレクトリ
+
+    Returns:
+        セグメントファイルのパス
+    """
+    return sorted(Path(directory).glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"))
+
+
+class _Segment:
+    """固定サイズでメモリマップしたJSONLセグメント"""
+
+    def __init__(self, path: Path, size: int):
+        self.path = path
+        self.size = size
+        self.position = 0
+        self._file = open(path, "w+b")
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+
+    def write(self, data: bytes) -> bool:
+        """空きがあれば書き込み、書き込めたかを返す"""
+        end = self.position + len(data)
+        if end > self.size:
+            return False
+        self._map[self.position : end] = data
+        self.position = end
+        return True
+
+    def flush(self) -> None:
+        self._map.flush()
+
+    def close(self) -> None:
+        """マップを閉じ、未使用の末尾を切り詰める"""
+        self._map.flush()
+        self._map.close()
+        self._file.truncate(self.position)
+        self._file.close()
+
+
+def _truncate_value(value: Any, max_chars: int) -> Any:
+    if isinstance(value, str) and len(value) > max_chars:
+        return f"{value[:max_chars]}...[truncated {len(value) - max_chars} chars]"
+    if isinstance(value, tuple):
+        return [_truncate_value(item, max_chars) for item in value]
+    return value
+
+
+def span_to_record(span: ReadableSpan, max_attribute_chars: int) -> dict[str, Any]:
+    """
+    スパンをプロファイル用のレコードに変換
+
+    Args:
+        span: 終了したスパン
+        max_attribute_chars: 文字列属性の最大文字数
+
+    Returns:
+        JSONLの1行に書き出すレコード
+    """
+    start, end = span.start_time or 0, span.end_time or 0
+    return {
+        "name": span.name,
+        "trace_id": trace.format_trace_id(span.context.trace_id),
+        "span_id": trace.format_span_id(span.context.span_id),
+        "parent_id": (
+            trace.format_span_id(span.parent.span_id) if span.parent else None
+        ),
+        "start_ns": start,
+        "end_ns": end,
+        "duration_ms": (end - start) / 1e6,
+        "status": span.status.status_code.name,
+        "attributes": {
+            key: _truncate_value(value, max_attribute_chars)
+            for key, value in (span.attributes or {}).items()
+        },
+    }
+
+
+class LocalJsonlSpanExporter(SpanExporter):
+    """
+    スパンをメモリマップしたJSONLセグメントのリングバッファに書き出すエクスポーター
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+        max_segments: int = DEFAULT_MAX_SEGMENTS,
+        max_attribute_chars: int = DEFAULT_MAX_ATTRIBUTE_CHARS,
+    ):
+        """
+        Args:
+            directory: 出力ディレクトリ（なければ作成）
+            segment_bytes: 1セグメントのサイズ（バイト）
+            max_segments: 保持するセグメント数の上限
+            max_attribute_chars: 文字列属性の最大文字数（プロンプト等を切り詰める）
+        """
+        if max_segments < 1:
+            raise ValueError(f"max_segments must be at least 1: {max_segments}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.max_attribute_chars = max_attribute_chars
+        self.dropped = 0
+        self._lock = threading.Lock()
+        existing = list_segments(self.directory)
+        self._next_index = (
+            int(existing[-1].name[len(SEGMENT_PREFIX) : -len(SEGMENT_SUFFIX)]) + 1
+            if existing
+            else 0
+        )
+        self._segment: _Segment | None = None
+        self._closed = False
+
+    def _rotate(self) -> _Segment:
+        """現在のセグメントを閉じて新しいセグメントを開き、古いものを削除"""
+        if self._segment is not None:
+            self._segment.close()
+        self._segment = _Segment(
+            _segment_path(self.directory, self._next_index), self.segment_bytes
+        )
+        self._next_index += 1
+        segments = list_segments(self.directory)
+        for path in segments[: max(0, len(segments) - self.max_segments)]:
+            path.unlink(missing_ok=True)
+        return self._segment
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = [
+            json.dumps(
+                span_to_record(span, self.max_attribute_chars),
+                ensure_ascii=False,
+                default=str,
+            ).encode()
+            + b"\n"
+            for span in spans
+        ]
+        with self._lock:
+            if self._closed:
+                return SpanExportResult.FAILURE
+            for line in lines:
+                if len(line) > self.segment_bytes:
+                    self.dropped += 1
+                    continue
+                segment = self._segment or self._rotate()
+                if not segment.write(line):
+                    self._rotate().write(line)
+        return SpanExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        with self._lock:
+            if self._segment is not None:
+                self._segment.flush()
+        return True
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+            self._closed = True
+
+
+def configure_local_tracing() -> bool:
+    """
+    環境変数 LOCAL_TRACE_DIR が設定されていればローカル記録のトレーサーを設定
+
+    プロセスで1度だけ設定する。LOCAL_TRACE_SEGMENT_BYTES / LOCAL_TRACE_MAX_SEGMENTS
+    でセグメントのサイズと数を変更できる。
+
+    Returns:
+        ローカル記録が有効かどうか
+    """
+    global _local_tracing_configured
+    directory = os.environ.get("LOCAL_TRACE_DIR")
+    if not directory:
+        return False
+    with _configure_lock:
+        if _local_tracing_configured:
+            return True
+        exporter = LocalJsonlSpanExporter(
+            directory,
+            segment_bytes=int(
+                os.environ.get("LOCAL_TRACE_SEGMENT_BYTES", DEFAULT_SEGMENT_BYTES)
+            ),
+            max_segments=int(
+                os.environ.get("LOCAL_TRACE_MAX_SEGMENTS", DEFAULT_MAX_SEGMENTS)
+            ),
+        )
+        provider = TracerProvider()
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+        trace.set_tracer_provider(provider)
+        _local_tracing_configured = True
+    logging.info(f"Recording spans locally to {directory}")
+    return True
+
+
+def iter_records(directory: str | Path) -> Iterator[dict[str, Any]]:
+    """
+    セグメントからスパンのレコードを古い順に読み出す
+
+    書き込み中のセグメントの未使用領域（NULバイト）と、書きかけの行は読み飛ばす。
+
+    Args:
+        directory: スパンの出力ディレクトリ
+
+    Yields:
+        スパンのレコード
+    """
+    for path in list_segments(directory):
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            # 読み込み中にローテーションで削除された
+            continue
+        for line in data.rstrip(b"\0").splitlines():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    """最近傍順位法のパーセンタイル"""
+    index = max(
+        0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1)
+    )
+    return sorted_values[index]
+
+
+def summarize_latency(records: Sequence[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    スパン名ごとのレイテンシを集計
+
+    Args:
+        records: スパンのレコード
+
+    Returns:
+        スパン名ごとの件数・p50/p90/p99/最大・合計（ミリ秒）。合計の降順
+    """
+    durations: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    for record in records:
+        durations[record["name"]].append(record["duration_ms"])
+        if record.get("status") == "ERROR":
+            errors[record["name"]] += 1
+
+    rows = []
+    for name, values in durations.items():
+        values.sort()
+        rows.append(
+            {
+                "name": name,
+                "count": len(values),
+                "errors": errors[name],
+                "p50": _percentile(values, 0.5),
+                "p90": _percentile(values, 0.9),
+                "p99": _percentile(values, 0.99),
+                "max": values[-1],
+                "total": sum(values),
+            }
+        )
+    return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+
+def _stack_of(
+    by_id: dict[tuple[str, str], dict[str, Any]], key: tuple[str, str]
+) -> tuple[str, ...]:
+    """ルートからスパンまでのスパン名の並び（記録にない親はルートとして扱う）"""
+    names = []
+    seen = set()
+    current = by_id.get(key)
+    while current is not None and key not in seen:
+        seen.add(key)
+        names.append(current["name"])
+        key = (current["trace_id"], current.get("parent_id"))
+        current = by_id.get(key)
+    return tuple(reversed(names))
+
+
+def summarize_stacks(
+    records: Sequence[dict[str, Any]],
+) -> dict[tuple[str, ...], dict[str, float]]:
+    """
+    呼び出し階層（ルートからのスパン名の並び）ごとに所要時間を集計
+
+    自己時間は子スパンの所要時間を差し引いた値（並行実行の子があると0に丸める）。
+
+    Args:
+        records: スパンのレコード
+
+    Returns:
+        階層ごとの件数・合計時間・自己時間（ミリ秒）
+    """
+    by_id = {(r["trace_id"], r["span_id"]): r for r in records}
+    child_ms: dict[tuple[str, str], float] = defaultdict(float)
+    for record in by_id.values():
+        if record.get("parent_id"):
+            child_ms[(record["trace_id"], record["parent_id"])] += record["duration_ms"]
+
+    stacks: dict[tuple[str, ...], dict[str, float]] = defaultdict(
+        lambda: {"count": 0, "total": 0.0, "self": 0.0}
+    )
+    for key, record in by_id.items():
+        entry = stacks[_stack_of(by_id, key)]
+        entry["count"] += 1
+        entry["total"] += record["duration_ms"]
+        entry["self"] += max(0.0, record["duration_ms"] - child_ms[key])
+    return dict(stacks)
+
+
+def _print_summary(records: list[dict[str, Any]]) -> None:
+    print(
+        f"{'span':<40} {'count':>6} {'err':>4} {'p50':>9} {'p90':>9} "
+        f"{'p99':>9} {'max':>9} {'total':>10}"
+    )
+    for row in summarize_latency(records):
+        print(
+            f"{row['name'][:40]:<40} {row['count']:>6} {row['errors']:>4} "
+            f"{row['p50']:>9.1f} {row['p90']:>9.1f} {row['p99']:>9.1f} "
+            f"{row['max']:>9.1f} {row['total']:>10.1f}"
+        )
+    print("(ms)")
+
+
+def _print_flame(records: list[dict[str, Any]], collapsed: bool) -> None:
+    stacks = summarize_stacks(records)
+    if collapsed:
+        # flamegraph.pl / speedscope で読める折りたたみ形式（自己時間をマイクロ秒で）
+        for stack, entry in sorted(stacks.items()):
+            print(f"{';'.join(stack)} {round(entry['self'] * 1000)}")
+        return
+
+    roots_total = sum(
+        entry["total"] for stack, entry in stacks.items() if len(stack) == 1
+    )
+    print(f"{'total ms':>10} {'self ms':>10} {'%':>6} {'count':>6}  stack")
+    for stack, entry in sorted(stacks.items()):
+        share = entry["total"] / roots_total * 100 if roots_total else 0.0
+        print(
+            f"{entry['total']:>10.1f} {entry['self']:>10.1f} {share:>6.1f} "
+            f"{entry['count']:>6}  {'  ' * (len(stack) - 1)}{stack[-1]}"
+        )
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="ローカルに記録したスパンの集計")
+    parser.add_argument("command", choices=["summary", "flame"])
+    parser.add_argument(
+        "directory",
+        nargs="?",
+        default=os.environ.get("LOCAL_TRACE_DIR", ".traces"),
+        help="スパンの出力ディレクトリ（既定: LOCAL_TRACE_DIR）",
+    )
+    parser.add_argument("--name", help="このスパン名を含むトレースだけを集計")
+    parser.add_argument(
+        "--collapsed", action="store_true", help="flame: 折りたたみスタック形式で出力"
+    )
+    args = parser.parse_args(argv)
+
+    records = list(iter_records(args.directory))
+    if args.name:
+        trace_ids = {r["trace_id"] for r in records if r["name"] == args.name}
+        records = [r for r in records if r["trace_id"] in trace_ids]
+    if not records:
+        print(f"No spans found in {args.directory}")
+        return
+
+    if args.command == "summary":
+        _print_summary(records)
+    else:
+        _print_flame(records, args.collapsed)
+
+
+if __name__ == "__main__":
+    main()
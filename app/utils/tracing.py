@@ -12,16 +12,145 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import gzip
 import json
 import logging
+import os
+import threading
+import time
+from collections import OrderedDict
 from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 import google.cloud.storage as storage
 from google.cloud import logging as google_cloud_logging
+from opentelemetry import trace
+from opentelemetry.context import Context
 from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
-from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
 from opentelemetry.sdk.trace.export import SpanExportResult
+from opentelemetry.sdk.util import ns_to_iso_str
+
+# Cloud Logging accepts entries up to 256KB; larger attributes go to GCS
+MAX_LOG_ATTRIBUTES_BYTES = 255 * 1024
+DEFAULT_BUCKET_CHECK_TTL = 300.0
+DEFAULT_MAX_UPLOAD_WORKERS = 4
+DEFAULT_MAX_PENDING_UPLOADS = 64
+
+# Tail sampling defaults (overridable through TRACE_* environment variables)
+DEFAULT_TRACE_SAMPLE_RATE = 0.1
+DEFAULT_TRACE_LATENCY_THRESHOLD = 15.0
+DEFAULT_TRACE_ATTRIBUTE_BUDGET = 16 * 1024
+DEFAULT_TRACE_MAX_BUFFERED = 1000
+DEFAULT_TRACE_TIMEOUT = 300.0
+# Attributes carrying prompts, responses and tool payloads
+TRUNCATED_ATTRIBUTES = (
+    "gcp.vertex.agent.llm_request",
+    "gcp.vertex.agent.llm_response",
+    "gcp.vertex.agent.tool_call_args",
+    "gcp.vertex.agent.tool_response",
+    "gcp.vertex.agent.data",
+)
+
+
+def _format_value(value: Any) -> Any:
+    """Convert tuple attribute values to lists, as JSON serialization would."""
+    return list(value) if isinstance(value, tuple) else value
+
+
+def _format_attributes(attributes: Any) -> dict[str, Any]:
+    if not attributes:
+        return {}
+    return {key: _format_value(value) for key, value in attributes.items()}
+
+
+def _format_context(context: trace.SpanContext) -> dict[str, str]:
+    return {
+        "trace_id": f"0x{trace.format_trace_id(context.trace_id)}",
+        "span_id": f"0x{trace.format_span_id(context.span_id)}",
+        "trace_state": repr(context.trace_state),
+    }
+
+
+def span_to_dict(span: ReadableSpan) -> dict[str, Any]:
+    """
+    Convert a span to the same dictionary as ``json.loads(span.to_json())``
+    without serializing and parsing it.
+
+    :param span: The span to convert
+    :return: The span data dictionary
+    """
+    status = {"status_code": span.status.status_code.name}
+    if span.status.description:
+        status["description"] = span.status.description
+    return {
+        "name": span.name,
+        "context": _format_context(span.context) if span.context else None,
+        "kind": str(span.kind),
+        "parent_id": (
+            f"0x{trace.format_span_id(span.parent.span_id)}" if span.parent else None
+        ),
+        "start_time": ns_to_iso_str(span.start_time) if span.start_time else None,
+        "end_time": ns_to_iso_str(span.end_time) if span.end_time else None,
+        "status": status,
+        "attributes": _format_attributes(span.attributes),
+        "events": [
+            {
+                "name": event.name,
+                "timestamp": ns_to_iso_str(event.timestamp),
+                "attributes": _format_attributes(event.attributes),
+            }
+            for event in span.events
+        ],
+        "links": [
+            {
+                "context": _format_context(link.context),
+                "attributes": _format_attributes(link.attributes),
+            }
+            for link in span.links
+        ],
+        "resource": {
+            "attributes": _format_attributes(span.resource.attributes),
+            "schema_url": span.resource.schema_url,
+        },
+    }
+
+
+def _value_size(value: Any, limit: int) -> int:
+    """Approximate the UTF-8 JSON size of a value, stopping once above limit."""
+    if isinstance(value, str):
+        # Each character takes at least one byte, so skip encoding huge strings
+        if len(value) > limit:
+            return len(value) + 2
+        return (len(value) if value.isascii() else len(value.encode())) + 2
+    if isinstance(value, list | tuple):
+        size = 2
+        for item in value:
+            size += _value_size(item, limit - size) + 1
+            if size > limit:
+                break
+        return size
+    return len(str(value))
+
+
+def estimate_attributes_size(attributes: dict[str, Any], limit: int) -> int:
+    """
+    Estimate the serialized size of span attributes in bytes.
+
+    The estimate stops as soon as it exceeds ``limit``, so oversized payloads are
+    detected without serializing them.
+
+    :param attributes: The span attributes
+    :param limit: The size above which counting stops
+    :return: The estimated size, or a value above ``limit`` if it is exceeded
+    """
+    size = 2
+    for key, value in attributes.items():
+        size += len(key) + 4 + _value_size(value, limit - size)
+        if size > limit:
+            break
+    return size
 
 
 class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
@@ -39,6 +168,9 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         storage_client: storage.Client | None = None,
         bucket_name: str | None = None,
         debug: bool = False,
+        bucket_check_ttl: float = DEFAULT_BUCKET_CHECK_TTL,
+        max_upload_workers: int = DEFAULT_MAX_UPLOAD_WORKERS,
+        max_pending_uploads: int = DEFAULT_MAX_PENDING_UPLOADS,
         **kwargs: Any,
     ) -> None:
         """
@@ -48,6 +180,9 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         :param storage_client: Google Cloud Storage client
         :param bucket_name: Name of the GCS bucket to store large payloads
         :param debug: Enable debug mode for additional logging
+        :param bucket_check_ttl: Seconds to cache the bucket existence check
+        :param max_upload_workers: Number of concurrent GCS uploads
+        :param max_pending_uploads: Uploads queued beyond this are dropped
         :param kwargs: Additional arguments to pass to the parent class
         """
         super().__init__(**kwargs)
@@ -61,6 +196,20 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             bucket_name or f"{self.project_id}-kids-food-advisor-logs-data"
         )
         self.bucket = self.storage_client.bucket(self.bucket_name)
+        # Runs the Cloud Logging write alongside the Cloud Trace write
+        self._logging_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="span-logging"
+        )
+        # Large payloads are compressed and uploaded in the background
+        self._upload_executor = ThreadPoolExecutor(
+            max_workers=max_upload_workers, thread_name_prefix="span-upload"
+        )
+        self._upload_slots = threading.BoundedSemaphore(max_pending_uploads)
+        self._bucket_check_ttl = bucket_check_ttl
+        self._bucket_checked_at: float | None = None
+        self._bucket_exists = False
+        self._upload_lock = threading.Lock()
+        self._upload_counts = {"uploaded": 0, "failed": 0, "dropped": 0}
 
     def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
         """
@@ -69,11 +218,12 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         :param spans: A sequence of spans to export
         :return: The result of the export operation
         """
+        span_dicts = []
         for span in spans:
             span_context = span.get_span_context()
             trace_id = format(span_context.trace_id, "x")
             span_id = format(span_context.span_id, "x")
-            span_dict = json.loads(span.to_json())
+            span_dict = span_to_dict(span)
 
             span_dict["trace"] = f"projects/{self.project_id}/traces/{trace_id}"
             span_dict["span_id"] = span_id
@@ -84,9 +234,29 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
 
             if self.debug:
                 print(span_dict)
+            span_dicts.append(span_dict)
 
-            # Log the span data to Google Cloud Logging
-            self.logger.log_struct(
+        # Log all span data in one batched write while exporting to Cloud Trace
+        logging_future = self._logging_executor.submit(self._write_logs, span_dicts)
+        trace_result = super().export(spans)
+        try:
+            logging_future.result()
+        except Exception as e:
+            logging.error(f"Failed to write span logs to Cloud Logging: {e}")
+            return SpanExportResult.FAILURE
+        return trace_result
+
+    def _write_logs(self, span_dicts: list[dict]) -> None:
+        """
+        Write span data to Google Cloud Logging as a single batched request.
+
+        :param span_dicts: The span data dictionaries to log
+        """
+        if not span_dicts:
+            return
+        batch = self.logger.batch()
+        for span_dict in span_dicts:
+            batch.log_struct(
                 span_dict,
                 labels={
                     "type": "agent_telemetry",
@@ -94,18 +264,56 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
                 },
                 severity="INFO",
             )
-        # Export spans to Google Cloud Trace using the parent class method
-        return super().export(spans)
+        batch.commit()
+
+    def shutdown(self) -> None:
+        """Finish pending uploads and log writes, then shut down the exporter."""
+        self._upload_executor.shutdown(wait=True)
+        self._logging_executor.shutdown(wait=True)
+        super().shutdown()
+
+    def upload_metrics(self) -> dict[str, int]:
+        """
+        Return counters for large-attribute uploads to GCS.
+
+        :return: Numbers of uploaded, failed and dropped payloads
+        """
+        with self._upload_lock:
+            return dict(self._upload_counts)
+
+    def _count_upload(self, outcome: str) -> None:
+        with self._upload_lock:
+            self._upload_counts[outcome] += 1
+
+    def _check_bucket(self) -> bool:
+        """
+        Check that the bucket exists, caching the result for the configured TTL.
+
+        :return: Whether the bucket exists
+        """
+        now = time.monotonic()
+        checked_at = self._bucket_checked_at
+        if checked_at is None or now - checked_at >= self._bucket_check_ttl:
+            try:
+                self._bucket_exists = self.bucket.exists()
+            except Exception as e:
+                logging.warning(f"Failed to check bucket {self.bucket_name}: {e}")
+                self._bucket_exists = False
+            self._bucket_checked_at = now
+        return self._bucket_exists
 
-    def store_in_gcs(self, content: str, span_id: str) -> str:
+    def store_in_gcs(self, payload: dict, span_id: str) -> str:
         """
-        Initiate storing large content in Google Cloud Storage/
+        Schedule a gzip-compressed upload of large content to Google Cloud Storage.
 
-        :param content: The content to store
+        The upload runs in the background; failures are counted in
+        ``upload_metrics`` instead of failing the export.
+
+        :param payload: The content to store
         :param span_id: The ID of the span
-        :return: The  GCS URI of the stored content
+        :return: The GCS URI the content will be stored at
         """
-        if not self.storage_client.bucket(self.bucket_name).exists():
+        if not self._check_bucket():
             logging.warning(
                 f"Bucket {self.bucket_name} not found. "
                 "Unable to store span attributes in GCS."
@@ -113,11 +321,38 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             return "GCS bucket not found"
 
         blob_name = f"spans/{span_id}.json"
-        blob = self.bucket.blob(blob_name)
-
-        blob.upload_from_string(content, "application/json")
+        if not self._upload_slots.acquire(blocking=False):
+            self._count_upload("dropped")
+            logging.warning(f"Too many pending span uploads, dropping {blob_name}")
+            return "GCS upload dropped"
+        try:
+            self._upload_executor.submit(self._upload_payload, payload, blob_name)
+        except RuntimeError:
+            # The exporter is shutting down
+            self._upload_slots.release()
+            self._count_upload("dropped")
+            return "GCS upload dropped"
         return f"gs://{self.bucket_name}/{blob_name}"
 
+    def _upload_payload(self, payload: dict, blob_name: str) -> None:
+        """
+        Serialize, compress and upload a payload to GCS.
+
+        :param payload: The content to store
+        :param blob_name: The destination object name
+        """
+        try:
+            data = gzip.compress(json.dumps(payload).encode(), compresslevel=6)
+            blob = self.bucket.blob(blob_name)
+            blob.content_encoding = "gzip"
+            blob.upload_from_string(data, content_type="application/json")
+            self._count_upload("uploaded")
+        except Exception as e:
+            self._count_upload("failed")
+            logging.warning(f"Failed to upload span payload {blob_name} to GCS: {e}")
+        finally:
+            self._upload_slots.release()
+
     def _process_large_attributes(self, span_dict: dict, span_id: str) -> dict:
         """
         Process large attribute values by storing them in GCS if they exceed the size
@@ -129,23 +364,262 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         :return: The updated span dictionary
         """
         attributes = span_dict["attributes"]
-        if len(json.dumps(attributes).encode()) > 255 * 1024:  # 250 KB
-            # Separate large payload from other attributes
-            attributes_payload = dict(attributes.items())
-            attributes_retain = dict(attributes.items())
-
-            # Store large payload in GCS
-            gcs_uri = self.store_in_gcs(json.dumps(attributes_payload), span_id)
-            attributes_retain["uri_payload"] = gcs_uri
-            attributes_retain["url_payload"] = (
-                f"https://storage.mtls.cloud.google.com/"
-                f"{self.bucket_name}/spans/{span_id}.json"
-            )
-
-            span_dict["attributes"] = attributes_retain
+        limit = MAX_LOG_ATTRIBUTES_BYTES
+        if estimate_attributes_size(attributes, limit) > limit:
+            # Store large payload in GCS; the log entry keeps only its location
+            gcs_uri = self.store_in_gcs(attributes, span_id)
+            span_dict["attributes"] = {"uri_payload": gcs_uri}
+            if gcs_uri.startswith("gs://"):
+                # Only link to the object when an upload was actually scheduled
+                span_dict["attributes"]["url_payload"] = (
+                    f"https://storage.mtls.cloud.google.com/"
+                    f"{self.bucket_name}/spans/{span_id}.json"
+                )
             logging.info(
                 "Length of payload span above 250 KB, storing attributes in GCS "
                 "to avoid large log entry errors"
             )
 
         return span_dict
+
+
+def _truncate_attributes(
+    attributes: Any, keys: Sequence[str], budget: int
+) -> tuple[dict[str, Any], int]:
+    """
+    Truncate string attributes listed in ``keys`` to ``budget`` characters.
+
+    :param attributes: The span attributes
+    :param keys: Attribute names to truncate
+    :param budget: Maximum number of characters kept per attribute
+    :return: The attributes and the number of truncated values
+    """
+    truncated = 0
+    result = dict(attributes or {})
+    for key in keys:
+        value = result.get(key)
+        if isinstance(value, str) and len(value) > budget:
+            result[key] = f"{value[:budget]}...[truncated {len(value) - budget} chars]"
+            truncated += 1
+    return result, truncated
+
+
+class TailSamplingSpanProcessor(SpanProcessor):
+    """
+    A span processor that buffers spans per trace and decides whether to export
+    the whole trace once its local root span ends.
+
+    Traces with an error status or a root span slower than ``latency_threshold``
+    are always kept; other traces are kept with probability ``sample_rate``
+    (decided from the trace ID, so every span of a trace gets the same decision).
+    Prompt and response attributes of exported spans are truncated to
+    ``attribute_budget`` characters.
+    """
+
+    def __init__(
+        self,
+        delegate: SpanProcessor,
+        sample_rate: float = DEFAULT_TRACE_SAMPLE_RATE,
+        latency_threshold: float = DEFAULT_TRACE_LATENCY_THRESHOLD,
+        attribute_budget: int = DEFAULT_TRACE_ATTRIBUTE_BUDGET,
+        max_buffered_traces: int = DEFAULT_TRACE_MAX_BUFFERED,
+        trace_timeout: float = DEFAULT_TRACE_TIMEOUT,
+        truncated_attributes: Sequence[str] = TRUNCATED_ATTRIBUTES,
+    ) -> None:
+        """
+        Initialize the processor.
+
+        :param delegate: The processor receiving the spans of kept traces
+        :param sample_rate: Fraction of successful, fast traces to keep (0.0-1.0)
+        :param latency_threshold: Root span duration in seconds above which a
+            trace is always kept
+        :param attribute_budget: Characters kept per prompt/response attribute
+        :param max_buffered_traces: Traces held in memory before the oldest one
+            is decided early
+        :param trace_timeout: Seconds after which an unfinished trace is decided
+            with the spans received so far
+        :param truncated_attributes: Attribute names subject to truncation
+        """
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"sample_rate must be between 0 and 1: {sample_rate}")
+        self._delegate = delegate
+        self.sample_rate = sample_rate
+        self.latency_threshold = latency_threshold
+        self.attribute_budget = attribute_budget
+        self.max_buffered_traces = max_buffered_traces
+        self.trace_timeout = trace_timeout
+        self.truncated_attributes = tuple(truncated_attributes)
+        self._sample_bound = round(sample_rate * (1 << 64))
+        self._lock = threading.Lock()
+        # trace_id -> (monotonic time of the first span, spans)
+        self._traces: OrderedDict[int, tuple[float, list[ReadableSpan]]] = OrderedDict()
+        self._stats = {
+            "traces_kept_error": 0,
+            "traces_kept_latency": 0,
+            "traces_kept_sampled": 0,
+            "traces_dropped": 0,
+            "traces_decided_early": 0,
+            "spans_exported": 0,
+            "spans_dropped": 0,
+            "attributes_truncated": 0,
+        }
+
+    @classmethod
+    def from_env(cls, delegate: SpanProcessor) -> "TailSamplingSpanProcessor":
+        """
+        Create a processor configured by environment variables.
+
+        TRACE_SAMPLE_RATE, TRACE_LATENCY_THRESHOLD_SECONDS, TRACE_ATTRIBUTE_BUDGET,
+        TRACE_MAX_BUFFERED_TRACES and TRACE_TIMEOUT_SECONDS override the defaults.
+
+        :param delegate: The processor receiving the spans of kept traces
+        :return: The configured processor
+        """
+        env = os.environ
+        return cls(
+            delegate,
+            sample_rate=float(env.get("TRACE_SAMPLE_RATE", DEFAULT_TRACE_SAMPLE_RATE)),
+            latency_threshold=float(
+                env.get(
+                    "TRACE_LATENCY_THRESHOLD_SECONDS", DEFAULT_TRACE_LATENCY_THRESHOLD
+                )
+            ),
+            attribute_budget=int(
+                env.get("TRACE_ATTRIBUTE_BUDGET", DEFAULT_TRACE_ATTRIBUTE_BUDGET)
+            ),
+            max_buffered_traces=int(
+                env.get("TRACE_MAX_BUFFERED_TRACES", DEFAULT_TRACE_MAX_BUFFERED)
+            ),
+            trace_timeout=float(
+                env.get("TRACE_TIMEOUT_SECONDS", DEFAULT_TRACE_TIMEOUT)
+            ),
+        )
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Return sampling counters and the current configuration.
+
+        :return: Counters of kept/dropped traces and spans, and the settings
+        """
+        with self._lock:
+            stats: dict[str, Any] = dict(self._stats)
+            stats["traces_buffered"] = len(self._traces)
+        stats["config"] = {
+            "sample_rate": self.sample_rate,
+            "latency_threshold": self.latency_threshold,
+            "attribute_budget": self.attribute_budget,
+        }
+        return stats
+
+    def on_start(self, span: Span, parent_context: Context | None = None) -> None:
+        self._delegate.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        trace_id = span.context.trace_id
+        is_root = span.parent is None or span.parent.is_remote
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            entry = self._traces.get(trace_id)
+            if entry is None:
+                entry = self._traces[trace_id] = (now, [])
+            entry[1].append(span)
+            if is_root:
+                ready.append((self._traces.pop(trace_id)[1], span))
+            # Decide stale traces and the oldest ones beyond the buffer limit
+            while self._traces:
+                oldest_id, (started, spans) = next(iter(self._traces.items()))
+                if (
+                    len(self._traces) <= self.max_buffered_traces
+                    and now - started < self.trace_timeout
+                ):
+                    break
+                del self._traces[oldest_id]
+                self._stats["traces_decided_early"] += 1
+                ready.append((spans, None))
+        for spans, root in ready:
+            self._decide(spans, root)
+
+    def _decide(self, spans: list[ReadableSpan], root: ReadableSpan | None) -> None:
+        """
+        Export or drop the spans of a trace.
+
+        :param spans: The spans of the trace
+        :param root: The local root span, or None if the trace is incomplete
+        """
+        if any(s.status.status_code == trace.StatusCode.ERROR for s in spans):
+            outcome = "traces_kept_error"
+        elif self._is_slow(spans, root):
+            outcome = "traces_kept_latency"
+        elif (spans[0].context.trace_id & ((1 << 64) - 1)) < self._sample_bound:
+            outcome = "traces_kept_sampled"
+        else:
+            with self._lock:
+                self._stats["traces_dropped"] += 1
+                self._stats["spans_dropped"] += len(spans)
+            return
+
+        truncated = 0
+        for span in spans:
+            span, count = self._truncate(span)
+            truncated += count
+            self._delegate.on_end(span)
+        with self._lock:
+            self._stats[outcome] += 1
+            self._stats["spans_exported"] += len(spans)
+            self._stats["attributes_truncated"] += truncated
+
+    def _is_slow(self, spans: list[ReadableSpan], root: ReadableSpan | None) -> bool:
+        if root is not None:
+            candidates = [root]
+        else:
+            candidates = spans
+        threshold_ns = self.latency_threshold * 1e9
+        return any(
+            s.end_time and s.start_time and s.end_time - s.start_time >= threshold_ns
+            for s in candidates
+        )
+
+    def _truncate(self, span: ReadableSpan) -> tuple[ReadableSpan, int]:
+        """
+        Return a copy of the span with prompt/response attributes truncated.
+
+        :param span: The span to truncate
+        :return: The span (unchanged if nothing was truncated) and the number of
+            truncated attributes
+        """
+        attributes, truncated = _truncate_attributes(
+            span.attributes, self.truncated_attributes, self.attribute_budget
+        )
+        if not truncated:
+            return span, 0
+        return (
+            ReadableSpan(
+                name=span.name,
+                context=span.context,
+                parent=span.parent,
+                resource=span.resource,
+                attributes=attributes,
+                events=span.events,
+                links=span.links,
+                kind=span.kind,
+                status=span.status,
+                start_time=span.start_time,
+                end_time=span.end_time,
+                instrumentation_scope=span.instrumentation_scope,
+            ),
+            truncated,
+        )
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """Decide all buffered traces and flush the delegate processor."""
+        with self._lock:
+            pending = [spans for _, spans in self._traces.values()]
+            self._traces.clear()
+        for spans in pending:
+            self._decide(spans, None)
+        return self._delegate.force_flush(timeout_millis)
+
+    def shutdown(self) -> None:
+        self.force_flush()
+        self._delegate.shutdown()
@@ -40,24 +40,34 @@ agent = get_multi_turn_agent()
 result = analyze_child_nutrition("2歳の息子の夕食について相談です...")
 """
 
-import os
-import uuid
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
 
-import google.auth
-from google.adk.agents import LlmAgent
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.genai import types
+if TYPE_CHECKING:
+    from google.adk.agents import LlmAgent
 
-# 新しいマルチターンエージェントをインポート
-from app.agents.unified_nutrition_agent import create_unified_nutrition_agent
 
-_, project_id = google.auth.default()
-os.environ.setdefault("GOOGLE_CLOUD_PROJECT", project_id)
-os.environ.setdefault("GOOGLE_CLOUD_LOCATION", "global")
-os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "True")
+@lru_cache(maxsize=1)
+def get_root_agent() -> "LlmAgent":
+    """
+    ルートエージェントを取得（初回呼び出し時に1度だけ構築）
+
+    ADK/genaiのインポートと認証情報の解決は初回呼び出しまで遅延する
+
+    Returns:
+        LlmAgent: 統合栄養エージェント
+    """
+    from app.agents.unified_nutrition_agent import get_unified_nutrition_agent
+
+    return get_unified_nutrition_agent()
+
+
+def __getattr__(name: str) -> Any:
+    """root_agent属性へのアクセス時にエージェントを構築"""
+    if name == "root_agent":
+        return get_root_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-root_agent = create_unified_nutrition_agent()
 
 # ===================================
 # 使用例とテスト用コード
@@ -65,6 +75,8 @@ root_agent = create_unified_nutrition_agent()
 
 if __name__ == "__main__":
     print("\n=== マルチターン対話対応Kids Food Advisorシステム テスト ===")
+    root_agent = get_root_agent()
+    print(f"エージェント: {root_agent.name} ({root_agent.model})")
 
     # 使用例1: 基本的な栄養相談
     sample_message = """
@@ -74,7 +86,7 @@ if __name__ == "__main__":
     昼食：ご飯、鶏肉、ブロッコリー
     夕食：うどん、卵、人参
     おやつ：りんご
-    
+
     夕食のメニューを改善したいと思っています。
     """
 
@@ -92,7 +104,3 @@ if __name__ == "__main__":
     print("\n🔄 移行ガイド:")
     print("  - 新しい実装: get_multi_turn_agent() + Agent Engine API")
     print("  - 互換性維持: analyze_child_nutrition() (非推奨)")
-
-else:
-    # モジュールとしてインポートされた場合
-    print("📋 マルチターン対話Kids Food Advisorシステムが初期化されました")
@@ -5,7 +5,7 @@ backend_server.pyとcloud_functions/agent_engine_stream/main.pyで共有
 
 from typing import Any
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class ApiResponse(BaseModel):
@@ -104,6 +104,31 @@ class VertexAISession(BaseModel):
     sessionState: dict[str, Any] | None = None
 
 
+class ChildProfile(BaseModel):
+    """チャットリクエストで送られる子どものプロフィール"""
+
+    name: str | None = None
+    ageMonths: int | None = Field(default=None, ge=0, le=72)
+    # 省略（null）はアレルギー不明、空リストは「アレルギーなし」
+    allergens: list[str] | None = None
+    dislikes: list[str] = []
+
+    def to_state_delta(self) -> dict[str, Any]:
+        """
+        セッション状態の差分に変換
+
+        エージェント側（app/agents/child_profile.py）の child_profile 形式に合わせる
+        """
+        return {
+            "child_profile": {
+                "name": self.name,
+                "age_months": self.ageMonths,
+                "allergens": self.allergens,
+                "dislikes": self.dislikes,
+            }
+        }
+
+
 class VertexAIEventActions(BaseModel):
     """Vertex AI Sessions APIのEventActionsオブジェクト"""
 
@@ -7,11 +7,13 @@ Staging環境: Vertex AI Agent Engine接続
 本番環境: Vertex AI Agent Engine接続
 """
 
+import asyncio
 import os
 from abc import ABC, abstractmethod
 from typing import Any
 
 from google.auth import default
+from google.auth.credentials import AnonymousCredentials
 
 
 class EnvironmentConfig(ABC):
@@ -23,12 +25,13 @@ class EnvironmentConfig(ABC):
             "GOOGLE_CLOUD_PROJECT", "my-staging-project-id"
         )
         self.location = os.environ.get("GOOGLE_CLOUD_LOCATION", "us-central1")
-        self.reasoning_engine_id = os.environ.get(
-            "REASONING_ENGINE_ID", "123456789"
-        )
+        self.reasoning_engine_id = os.environ.get("REASONING_ENGINE_ID", "123456789")
 
-        # 認証情報の取得
-        self.credentials, _ = default()
+        # 認証情報の取得（スタブバックエンドでのオフライン実行時は不要）
+        if os.environ.get("AGENT_BACKEND") == "stub":
+            self.credentials = AnonymousCredentials()
+        else:
+            self.credentials, _ = default()
 
     @property
     @abstractmethod
@@ -176,7 +179,30 @@ def get_access_token(config: EnvironmentConfig) -> str:
         str: 認証トークン
     """
     from google.auth.transport.requests import Request as GoogleRequest
+    from utils.single_flight import upstream_flight
 
     if not config.credentials.valid:
-        config.credentials.refresh(GoogleRequest())
+        # 同時に期限切れを検知したリクエストのトークン更新を1回にまとめる
+        upstream_flight.do(
+            ("token_refresh", id(config.credentials)),
+            lambda: config.credentials.refresh(GoogleRequest()),
+        )
     return config.credentials.token
+
+
+async def get_access_token_async(config: EnvironmentConfig) -> str:
+    """
+    Google Cloud認証トークンを取得（非同期版）
+
+    有効なトークンはその場で返し、更新が必要な場合だけスレッドで実行して
+    イベントループを止めない
+
+    Args:
+        config: 環境設定オブジェクト
+
+    Returns:
+        str: 認証トークン
+    """
+    if config.credentials.valid:
+        return config.credentials.token
+    return await asyncio.to_thread(get_access_token, config)
@@ -6,8 +6,18 @@ import json
 from abc import ABC, abstractmethod
 from typing import Any
 
+from api_models import ChildProfile
 from environment_config import EnvironmentConfig
 from flask import Request, Response
+from pydantic import ValidationError
+from starlette.requests import Request as ASGIRequest
+from starlette.responses import Response as ASGIResponse
+
+# リクエスト検証エラー時のヘッダー
+_REQUEST_ERROR_HEADERS = {
+    "Access-Control-Allow-Origin": "http://localhost:3002",
+    "Content-Type": "application/json",
+}
 
 
 class ChatHandler(ABC):
@@ -30,32 +40,124 @@ class ChatHandler(ABC):
         """セッション作成処理"""
         pass
 
+    @abstractmethod
+    async def handle_chat_stream_async(
+        self,
+        request: ASGIRequest,
+        user_info: dict[str, Any],
+        base_headers: dict[str, str],
+    ) -> ASGIResponse:
+        """チャットストリーミング処理（ASGI用）"""
+        pass
+
+    @abstractmethod
+    async def handle_create_session_async(
+        self,
+        request: ASGIRequest,
+        user_info: dict[str, Any],
+        base_headers: dict[str, str],
+    ) -> ASGIResponse:
+        """セッション作成処理（ASGI用）"""
+        pass
+
     def _get_request_data(
         self, request: Request
     ) -> tuple[dict | None, Response | None]:
         """リクエストデータを取得・検証"""
-        base_headers = {
-            "Access-Control-Allow-Origin": "http://localhost:3002",
-            "Content-Type": "application/json",
-        }
-
-        if not request.is_json:
+        data = request.get_json() if request.is_json else None
+        error = self._validate_request_data(request.is_json, data)
+        if error:
             return None, Response(
-                json.dumps(
-                    {"success": False, "error": "Content-Type must be application/json"}
-                ),
+                json.dumps({"success": False, "error": error}),
                 status=400,
-                headers=base_headers,
+                headers=_REQUEST_ERROR_HEADERS,
+            )
+        return data, None
+
+    async def _get_request_data_async(
+        self, request: ASGIRequest
+    ) -> tuple[dict | None, ASGIResponse | None]:
+        """リクエストデータを取得・検証（ASGI用）"""
+        mimetype = request.headers.get("content-type", "").split(";")[0].strip()
+        is_json = mimetype == "application/json" or (
+            mimetype.startswith("application/") and mimetype.endswith("+json")
+        )
+        data = None
+        if is_json:
+            try:
+                data = await request.json()
+            except ValueError:
+                data = None
+
+        error = self._validate_request_data(is_json, data)
+        if error:
+            return None, ASGIResponse(
+                json.dumps({"success": False, "error": error}),
+                status_code=400,
+                headers=_REQUEST_ERROR_HEADERS,
             )
+        return data, None
+
+    def _validate_request_data(self, is_json: bool, data: Any) -> str | None:
+        """
+        チャットリクエストの本文を検証
 
-        data = request.get_json()
-        if not data or "message" not in data:
+        Args:
+            is_json: Content-TypeがJSONかどうか
+            data: JSONとして読み込んだ本文
+
+        Returns:
+            str | None: エラーメッセージ（問題なければNone）
+        """
+        if not is_json:
+            return "Content-Type must be application/json"
+        if not data or not isinstance(data, dict) or "message" not in data:
+            return "No message provided in request"
+        return None
+
+    def _get_state_delta(
+        self, data: dict[str, Any], base_headers: dict[str, str]
+    ) -> tuple[dict[str, Any] | None, Response | None]:
+        """リクエストのchildProfileを検証してセッション状態の差分に変換"""
+        state_delta, error = self._parse_state_delta(data)
+        if error:
             return None, Response(
-                json.dumps(
-                    {"success": False, "error": "No message provided in request"}
-                ),
+                json.dumps({"success": False, "error": error}, ensure_ascii=False),
                 status=400,
-                headers=base_headers,
+                headers={**base_headers, "Content-Type": "application/json"},
             )
+        return state_delta, None
 
-        return data, None
+    def _get_state_delta_asgi(
+        self, data: dict[str, Any], base_headers: dict[str, str]
+    ) -> tuple[dict[str, Any] | None, ASGIResponse | None]:
+        """リクエストのchildProfileを検証してセッション状態の差分に変換（ASGI用）"""
+        state_delta, error = self._parse_state_delta(data)
+        if error:
+            return None, ASGIResponse(
+                json.dumps({"success": False, "error": error}, ensure_ascii=False),
+                status_code=400,
+                headers={**base_headers, "Content-Type": "application/json"},
+            )
+        return state_delta, None
+
+    def _parse_state_delta(
+        self, data: dict[str, Any]
+    ) -> tuple[dict[str, Any] | None, str | None]:
+        """
+        childProfileをセッション状態の差分に変換
+
+        Args:
+            data: リクエスト本文
+
+        Returns:
+            (state_delta, error_message) のタプル（childProfileがなければ両方None）
+        """
+        profile = data.get("childProfile")
+        if profile is None:
+            return None, None
+
+        try:
+            return ChildProfile.model_validate(profile).to_state_delta(), None
+        except ValidationError as e:
+            return None, f"Invalid childProfile: {e.errors()}"
@@ -2,13 +2,21 @@
 ローカルADK環境用チャットハンドラー
 """
 
+import asyncio
+import inspect
 import json
 import logging
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
 from typing import Any
 
+from api_models import SessionCreateResponse
 from environment_config import EnvironmentConfig
 from flask import Request, Response
+from starlette.requests import Request as ASGIRequest
+from starlette.responses import Response as ASGIResponse
+from starlette.responses import StreamingResponse
+from utils.consultation_renderer import ConsultationStreamRenderer
+from utils.stream_events import SSE_HEADERS, sse_event
 
 from .base import ChatHandler
 
@@ -39,7 +47,12 @@ class LocalChatHandler(ChatHandler):
             sys.path.insert(
                 0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.."))
             )
-            from app.vertex_ai_agent import root_agent
+            from app.utils.local_tracing import configure_local_tracing
+            from app.vertex_ai_agent import get_root_agent
+
+            # LOCAL_TRACE_DIR があれば本番と同じADKのスパンをローカルに記録
+            configure_local_tracing()
+            root_agent = get_root_agent()
 
             # ADK コンポーネントを初期化
             self.adk_session_service = InMemorySessionService()
@@ -52,7 +65,7 @@ class LocalChatHandler(ChatHandler):
 
         except Exception as e:
             logger.error(f"ADK initialization failed: {e}")
-            raise RuntimeError(f"ADK初期化に失敗しました: {e}")
+            raise RuntimeError(f"ADK初期化に失敗しました: {e}") from e
 
     def handle_chat_stream(
         self, request: Request, user_info: dict[str, Any], base_headers: dict[str, str]
@@ -65,88 +78,21 @@ class LocalChatHandler(ChatHandler):
 
             message = data["message"]
             session_id = data.get("sessionId", "default")
+            state_delta, error_response = self._get_state_delta(data, base_headers)
+            if error_response:
+                return error_response
 
             logger.info(
                 f"ADKストリーミング開始 - ユーザー: {user_info['uid']}, "
                 f"セッション: {session_id}, メッセージ: {message[:50]}..."
             )
 
-            def generate_adk_stream() -> Generator[str, None, None]:
-                """ADKストリーミング生成"""
-                try:
-                    logger.info("ADKストリーミング開始")
-                    current_agent = None
-                    agent_started = False
-
-                    import asyncio
-
-                    async def adk_stream():
-                        nonlocal current_agent, agent_started
-                        async for event in self._run_adk_agent_async(
-                            message, user_info["uid"], session_id
-                        ):
-                            if event.content and event.content.parts:
-                                # エージェント名を特定
-                                agent_name = (
-                                    getattr(event, "author", None)
-                                    or "Kids Food Advisor"
-                                )
-
-                                # エージェントが変わった場合の処理
-                                if current_agent and current_agent != agent_name:
-                                    agent_complete_data = f"data: {json.dumps({'type': 'agent_complete', 'agent_name': current_agent}, ensure_ascii=False)}\\n\\n"
-                                    yield agent_complete_data
-
-                                # 新しいエージェント開始時の処理
-                                if not current_agent or current_agent != agent_name:
-                                    agent_start_data = f"data: {json.dumps({'type': 'agent_start', 'agent_name': agent_name}, ensure_ascii=False)}\\n\\n"
-                                    yield agent_start_data
-                                    current_agent = agent_name
-                                    agent_started = True
-
-                                # テキスト部分を処理
-                                for part in event.content.parts:
-                                    if part.text:
-                                        sse_data = f"data: {json.dumps({'type': 'chunk', 'agent_name': agent_name, 'content': part.text}, ensure_ascii=False)}\\n\\n"
-                                        yield sse_data
-
-                        # エージェント完了とストリーム終了イベントを送信
-                        if agent_started and current_agent:
-                            agent_complete_data = f"data: {json.dumps({'type': 'agent_complete', 'agent_name': current_agent}, ensure_ascii=False)}\\n\\n"
-                            yield agent_complete_data
-
-                        # ストリーミング完了を通知
-                        stream_end_data = f"data: {json.dumps({'type': 'stream_end'}, ensure_ascii=False)}\\n\\n"
-                        yield stream_end_data
-
-                    # 非同期関数を同期的に実行
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    try:
-                        async_gen = adk_stream()
-                        while True:
-                            try:
-                                result = loop.run_until_complete(async_gen.__anext__())
-                                yield result
-                            except StopAsyncIteration:
-                                break
-                    finally:
-                        loop.close()
-
-                except Exception as e:
-                    logger.error(f"ADKストリーミングエラー: {e}")
-                    yield f"data: {json.dumps({'type': 'error', 'content': f'ADK streaming error: {e!s}'}, ensure_ascii=False)}\\n\\n"
-
             # Server-Sent Eventsヘッダーでストリーミングレスポンス
-            stream_headers = {
-                **base_headers,
-                "Content-Type": "text/event-stream",
-                "Cache-Control": "no-cache",
-                "X-Accel-Buffering": "no",
-                "Connection": "keep-alive",
-            }
-
-            return Response(generate_adk_stream(), status=200, headers=stream_headers)
+            return Response(
+                self._generate_stream(user_info, session_id, message, state_delta),
+                status=200,
+                headers={**base_headers, **SSE_HEADERS},
+            )
 
         except Exception as e:
             logger.error(f"ADKストリーミングエラー: {e}")
@@ -156,6 +102,181 @@ class LocalChatHandler(ChatHandler):
                 headers=base_headers,
             )
 
+    async def handle_chat_stream_async(
+        self,
+        request: ASGIRequest,
+        user_info: dict[str, Any],
+        base_headers: dict[str, str],
+    ) -> ASGIResponse:
+        """ADKを使用したチャットストリーミング処理（ASGI用）"""
+        try:
+            data, error_response = await self._get_request_data_async(request)
+            if error_response:
+                return error_response
+
+            message = data["message"]
+            session_id = data.get("sessionId", "default")
+            state_delta, error_response = self._get_state_delta_asgi(data, base_headers)
+            if error_response:
+                return error_response
+
+            logger.info(
+                f"ADKストリーミング開始(ASGI) - ユーザー: {user_info['uid']}, "
+                f"セッション: {session_id}, メッセージ: {message[:50]}..."
+            )
+
+            return StreamingResponse(
+                self._generate_stream_async(
+                    user_info, session_id, message, state_delta
+                ),
+                status_code=200,
+                headers={**base_headers, **SSE_HEADERS},
+            )
+
+        except Exception as e:
+            logger.error(f"ADKストリーミングエラー: {e}")
+            return ASGIResponse(
+                json.dumps({"success": False, "error": f"ADK streaming failed: {e!s}"}),
+                status_code=500,
+                headers=base_headers,
+            )
+
+    def _generate_stream(
+        self,
+        user_info: dict[str, Any],
+        session_id: str,
+        message: str,
+        state_delta: dict[str, Any] | None,
+    ) -> Generator[str, None, None]:
+        """ADKストリーミング生成"""
+        try:
+            logger.info("ADKストリーミング開始")
+
+            # 非同期関数を同期的に実行
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                async_gen = self._adk_events(
+                    user_info, session_id, message, state_delta
+                )
+                while True:
+                    try:
+                        result = loop.run_until_complete(async_gen.__anext__())
+                        yield result
+                    except StopAsyncIteration:
+                        break
+            finally:
+                loop.close()
+
+        except Exception as e:
+            logger.error(f"ADKストリーミングエラー: {e}")
+            yield sse_event({"type": "error", "content": f"ADK streaming error: {e!s}"})
+
+    async def _generate_stream_async(
+        self,
+        user_info: dict[str, Any],
+        session_id: str,
+        message: str,
+        state_delta: dict[str, Any] | None,
+    ) -> AsyncGenerator[str, None]:
+        """ADKストリーミング生成（ASGIのイベントループ上で実行）"""
+        try:
+            logger.info("ADKストリーミング開始")
+            async for event in self._adk_events(
+                user_info, session_id, message, state_delta
+            ):
+                yield event
+        except Exception as e:
+            logger.error(f"ADKストリーミングエラー: {e}")
+            yield sse_event({"type": "error", "content": f"ADK streaming error: {e!s}"})
+
+    async def _adk_events(
+        self,
+        user_info: dict[str, Any],
+        session_id: str,
+        message: str,
+        state_delta: dict[str, Any] | None,
+    ) -> AsyncGenerator[str, None]:
+        """ADKエージェントの実行イベントをSSEイベントに変換"""
+        current_agent = None
+        agent_started = False
+        renderer = ConsultationStreamRenderer()
+
+        if state_delta:
+            await self._append_state_delta(user_info["uid"], session_id, state_delta)
+        async for event in self._run_adk_agent_async(
+            message, user_info["uid"], session_id
+        ):
+            if event.content and event.content.parts:
+                # エージェント名を特定
+                agent_name = getattr(event, "author", None) or "Kids Food Advisor"
+
+                # エージェントが変わった場合の処理
+                if current_agent and current_agent != agent_name:
+                    yield sse_event(
+                        {"type": "agent_complete", "agent_name": current_agent}
+                    )
+
+                # 新しいエージェント開始時の処理
+                if not current_agent or current_agent != agent_name:
+                    yield sse_event({"type": "agent_start", "agent_name": agent_name})
+                    current_agent = agent_name
+                    agent_started = True
+
+                # テキスト部分を処理
+                for part in event.content.parts:
+                    if part.text:
+                        text = renderer.feed(part.text)
+                        if text:
+                            yield sse_event(
+                                {
+                                    "type": "chunk",
+                                    "agent_name": agent_name,
+                                    "content": text,
+                                }
+                            )
+
+        # 構造化出力の残りを送信
+        remaining = renderer.finish()
+        if remaining and current_agent:
+            yield sse_event(
+                {"type": "chunk", "agent_name": current_agent, "content": remaining}
+            )
+
+        # エージェント完了とストリーム終了イベントを送信
+        if agent_started and current_agent:
+            yield sse_event({"type": "agent_complete", "agent_name": current_agent})
+
+        # ストリーミング完了を通知
+        yield sse_event({"type": "stream_end"})
+
+    async def _append_state_delta(
+        self, user_id: str, session_id: str, state_delta: dict[str, Any]
+    ) -> None:
+        """セッション状態の差分をイベントとして追記"""
+        import uuid
+
+        from google.adk.events import Event, EventActions
+
+        session = self.adk_session_service.get_session(
+            app_name=self.adk_runner.app_name, user_id=user_id, session_id=session_id
+        )
+        if inspect.isawaitable(session):
+            session = await session
+        if session is None:
+            logger.warning(f"状態更新対象のセッションが見つかりません: {session_id}")
+            return
+
+        event = Event(
+            invocation_id=f"state-{uuid.uuid4().hex}",
+            author="user",
+            actions=EventActions(state_delta=state_delta),
+        )
+        result = self.adk_session_service.append_event(session, event)
+        if inspect.isawaitable(result):
+            await result
+        logger.info(f"セッション状態を更新: {list(state_delta)}")
+
     async def _run_adk_agent_async(
         self,
         message: str,
@@ -209,32 +330,48 @@ class LocalChatHandler(ChatHandler):
         """ADKを使用したセッション作成処理"""
         try:
             logger.info(f"ADKセッション作成開始 - ユーザー: {user_info['uid']}")
-
-            from api_models import SessionCreateResponse
-
             session = self.adk_session_service.create_session(
                 app_name=self.adk_runner.app_name, user_id=user_info["uid"]
             )
-            session_id = session.id if hasattr(session, "id") and session.id else None
-            if not session_id:
-                raise Exception("セッションIDの取得に失敗しました")
-
-            session_response = SessionCreateResponse(success=True, sessionId=session_id)
-            return Response(
-                session_response.model_dump_json(),
-                status=200,
-                headers=base_headers,
-            )
-
+            body, status = self._session_created(session), 200
         except Exception as e:
-            logger.error(f"ADKセッション作成エラー: {e}")
-            from api_models import SessionCreateResponse
+            body, status = self._session_create_error(e), 500
 
-            session_response = SessionCreateResponse(
-                success=False, error=f"ADK session creation failed: {e!s}"
-            )
-            return Response(
-                session_response.model_dump_json(),
-                status=500,
-                headers=base_headers,
+        return Response(body, status=status, headers=base_headers)
+
+    async def handle_create_session_async(
+        self,
+        request: ASGIRequest,
+        user_info: dict[str, Any],
+        base_headers: dict[str, str],
+    ) -> ASGIResponse:
+        """ADKを使用したセッション作成処理（ASGI用）"""
+        try:
+            logger.info(f"ADKセッション作成開始 - ユーザー: {user_info['uid']}")
+            session = self.adk_session_service.create_session(
+                app_name=self.adk_runner.app_name, user_id=user_info["uid"]
             )
+            if inspect.isawaitable(session):
+                session = await session
+            body, status = self._session_created(session), 200
+        except Exception as e:
+            body, status = self._session_create_error(e), 500
+
+        return ASGIResponse(body, status_code=status, headers=base_headers)
+
+    def _session_created(self, session: Any) -> str:
+        """作成したセッションからレスポンス本文を作成"""
+        session_id = session.id if hasattr(session, "id") and session.id else None
+        if not session_id:
+            raise Exception("セッションIDの取得に失敗しました")
+
+        return SessionCreateResponse(
+            success=True, sessionId=session_id
+        ).model_dump_json()
+
+    def _session_create_error(self, error: Exception) -> str:
+        """セッション作成中の例外からレスポンス本文を作成"""
+        logger.error(f"ADKセッション作成エラー: {error}")
+        return SessionCreateResponse(
+            success=False, error=f"ADK session creation failed: {error!s}"
+        ).model_dump_json()
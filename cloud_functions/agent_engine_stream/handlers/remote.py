@@ -4,13 +4,21 @@
 
 import json
 import logging
-from collections.abc import Generator
+import uuid
+from collections.abc import AsyncGenerator, Generator
+from datetime import datetime, timezone
 from typing import Any
 
 import httpx
-from environment_config import get_access_token
+from api_models import SessionCreateResponse
+from environment_config import get_access_token, get_access_token_async
 from flask import Request, Response
-from services import poll_operation
+from services import poll_operation, poll_operation_async
+from starlette.requests import Request as ASGIRequest
+from starlette.responses import Response as ASGIResponse
+from starlette.responses import StreamingResponse
+from utils.http_client import get_async_http_client, get_http_client
+from utils.stream_events import SSE_HEADERS, AgentEngineStreamTranslator, sse_event
 
 from .base import ChatHandler
 
@@ -32,148 +40,20 @@ class RemoteChatHandler(ChatHandler):
 
             message = data["message"]
             session_id = data.get("sessionId", "default")
+            state_delta, error_response = self._get_state_delta(data, base_headers)
+            if error_response:
+                return error_response
 
             logger.info(
                 f"Vertex AIストリーミング開始 - ユーザー: {user_info['uid']}, "
                 f"セッション: {session_id}, メッセージ: {message[:50]}..."
             )
 
-            def generate_vertex_ai_stream() -> Generator[str, None, None]:
-                """Vertex AI APIストリーミング生成"""
-                try:
-                    # 認証トークンの取得
-                    access_token = get_access_token(self.config)
-
-                    # Vertex AI Agent Engine API リクエスト
-                    request_payload = {
-                        "class_method": "stream_query",
-                        "input": {
-                            "user_id": user_info["uid"],
-                            "session_id": session_id,
-                            "message": message,
-                        },
-                    }
-
-                    headers = {
-                        "Authorization": f"Bearer {access_token}",
-                        "Content-Type": "application/json",
-                    }
-
-                    vertex_ai_urls = self.config.get_vertex_ai_urls()
-                    agent_engine_url = vertex_ai_urls["agent_engine_url"]
-
-                    logger.info(f"Agent Engine APIにリクエスト送信: {agent_engine_url}")
-
-                    # Agent Engine APIにストリーミングリクエストを送信
-                    with httpx.stream(
-                        "POST",
-                        agent_engine_url,
-                        json=request_payload,
-                        headers=headers,
-                        timeout=60.0,
-                    ) as response:
-                        logger.info(
-                            f"Agent Engine APIレスポンス: {response.status_code}"
-                        )
-
-                        if response.status_code != 200:
-                            error_text = response.text
-                            logger.error(
-                                f"Agent Engine APIエラー: {response.status_code} - {error_text}"
-                            )
-                            yield f"data: {json.dumps({'type': 'error', 'content': f'Agent Engine API Error: {response.status_code} - {error_text}'}, ensure_ascii=False)}\\n\\n"
-                            return
-
-                        logger.info("Agent Engine APIストリーミングレスポンス処理開始")
-
-                        # ストリーミングレスポンスを逐次処理
-                        current_agent = None
-                        agent_started = False
-
-                        for line in response.iter_lines():
-                            if line.strip():
-                                try:
-                                    line_str = (
-                                        line.decode("utf-8")
-                                        if isinstance(line, bytes)
-                                        else str(line)
-                                    )
-
-                                    response_data = json.loads(line_str)
-
-                                    # Agent Engineのcontentオブジェクトからテキストを抽出
-                                    if (
-                                        "content" in response_data
-                                        and "parts" in response_data["content"]
-                                    ):
-                                        parts = response_data["content"]["parts"]
-                                        for part in parts:
-                                            if "text" in part:
-                                                text_content = part["text"]
-
-                                                # エージェント分割処理（必要に応じて）
-                                                from utils import split_agent_content
-
-                                                agent_parts = split_agent_content(
-                                                    text_content
-                                                )
-
-                                                for (
-                                                    part_content,
-                                                    agent_name,
-                                                ) in agent_parts:
-                                                    if not part_content.strip():
-                                                        continue
-
-                                                    # エージェント変更処理
-                                                    if (
-                                                        current_agent
-                                                        and current_agent != agent_name
-                                                    ):
-                                                        agent_complete_data = f"data: {json.dumps({'type': 'agent_complete', 'agent_name': current_agent}, ensure_ascii=False)}\\n\\n"
-                                                        yield agent_complete_data
-
-                                                    # 新しいエージェント開始
-                                                    if (
-                                                        not current_agent
-                                                        or current_agent != agent_name
-                                                    ):
-                                                        agent_start_data = f"data: {json.dumps({'type': 'agent_start', 'agent_name': agent_name}, ensure_ascii=False)}\\n\\n"
-                                                        yield agent_start_data
-                                                        current_agent = agent_name
-                                                        agent_started = True
-
-                                                    # SSE形式で送信
-                                                    sse_data = f"data: {json.dumps({'type': 'chunk', 'agent_name': agent_name, 'content': part_content}, ensure_ascii=False)}\\n\\n"
-                                                    yield sse_data
-
-                                except json.JSONDecodeError as e:
-                                    logger.error(f"JSON解析エラー: {e}")
-                                    yield f"data: {json.dumps({'type': 'error', 'content': f'JSON parsing error: {e!s}'}, ensure_ascii=False)}\\n\\n"
-
-                        # ストリーミング完了処理
-                        if agent_started and current_agent:
-                            agent_complete_data = f"data: {json.dumps({'type': 'agent_complete', 'agent_name': current_agent}, ensure_ascii=False)}\\n\\n"
-                            yield agent_complete_data
-
-                        stream_end_data = f"data: {json.dumps({'type': 'stream_end'}, ensure_ascii=False)}\\n\\n"
-                        yield stream_end_data
-
-                except Exception as e:
-                    logger.error(f"Vertex AIストリーミングエラー: {e}")
-                    yield f"data: {json.dumps({'type': 'error', 'content': f'Streaming error: {e!s}'}, ensure_ascii=False)}\\n\\n"
-
             # Server-Sent Eventsヘッダーでストリーミングレスポンス
-            stream_headers = {
-                **base_headers,
-                "Content-Type": "text/event-stream",
-                "Cache-Control": "no-cache",
-                "X-Accel-Buffering": "no",
-                "Connection": "keep-alive",
-            }
-
             return Response(
-                generate_vertex_ai_stream(), status=200, headers=stream_headers
+                self._generate_stream(user_info, session_id, message, state_delta),
+                status=200,
+                headers={**base_headers, **SSE_HEADERS},
             )
 
         except Exception as e:
@@ -186,6 +66,262 @@ class RemoteChatHandler(ChatHandler):
                 headers=base_headers,
             )
 
+    async def handle_chat_stream_async(
+        self,
+        request: ASGIRequest,
+        user_info: dict[str, Any],
+        base_headers: dict[str, str],
+    ) -> ASGIResponse:
+        """Vertex AI Agent Engineを使用したチャットストリーミング処理（ASGI用）"""
+        try:
+            data, error_response = await self._get_request_data_async(request)
+            if error_response:
+                return error_response
+
+            message = data["message"]
+            session_id = data.get("sessionId", "default")
+            state_delta, error_response = self._get_state_delta_asgi(data, base_headers)
+            if error_response:
+                return error_response
+
+            logger.info(
+                f"Vertex AIストリーミング開始(ASGI) - ユーザー: {user_info['uid']}, "
+                f"セッション: {session_id}, メッセージ: {message[:50]}..."
+            )
+
+            return StreamingResponse(
+                self._generate_stream_async(
+                    user_info, session_id, message, state_delta
+                ),
+                status_code=200,
+                headers={**base_headers, **SSE_HEADERS},
+            )
+
+        except Exception as e:
+            logger.error(f"Vertex AIストリーミングエラー: {e}")
+            return ASGIResponse(
+                json.dumps(
+                    {"success": False, "error": f"Vertex AI streaming failed: {e!s}"}
+                ),
+                status_code=500,
+                headers=base_headers,
+            )
+
+    def _stream_query_request(
+        self,
+        access_token: str,
+        user_info: dict[str, Any],
+        session_id: str,
+        message: str,
+    ) -> tuple[str, dict[str, Any], dict[str, str]]:
+        """Agent Engine stream_query のURL・ペイロード・ヘッダーを組み立て"""
+        request_payload = {
+            "class_method": "stream_query",
+            "input": {
+                "user_id": user_info["uid"],
+                "session_id": session_id,
+                "message": message,
+            },
+        }
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json",
+        }
+        agent_engine_url = self.config.get_vertex_ai_urls()["agent_engine_url"]
+        logger.info(f"Agent Engine APIにリクエスト送信: {agent_engine_url}")
+        return agent_engine_url, request_payload, headers
+
+    def _generate_stream(
+        self,
+        user_info: dict[str, Any],
+        session_id: str,
+        message: str,
+        state_delta: dict[str, Any] | None,
+    ) -> Generator[str, None, None]:
+        """Vertex AI APIストリーミング生成"""
+        try:
+            # 認証トークンの取得
+            access_token = get_access_token(self.config)
+
+            # 子どものプロフィールをセッション状態に反映
+            if state_delta:
+                self._append_state_delta(
+                    access_token, session_id, state_delta, user_info["uid"]
+                )
+
+            url, payload, headers = self._stream_query_request(
+                access_token, user_info, session_id, message
+            )
+
+            # Agent Engine APIにストリーミングリクエストを送信
+            with get_http_client().stream(
+                "POST", url, json=payload, headers=headers, timeout=60.0
+            ) as response:
+                logger.info(f"Agent Engine APIレスポンス: {response.status_code}")
+
+                if response.status_code != 200:
+                    yield self._upstream_error_event(
+                        response.status_code, response.read()
+                    )
+                    return
+
+                logger.info("Agent Engine APIストリーミングレスポンス処理開始")
+
+                # ストリーミングレスポンスを逐次処理
+                translator = AgentEngineStreamTranslator()
+                for line in response.iter_lines():
+                    yield from translator.feed_line(line)
+                yield from translator.finish()
+
+        except Exception as e:
+            logger.error(f"Vertex AIストリーミングエラー: {e}")
+            yield sse_event({"type": "error", "content": f"Streaming error: {e!s}"})
+
+    async def _generate_stream_async(
+        self,
+        user_info: dict[str, Any],
+        session_id: str,
+        message: str,
+        state_delta: dict[str, Any] | None,
+    ) -> AsyncGenerator[str, None]:
+        """Vertex AI APIストリーミング生成（httpx.AsyncClient使用）"""
+        try:
+            access_token = await get_access_token_async(self.config)
+
+            if state_delta:
+                await self._append_state_delta_async(
+                    access_token, session_id, state_delta, user_info["uid"]
+                )
+
+            url, payload, headers = self._stream_query_request(
+                access_token, user_info, session_id, message
+            )
+
+            async with get_async_http_client().stream(
+                "POST", url, json=payload, headers=headers, timeout=60.0
+            ) as response:
+                logger.info(f"Agent Engine APIレスポンス: {response.status_code}")
+
+                if response.status_code != 200:
+                    body = await response.aread()
+                    yield self._upstream_error_event(response.status_code, body)
+                    return
+
+                logger.info("Agent Engine APIストリーミングレスポンス処理開始")
+
+                translator = AgentEngineStreamTranslator()
+                async for line in response.aiter_lines():
+                    for event in translator.feed_line(line):
+                        yield event
+                for event in translator.finish():
+                    yield event
+
+        except Exception as e:
+            logger.error(f"Vertex AIストリーミングエラー: {e}")
+            yield sse_event({"type": "error", "content": f"Streaming error: {e!s}"})
+
+    def _upstream_error_event(self, status_code: int, body: bytes) -> str:
+        """Agent Engine APIのエラー応答をSSEのエラーイベントに変換"""
+        error_text = body.decode("utf-8", errors="replace")
+        logger.error(f"Agent Engine APIエラー: {status_code} - {error_text}")
+        return sse_event(
+            {
+                "type": "error",
+                "content": f"Agent Engine API Error: {status_code} - {error_text}",
+            }
+        )
+
+    def _state_delta_request(
+        self, access_token: str, session_id: str, state_delta: dict[str, Any]
+    ) -> tuple[str, dict[str, Any], dict[str, str]]:
+        """セッションのURLと appendEvent のイベント・ヘッダーを組み立て"""
+        sessions_base_url = self.config.get_vertex_ai_urls()["sessions_base_url"]
+        event = {
+            "author": "user",
+            "invocationId": f"state-{uuid.uuid4().hex}",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "actions": {"stateDelta": state_delta},
+        }
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json",
+        }
+        return f"{sessions_base_url}/{session_id}", event, headers
+
+    def _owns_session(
+        self, response: httpx.Response, session_id: str, uid: str
+    ) -> bool:
+        """取得したセッションの所有者がカレントユーザーか確認"""
+        if response.status_code != 200:
+            logger.warning(
+                f"状態更新対象のセッションを取得できません: {session_id} - {response.status_code}"
+            )
+            return False
+        if response.json().get("userId") != uid:
+            logger.error(
+                f"セッションの所有者が異なるため状態を更新しません: {session_id} - ユーザー: {uid}"
+            )
+            return False
+        return True
+
+    def _log_state_delta_result(
+        self, response: httpx.Response, state_delta: dict[str, Any]
+    ) -> None:
+        # 状態更新に失敗しても会話は継続する（プロフィールは発話からも推測できる）
+        if response.status_code != 200:
+            logger.warning(
+                f"セッション状態の更新に失敗: {response.status_code} - {response.text}"
+            )
+        else:
+            logger.info(f"セッション状態を更新: {list(state_delta)}")
+
+    def _append_state_delta(
+        self,
+        access_token: str,
+        session_id: str,
+        state_delta: dict[str, Any],
+        uid: str,
+    ) -> None:
+        """
+        Sessions APIのappendEventでセッション状態の差分を追記
+
+        サービスアカウントの権限で書き込むため、カレントユーザーが
+        所有するセッションの場合だけ追記する
+        """
+        session_url, event, headers = self._state_delta_request(
+            access_token, session_id, state_delta
+        )
+        client = get_http_client()
+        session = client.get(session_url, headers=headers, timeout=30.0)
+        if not self._owns_session(session, session_id, uid):
+            return
+
+        response = client.post(
+            f"{session_url}:appendEvent", json=event, headers=headers, timeout=30.0
+        )
+        self._log_state_delta_result(response, state_delta)
+
+    async def _append_state_delta_async(
+        self,
+        access_token: str,
+        session_id: str,
+        state_delta: dict[str, Any],
+        uid: str,
+    ) -> None:
+        """Sessions APIのappendEventでセッション状態の差分を追記（非同期版）"""
+        session_url, event, headers = self._state_delta_request(
+            access_token, session_id, state_delta
+        )
+        client = get_async_http_client()
+        session = await client.get(session_url, headers=headers, timeout=30.0)
+        if not self._owns_session(session, session_id, uid):
+            return
+
+        response = await client.post(
+            f"{session_url}:appendEvent", json=event, headers=headers, timeout=30.0
+        )
+        self._log_state_delta_result(response, state_delta)
+
     def handle_create_session(
         self, request: Request, user_info: dict[str, Any], base_headers: dict[str, str]
     ) -> Response:
@@ -201,94 +337,120 @@ class RemoteChatHandler(ChatHandler):
             }
 
             # Vertex AI Sessions API でセッション作成
-            create_payload = {"userId": user_info["uid"]}
             vertex_ai_urls = self.config.get_vertex_ai_urls()
-            sessions_base_url = vertex_ai_urls["sessions_base_url"]
-
-            with httpx.Client() as client:
-                response = client.post(
-                    sessions_base_url,
-                    json=create_payload,
-                    headers=headers,
-                    timeout=30.0,
+            response = get_http_client().post(
+                vertex_ai_urls["sessions_base_url"],
+                json={"userId": user_info["uid"]},
+                headers=headers,
+                timeout=30.0,
+            )
+
+            logger.info(f"Session Create API レスポンス: {response.status_code}")
+
+            if response.status_code == 200:
+                # Operationの完了をポーリングで待機
+                session_data = poll_operation(
+                    operation_name=self._operation_name(response),
+                    access_token=access_token,
+                    operations_base_url=vertex_ai_urls["operations_base_url"],
                 )
+                body, status = self._session_created(session_data), 200
+            else:
+                body, status = self._session_create_failed(response)
 
-                logger.info(f"Session Create API レスポンス: {response.status_code}")
+        except Exception as e:
+            body, status = self._session_create_error(e), 500
 
-                if response.status_code == 200:
-                    operation_data = response.json()
-                    operation_name = operation_data.get("name")
+        return Response(body, status=status, headers=base_headers)
 
-                    if not operation_name:
-                        raise Exception(
-                            f"Operation name not found in response: {operation_data}"
-                        )
+    async def handle_create_session_async(
+        self,
+        request: ASGIRequest,
+        user_info: dict[str, Any],
+        base_headers: dict[str, str],
+    ) -> ASGIResponse:
+        """Vertex AI Agent Engineを使用したセッション作成処理（ASGI用）"""
+        try:
+            logger.info(f"Vertex AIセッション作成開始 - ユーザー: {user_info['uid']}")
 
-                    logger.info(f"Operation開始: {operation_name}")
+            access_token = await get_access_token_async(self.config)
+            headers = {
+                "Authorization": f"Bearer {access_token}",
+                "Content-Type": "application/json",
+            }
 
-                    # Operationの完了をポーリングで待機
-                    vertex_ai_urls = self.config.get_vertex_ai_urls()
-                    session_data = poll_operation(
-                        operation_name=operation_name,
-                        access_token=access_token,
-                        operations_base_url=vertex_ai_urls["operations_base_url"],
-                    )
-                    logger.info(
-                        f"セッション作成成功: {session_data.get('name', 'Unknown')}"
-                    )
+            vertex_ai_urls = self.config.get_vertex_ai_urls()
+            response = await get_async_http_client().post(
+                vertex_ai_urls["sessions_base_url"],
+                json={"userId": user_info["uid"]},
+                headers=headers,
+                timeout=30.0,
+            )
 
-                    # session_dataのname からsessionIdを抽出
-                    session_name = session_data.get("name", "")
-                    if session_name and "/sessions/" in session_name:
-                        after_sessions = session_name.split("/sessions/")[-1]
-                        session_id = after_sessions.split("/")[0]
+            logger.info(f"Session Create API レスポンス: {response.status_code}")
 
-                        if not session_id:
-                            raise Exception(
-                                f"セッションIDの抽出に失敗: session name '{session_name}'"
-                            )
-                    else:
-                        raise Exception(f"無効なセッション名形式: '{session_name}'")
+            if response.status_code == 200:
+                session_data = await poll_operation_async(
+                    operation_name=self._operation_name(response),
+                    access_token=access_token,
+                    operations_base_url=vertex_ai_urls["operations_base_url"],
+                )
+                body, status = self._session_created(session_data), 200
+            else:
+                body, status = self._session_create_failed(response)
 
-                    from api_models import SessionCreateResponse
+        except Exception as e:
+            body, status = self._session_create_error(e), 500
 
-                    session_response = SessionCreateResponse(
-                        success=True, sessionId=session_id
-                    )
+        return ASGIResponse(body, status_code=status, headers=base_headers)
 
-                    return Response(
-                        session_response.model_dump_json(),
-                        status=200,
-                        headers=base_headers,
-                    )
-                else:
-                    error_text = response.text
-                    logger.error(
-                        f"Session Create API エラー: {response.status_code} - {error_text}"
-                    )
+    def _operation_name(self, response: httpx.Response) -> str:
+        """セッション作成APIの応答からOperation名を取得"""
+        operation_data = response.json()
+        operation_name = operation_data.get("name")
 
-                    from api_models import SessionCreateResponse
+        if not operation_name:
+            raise Exception(f"Operation name not found in response: {operation_data}")
 
-                    session_response = SessionCreateResponse(
-                        success=False,
-                        error=f"Failed to create session: {response.status_code} - {error_text}",
-                    )
+        logger.info(f"Operation開始: {operation_name}")
+        return operation_name
 
-                    return Response(
-                        session_response.model_dump_json(),
-                        status=response.status_code,
-                        headers=base_headers,
-                    )
+    def _session_created(self, session_data: dict[str, Any]) -> str:
+        """完了したOperationのセッションからレスポンス本文を作成"""
+        logger.info(f"セッション作成成功: {session_data.get('name', 'Unknown')}")
 
-        except Exception as e:
-            logger.error(f"Vertex AIセッション作成エラー: {e}")
-            from api_models import SessionCreateResponse
+        # session_dataのname からsessionIdを抽出
+        session_name = session_data.get("name", "")
+        if session_name and "/sessions/" in session_name:
+            after_sessions = session_name.split("/sessions/")[-1]
+            session_id = after_sessions.split("/")[0]
 
-            session_response = SessionCreateResponse(
-                success=False, error=f"Session creation failed: {e!s}"
-            )
-            return Response(
-                session_response.model_dump_json(),
-                status=500,
-                headers=base_headers,
-            )
+            if not session_id:
+                raise Exception(
+                    f"セッションIDの抽出に失敗: session name '{session_name}'"
+                )
+        else:
+            raise Exception(f"無効なセッション名形式: '{session_name}'")
+
+        return SessionCreateResponse(
+            success=True, sessionId=session_id
+        ).model_dump_json()
+
+    def _session_create_failed(self, response: httpx.Response) -> tuple[str, int]:
+        """セッション作成APIのエラー応答からレスポンス本文とステータスを作成"""
+        error_text = response.text
+        logger.error(
+            f"Session Create API エラー: {response.status_code} - {error_text}"
+        )
+        session_response = SessionCreateResponse(
+            success=False,
+            error=f"Failed to create session: {response.status_code} - {error_text}",
+        )
+        return session_response.model_dump_json(), response.status_code
+
+    def _session_create_error(self, error: Exception) -> str:
+        """セッション作成中の例外からレスポンス本文を作成"""
+        logger.error(f"Vertex AIセッション作成エラー: {error}")
+        return SessionCreateResponse(
+            success=False, error=f"Session creation failed: {error!s}"
+        ).model_dump_json()
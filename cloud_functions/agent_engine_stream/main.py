@@ -6,10 +6,12 @@ Vertex AI Agent Engineとのストリーミング通信を提供
 リファクタリング版: 環境別の処理を分離して保守性を向上
 """
 
+import importlib.util
 import logging
 from typing import Any
 
 import functions_framework
+import functions_framework.aio
 
 # 新しいアーキテクチャのインポート
 from environment_config import create_environment_config
@@ -23,16 +25,15 @@ from routers import (
 
 # ユーティリティとサービスのインポート
 from services import poll_operation as poll_operation_service
+from starlette.requests import Request as ASGIRequest
+from starlette.responses import Response as ASGIResponse
 
-# 後方互換性のために既存のインポートも保持
+# 後方互換性のためにADKの有無を保持（ADK自体はハンドラー側で必要な時に読み込む）
 try:
-    from google.adk.runners import RunConfig, Runner, StreamingMode
-    from google.adk.sessions import InMemorySessionService
-    from google.genai import types
-
-    ADK_AVAILABLE = True
-except ImportError:
+    ADK_AVAILABLE = importlib.util.find_spec("google.adk") is not None
+except ModuleNotFoundError:
     ADK_AVAILABLE = False
+if not ADK_AVAILABLE:
     print("ADK not available - running in Cloud Functions mode")
 
 # 削除済み - 必要に応じてutils.routingでインポート
@@ -113,6 +114,30 @@ def agent_engine_stream(request: Request):
     return route_request(request, base_headers, config, chat_handler, USE_ADK)
 
 
+@functions_framework.aio.http
+async def agent_engine_stream_asgi(request: ASGIRequest):
+    """
+    Agent Engineストリーミング・セッション管理統合エンドポイント（ASGI版）
+
+    agent_engine_stream と同じパスルーティングを提供する。
+    ストリーミングはイベントループ上で上流の応答を中継するため、
+    1インスタンスで多数のストリームを同時に処理できる
+    （FUNCTION_USE_ASGI=true でデプロイ）
+    """
+    from utils.cors import setup_cors_headers
+
+    base_headers = setup_cors_headers(request, config)
+
+    if request.method == "OPTIONS":
+        return ASGIResponse("", status_code=204, headers=base_headers)
+
+    from utils.routing import route_request_async
+
+    return await route_request_async(
+        request, base_headers, config, chat_handler, USE_ADK
+    )
+
+
 # 後方互換性のためのラッパー関数（非推奨）
 # 実際の処理は新しいハンドラークラスで行われます
 
@@ -7,8 +7,8 @@ import logging
 import os
 from typing import Any
 
-import httpx
 from flask import Request, Response
+from utils.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -64,31 +64,29 @@ def handle_image_analyze_proxy_router(
             for key, file in request.files.items():
                 files[key] = (file.filename, file.read(), file.content_type)
 
-            # httpxでプロキシリクエスト
-            with httpx.Client() as client:
-                response = client.post(
-                    image_recognition_url,
-                    files=files,
-                    headers={
-                        "Authorization": request.headers.get("Authorization", ""),
-                    },
-                    timeout=30.0,
-                )
+            # 共有クライアントでプロキシリクエスト
+            response = get_http_client().post(
+                image_recognition_url,
+                files=files,
+                headers={
+                    "Authorization": request.headers.get("Authorization", ""),
+                },
+                timeout=30.0,
+            )
         else:
             # JSONの場合
             data = request.get_json()
 
-            # httpxでプロキシリクエスト
-            with httpx.Client() as client:
-                response = client.post(
-                    image_recognition_url,
-                    json=data,
-                    headers={
-                        "Authorization": request.headers.get("Authorization", ""),
-                        "Content-Type": "application/json",
-                    },
-                    timeout=30.0,
-                )
+            # 共有クライアントでプロキシリクエスト
+            response = get_http_client().post(
+                image_recognition_url,
+                json=data,
+                headers={
+                    "Authorization": request.headers.get("Authorization", ""),
+                    "Content-Type": "application/json",
+                },
+                timeout=30.0,
+            )
 
         logger.info(f"画像認識プロキシレスポンス: {response.status_code}")
 
@@ -4,7 +4,10 @@
 
 import json
 
+from firebase_auth_utils import get_token_cache_stats
 from flask import Response
+from utils.http_client import get_http_client_stats
+from utils.single_flight import upstream_flight
 
 
 def handle_health_check_router(config) -> Response:
@@ -33,6 +36,9 @@ def handle_health_check_router(config) -> Response:
                     "agent_engine_url": agent_engine_url,
                     "environment": config.environment_name,
                     "handler_type": config.chat_handler_type,
+                    "single_flight": upstream_flight.stats(),
+                    "token_cache": get_token_cache_stats(),
+                    "http_client": get_http_client_stats(),
                 },
             }
         ),
@@ -17,10 +17,46 @@ from api_models import (
 )
 from environment_config import get_access_token
 from flask import Request, Response
+from utils.http_client import get_http_client
+from utils.single_flight import upstream_flight
 
 logger = logging.getLogger(__name__)
 
 
+def _get_upstream(
+    client: httpx.Client,
+    url: str,
+    headers: dict[str, str],
+    uid: str,
+    params: dict[str, str] | None = None,
+    timeout: float = 30.0,
+) -> httpx.Response:
+    """
+    同一ユーザーの同一URL・パラメータへの同時GETを1回の上流呼び出しにまとめる
+
+    URL・パラメータはユーザーIDやページトークンを含み大文字/小文字を区別するため
+    正規化せずそのままキーにし、呼び出し元のユーザーIDもキーに含める
+    （一覧取得はレスポンス取得後の所有者チェックがないため、
+    他ユーザーの結果を共有しないようにする）
+
+    Args:
+        client: HTTPクライアント
+        url: リクエストURL
+        headers: リクエストヘッダー
+        uid: 呼び出し元のユーザーID
+        params: クエリパラメータ
+        timeout: タイムアウト（秒）
+
+    Returns:
+        httpx.Response: 上流APIのレスポンス（本文読み込み済み）
+    """
+    key = ("GET", url, tuple(sorted((params or {}).items())), uid)
+    return upstream_flight.do(
+        key,
+        lambda: client.get(url, params=params, headers=headers, timeout=timeout),
+    )
+
+
 def handle_create_session_router(
     request: Request,
     user_info: dict[str, Any],
@@ -84,65 +120,67 @@ def handle_list_sessions_router(
         vertex_ai_urls = config.get_vertex_ai_urls()
         sessions_base_url = vertex_ai_urls["sessions_base_url"]
 
-        with httpx.Client() as client:
-            response = client.get(
-                sessions_base_url,
-                params=params,
-                headers=headers,
-                timeout=30.0,
-            )
-
-            logger.info(f"Sessions List API レスポンス: {response.status_code}")
-            logger.info(f"リクエストURL: {response.url}")
-
-            if response.status_code == 200:
-                sessions_data = response.json()
-                # Vertex AI Sessions APIは 'sessions' キーでセッション一覧を返す
-                sessions_list = sessions_data.get("sessions", [])
-                next_page_token = sessions_data.get("nextPageToken")
-                session_count = len(sessions_list)
-                logger.info(
-                    f"セッション一覧取得成功: {session_count}件, nextPageToken: {next_page_token}"
-                )
+        client = get_http_client()
+        response = _get_upstream(
+            client,
+            sessions_base_url,
+            uid=user_info["uid"],
+            params=params,
+            headers=headers,
+            timeout=30.0,
+        )
 
-                # Vertex AI APIレスポンスを適切にパースしてから返却
-                try:
-                    # VertexAISessionsListResponseで構造をバリデーション
-                    vertex_response = VertexAISessionsListResponse(**sessions_data)
-
-                    sessions_response = SessionListResponse(
-                        success=True,
-                        sessions=vertex_response.sessions,
-                        nextPageToken=vertex_response.nextPageToken,
-                    )
-                except Exception as parse_error:
-                    logger.error(f"Sessions レスポンス解析エラー: {parse_error}")
-                    sessions_response = SessionListResponse(
-                        success=False,
-                        error=f"レスポンスの解析に失敗しました: {parse_error}",
-                    )
+        logger.info(f"Sessions List API レスポンス: {response.status_code}")
+        logger.info(f"リクエストURL: {response.url}")
+
+        if response.status_code == 200:
+            sessions_data = response.json()
+            # Vertex AI Sessions APIは 'sessions' キーでセッション一覧を返す
+            sessions_list = sessions_data.get("sessions", [])
+            next_page_token = sessions_data.get("nextPageToken")
+            session_count = len(sessions_list)
+            logger.info(
+                f"セッション一覧取得成功: {session_count}件, nextPageToken: {next_page_token}"
+            )
 
-                return Response(
-                    sessions_response.model_dump_json(),
-                    status=200,
-                    headers={**base_headers, "Content-Type": "application/json"},
-                )
-            else:
-                error_text = response.text
-                logger.error(
-                    f"Sessions List API エラー: {response.status_code} - {error_text}"
-                )
+            # Vertex AI APIレスポンスを適切にパースしてから返却
+            try:
+                # VertexAISessionsListResponseで構造をバリデーション
+                vertex_response = VertexAISessionsListResponse(**sessions_data)
 
+                sessions_response = SessionListResponse(
+                    success=True,
+                    sessions=vertex_response.sessions,
+                    nextPageToken=vertex_response.nextPageToken,
+                )
+            except Exception as parse_error:
+                logger.error(f"Sessions レスポンス解析エラー: {parse_error}")
                 sessions_response = SessionListResponse(
                     success=False,
-                    error=f"Failed to list sessions: {response.status_code} - {error_text}",
+                    error=f"レスポンスの解析に失敗しました: {parse_error}",
                 )
 
-                return Response(
-                    sessions_response.model_dump_json(),
-                    status=response.status_code,
-                    headers={**base_headers, "Content-Type": "application/json"},
-                )
+            return Response(
+                sessions_response.model_dump_json(),
+                status=200,
+                headers={**base_headers, "Content-Type": "application/json"},
+            )
+        else:
+            error_text = response.text
+            logger.error(
+                f"Sessions List API エラー: {response.status_code} - {error_text}"
+            )
+
+            sessions_response = SessionListResponse(
+                success=False,
+                error=f"Failed to list sessions: {response.status_code} - {error_text}",
+            )
+
+            return Response(
+                sessions_response.model_dump_json(),
+                status=response.status_code,
+                headers={**base_headers, "Content-Type": "application/json"},
+            )
 
     except httpx.RequestError as e:
         logger.error(f"セッション一覧取得リクエストエラー: {e}")
@@ -193,73 +231,75 @@ def handle_get_session_router(
 
         session_url = f"https://{config.location}-aiplatform.googleapis.com/v1beta1/{full_session_name}"
 
-        with httpx.Client() as client:
-            response = client.get(
-                session_url,
-                headers=headers,
-                timeout=30.0,
-            )
+        client = get_http_client()
+        response = _get_upstream(
+            client,
+            session_url,
+            uid=user_info["uid"],
+            headers=headers,
+            timeout=30.0,
+        )
 
-            logger.info(f"Session Get API レスポンス: {response.status_code}")
+        logger.info(f"Session Get API レスポンス: {response.status_code}")
 
-            if response.status_code == 200:
-                session_data = response.json()
-                logger.info(
-                    f"セッション詳細取得成功: {session_data.get('name', 'Unknown')}"
-                )
+        if response.status_code == 200:
+            session_data = response.json()
+            logger.info(
+                f"セッション詳細取得成功: {session_data.get('name', 'Unknown')}"
+            )
 
-                # Vertex AI APIレスポンスを適切にパースしてから返却
-                try:
-                    # VertexAISessionで構造をバリデーション
-                    vertex_session = VertexAISession(**session_data)
-
-                    session_response = SessionGetResponse(
-                        success=True, session=vertex_session
-                    )
-                except Exception as parse_error:
-                    logger.error(f"Session レスポンス解析エラー: {parse_error}")
-                    session_response = SessionGetResponse(
-                        success=False,
-                        error=f"レスポンスの解析に失敗しました: {parse_error}",
-                    )
-                
-                # カレントユーザーがセッションの所有者であるか確認
-                if vertex_session.userId != user_info["uid"]:
-                    logger.error(
-                        f"セッションの所有者が異なります: {session_id} - ユーザー: {user_info['uid']}"
-                    )
-                    session_response = SessionGetResponse(
-                        success=False,
-                        error=f"Session not found: {session_id}",
-                    )
-                    return Response(
-                        session_response.model_dump_json(),
-                        status=404,
-                        headers={**base_headers, "Content-Type": "application/json"},
-                    )
+            # Vertex AI APIレスポンスを適切にパースしてから返却
+            try:
+                # VertexAISessionで構造をバリデーション
+                vertex_session = VertexAISession(**session_data)
 
-                return Response(
-                    session_response.model_dump_json(),
-                    status=200,
-                    headers={**base_headers, "Content-Type": "application/json"},
+                session_response = SessionGetResponse(
+                    success=True, session=vertex_session
                 )
-            else:
-                error_text = response.text
-                logger.error(
-                    f"Session Get API エラー: {response.status_code} - {error_text}"
+            except Exception as parse_error:
+                logger.error(f"Session レスポンス解析エラー: {parse_error}")
+                session_response = SessionGetResponse(
+                    success=False,
+                    error=f"レスポンスの解析に失敗しました: {parse_error}",
                 )
 
+            # カレントユーザーがセッションの所有者であるか確認
+            if vertex_session.userId != user_info["uid"]:
+                logger.error(
+                    f"セッションの所有者が異なります: {session_id} - ユーザー: {user_info['uid']}"
+                )
                 session_response = SessionGetResponse(
                     success=False,
-                    error=f"Failed to get session: {response.status_code} - {error_text}",
+                    error=f"Session not found: {session_id}",
                 )
-
                 return Response(
                     session_response.model_dump_json(),
-                    status=response.status_code,
+                    status=404,
                     headers={**base_headers, "Content-Type": "application/json"},
                 )
 
+            return Response(
+                session_response.model_dump_json(),
+                status=200,
+                headers={**base_headers, "Content-Type": "application/json"},
+            )
+        else:
+            error_text = response.text
+            logger.error(
+                f"Session Get API エラー: {response.status_code} - {error_text}"
+            )
+
+            session_response = SessionGetResponse(
+                success=False,
+                error=f"Failed to get session: {response.status_code} - {error_text}",
+            )
+
+            return Response(
+                session_response.model_dump_json(),
+                status=response.status_code,
+                headers={**base_headers, "Content-Type": "application/json"},
+            )
+
     except httpx.RequestError as e:
         logger.error(f"セッション詳細取得リクエストエラー: {e}")
         session_response = SessionGetResponse(
@@ -309,30 +349,32 @@ def handle_delete_session_router(
 
         session_url = f"https://{config.location}-aiplatform.googleapis.com/v1beta1/{full_session_name}"
 
-        with httpx.Client() as client:
-            # セッション詳細を取得してセッションが存在するかを確認
-            session_response = client.get(
-                session_url,
-                headers=headers,
-                timeout=30.0,
-            )
+        client = get_http_client()
+        # セッション詳細を取得してセッションが存在するかを確認
+        session_response = _get_upstream(
+            client,
+            session_url,
+            uid=user_info["uid"],
+            headers=headers,
+            timeout=30.0,
+        )
 
-            logger.info(f"セッション存在確認レスポンス: {session_response.status_code}")
+        logger.info(f"セッション存在確認レスポンス: {session_response.status_code}")
+
+        if session_response.status_code != 200:
+            logger.error(
+                f"セッションが存在しません: {session_id} - {session_response.status_code}: {session_response.text}"
+            )
+            events_response = ApiResponse(
+                success=False,
+                error=f"Session not found: {session_id} - {session_response.status_code}",
+            )
+            return Response(
+                events_response.model_dump_json(),
+                status=404,
+                headers={**base_headers, "Content-Type": "application/json"},
+            )
 
-            if session_response.status_code != 200:
-                logger.error(
-                    f"セッションが存在しません: {session_id} - {session_response.status_code}: {session_response.text}"
-                )
-                events_response = ApiResponse(
-                    success=False,
-                    error=f"Session not found: {session_id} - {session_response.status_code}",
-                )
-                return Response(
-                    events_response.model_dump_json(),
-                    status=404,
-                    headers={**base_headers, "Content-Type": "application/json"},
-                )
-        
         # カレントユーザーのセッションでなければ404エラーにする
         if session_response.json().get("userId") != user_info["uid"]:
             logger.error(
@@ -347,49 +389,48 @@ def handle_delete_session_router(
                 events_response.model_dump_json(),
                 status=404,
                 headers={**base_headers, "Content-Type": "application/json"},
-            )   
-
-        with httpx.Client() as client:
-            response = client.delete(
-                session_url,
-                headers=headers,
-                timeout=30.0,
             )
 
-            logger.info(f"Session Delete API レスポンス: {response.status_code}")
+        response = client.delete(
+            session_url,
+            headers=headers,
+            timeout=30.0,
+        )
 
-            if response.status_code in [200, 204]:
-                logger.info(f"セッション削除成功: session_id={session_id}")
+        logger.info(f"Session Delete API レスポンス: {response.status_code}")
 
-                api_response = ApiResponse(
-                    success=True,
-                    data={
-                        "sessionId": session_id,
-                        "message": f"Session {session_id} deleted successfully",
-                    },
-                )
+        if response.status_code in [200, 204]:
+            logger.info(f"セッション削除成功: session_id={session_id}")
 
-                return Response(
-                    api_response.model_dump_json(),
-                    status=200,
-                    headers={**base_headers, "Content-Type": "application/json"},
-                )
-            else:
-                error_text = response.text
-                logger.error(
-                    f"Session Delete API エラー: {response.status_code} - {error_text}"
-                )
+            api_response = ApiResponse(
+                success=True,
+                data={
+                    "sessionId": session_id,
+                    "message": f"Session {session_id} deleted successfully",
+                },
+            )
 
-                api_response = ApiResponse(
-                    success=False,
-                    error=f"Failed to delete session: {response.status_code} - {error_text}",
-                )
+            return Response(
+                api_response.model_dump_json(),
+                status=200,
+                headers={**base_headers, "Content-Type": "application/json"},
+            )
+        else:
+            error_text = response.text
+            logger.error(
+                f"Session Delete API エラー: {response.status_code} - {error_text}"
+            )
 
-                return Response(
-                    api_response.model_dump_json(),
-                    status=response.status_code,
-                    headers={**base_headers, "Content-Type": "application/json"},
-                )
+            api_response = ApiResponse(
+                success=False,
+                error=f"Failed to delete session: {response.status_code} - {error_text}",
+            )
+
+            return Response(
+                api_response.model_dump_json(),
+                status=response.status_code,
+                headers={**base_headers, "Content-Type": "application/json"},
+            )
 
     except httpx.RequestError as e:
         logger.error(f"セッション削除リクエストエラー: {e}")
@@ -483,30 +524,32 @@ def handle_list_session_events_router(
         logger.info(f"セッション存在確認URL: {session_url}")
         logger.info(f"使用するセッションリソース名: {full_session_name}")
 
-        with httpx.Client() as client:
-            # セッション詳細を取得してセッションが存在するかを確認
-            session_response = client.get(
-                session_url,
-                headers=headers,
-                timeout=30.0,
-            )
+        client = get_http_client()
+        # セッション詳細を取得してセッションが存在するかを確認
+        session_response = _get_upstream(
+            client,
+            session_url,
+            uid=user_info["uid"],
+            headers=headers,
+            timeout=30.0,
+        )
 
-            logger.info(f"セッション存在確認レスポンス: {session_response.status_code}")
+        logger.info(f"セッション存在確認レスポンス: {session_response.status_code}")
+
+        if session_response.status_code != 200:
+            logger.error(
+                f"セッションが存在しません: {session_id} - {session_response.status_code}: {session_response.text}"
+            )
+            events_response = SessionEventListResponse(
+                success=False,
+                error=f"Session not found: {session_id} - {session_response.status_code}",
+            )
+            return Response(
+                events_response.model_dump_json(),
+                status=404,
+                headers={**base_headers, "Content-Type": "application/json"},
+            )
 
-            if session_response.status_code != 200:
-                logger.error(
-                    f"セッションが存在しません: {session_id} - {session_response.status_code}: {session_response.text}"
-                )
-                events_response = SessionEventListResponse(
-                    success=False,
-                    error=f"Session not found: {session_id} - {session_response.status_code}",
-                )
-                return Response(
-                    events_response.model_dump_json(),
-                    status=404,
-                    headers={**base_headers, "Content-Type": "application/json"},
-                )
-        
         # カレントユーザーのセッションでなければ404エラーにする
         if session_response.json().get("userId") != user_info["uid"]:
             logger.error(
@@ -521,67 +564,68 @@ def handle_list_session_events_router(
                 events_response.model_dump_json(),
                 status=404,
                 headers={**base_headers, "Content-Type": "application/json"},
-            )   
+            )
 
         events_url = f"https://{config.location}-aiplatform.googleapis.com/v1beta1/{full_session_name}/events"
         logger.info(f"Session Events API URL: {events_url}")
         logger.info(f"Session Events API Headers: {headers}")
 
-        with httpx.Client() as client:
-            response = client.get(
-                events_url,
-                headers=headers,
-                timeout=30.0,
-            )
-
-            logger.info(f"Session Events API レスポンス: {response.status_code}")
-            logger.info(f"Session Events API レスポンス詳細: {response.text}")
-
-            if response.status_code == 200:
-                events_data = response.json()
-                # Vertex AI Sessions APIは 'sessionEvents' キーでイベントを返す
-                events_list = events_data.get("sessionEvents", [])
-                event_count = len(events_list)
-                logger.info(f"セッションイベント取得成功: {event_count}件")
-
-                # Vertex AI APIレスポンスを適切にパースしてから返却
-                try:
-                    # VertexAIEventsListResponseで構造をバリデーション
-                    vertex_response = VertexAIEventsListResponse(**events_data)
-
-                    events_response = SessionEventListResponse(
-                        success=True,
-                        events=vertex_response.sessionEvents,
-                        nextPageToken=vertex_response.nextPageToken,
-                    )
-                except Exception as parse_error:
-                    logger.error(f"Events レスポンス解析エラー: {parse_error}")
-                    events_response = SessionEventListResponse(
-                        success=False,
-                        error=f"レスポンスの解析に失敗しました: {parse_error}",
-                    )
+        response = _get_upstream(
+            client,
+            events_url,
+            uid=user_info["uid"],
+            headers=headers,
+            timeout=30.0,
+        )
+
+        logger.info(f"Session Events API レスポンス: {response.status_code}")
+        logger.info(f"Session Events API レスポンス詳細: {response.text}")
 
-                return Response(
-                    events_response.model_dump_json(),
-                    status=200,
-                    headers={**base_headers, "Content-Type": "application/json"},
-                )
-            else:
-                error_text = response.text
-                logger.error(
-                    f"Session Events API エラー: {response.status_code} - {error_text}"
-                )
+        if response.status_code == 200:
+            events_data = response.json()
+            # Vertex AI Sessions APIは 'sessionEvents' キーでイベントを返す
+            events_list = events_data.get("sessionEvents", [])
+            event_count = len(events_list)
+            logger.info(f"セッションイベント取得成功: {event_count}件")
 
+            # Vertex AI APIレスポンスを適切にパースしてから返却
+            try:
+                # VertexAIEventsListResponseで構造をバリデーション
+                vertex_response = VertexAIEventsListResponse(**events_data)
+
+                events_response = SessionEventListResponse(
+                    success=True,
+                    events=vertex_response.sessionEvents,
+                    nextPageToken=vertex_response.nextPageToken,
+                )
+            except Exception as parse_error:
+                logger.error(f"Events レスポンス解析エラー: {parse_error}")
                 events_response = SessionEventListResponse(
                     success=False,
-                    error=f"Failed to list session events: {response.status_code} - {error_text}",
+                    error=f"レスポンスの解析に失敗しました: {parse_error}",
                 )
 
-                return Response(
-                    events_response.model_dump_json(),
-                    status=response.status_code,
-                    headers={**base_headers, "Content-Type": "application/json"},
-                )
+            return Response(
+                events_response.model_dump_json(),
+                status=200,
+                headers={**base_headers, "Content-Type": "application/json"},
+            )
+        else:
+            error_text = response.text
+            logger.error(
+                f"Session Events API エラー: {response.status_code} - {error_text}"
+            )
+
+            events_response = SessionEventListResponse(
+                success=False,
+                error=f"Failed to list session events: {response.status_code} - {error_text}",
+            )
+
+            return Response(
+                events_response.model_dump_json(),
+                status=response.status_code,
+                headers={**base_headers, "Content-Type": "application/json"},
+            )
 
     except httpx.RequestError as e:
         logger.error(f"セッションイベント取得リクエストエラー: {e}")
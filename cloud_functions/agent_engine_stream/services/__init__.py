@@ -2,6 +2,6 @@
 Agent Engine Stream サービスモジュール
 """
 
-from .operation_service import poll_operation
+from .operation_service import poll_operation, poll_operation_async
 
-__all__ = ["poll_operation"]
+__all__ = ["poll_operation", "poll_operation_async"]
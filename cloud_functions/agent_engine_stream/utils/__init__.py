@@ -3,5 +3,28 @@ Agent Engine Stream ユーティリティモジュール
 """
 
 from .agent_utils import get_agent_name, split_agent_content
+from .http_client import (
+    close_async_http_client,
+    close_http_client,
+    get_async_http_client,
+    get_http_client,
+    get_http_client_stats,
+)
+from .single_flight import SingleFlight, normalize_key, upstream_flight
+from .stream_events import SSE_HEADERS, AgentEngineStreamTranslator, sse_event
 
-__all__ = ["get_agent_name", "split_agent_content"]
+__all__ = [
+    "SSE_HEADERS",
+    "AgentEngineStreamTranslator",
+    "SingleFlight",
+    "close_async_http_client",
+    "close_http_client",
+    "get_agent_name",
+    "get_async_http_client",
+    "get_http_client",
+    "get_http_client_stats",
+    "normalize_key",
+    "split_agent_content",
+    "sse_event",
+    "upstream_flight",
+]
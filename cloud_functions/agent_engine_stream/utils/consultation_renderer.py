@@ -0,0 +1,248 @@
+"""
+初回相談の構造化出力レンダラー
+
+エージェントが構造化モード（CONSULTATION_OUTPUT_MODE=structured）で返す
+JSON（app/agents/consultation_output.py の ConsultationReport）を
+固定フォーマットのマークダウンに整形する。
+ストリーミング中は値が確定したフィールドから順に出力する。
+"""
+
+import json
+import logging
+import os
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+STRUCTURED_MODE = "structured"
+# 送信済みの内容と整合しなくなったときに、続けて送る全文との区切り
+_RESYNC_SEPARATOR = "\n\n"
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def is_structured_mode() -> bool:
+    """構造化出力モードが有効か"""
+    return os.environ.get("CONSULTATION_OUTPUT_MODE", "markdown") == STRUCTURED_MODE
+
+
+def parse_partial_json(buffer: str) -> tuple[Any, bool]:
+    """
+    途中までのJSONを値が確定した部分だけで解析
+
+    未完了の文字列・数値などは切り捨て、開いている配列/オブジェクトを閉じて解析する
+
+    Args:
+        buffer: 受信済みのJSONテキスト
+
+    Returns:
+        (解析結果, JSON全体が完結しているか)。解析できない場合は (None, False)
+    """
+    stack: list[str] = []
+    in_string = False
+    escaped = False
+    cut = 0  # 値が確定している位置（この位置で切って閉じれば妥当なJSON）
+    cut_stack: list[str] = []
+    expecting_value = False
+
+    for index, ch in enumerate(buffer):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+                if not expecting_value:
+                    # オブジェクトのキーは値が揃うまで確定しない
+                    continue
+                cut, cut_stack = index + 1, list(stack)
+            continue
+
+        if ch == '"':
+            in_string = True
+            expecting_value = (
+                not stack or stack[-1] == "[" or _after_colon(buffer, index)
+            )
+        elif ch in _CLOSERS:
+            stack.append(ch)
+            cut, cut_stack = index + 1, list(stack)
+        elif ch in "}]":
+            if not stack:
+                return None, False
+            stack.pop()
+            cut, cut_stack = index + 1, list(stack)
+        elif ch in "0123456789-tfn.eE+":
+            # 数値・リテラルは区切り文字まで確定しない
+            continue
+        elif ch == ",":
+            cut, cut_stack = index, list(stack)
+
+    if not cut:
+        return None, False
+
+    text = buffer[:cut].rstrip().rstrip(",")
+    if text.endswith(":"):
+        return None, False
+    text += "".join(_CLOSERS[opener] for opener in reversed(cut_stack))
+    try:
+        return json.loads(text), not stack and not in_string and cut == len(
+            buffer.rstrip()
+        )
+    except json.JSONDecodeError:
+        return None, False
+
+
+def _after_colon(buffer: str, index: int) -> bool:
+    """直前の非空白文字がコロンか（オブジェクトの値の文字列か）"""
+    position = index - 1
+    while position >= 0 and buffer[position].isspace():
+        position -= 1
+    return position >= 0 and buffer[position] == ":"
+
+
+def render_consultation_markdown(report: dict[str, Any], complete: bool = True) -> str:
+    """
+    構造化された相談結果を固定フォーマットのマークダウンに整形
+
+    フィールド順に整形し、未確定のフィールドに到達した時点で打ち切る
+    （出力は受信が進むにつれて前方一致で伸びる）
+
+    Args:
+        report: ConsultationReport相当の辞書（途中まででも可）
+        complete: JSON全体を受信済みか
+
+    Returns:
+        マークダウン文字列
+    """
+    pieces = ["🥗 **栄養アドバイザーより**  \n"]
+
+    age = report.get("age")
+    if age is None:
+        return "".join(pieces)
+    pieces.append(f"{age}の食事を拝見しました！  \n")
+
+    for key, template in (
+        ("praise", "✨ {}  \n"),
+        ("concern", "{}💕  \n"),
+        ("suggestion", "{}\n\n"),
+    ):
+        value = report.get(key)
+        if value is None:
+            return "".join(pieces)
+        pieces.append(template.format(value))
+
+    nutrients = report.get("nutrients")
+    if nutrients is None:
+        return "".join(pieces)
+    pieces.append("📈 補強したい栄養素\n\n")
+
+    for nutrient in nutrients:
+        if "name" not in nutrient:
+            return "".join(pieces)
+        pieces.append(f"**{nutrient['name']}**  \n")
+        if "reason" not in nutrient:
+            return "".join(pieces)
+        pieces.append(f"- {nutrient['reason']}  \n\n")
+
+    if not complete:
+        return "".join(pieces)
+
+    pieces.append("🥄 栄養素が補強出来る食材  \n\n")
+    for nutrient in nutrients:
+        foods = "/".join(nutrient.get("foods", []))
+        pieces.append(f"**{nutrient['name']}の食材**\n→ {foods}\n\n")
+    return "".join(pieces).rstrip() + "\n"
+
+
+class ConsultationStreamRenderer:
+    """ストリーミング中のJSONを逐次マークダウンに変換するレンダラー"""
+
+    def __init__(self, enabled: bool | None = None):
+        """
+        初期化
+
+        Args:
+            enabled: 構造化出力の整形を行うか（省略時は環境変数で判定）
+        """
+        self._buffer = ""
+        self._emitted = ""
+        self._structured: bool | None = (
+            None if (is_structured_mode() if enabled is None else enabled) else False
+        )
+
+    def feed(self, chunk: str) -> str:
+        """
+        受信したテキストを追加し、新たに表示できるマークダウンを返す
+
+        JSONでない応答（会話モードなど）はそのまま返す
+
+        Args:
+            chunk: 受信したテキスト断片
+
+        Returns:
+            クライアントに送る差分テキスト
+        """
+        if self._structured is None:
+            stripped = (self._buffer + chunk).lstrip()
+            if not stripped:
+                self._buffer += chunk
+                return ""
+            self._structured = stripped.startswith("{")
+            if not self._structured:
+                chunk, self._buffer = self._buffer + chunk, ""
+
+        if not self._structured:
+            return chunk
+
+        self._buffer += chunk
+        report, complete = parse_partial_json(self._buffer)
+        if not isinstance(report, dict):
+            return ""
+        return self._emit(render_consultation_markdown(report, complete))
+
+    def finish(self) -> str:
+        """
+        ストリーム終了時に残りを出力
+
+        JSONとして解析できなかった場合は受信したテキストをそのまま返す
+        （整形済みの部分を送信済みなら区切りを挟んで続ける）
+
+        Returns:
+            クライアントに送る差分テキスト
+        """
+        remaining, self._buffer = self._buffer, ""
+        if not self._structured:
+            return remaining
+
+        try:
+            report = json.loads(remaining)
+        except json.JSONDecodeError:
+            report = None
+        if isinstance(report, dict):
+            return self._emit(render_consultation_markdown(report, complete=True))
+
+        if not self._emitted:
+            return remaining
+        logger.warning(
+            "Structured consultation was not valid JSON; "
+            f"sending raw text ({len(remaining)} chars)"
+        )
+        return _RESYNC_SEPARATOR + remaining
+
+    def _emit(self, rendered: str) -> str:
+        """
+        送信済みの部分との差分を返す
+
+        整形結果が送信済みの内容の続きにならない場合は、区切りを挟んで全文を送る
+        """
+        if not rendered.startswith(self._emitted):
+            logger.warning(
+                "Structured consultation render diverged from sent text; "
+                "resending full render"
+            )
+            self._emitted = rendered
+            return _RESYNC_SEPARATOR + rendered
+        delta = rendered[len(self._emitted) :]
+        self._emitted = rendered
+        return delta
@@ -0,0 +1,158 @@
+"""
+上流API呼び出し用の共有HTTPクライアント
+
+リクエストごとに httpx.Client を作るとTLSコンテキストの読み込みと
+TCP/TLSハンドシェイクが毎回発生するため、インスタンス内で1つのクライアントを
+共有し、HTTP/2とkeep-aliveで接続を再利用する
+タイムアウトは呼び出しごとに timeout 引数で指定する
+ASGIエントリポイントからは同じ設定の httpx.AsyncClient を使う
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Any
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# 呼び出し側で timeout を指定しなかった場合の既定値（秒）
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+_async_client: httpx.AsyncClient | None = None
+_async_client_loop: asyncio.AbstractEventLoop | None = None
+_requests = 0
+_counter_lock = threading.Lock()
+
+
+def _http2_enabled() -> bool:
+    return os.environ.get("HTTP_CLIENT_HTTP2", "true").lower() != "false"
+
+
+def _limits() -> httpx.Limits:
+    """
+    環境変数から接続プールの上限を取得
+
+    同期クライアントはプールが埋まった状態でスレッドが接続を待つと
+    接続の割り当てに失敗することがあるため、max_connections は
+    インスタンスの同時実行数（デプロイ時の --concurrency）以上にすること
+    """
+    return httpx.Limits(
+        max_connections=int(os.environ.get("HTTP_CLIENT_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(
+            os.environ.get("HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS", "20")
+        ),
+        keepalive_expiry=float(os.environ.get("HTTP_CLIENT_KEEPALIVE_EXPIRY", "60")),
+    )
+
+
+def _count_request(request: httpx.Request) -> None:
+    global _requests
+    with _counter_lock:
+        _requests += 1
+
+
+async def _count_request_async(request: httpx.Request) -> None:
+    _count_request(request)
+
+
+def get_http_client() -> httpx.Client:
+    """
+    共有HTTPクライアントを取得（初回呼び出し時に作成）
+
+    httpx.Client はスレッド間で共有でき、同時リクエストは接続プールから
+    接続を借りる。with文で閉じず、そのまま呼び出すこと
+
+    Returns:
+        httpx.Client: HTTP/2・keep-alive対応の共有クライアント
+    """
+    global _client
+    client = _client
+    if client is not None:
+        return client
+
+    with _client_lock:
+        if _client is None:
+            limits = _limits()
+            _client = httpx.Client(
+                http2=_http2_enabled(),
+                limits=limits,
+                timeout=DEFAULT_TIMEOUT,
+                event_hooks={"request": [_count_request]},
+            )
+            logger.info(
+                f"共有HTTPクライアント作成: http2={_http2_enabled()}, "
+                f"max_connections={limits.max_connections}, "
+                f"max_keepalive={limits.max_keepalive_connections}"
+            )
+        return _client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    共有非同期HTTPクライアントを取得（初回呼び出し時に作成）
+
+    接続はイベントループに結び付くため、実行中のイベントループごとに作成する
+    （ワーカーのイベントループは1つなので通常は1つだけ）
+
+    Returns:
+        httpx.AsyncClient: HTTP/2・keep-alive対応の共有クライアント
+    """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        limits = _limits()
+        _async_client = httpx.AsyncClient(
+            http2=_http2_enabled(),
+            limits=limits,
+            timeout=DEFAULT_TIMEOUT,
+            event_hooks={"request": [_count_request_async]},
+        )
+        _async_client_loop = loop
+        logger.info(
+            f"共有非同期HTTPクライアント作成: http2={_http2_enabled()}, "
+            f"max_connections={limits.max_connections}"
+        )
+    return _async_client
+
+
+async def close_async_http_client() -> None:
+    """共有非同期HTTPクライアントを閉じる（次回の get_async_http_client で再作成）"""
+    global _async_client, _async_client_loop
+    client, _async_client, _async_client_loop = _async_client, None, None
+    if client is not None:
+        await client.aclose()
+
+
+def close_http_client() -> None:
+    """共有HTTPクライアントを閉じる（次回の get_http_client で再作成）"""
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+
+def get_http_client_stats() -> dict[str, Any]:
+    """
+    共有HTTPクライアントのメトリクスを取得
+
+    Returns:
+        同期・非同期クライアントの作成有無・HTTP/2設定・プール上限・送信リクエスト数を含む辞書
+    """
+    limits = _limits()
+    with _counter_lock:
+        requests = _requests
+    return {
+        "created": _client is not None,
+        "async_created": _async_client is not None,
+        "http2": _http2_enabled(),
+        "max_connections": limits.max_connections,
+        "max_keepalive_connections": limits.max_keepalive_connections,
+        "keepalive_expiry": limits.keepalive_expiry,
+        "requests": requests,
+    }
@@ -4,9 +4,10 @@
 
 import json
 import logging
+from typing import Any
 
 from environment_config import EnvironmentConfig
-from firebase_auth_utils import authenticate_request
+from firebase_auth_utils import authenticate_request, authenticate_request_async
 from flask import Request, Response
 from handlers import ChatHandler
 from routers import (
@@ -18,10 +19,90 @@ from routers import (
     handle_list_session_events_router,
     handle_list_sessions_router,
 )
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request as ASGIRequest
+from starlette.responses import Response as ASGIResponse
+from werkzeug.test import EnvironBuilder
 
 logger = logging.getLogger(__name__)
 
 
+def resolve_route(method: str, path: str) -> tuple[str | None, str | None]:
+    """
+    パスとメソッドからルートを特定
+
+    Args:
+        method: HTTPメソッド
+        path: 先頭・末尾の "/" を除いたパス
+
+    Returns:
+        (ルート名, セッションID) のタプル（該当なしはルート名がNone）
+    """
+    if path == "api/chat/stream" and method == "POST":
+        return "chat_stream", None
+    elif path == "api/sessions" and method == "POST":
+        return "create_session", None
+    elif path == "api/sessions" and method == "GET":
+        return "list_sessions", None
+    elif path.startswith("api/sessions/") and "/" not in path[13:]:
+        session_id = path[13:]
+        if method == "GET":
+            return "get_session", session_id
+        elif method == "DELETE":
+            return "delete_session", session_id
+    elif path.startswith("api/sessions/") and path.endswith("/events"):
+        if method == "GET":
+            return "list_session_events", path[13:-7]
+    elif path == "api/image/analyze" and method == "POST":
+        return "image_analyze", None
+    return None, None
+
+
+def _unauthorized(auth_error: dict, base_headers: dict[str, str]) -> tuple[str, dict]:
+    logger.warning(f"Authentication failed: {auth_error}")
+    return json.dumps(auth_error), {**base_headers, "Content-Type": "application/json"}
+
+
+def _unknown_endpoint(
+    method: str, path: str, base_headers: dict[str, str]
+) -> tuple[str, dict]:
+    body = json.dumps(
+        {"success": False, "error": f"Unknown endpoint: {method} /{path}"}
+    )
+    return body, {**base_headers, "Content-Type": "application/json"}
+
+
+def _dispatch(
+    route: str,
+    session_id: str | None,
+    request: Request,
+    user_info: dict[str, Any],
+    base_headers: dict[str, str],
+    config: EnvironmentConfig,
+    chat_handler: ChatHandler,
+    use_adk: bool,
+) -> Response:
+    """特定したルートのルーター処理を呼び出す"""
+    if route == "chat_stream":
+        return handle_chat_stream_router(request, user_info, base_headers, chat_handler)
+    elif route == "create_session":
+        return handle_create_session_router(
+            request, user_info, base_headers, chat_handler
+        )
+    elif route == "list_sessions":
+        return handle_list_sessions_router(request, user_info, base_headers, config)
+    elif route == "get_session":
+        return handle_get_session_router(session_id, user_info, base_headers, config)
+    elif route == "delete_session":
+        return handle_delete_session_router(session_id, user_info, base_headers, config)
+    elif route == "list_session_events":
+        return handle_list_session_events_router(
+            session_id, user_info, base_headers, config, use_adk
+        )
+    else:
+        return handle_image_analyze_proxy_router(request, user_info, base_headers)
+
+
 def route_request(
     request: Request,
     base_headers: dict[str, str],
@@ -48,52 +129,110 @@ def route_request(
     # Firebase認証チェック
     user_info, auth_error = authenticate_request(request)
     if auth_error:
-        logger.warning(f"Authentication failed: {auth_error}")
-        return Response(
-            json.dumps(auth_error),
-            status=401,
-            headers={**base_headers, "Content-Type": "application/json"},
-        )
+        body, headers = _unauthorized(auth_error, base_headers)
+        return Response(body, status=401, headers=headers)
 
     logger.info(
         f"Authenticated user: {user_info['uid']} ({user_info.get('email', 'no email')})"
     )
 
     # パスに基づく処理の振り分け
-    if path == "api/chat/stream" and request.method == "POST":
-        return handle_chat_stream_router(request, user_info, base_headers, chat_handler)
-    elif path == "api/sessions" and request.method == "POST":
-        return handle_create_session_router(
-            request, user_info, base_headers, chat_handler
+    route, session_id = resolve_route(request.method, path)
+    if route is None:
+        body, headers = _unknown_endpoint(request.method, path, base_headers)
+        return Response(body, status=404, headers=headers)
+
+    return _dispatch(
+        route,
+        session_id,
+        request,
+        user_info,
+        base_headers,
+        config,
+        chat_handler,
+        use_adk,
+    )
+
+
+async def route_request_async(
+    request: ASGIRequest,
+    base_headers: dict[str, str],
+    config: EnvironmentConfig,
+    chat_handler: ChatHandler,
+    use_adk: bool,
+) -> ASGIResponse:
+    """
+    リクエストのルーティング処理（ASGI用）
+
+    チャットストリーミングとセッション作成はハンドラーの非同期メソッドで処理し、
+    それ以外のルートは既存の同期ルーターをスレッドプールで実行する
+
+    Args:
+        request: Starlette Request オブジェクト
+        base_headers: ベースヘッダー辞書
+        config: 環境設定オブジェクト
+        chat_handler: チャットハンドラー
+        use_adk: ADKモード使用フラグ
+
+    Returns:
+        Response: Starlette Response オブジェクト
+    """
+    path = request.url.path.strip("/")
+    logger.info(f"リクエストパス: {request.method} /{path}")
+
+    # Firebase認証チェック
+    user_info, auth_error = await authenticate_request_async(request)
+    if auth_error:
+        body, headers = _unauthorized(auth_error, base_headers)
+        return ASGIResponse(body, status_code=401, headers=headers)
+
+    logger.info(
+        f"Authenticated user: {user_info['uid']} ({user_info.get('email', 'no email')})"
+    )
+
+    route, session_id = resolve_route(request.method, path)
+    if route is None:
+        body, headers = _unknown_endpoint(request.method, path, base_headers)
+        return ASGIResponse(body, status_code=404, headers=headers)
+
+    if route == "chat_stream":
+        return await chat_handler.handle_chat_stream_async(
+            request, user_info, base_headers
         )
-    elif path == "api/sessions" and request.method == "GET":
-        return handle_list_sessions_router(request, user_info, base_headers, config)
-    elif path.startswith("api/sessions/") and "/" not in path[13:]:
-        session_id = path[13:]
-        if request.method == "GET":
-            return handle_get_session_router(
-                session_id, user_info, base_headers, config
-            )
-        elif request.method == "DELETE":
-            return handle_delete_session_router(
-                session_id, user_info, base_headers, config
-            )
-    elif path.startswith("api/sessions/") and path.endswith("/events"):
-        session_id = path[13:-7]
-        if request.method == "GET":
-            return handle_list_session_events_router(
-                session_id, user_info, base_headers, config, use_adk
-            )
-    elif path == "api/image/analyze" and request.method == "POST":
-        return handle_image_analyze_proxy_router(request, user_info, base_headers)
-    else:
-        return Response(
-            json.dumps(
-                {
-                    "success": False,
-                    "error": f"Unknown endpoint: {request.method} /{path}",
-                }
-            ),
-            status=404,
-            headers={**base_headers, "Content-Type": "application/json"},
+    elif route == "create_session":
+        return await chat_handler.handle_create_session_async(
+            request, user_info, base_headers
         )
+
+    flask_request = await _to_flask_request(request)
+    response = await run_in_threadpool(
+        _dispatch,
+        route,
+        session_id,
+        flask_request,
+        user_info,
+        base_headers,
+        config,
+        chat_handler,
+        use_adk,
+    )
+    return ASGIResponse(
+        response.get_data(),
+        status_code=response.status_code,
+        headers=dict(response.headers),
+    )
+
+
+async def _to_flask_request(request: ASGIRequest) -> Request:
+    """同期ルーターに渡すため、Starlette RequestをFlask Requestに変換"""
+    builder = EnvironBuilder(
+        path=request.url.path,
+        method=request.method,
+        query_string=request.url.query,
+        headers=list(request.headers.items()),
+        data=await request.body(),
+    )
+    try:
+        return Request(builder.get_environ())
+    finally:
+        builder.close()
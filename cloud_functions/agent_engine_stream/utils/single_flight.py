@@ -0,0 +1,130 @@
+"""
+シングルフライト（同一リクエストの重複実行抑止）ユーティリティ
+app/utils/single_flight.py から移植
+
+同時に発生した同一キーの上流API呼び出しを1回の実行にまとめ、
+後続の呼び出し元は先行呼び出しの結果を待機して共有する
+"""
+
+import json
+import threading
+import unicodedata
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+def normalize_key(*parts: Any) -> str:
+    """
+    リクエスト内容から重複判定用のキーを生成
+
+    全角/半角・大文字/小文字・連続空白の違いを吸収する
+
+    Args:
+        parts: キーを構成する値（dict/listはJSONとして正規化）
+
+    Returns:
+        正規化されたキー文字列
+    """
+    normalized = []
+    for part in parts:
+        if isinstance(part, dict | list | tuple):
+            text = json.dumps(part, sort_keys=True, ensure_ascii=False, default=str)
+        else:
+            text = "" if part is None else str(part)
+        text = unicodedata.normalize("NFKC", text).lower()
+        normalized.append(" ".join(text.split()))
+    return "\x1f".join(normalized)
+
+
+class SingleFlight:
+    """同一キーの同時実行を1回にまとめるクラス"""
+
+    def __init__(self, name: str = "default"):
+        """
+        初期化
+
+        Args:
+            name: メトリクス出力時の識別名
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._in_flight: dict[Hashable, Future] = {}
+        self._calls = 0
+        self._executions = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """
+        キー単位で重複を抑止して関数を実行
+
+        最初の呼び出し元が fn を実行し、実行中に到着した同一キーの
+        呼び出し元は同じ結果（または例外）を受け取る
+
+        Args:
+            key: 重複判定キー（normalize_keyの利用を推奨）
+            fn: 実行する関数
+
+        Returns:
+            fn の実行結果
+        """
+        with self._lock:
+            self._calls += 1
+            future = self._in_flight.get(key)
+            is_leader = future is None
+            if future is None:
+                future = Future()
+                self._in_flight[key] = future
+                self._executions += 1
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._release(key)
+            future.set_exception(e)
+            raise
+
+        self._release(key)
+        future.set_result(result)
+        return result
+
+    def _release(self, key: Hashable) -> None:
+        """実行中テーブルからキーを除去"""
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        重複抑止のメトリクスを取得
+
+        Returns:
+            呼び出し数・実行数・集約数・集約率を含む辞書
+        """
+        with self._lock:
+            calls = self._calls
+            executions = self._executions
+            in_flight = len(self._in_flight)
+
+        collapsed = calls - executions
+        return {
+            "name": self.name,
+            "calls": calls,
+            "executions": executions,
+            "collapsed": collapsed,
+            "collapse_ratio": collapsed / calls if calls else 0.0,
+            "in_flight": in_flight,
+        }
+
+    def reset_stats(self) -> None:
+        """メトリクスをリセット"""
+        with self._lock:
+            self._calls = 0
+            self._executions = 0
+
+
+# Vertex AI 上流API呼び出し用の共有インスタンス
+upstream_flight = SingleFlight("vertex_ai_upstream")
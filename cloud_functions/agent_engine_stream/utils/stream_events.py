@@ -0,0 +1,137 @@
+"""
+SSEイベントの生成ユーティリティ
+
+Flask（同期）とASGI（非同期）のどちらのエントリポイントからも
+同じ形式のイベントを送るため、イベントの組み立てをここにまとめる
+"""
+
+import json
+import logging
+from typing import Any
+
+from .agent_utils import split_agent_content
+from .consultation_renderer import ConsultationStreamRenderer
+
+logger = logging.getLogger(__name__)
+
+# Server-Sent Eventsで返すレスポンスヘッダー
+SSE_HEADERS = {
+    "Content-Type": "text/event-stream",
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+    "Connection": "keep-alive",
+}
+
+
+def sse_event(payload: dict[str, Any]) -> str:
+    """
+    イベント1件をSSE形式の文字列に変換
+
+    区切りは既存のクライアントとの互換性のため従来どおりの文字列を使う
+
+    Args:
+        payload: typeを含むイベント内容
+
+    Returns:
+        str: SSE形式のイベント
+    """
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\\n\\n"
+
+
+class AgentEngineStreamTranslator:
+    """Agent Engine の stream_query 応答（JSON Lines）をSSEイベントに変換するクラス"""
+
+    def __init__(self):
+        self.current_agent: str | None = None
+        self.agent_started = False
+        self._renderer = ConsultationStreamRenderer()
+
+    def feed_line(self, line: str | bytes) -> list[str]:
+        """
+        応答1行を処理して送信するイベントを返す
+
+        Args:
+            line: Agent Engineの応答1行
+
+        Returns:
+            list[str]: SSE形式のイベント（エージェント切り替え・チャンク）
+        """
+        if not line.strip():
+            return []
+
+        try:
+            line_str = line.decode("utf-8") if isinstance(line, bytes) else str(line)
+            response_data = json.loads(line_str)
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON解析エラー: {e}")
+            return [
+                sse_event({"type": "error", "content": f"JSON parsing error: {e!s}"})
+            ]
+
+        # Agent Engineのcontentオブジェクトからテキストを抽出
+        content = (
+            response_data.get("content") if isinstance(response_data, dict) else None
+        )
+        if not isinstance(content, dict) or "parts" not in content:
+            return []
+
+        events = []
+        for part in content["parts"]:
+            if "text" not in part:
+                continue
+            # 構造化出力はマークダウンに整形
+            text_content = self._renderer.feed(part["text"])
+            for part_content, agent_name in split_agent_content(text_content):
+                if not part_content.strip():
+                    continue
+                events.extend(self._switch_agent(agent_name))
+                events.append(
+                    sse_event(
+                        {
+                            "type": "chunk",
+                            "agent_name": agent_name,
+                            "content": part_content,
+                        }
+                    )
+                )
+        return events
+
+    def finish(self) -> list[str]:
+        """
+        応答の終了時に送信するイベントを返す
+
+        Returns:
+            list[str]: 構造化出力の残り・エージェント完了・ストリーム終了のイベント
+        """
+        events = []
+        remaining = self._renderer.finish()
+        if remaining and self.current_agent:
+            events.append(
+                sse_event(
+                    {
+                        "type": "chunk",
+                        "agent_name": self.current_agent,
+                        "content": remaining,
+                    }
+                )
+            )
+        if self.agent_started and self.current_agent:
+            events.append(
+                sse_event({"type": "agent_complete", "agent_name": self.current_agent})
+            )
+        events.append(sse_event({"type": "stream_end"}))
+        return events
+
+    def _switch_agent(self, agent_name: str) -> list[str]:
+        """エージェントが変わった場合の完了・開始イベント"""
+        if self.current_agent == agent_name:
+            return []
+        events = []
+        if self.current_agent:
+            events.append(
+                sse_event({"type": "agent_complete", "agent_name": self.current_agent})
+            )
+        events.append(sse_event({"type": "agent_start", "agent_name": agent_name}))
+        self.current_agent = agent_name
+        self.agent_started = True
+        return events
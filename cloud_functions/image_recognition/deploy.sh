@@ -20,6 +20,17 @@ if [ ! -f "main.py" ]; then
     exit 1
 fi
 
+# 共通の認証パッケージ app/auth を関数のソースに同梱（make stage-shared-auth と同じ）
+# 終了時（失敗時も含む）に同梱したファイルを削除する
+FUNCTION_DIR=$(pwd)
+REPO_ROOT=$(cd ../.. && pwd)
+trap 'rm -rf "$FUNCTION_DIR/app"' EXIT
+rm -rf "$FUNCTION_DIR/app"
+mkdir -p "$FUNCTION_DIR/app"
+touch "$FUNCTION_DIR/app/__init__.py"
+cp -r "$REPO_ROOT/app/auth" "$FUNCTION_DIR/app/auth"
+rm -rf "$FUNCTION_DIR/app/auth/__pycache__"
+
 # Cloud Functionsにデプロイ
 gcloud functions deploy $FUNCTION_NAME \
     --gen2 \
@@ -9,18 +9,17 @@ import io
 import json
 import logging
 import os
-import sys
 from typing import Any
 
 import functions_framework
 import vertexai
+
+# Firebase認証ユーティリティをインポート
+from firebase_auth_utils import authenticate_request, get_token_cache_stats
 from flask import Request, jsonify
 from PIL import Image
 from vertexai.generative_models import GenerativeModel, Part
 
-# Firebase認証ユーティリティをインポート
-from firebase_auth_utils import authenticate_request
-
 # ログ設定
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -365,6 +364,7 @@ def health_check(request: Request):
                 "status": "healthy",
                 "service": "kids-food-advisor-image-recognition",
                 "version": "1.0.0",
+                "token_cache": get_token_cache_stats(),
             },
         }
     )
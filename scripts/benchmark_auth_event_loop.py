@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+認証処理によるイベントループの遅延ベンチマーク
+
+ローカルで生成したRSA鍵で署名したID Tokenを使い、同時に届く認証付き
+リクエストを asyncio 上で処理したときのイベントループの遅れ（1ms間隔の
+タイマーが予定より遅れた時間）と所要時間を計測します。
+
+- blocking: app.auth.firebase_tokens.verify_id_token をコルーチン内で同期に
+  呼ぶ（キャッシュ済みは辞書の参照のみ、未検証はイベントループ上で署名検証）
+- offload: app.auth.firebase_tokens.verify_id_token_async（キャッシュ済みは
+  その場で返し、署名検証はスレッドプールで実行）
+
+どちらも同じ VerifiedTokenCache を通すため、検証回数は同程度になり、
+違いは署名検証をどこで実行するかだけになります。
+
+検証には署名検証に加え、--fetch-every 回に1回の公開鍵の取得（--fetch-latency 秒）
+を含めます。認証情報やネットワークは不要です。
+
+使い方:
+    python scripts/benchmark_auth_event_loop.py --users 50 --requests-per-user 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import jwt  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+
+from app.auth import firebase_tokens  # noqa: E402
+from app.auth.token_cache import VerifiedTokenCache  # noqa: E402
+
+PROJECT_ID = "benchmark-project"
+SIGNING_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def make_tokens(count: int) -> list[str]:
+    now = int(time.time())
+    return [
+        jwt.encode(
+            {"aud": PROJECT_ID, "sub": f"user-{i}", "uid": f"user-{i}",
+             "iat": now, "exp": now + 3600},
+            SIGNING_KEY,
+            algorithm="RS256",
+        )
+        for i in range(count)
+    ]  # fmt: skip
+
+
+class Verifier:
+    """RS256の署名検証と、一定回数ごとの公開鍵の取得（遅延）を行う"""
+
+    def __init__(self, fetch_every: int, fetch_latency: float):
+        self.fetch_every = fetch_every
+        self.fetch_latency = fetch_latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, token: str) -> dict:
+        with self._lock:
+            self.calls += 1
+            fetch = self.fetch_every and self.calls % self.fetch_every == 1
+        if fetch:
+            time.sleep(self.fetch_latency)
+        return jwt.decode(
+            token, SIGNING_KEY.public_key(), algorithms=["RS256"], audience=PROJECT_ID
+        )
+
+
+async def monitor_lag(stop: asyncio.Event, interval: float = 0.001) -> list[float]:
+    """予定時刻からの遅れ(ms)を記録"""
+    lags = []
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(time.perf_counter() - expected, 0.0) * 1000)
+    return lags
+
+
+async def run(mode: str, tokens: list[str], args) -> dict:
+    verifier = Verifier(args.fetch_every, args.fetch_latency)
+    firebase_tokens.token_cache = VerifiedTokenCache(verifier)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def handle(token: str) -> None:
+        async with semaphore:
+            if mode == "blocking":
+                firebase_tokens.verify_id_token(token)
+            else:
+                await firebase_tokens.verify_id_token_async(token)
+            # 認証後のハンドラーの処理（上流APIの呼び出しなど）
+            await asyncio.sleep(args.handler_latency)
+
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_lag(stop))
+    requests = [token for _ in range(args.requests_per_user) for token in tokens]
+    start = time.perf_counter()
+    await asyncio.gather(*(handle(token) for token in requests))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    lags = sorted(await monitor)
+    return {
+        "requests": len(requests),
+        "verifications": verifier.calls,
+        "elapsed": elapsed,
+        "lag_p50": statistics.median(lags),
+        "lag_p99": lags[int(len(lags) * 0.99)],
+        "lag_max": lags[-1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=50, help="異なるトークンの数")
+    parser.add_argument("--requests-per-user", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--handler-latency", type=float, default=0.005)
+    parser.add_argument("--fetch-every", type=int, default=25)
+    parser.add_argument("--fetch-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    tokens = make_tokens(args.users)
+    print(f"{'mode':<9} {'requests':>8} {'verified':>8} {'elapsed s':>9} "
+          f"{'lag p50':>8} {'lag p99':>8} {'lag max':>8}  (ms)")  # fmt: skip
+    for mode in ("blocking", "offload"):
+        result = asyncio.run(run(mode, tokens, args))
+        print(f"{mode:<9} {result['requests']:>8} {result['verifications']:>8} "
+              f"{result['elapsed']:>9.2f} {result['lag_p50']:>8.2f} "
+              f"{result['lag_p99']:>8.2f} {result['lag_max']:>8.2f}")  # fmt: skip
+
+
+if __name__ == "__main__":
+    main()
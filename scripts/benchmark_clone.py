@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+AgentEngineApp.clone のベンチマーク
+
+エージェントを深いコピーしていた従来のcloneと、エージェント定義を共有する
+現在のcloneについて、1回あたりの所要時間と確保メモリ（tracemalloc）を比較します。
+エージェントはスタブバックエンド（AGENT_BACKEND=stub）で構築するため
+認証情報は不要です。
+
+使い方:
+    python scripts/benchmark_clone.py --iterations 200
+"""
+
+import argparse
+import copy
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def legacy_clone(app):
+    """従来のclone（エージェントの深いコピー）"""
+    attrs = app._tmpl_attrs
+    return app.__class__(
+        agent=copy.deepcopy(attrs.get("agent")),
+        enable_tracing=attrs.get("enable_tracing"),
+        session_service_builder=attrs.get("session_service_builder"),
+        artifact_service_builder=attrs.get("artifact_service_builder"),
+        env_vars=attrs.get("env_vars"),
+    )
+
+
+def measure(clone_fn, app, iterations: int) -> tuple[float, float]:
+    """1回あたりの所要時間(ms)と確保メモリ(KiB)の中央値を返す"""
+    durations, allocations = [], []
+    for _ in range(iterations):
+        tracemalloc.start()
+        start = time.perf_counter()
+        cloned = clone_fn(app)
+        durations.append(time.perf_counter() - start)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        allocations.append(current)
+        del cloned
+    return statistics.median(durations) * 1000, statistics.median(allocations) / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+
+    os.environ["AGENT_BACKEND"] = "stub"
+
+    import vertexai
+
+    from app.agent_engine_app import AgentEngineApp
+    from app.agents.unified_nutrition_agent import create_unified_nutrition_agent
+
+    vertexai.init(project="stub-project", location="us-central1")
+    app = AgentEngineApp(agent=create_unified_nutrition_agent())
+
+    print(f"{'clone':<8} {'time(ms)':>10} {'memory(KiB)':>12}")
+    results = {}
+    for name, clone_fn in (
+        ("deepcopy", legacy_clone),
+        ("shared", AgentEngineApp.clone),
+    ):
+        results[name] = measure(clone_fn, app, args.iterations)
+        duration, memory = results[name]
+        print(f"{name:<8} {duration:>10.3f} {memory:>12.1f}")
+
+    print(
+        f"speedup: x{results['deepcopy'][0] / results['shared'][0]:.0f}, "
+        f"memory: x{results['deepcopy'][1] / max(results['shared'][1], 0.001):.0f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
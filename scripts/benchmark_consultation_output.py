@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+初回相談の出力モード比較ベンチマーク
+
+記録済みの初回相談プロンプト（scripts/data/consultation_recordings.json）で、
+固定マークダウン出力と構造化（JSON）出力の出力トークン数・完了時間を比較します。
+
+- オフライン（既定）: 記録済み回答のトークン数を概算し、生成速度から完了時間を見積もる。
+  構造化出力はストリーミングレンダラーで整形し、マークダウン版と一致するかも確認する
+- --live: Geminiを実際に呼び出し、usage_metadataの出力トークン数と実測時間を比較する
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "cloud_functions" / "agent_engine_stream"))
+
+from utils.consultation_renderer import ConsultationStreamRenderer  # noqa: E402
+
+from app.tools.search_compaction import estimate_tokens  # noqa: E402
+
+RECORDINGS = Path(__file__).resolve().parent / "data" / "consultation_recordings.json"
+
+
+def load_recordings() -> list[dict]:
+    """記録済みプロンプトと回答を読み込み"""
+    with open(RECORDINGS, encoding="utf-8") as f:
+        return json.load(f)["recordings"]
+
+
+def stream_render(text: str, chunk_size: int) -> tuple[str, float]:
+    """JSONを一定サイズの断片で流し込み、整形結果と処理時間を返す"""
+    renderer = ConsultationStreamRenderer(enabled=True)
+    start = time.perf_counter()
+    rendered = "".join(
+        renderer.feed(text[i : i + chunk_size]) for i in range(0, len(text), chunk_size)
+    )
+    rendered += renderer.finish()
+    return rendered, time.perf_counter() - start
+
+
+def run_offline(recordings: list[dict], tokens_per_second: float, chunk_size: int):
+    """記録済み回答でトークン数と完了時間を見積もり"""
+    print(f"生成速度 {tokens_per_second:.0f} tokens/s で見積もり")
+    reductions = []
+    for index, recording in enumerate(recordings, 1):
+        markdown = recording["markdown"]
+        structured = json.dumps(recording["structured"], ensure_ascii=False)
+        markdown_tokens = estimate_tokens(markdown)
+        structured_tokens = estimate_tokens(structured)
+        rendered, render_seconds = stream_render(structured, chunk_size)
+
+        reduction = 1 - structured_tokens / markdown_tokens
+        reductions.append(reduction)
+        print(
+            f"[{index}] 出力トークン {markdown_tokens} -> {structured_tokens} "
+            f"({reduction:.0%}削減) / 完了時間 "
+            f"{markdown_tokens / tokens_per_second:.2f}s -> "
+            f"{structured_tokens / tokens_per_second + render_seconds:.2f}s / "
+            f"整形 {render_seconds * 1000:.2f}ms / "
+            f"表示一致 {'OK' if rendered == markdown else 'NG'}"
+        )
+    print(f"平均削減率: {statistics.mean(reductions):.0%}")
+
+
+def run_live(recordings: list[dict], repeat: int):
+    """Geminiを呼び出して実測"""
+    import google.auth
+    from google import genai
+    from google.genai import types
+
+    from app.agents.consultation_output import (
+        _STRUCTURED_INSTRUCTION,
+        ConsultationReport,
+    )
+    from app.agents.unified_nutrition_agent import create_unified_nutrition_agent
+
+    _, project_id = google.auth.default()
+    client = genai.Client(vertexai=True, project=project_id, location="us-central1")
+    agent = create_unified_nutrition_agent()
+
+    modes = {
+        "markdown": types.GenerateContentConfig(system_instruction=agent.instruction),
+        "structured": types.GenerateContentConfig(
+            system_instruction=f"{agent.instruction}\n\n{_STRUCTURED_INSTRUCTION}",
+            response_schema=ConsultationReport,
+            response_mime_type="application/json",
+        ),
+    }
+
+    for index, recording in enumerate(recordings, 1):
+        results = {}
+        for mode, config in modes.items():
+            tokens, seconds = [], []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                response = client.models.generate_content(
+                    model=agent.model, contents=recording["prompt"], config=config
+                )
+                seconds.append(time.perf_counter() - start)
+                tokens.append(response.usage_metadata.candidates_token_count or 0)
+            results[mode] = (statistics.median(tokens), statistics.median(seconds))
+
+        (md_tokens, md_seconds), (st_tokens, st_seconds) = (
+            results["markdown"],
+            results["structured"],
+        )
+        print(
+            f"[{index}] 出力トークン {md_tokens:.0f} -> {st_tokens:.0f} / "
+            f"完了時間 {md_seconds:.2f}s -> {st_seconds:.2f}s（中央値, {repeat}回）"
+        )
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="初回相談の出力モード比較")
+    parser.add_argument("--live", action="store_true", help="Geminiを呼び出して実測")
+    parser.add_argument("--repeat", type=int, default=3, help="実測の繰り返し回数")
+    parser.add_argument(
+        "--tokens-per-second", type=float, default=150.0, help="見積もり用の生成速度"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=16, help="ストリーミング断片の文字数"
+    )
+    args = parser.parse_args()
+
+    recordings = load_recordings()
+    if args.live:
+        run_live(recordings, args.repeat)
+    else:
+        run_offline(recordings, args.tokens_per_second, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
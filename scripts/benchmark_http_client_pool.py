@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+上流API呼び出しのHTTPクライアント再利用ベンチマーク
+
+自己署名証明書で起動したローカルのTLSサーバー（Vertex AI Sessions APIの代わり）に
+対して、agent_engine_stream のルーターと同じ呼び出しを行い、1リクエストあたりの
+レイテンシを計測します。
+
+- fresh: 従来の実装（上流呼び出しごとに httpx.Client() を作成して閉じる）
+- pooled: utils.http_client.get_http_client() の共有クライアント（keep-alive）
+
+セッション削除・イベント履歴取得と同様に、1リクエストで --calls-per-request 回
+上流APIを呼び出します。--connect-delay で新規接続ごとのネットワーク往復時間を
+再現できます。ローカルサーバーはHTTP/1.1のみのため、ALPNでHTTP/1.1に
+フォールバックした状態での比較になります。認証情報やネットワークは不要です。
+
+使い方:
+    python scripts/benchmark_http_client_pool.py --requests 200 --concurrency 8
+    # 新規接続ごとに2msの往復時間を加える場合
+    python scripts/benchmark_http_client_pool.py --connect-delay 0.002
+"""
+
+import argparse
+import datetime
+import ipaddress
+import json
+import os
+import socket
+import ssl
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "cloud_functions" / "agent_engine_stream"))
+
+import certifi  # noqa: E402
+import httpx  # noqa: E402
+from cryptography import x509  # noqa: E402
+from cryptography.hazmat.primitives import hashes, serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+from cryptography.x509.oid import NameOID  # noqa: E402
+from utils.http_client import close_http_client, get_http_client  # noqa: E402
+
+SESSION = {
+    "name": "projects/p/locations/l/reasoningEngines/1/sessions/123",
+    "userId": "user-1",
+    "createTime": "2025-01-01T00:00:00Z",
+}
+
+
+def write_certificates(directory: Path) -> tuple[Path, Path, Path]:
+    """127.0.0.1用の自己署名証明書と、それを含むCAバンドルを作成"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(
+            x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]),
+            critical=False,
+        )
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )  # fmt: skip
+    cert_pem = certificate.public_bytes(serialization.Encoding.PEM)
+    cert_file, key_file = directory / "server.pem", directory / "server.key"
+    cert_file.write_bytes(cert_pem)
+    key_file.write_bytes(
+        key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    # 本番と同じく、クライアント作成時に公開CAのバンドル全体を読み込ませる
+    bundle = directory / "bundle.pem"
+    bundle.write_bytes(Path(certifi.where()).read_bytes() + cert_pem)
+    return cert_file, key_file, bundle
+
+
+class TLSServer(ThreadingHTTPServer):
+    """新規接続ごとに遅延を入れてからTLSハンドシェイクを行うサーバー"""
+
+    daemon_threads = True
+
+    def __init__(self, address, handler, context: ssl.SSLContext, connect_delay):
+        super().__init__(address, handler)
+        self.context = context
+        self.connect_delay = connect_delay
+        self.connections = 0
+
+    def finish_request(self, request, client_address):
+        self.connections += 1
+        # ヘッダーと本文の分割送信でNagleと遅延ACKによる待ちが出ないようにする
+        request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.connect_delay:
+            time.sleep(self.connect_delay)
+        tls = self.context.wrap_socket(request, server_side=True)
+        self.RequestHandlerClass(tls, client_address, self)
+
+
+class SessionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_latency = 0.0
+
+    def do_GET(self):
+        if self.server_latency:
+            time.sleep(self.server_latency)
+        body = json.dumps(SESSION).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(cert_file: Path, key_file: Path, args) -> TLSServer:
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert_file, key_file)
+    SessionHandler.server_latency = args.server_latency
+    server = TLSServer(("127.0.0.1", 0), SessionHandler, context, args.connect_delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fresh_request(url: str, calls: int) -> None:
+    for _ in range(calls):
+        with httpx.Client() as client:
+            client.get(url, timeout=30.0).raise_for_status()
+
+
+def pooled_request(url: str, calls: int) -> None:
+    client = get_http_client()
+    for _ in range(calls):
+        client.get(url, timeout=30.0).raise_for_status()
+
+
+def run(mode: str, url: str, server: TLSServer, args) -> dict:
+    request = fresh_request if mode == "fresh" else pooled_request
+    # 接続プールの初期化やインポートの影響を除く
+    request(url, args.calls_per_request)
+    server.connections = 0
+
+    def timed(_):
+        start = time.perf_counter()
+        request(url, args.calls_per_request)
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        latencies = sorted(executor.map(timed, range(args.requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "elapsed": elapsed,
+        "connections": server.connections,
+        "mean": statistics.fmean(latencies),
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95)],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--calls-per-request", type=int, default=2)
+    parser.add_argument("--server-latency", type=float, default=0.0)
+    parser.add_argument("--connect-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cert_file, key_file, bundle = write_certificates(Path(directory))
+        os.environ["SSL_CERT_FILE"] = str(bundle)
+        server = start_server(cert_file, key_file, args)
+        url = f"https://127.0.0.1:{server.server_port}/v1beta1/sessions/123"
+
+        results = {}
+        print(f"{'mode':<7} {'requests':>8} {'conns':>6} {'elapsed s':>9} "
+              f"{'mean':>7} {'p50':>7} {'p95':>7}  (ms/request)")  # fmt: skip
+        for mode in ("fresh", "pooled"):
+            result = results[mode] = run(mode, url, server, args)
+            print(f"{mode:<7} {args.requests:>8} {result['connections']:>6} "
+                  f"{result['elapsed']:>9.2f} {result['mean']:>7.2f} "
+                  f"{result['p50']:>7.2f} {result['p95']:>7.2f}")  # fmt: skip
+        close_http_client()
+        server.shutdown()
+
+    saved = results["fresh"]["mean"] - results["pooled"]["mean"]
+    print(f"saved per request: {saved:.2f} ms "
+          f"({results['fresh']['mean'] / results['pooled']['mean']:.1f}x)")  # fmt: skip
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+入力サニタイズの最悪ケースベンチマーク
+
+細工された1,000文字のチャットメッセージ（閉じない '<'、閉じタグのないscript、
+"on" の繰り返しなど）について、sanitize_input と validate_chat_message の
+所要時間を従来の実装（4回のre.sub）と比較します。あわせて入力長を倍々に
+したときの現在の実装の所要時間を表示し、線形時間で終わることを確認します。
+
+使い方:
+    python scripts/benchmark_input_validation.py --length 1000 --repeat 50
+"""
+
+import argparse
+import html
+import re
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app.utils.input_validation import (  # noqa: E402
+    sanitize_input,
+    validate_chat_message,
+)
+
+# 入力名と（先頭, 繰り返す単位）。先頭の '=' / ':' はイベントハンドラーと
+# JavaScript URLの走査を省略させないためのもの
+ADVERSARIAL = {
+    "unclosed '<'": ("", "<"),
+    "unclosed <script>": ("", "<script>"),
+    "'on' repeated": ("=", "on"),
+    "<script> + '<a'": ("<script>", "<a"),
+    "'onx' + no '='": ("=", "onx"),
+    "'javascript' + ':'": (":", "javascript"),
+    "normal text": ("", "1歳半の子供の食事について教えてください。"),
+    "text with ':' '='": ("", "お米:100g、にんじん=50g を食べました。"),
+}
+
+
+def legacy_sanitize_input(input_text: str) -> str:
+    """従来の実装（パターン文字列による4回のre.sub）"""
+    sanitized = re.sub(
+        r"<script\b[^<]*(?:(?!<\/script>)<[^<]*)*<\/script>",
+        "",
+        input_text,
+        flags=re.IGNORECASE,
+    )
+    sanitized = re.sub(r"<[^>]*>", "", sanitized)
+    sanitized = re.sub(r"javascript:", "", sanitized, flags=re.IGNORECASE)
+    sanitized = re.sub(r"on\w+\s*=", "", sanitized, flags=re.IGNORECASE)
+    return html.escape(sanitized, quote=True)
+
+
+def legacy_validate_chat_message(message: str) -> bool:
+    """従来のチャットメッセージ検証（タグ検出・パターン照合・サニタイズ）"""
+    if re.search(r"<[^>]*>", message):
+        legacy_sanitize_input(message)
+        return False
+    valid = bool(re.match(r"^[^\x00-\x08\x0B\x0C\x0E-\x1F\x7F<>]+$", message))
+    legacy_sanitize_input(message)
+    return valid
+
+
+def make_input(name: str, length: int) -> str:
+    prefix, unit = ADVERSARIAL[name]
+    return (prefix + unit * (length // len(unit) + 1))[:length]
+
+
+def measure(sanitize, validate, text: str, repeat: int) -> float:
+    """1回あたりの所要時間(ms)の最小値"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        sanitize(text)
+        validate(text)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--length", type=int, default=1000, help="メッセージの文字数")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{args.length}文字の入力（ms）")
+    print(f"{'input':<20} {'legacy':>10} {'current':>10} {'speedup':>8}")
+    for name in ADVERSARIAL:
+        text = make_input(name, args.length)
+        legacy = measure(
+            legacy_sanitize_input, legacy_validate_chat_message, text, args.repeat
+        )
+        current = measure(sanitize_input, validate_chat_message, text, args.repeat)
+        print(f"{name:<20} {legacy:>10.3f} {current:>10.3f} {legacy / current:>7.1f}x")
+
+    print("\n現在の実装の入力長ごとの所要時間（ms、線形なら倍々に増える）")
+    lengths = [args.length * 2**i for i in range(5)]
+    print(f"{'input':<20} " + " ".join(f"{n:>9}" for n in lengths))
+    for name in ADVERSARIAL:
+        times = [
+            measure(
+                sanitize_input,
+                validate_chat_message,
+                make_input(name, n),
+                max(1, args.repeat // 5),
+            )
+            for n in lengths
+        ]
+        print(f"{name:<20} " + " ".join(f"{t:>9.3f}" for t in times))
+
+
+if __name__ == "__main__":
+    main()
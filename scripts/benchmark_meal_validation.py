@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+食事記録の一括検証ベンチマーク
+
+保育施設のCSV取り込みを想定した数千件の食事記録について、1件ずつ
+validate_meal_data を呼ぶ従来の方法と iter_meal_rejections による一括検証の
+所要時間を比較します。validate_meal_data と同じ形式の記録と、
+csv.DictReader で読んだ1行1食材の行の両方を計測し、目標の10倍に届いたかを
+表示します。
+
+使い方:
+    python scripts/benchmark_meal_validation.py --records 5000 --reject-ratio 0.05
+"""
+
+import argparse
+import csv
+import gc
+import io
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app.utils.input_validation import (  # noqa: E402
+    iter_meal_rejections,
+    validate_meal_data,
+)
+
+MEAL_TYPES = ["breakfast", "lunch", "dinner", "snack"]
+FOOD_NAMES = ["ご飯", "味噌汁", "にんじん", "鶏肉", "豆腐", "バナナ", "牛乳", "りんご"]
+NOTES = ["", "よく食べました", "半分残しました", "おかわりしました"]
+# 一括検証に求める従来の方法からの高速化率
+TARGET_SPEEDUP = 10.0
+
+
+def make_records(count: int, reject_ratio: float, seed: int = 0) -> list[dict]:
+    """1食あたり3品の食事記録を作成（一部は数量が範囲外）"""
+    rng = random.Random(seed)
+    records = []
+    for _ in range(count):
+        foods = [
+            {
+                "name": rng.choice(FOOD_NAMES),
+                "quantity": rng.randint(10, 200),
+                "unit": "g",
+            }
+            for _ in range(3)
+        ]
+        if rng.random() < reject_ratio:
+            foods[1]["quantity"] = 0
+        records.append(
+            {"type": rng.choice(MEAL_TYPES), "foods": foods, "notes": rng.choice(NOTES)}
+        )
+    return records
+
+
+def make_csv_rows(records: list[dict]) -> list[dict]:
+    """食事記録を1行1食材のCSVにしてcsv.DictReaderで読み直す"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(
+        buffer, fieldnames=["type", "food_name", "quantity", "unit", "notes"]
+    )
+    writer.writeheader()
+    for record in records:
+        for food in record["foods"]:
+            writer.writerow(
+                {
+                    "type": record["type"],
+                    "food_name": food["name"],
+                    "quantity": food["quantity"],
+                    "unit": food["unit"],
+                    "notes": record["notes"],
+                }
+            )
+    buffer.seek(0)
+    return list(csv.DictReader(buffer))
+
+
+def per_record_rejections(records: list[dict]) -> list[int]:
+    """従来の方法: 1件ずつ validate_meal_data を呼ぶ"""
+    return [
+        row
+        for row, record in enumerate(records)
+        if not validate_meal_data(record)["is_valid"]
+    ]
+
+
+def per_row_rejections(rows: list[dict]) -> list[int]:
+    """従来の方法: CSVの行を validate_meal_data の形式に詰め替えて1件ずつ検証"""
+    return per_record_rejections(
+        [
+            {
+                "type": row["type"],
+                "foods": [
+                    {
+                        "name": row["food_name"],
+                        "quantity": row["quantity"],
+                        "unit": row["unit"],
+                    }
+                ],
+                "notes": row["notes"],
+            }
+            for row in rows
+        ]
+    )
+
+
+def bulk_rejections(records: list[dict]) -> list[int]:
+    return [rejection.row for rejection in iter_meal_rejections(records)]
+
+
+def measure(funcs, records: list[dict], repeat: int) -> list[tuple[float, list[int]]]:
+    """
+    各関数の所要時間(ms)の最小値と不合格の行番号
+
+    負荷の揺らぎが片方だけに偏らないよう、関数を交互に実行し、計測中は
+    GCを止める（timeit と同じ）。
+    """
+    best = [float("inf")] * len(funcs)
+    rejected = [[] for _ in funcs]
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            for i, func in enumerate(funcs):
+                start = time.perf_counter()
+                rejected[i] = func(records)
+                best[i] = min(best[i], time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return [
+        (seconds * 1000, rows) for seconds, rows in zip(best, rejected, strict=True)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=5000, help="食事記録の件数")
+    parser.add_argument("--reject-ratio", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    records = make_records(args.records, args.reject_ratio)
+    rows = make_csv_rows(records)
+    print(f"{'input':<8} {'rows':>7} {'rejected':>9} {'legacy ms':>10} "
+          f"{'bulk ms':>9} {'speedup':>8} target")  # fmt: skip
+    for name, data, legacy_func in (
+        ("nested", records, per_record_rejections),
+        ("csv", rows, per_row_rejections),
+    ):
+        (legacy, expected), (bulk, rejected) = measure(
+            (legacy_func, bulk_rejections), data, args.repeat
+        )
+        assert rejected == expected, "一括検証と従来の検証で結果が異なります"
+        speedup = legacy / bulk
+        status = "ok" if speedup >= TARGET_SPEEDUP else "未達"
+        print(f"{name:<8} {len(data):>7} {len(rejected):>9} {legacy:>10.1f} "
+              f"{bulk:>9.1f} {speedup:>7.1f}x {status}")  # fmt: skip
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+スパンエクスポートのスループット計測
+
+フェイクのCloud Logging / Cloud Trace / Cloud Storageクライアント（遅延を設定可能）で
+CloudTraceLoggingSpanExporter.export を実行し、スパン/秒を計測します。
+比較用に、スパンごとに同期でlog_structを呼んでからCloud Traceへ書き込む
+従来方式と、スパンをJSON文字列経由で辞書化し属性サイズを都度シリアライズして
+計測していた方式（roundtrip）のエクスポートも計測します。比較用の2方式は
+大きな属性を都度バケットの存在確認をしてから非圧縮で同期アップロードします。
+認証情報やネットワークは不要です。
+
+使い方:
+    python scripts/benchmark_span_export.py --spans 50 --batches 20 --logging-latency 0.05
+    # 変換処理のCPU時間だけを比較する場合は遅延を0にする
+    python scripts/benchmark_span_export.py --attribute-size 60000 \
+        --logging-latency 0 --trace-latency 0 --storage-latency 0
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter  # noqa: E402
+from opentelemetry.sdk.trace import TracerProvider  # noqa: E402
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor  # noqa: E402
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (  # noqa: E402
+    InMemorySpanExporter,
+)
+
+from app.utils.tracing import CloudTraceLoggingSpanExporter  # noqa: E402
+
+
+class FakeLogger:
+    """書き込み1回ごとに遅延するCloud Loggingロガー"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.writes = 0
+
+    def log_struct(self, info, **kwargs):
+        time.sleep(self.latency)
+        self.writes += 1
+
+    def batch(self):
+        logger = self
+
+        class Batch:
+            def log_struct(self, info, **kwargs):
+                pass
+
+            def commit(self):
+                time.sleep(logger.latency)
+                logger.writes += 1
+
+        return Batch()
+
+
+class FakeLoggingClient:
+    def __init__(self, latency: float):
+        self._logger = FakeLogger(latency)
+
+    def logger(self, name):
+        return self._logger
+
+
+class FakeTraceClient:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def batch_write_spans(self, request):
+        time.sleep(self.latency)
+
+
+class FakeBlob:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def upload_from_string(self, *args, **kwargs):
+        time.sleep(self.latency)
+
+
+class FakeBucket:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def exists(self):
+        time.sleep(self.latency)
+        return True
+
+    def blob(self, name):
+        return FakeBlob(self.latency)
+
+
+class FakeStorageClient:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def bucket(self, name):
+        return FakeBucket(self.latency)
+
+
+def legacy_process_large_attributes(exporter, span_dict: dict, span_id: str) -> dict:
+    """従来方式の大きな属性の退避（都度の存在確認と非圧縮の同期アップロード）"""
+    attributes = span_dict["attributes"]
+    if len(json.dumps(attributes).encode()) > 255 * 1024:
+        attributes_retain = dict(attributes)
+        if exporter.storage_client.bucket(exporter.bucket_name).exists():
+            blob_name = f"spans/{span_id}.json"
+            exporter.bucket.blob(blob_name).upload_from_string(
+                json.dumps(dict(attributes)), "application/json"
+            )
+            attributes_retain["uri_payload"] = (
+                f"gs://{exporter.bucket_name}/{blob_name}"
+            )
+        span_dict["attributes"] = attributes_retain
+    return span_dict
+
+
+class LegacyExporter(CloudTraceLoggingSpanExporter):
+    """従来方式: スパンごとに同期でlog_structし、その後Cloud Traceへ書き込む"""
+
+    def export(self, spans):
+        for span in spans:
+            span_id = format(span.get_span_context().span_id, "x")
+            span_dict = json.loads(span.to_json())
+            span_dict["span_id"] = span_id
+            span_dict = legacy_process_large_attributes(self, span_dict, span_id)
+            self.logger.log_struct(span_dict, severity="INFO")
+        return CloudTraceSpanExporter.export(self, spans)
+
+
+class RoundTripExporter(CloudTraceLoggingSpanExporter):
+    """JSON文字列経由で辞書化し、属性サイズの計測とアップロードで2回シリアライズする方式"""
+
+    def export(self, spans):
+        span_dicts = []
+        for span in spans:
+            span_context = span.get_span_context()
+            span_id = format(span_context.span_id, "x")
+            span_dict = json.loads(span.to_json())
+            span_dict["trace"] = (
+                f"projects/{self.project_id}/traces/{span_context.trace_id:x}"
+            )
+            span_dict["span_id"] = span_id
+            span_dicts.append(legacy_process_large_attributes(self, span_dict, span_id))
+        logging_future = self._logging_executor.submit(self._write_logs, span_dicts)
+        result = CloudTraceSpanExporter.export(self, spans)
+        logging_future.result()
+        return result
+
+
+def make_spans(count: int, attribute_size: int) -> list:
+    """LLM呼び出し相当の属性を持つスパンを作成"""
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    tracer = provider.get_tracer("benchmark")
+    prompt = "栄養相談のプロンプトです。" * (attribute_size // 13 + 1)
+    for i in range(count):
+        with tracer.start_as_current_span(f"call_llm_{i}") as span:
+            span.set_attribute("gcp.vertex.agent.llm_request", prompt[:attribute_size])
+            span.set_attribute(
+                "gcp.vertex.agent.llm_response", prompt[: attribute_size // 4]
+            )
+            span.set_attribute("gen_ai.request.model", "gemini-2.0-flash")
+    return list(exporter.get_finished_spans())
+
+
+def build_exporter(cls, args):
+    return cls(
+        project_id="benchmark",
+        client=FakeTraceClient(args.trace_latency),
+        logging_client=FakeLoggingClient(args.logging_latency),
+        storage_client=FakeStorageClient(args.storage_latency),
+        bucket_name="benchmark-bucket",
+    )
+
+
+def measure(exporter, spans: list, batches: int) -> tuple[float, float]:
+    """スパン/秒と1スパンあたりのCPU時間(ms)を返す"""
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    for _ in range(batches):
+        exporter.export(spans)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    total = len(spans) * batches
+    return total / wall, cpu / total * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--spans", type=int, default=50, help="1回のexportのスパン数")
+    parser.add_argument("--batches", type=int, default=10, help="exportの回数")
+    parser.add_argument("--attribute-size", type=int, default=8000, help="属性の文字数")
+    parser.add_argument("--logging-latency", type=float, default=0.02)
+    parser.add_argument("--trace-latency", type=float, default=0.05)
+    parser.add_argument("--storage-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    spans = make_spans(args.spans, args.attribute_size)
+    print(f"{'exporter':<10} {'spans/s':>10} {'cpu ms/span':>12}")
+    for name, cls in (
+        ("legacy", LegacyExporter),
+        ("roundtrip", RoundTripExporter),
+        ("current", CloudTraceLoggingSpanExporter),
+    ):
+        exporter = build_exporter(cls, args)
+        throughput, cpu = measure(exporter, spans, args.batches)
+        exporter.shutdown()
+        print(f"{name:<10} {throughput:>10.0f} {cpu:>12.3f}")
+    print(f"current uploads: {exporter.upload_metrics()}")
+
+
+if __name__ == "__main__":
+    main()
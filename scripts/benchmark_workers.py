@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+ワーカー数ごとのスループット計測
+
+Agent EngineのNUM_WORKERSと同様に、AgentEngineAppを複数のワーカープロセスで
+起動し（各ワーカーがset_upを実行）、スタブバックエンド（AGENT_BACKEND=stub）に
+対してstream_queryを並列に送ってスループットとレイテンシを比較します。
+スタブバックエンドではログもCloud Loggingではなく標準のloggingに出力するため、
+認証情報やネットワークは不要です。
+
+使い方:
+    python scripts/benchmark_workers.py --workers 1 2 4 --concurrency 4 --requests 200
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# ワーカーの起動・応答を待つ上限（秒）
+WAIT_TIMEOUT = 120.0
+
+MESSAGES = [
+    "1歳8ヶ月の子どもの食事内容です。朝食: パン、牛乳 昼食: うどん 夕食: ご飯、鮭。栄養分析をお願いします",
+    "小松菜は何分茹でればいい？",
+    "鉄分を摂れる他の食材は？",
+]
+
+
+def worker_main(worker_id: int, concurrency: int, tasks, results, ready) -> None:
+    """ワーカープロセス: AgentEngineAppを初期化し、タスクを同時実行数分のスレッドで処理"""
+    os.environ["WORKER_CONCURRENCY"] = str(concurrency)
+
+    import vertexai
+
+    from app.agent_engine_app import AgentEngineApp
+    from app.vertex_ai_agent import get_root_agent
+
+    # プロジェクトIDの解決（Resource Manager API呼び出し）を避ける
+    vertexai.init(project="stub-project", location="us-central1")
+
+    app = AgentEngineApp(agent=get_root_agent())
+    app.set_up()
+    # 初回実行の遅延初期化を計測から除外
+    for _ in app.stream_query(message=MESSAGES[1], user_id=f"warmup-{worker_id}"):
+        pass
+    ready.put(os.getpid())
+
+    def consume() -> None:
+        while (index := tasks.get()) is not None:
+            start = time.perf_counter()
+            for _ in app.stream_query(
+                message=MESSAGES[index % len(MESSAGES)],
+                user_id=f"worker-{worker_id}-{index}",
+            ):
+                pass
+            results.put(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(consume)
+
+
+def collect(source, count: int, processes, deadline: float) -> list:
+    """ワーカーの生存を確認しながらキューからcount件受け取る
+
+    Raises:
+        RuntimeError: ワーカーが異常終了した場合
+        TimeoutError: deadlineまでに受け取れなかった場合
+    """
+    items = []
+    while len(items) < count:
+        try:
+            items.append(source.get(timeout=1.0))
+        except queue.Empty:
+            failed = [p for p in processes if p.exitcode not in (None, 0)]
+            if failed:
+                for process in processes:
+                    process.kill()
+                raise RuntimeError(
+                    f"ワーカーが異常終了しました: exitcode={failed[0].exitcode}"
+                ) from None
+            if time.monotonic() > deadline:
+                for process in processes:
+                    process.kill()
+                raise TimeoutError(
+                    f"{WAIT_TIMEOUT:.0f}秒以内にワーカーから応答がありません"
+                ) from None
+    return items
+
+
+def run(num_workers: int, concurrency: int, requests: int) -> dict:
+    """指定したワーカー数で計測"""
+    ctx = mp.get_context("spawn")
+    tasks, results, ready = ctx.Queue(), ctx.Queue(), ctx.Queue()
+    processes = [
+        ctx.Process(target=worker_main, args=(i, concurrency, tasks, results, ready))
+        for i in range(num_workers)
+    ]
+    for process in processes:
+        process.start()
+    pids = set(collect(ready, num_workers, processes, time.monotonic() + WAIT_TIMEOUT))
+
+    start = time.perf_counter()
+    for index in range(requests):
+        tasks.put(index)
+    for _ in range(num_workers * concurrency):
+        tasks.put(None)
+    latencies = collect(results, requests, processes, time.monotonic() + WAIT_TIMEOUT)
+    wall = time.perf_counter() - start
+
+    for process in processes:
+        process.join()
+    latencies.sort()
+    return {
+        "workers": num_workers,
+        "pids": len(pids),
+        "throughput": requests / wall,
+        "p50": statistics.median(latencies),
+        "p95": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="ワーカーあたりの同時実行数"
+    )
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--first-token-delay", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=2000)
+    parser.add_argument("--search-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    from app.agent_engine_app import validate_worker_settings
+
+    for num_workers in args.workers:
+        validate_worker_settings(num_workers, args.concurrency)
+
+    # 子プロセスに引き継ぐ設定
+    os.environ.update(
+        AGENT_BACKEND="stub",
+        DISABLE_TRACING="true",
+        STUB_LLM_FIRST_TOKEN_DELAY=str(args.first_token_delay),
+        STUB_LLM_TOKENS_PER_SECOND=str(args.tokens_per_second),
+        STUB_SEARCH_LATENCY=str(args.search_latency),
+    )
+
+    print(f"{'workers':>7} {'req/s':>8} {'p50(ms)':>8} {'p95(ms)':>8}")
+    baseline = None
+    for num_workers in args.workers:
+        result = run(num_workers, args.concurrency, args.requests)
+        assert result["pids"] == num_workers, "ワーカーごとにset_upされていません"
+        baseline = baseline or result["throughput"]
+        print(
+            f"{num_workers:>7} {result['throughput']:>8.1f} "
+            f"{result['p50'] * 1000:>8.0f} {result['p95'] * 1000:>8.0f}"
+            f"  (x{result['throughput'] / baseline:.2f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
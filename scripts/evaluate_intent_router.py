@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+発話意図ルーターの評価スクリプト
+
+学習・ルール調整用のサンプル（INTENT_SAMPLES）で学習したルーターを、
+評価専用のサンプル（INTENT_HOLDOUT_SAMPLES）で評価し、
+初回相談判定とPDF検索要否判定の適合率・再現率を表示します。
+ルールは INTENT_SAMPLES を見て作っているため、指標は評価専用サンプルでのみ報告します。
+"""
+
+import argparse
+import sys
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.agents.intent_router import CONSULTATION, IntentRouter
+from app.data.intent_samples import INTENT_HOLDOUT_SAMPLES, INTENT_SAMPLES
+
+
+def precision_recall(pairs: list[tuple[bool, bool]]) -> tuple[float, float, int]:
+    """(予測, 正解) の組から適合率・再現率・正例数を計算"""
+    tp = sum(1 for predicted, actual in pairs if predicted and actual)
+    fp = sum(1 for predicted, actual in pairs if predicted and not actual)
+    fn = sum(1 for predicted, actual in pairs if not predicted and actual)
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return precision, recall, tp + fn
+
+
+def evaluate(
+    train: list[tuple[str, str, bool]], test: list[tuple[str, str, bool]]
+) -> dict[str, object]:
+    """train で学習したルーターを test で評価"""
+    turn_pairs: list[tuple[bool, bool]] = []
+    grounding_pairs: list[tuple[bool, bool]] = []
+    sources: Counter[str] = Counter()
+    errors = []
+
+    router = IntentRouter(train)
+    for message, turn_type, needs_grounding in test:
+        decision = router.classify(message)
+        sources[decision.source] += 1
+        turn_pairs.append(
+            (decision.turn_type == CONSULTATION, turn_type == CONSULTATION)
+        )
+        grounding_pairs.append((decision.needs_grounding, needs_grounding))
+        if (decision.turn_type, decision.needs_grounding) != (
+            turn_type,
+            needs_grounding,
+        ):
+            errors.append((message, turn_type, needs_grounding, decision))
+
+    return {
+        "turn_type": precision_recall(turn_pairs),
+        "needs_grounding": precision_recall(grounding_pairs),
+        "sources": sources,
+        "errors": errors,
+    }
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="発話意図ルーターの評価")
+    parser.add_argument(
+        "--show-errors", action="store_true", help="誤判定したサンプルを表示"
+    )
+    args = parser.parse_args()
+
+    result = evaluate(INTENT_SAMPLES, INTENT_HOLDOUT_SAMPLES)
+
+    print(
+        f"学習サンプル数: {len(INTENT_SAMPLES)} / "
+        f"評価サンプル数（未使用）: {len(INTENT_HOLDOUT_SAMPLES)}"
+    )
+    for label, title in (
+        ("turn_type", "初回相談判定"),
+        ("needs_grounding", "PDF検索要否"),
+    ):
+        precision, recall, positives = result[label]
+        print(
+            f"{title}: precision={precision:.3f} recall={recall:.3f} "
+            f"(正例 {positives}件)"
+        )
+    print(f"判定元: {dict(result['sources'])}")
+
+    if args.show_errors:
+        for message, turn_type, needs_grounding, decision in result["errors"]:
+            print(
+                f"- {message[:40]!r} 正解=({turn_type}, {needs_grounding}) "
+                f"予測=({decision.turn_type}, {decision.needs_grounding}, {decision.source})"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+agent_engine_stream の同時ストリーム数ロードテスト（Flask版 vs ASGI版）
+
+Agent Engine の stream_query の代わりに、JSON Linesを一定間隔で返すローカルの
+上流サーバーを起動し、同じ関数を2つのエントリポイントで動かして
+--streams 本のチャットストリームを同時に送ります。
+
+- flask: agent_engine_stream（functions_framework.create_app）を、
+  --threads 個のワーカースレッドを持つWSGIサーバーで実行
+  （gunicorn gthread と同じく、1ストリームが1スレッドを占有する）
+- asgi: agent_engine_stream_asgi（functions_framework.aio.create_asgi_app）を
+  uvicornで実行（ストリームはイベントループ上で中継する）
+
+上流で同時に処理中だったストリーム数の最大値が、1インスタンスで
+同時に中継できたストリーム数になります。Firebase認証は検証済みトークンの
+キャッシュを差し替えて省略し、Google Cloudの認証情報やネットワークは不要です。
+
+使い方:
+    python scripts/load_test_stream_asgi.py --streams 50 --threads 10
+    # 上流の応答を長くする場合（1ストリームあたり 40 x 0.05 = 2秒）
+    python scripts/load_test_stream_asgi.py --chunks 40 --chunk-delay 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+FUNCTION_DIR = ROOT / "cloud_functions" / "agent_engine_stream"
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(FUNCTION_DIR))
+
+# Vertex AI Agent Engine用のハンドラーを、認証情報なしで使う
+os.environ["DEVELOPMENT_MODE"] = "vertex_ai"
+os.environ["AGENT_BACKEND"] = "stub"
+
+import functions_framework  # noqa: E402
+import functions_framework.aio  # noqa: E402
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from werkzeug.serving import BaseWSGIServer  # noqa: E402
+
+from app.auth import firebase_tokens  # noqa: E402
+from app.auth.token_cache import VerifiedTokenCache  # noqa: E402
+
+TOKEN = "load-test-token"
+SESSION_ID = "load-test-session"
+
+
+class AgentEngineHandler(BaseHTTPRequestHandler):
+    """stream_query の応答をチャンク転送で少しずつ返す上流サーバー"""
+
+    protocol_version = "HTTP/1.1"
+    chunks = 20
+    chunk_delay = 0.1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(self.chunks):
+                time.sleep(self.chunk_delay)
+                line = (
+                    json.dumps(
+                        {
+                            "author": "lifestyle_advisor",
+                            "content": {"parts": [{"text": f"ごはんの話 {i}。"}]},
+                        },
+                        ensure_ascii=False,
+                    ).encode()
+                    + b"\n"
+                )
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class UpstreamServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 同時接続を取りこぼさないよう接続待ちキューを広げる
+    request_queue_size = 1024
+
+    def __init__(self, address, handler):
+        super().__init__(address, handler)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def finish_request(self, request, client_address):
+        request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super().finish_request(request, client_address)
+
+
+class BoundedThreadWSGIServer(BaseWSGIServer):
+    """決まった数のワーカースレッドでリクエストを処理するWSGIサーバー"""
+
+    def __init__(self, host: str, port: int, app, threads: int):
+        super().__init__(host, port, app)
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure_function(module, upstream_url: str) -> None:
+    """読み込んだ main モジュールの上流URLをローカルサーバーに向ける"""
+    from environment_config import StagingConfig
+    from handlers import RemoteChatHandler
+
+    class LoadTestConfig(StagingConfig):
+        def get_vertex_ai_urls(self) -> dict[str, str]:
+            return {
+                "agent_engine_url": f"{upstream_url}/streamQuery",
+                "sessions_base_url": f"{upstream_url}/sessions",
+                "operations_base_url": upstream_url,
+            }
+
+    module.config = LoadTestConfig()
+    module.chat_handler = RemoteChatHandler(module.config)
+
+
+def start_flask(threads: int) -> tuple[BoundedThreadWSGIServer, str]:
+    app = functions_framework.create_app(
+        target="agent_engine_stream", source=str(FUNCTION_DIR / "main.py")
+    )
+    port = free_port()
+    server = BoundedThreadWSGIServer("127.0.0.1", port, app, threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{port}"
+
+
+def start_asgi() -> tuple[uvicorn.Server, str]:
+    app = functions_framework.aio.create_asgi_app(
+        target="agent_engine_stream_asgi", source=str(FUNCTION_DIR / "main.py")
+    )
+    port = free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def open_stream(client: httpx.AsyncClient, url: str) -> tuple[float, float]:
+    """チャットストリームを1本受信し、(最初のイベントまで, 完了まで) の秒数を返す"""
+    start = time.perf_counter()
+    first_event = None
+    body = ""
+    async with client.stream(
+        "POST",
+        f"{url}/api/chat/stream",
+        json={"message": "1歳の子の朝ごはん", "sessionId": SESSION_ID},
+        headers={"Authorization": f"Bearer {TOKEN}"},
+    ) as response:
+        response.raise_for_status()
+        async for text in response.aiter_text():
+            if first_event is None and "agent_start" in text:
+                first_event = time.perf_counter() - start
+            body += text
+    if '"stream_end"' not in body:
+        raise RuntimeError(f"stream did not finish: {body[-200:]}")
+    return first_event, time.perf_counter() - start
+
+
+async def run_streams(url: str, streams: int) -> dict:
+    limits = httpx.Limits(max_connections=streams, max_keepalive_connections=streams)
+    async with httpx.AsyncClient(limits=limits, timeout=120.0) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(open_stream(client, url) for _ in range(streams))
+        )
+        elapsed = time.perf_counter() - start
+    first_events = sorted(r[0] for r in results)
+    durations = sorted(r[1] for r in results)
+    return {
+        "elapsed": elapsed,
+        "ttfb_p50": statistics.median(first_events),
+        "ttfb_p95": first_events[int(len(first_events) * 0.95)],
+        "total_p95": durations[int(len(durations) * 0.95)],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--streams", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=10)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--chunk-delay", type=float, default=0.1)
+    args = parser.parse_args()
+
+    AgentEngineHandler.chunks = args.chunks
+    AgentEngineHandler.chunk_delay = args.chunk_delay
+    upstream = UpstreamServer(("127.0.0.1", 0), AgentEngineHandler)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    upstream_url = f"http://127.0.0.1:{upstream.server_port}"
+
+    # 認証はトークンを検証済みとして扱う
+    firebase_tokens.token_cache = VerifiedTokenCache(
+        lambda token: {"uid": "load-test-user", "exp": time.time() + 3600}
+    )
+
+    flask_server, flask_url = start_flask(args.threads)
+    configure_function(sys.modules["main"], upstream_url)
+    asgi_server, asgi_url = start_asgi()
+    configure_function(sys.modules["main"], upstream_url)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    stream_seconds = args.chunks * args.chunk_delay
+    print(f"streams={args.streams} upstream={stream_seconds:.1f}s/stream "
+          f"flask threads={args.threads}")  # fmt: skip
+    print(f"{'mode':<6} {'peak streams':>12} {'elapsed s':>9} "
+          f"{'ttfb p50':>9} {'ttfb p95':>9} {'total p95':>9}")  # fmt: skip
+    for mode, url in (("flask", flask_url), ("asgi", asgi_url)):
+        upstream.peak = 0
+        result = asyncio.run(run_streams(url, args.streams))
+        print(f"{mode:<6} {upstream.peak:>12} {result['elapsed']:>9.2f} "
+              f"{result['ttfb_p50']:>9.2f} {result['ttfb_p95']:>9.2f} "
+              f"{result['total_p95']:>9.2f}")  # fmt: skip
+
+    flask_server.shutdown()
+    asgi_server.should_exit = True
+    upstream.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+フレームワークのオーバーヘッド計測
+
+AGENT_BACKEND=stub のエージェントをADK Runnerで実行し、エンドツーエンドの
+処理時間からスタブが模擬したモデル・検索時間を差し引いて、ADKと
+コールバック群（意図判定・履歴圧縮・キャッシュ等）のオーバーヘッドを求めます。
+認証情報やネットワークは不要です。
+
+使い方:
+    python scripts/measure_framework_overhead.py --turns 20 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+CONVERSATION = [
+    "1歳8ヶ月の子どもの食事内容です。朝食: パン、バナナ、牛乳 昼食: うどん、にんじん 夕食: ご飯、鮭。栄養分析をお願いします",
+    "小松菜は何分茹でればいい？",
+    "鉄分を摂れる他の食材は？",
+    "ありがとう！",
+]
+
+
+def percentile(values: list[float], q: float) -> float:
+    """パーセンタイル値を計算"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_session(runner, session_service, user_id: str, turns: int) -> list[float]:
+    """1セッション分の会話を実行し、ターンごとの処理時間を返す"""
+    from google.adk.runners import RunConfig, StreamingMode
+    from google.genai import types
+
+    session = session_service.create_session(app_name=runner.app_name, user_id=user_id)
+    run_config = RunConfig(streaming_mode=StreamingMode.SSE)
+    latencies = []
+    for turn in range(turns):
+        message = types.UserContent(
+            parts=[types.Part.from_text(text=CONVERSATION[turn % len(CONVERSATION)])]
+        )
+        start = time.perf_counter()
+        async for _ in runner.run_async(
+            user_id=user_id,
+            session_id=session.id,
+            new_message=message,
+            run_config=run_config,
+        ):
+            pass
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def measure(turns: int, concurrency: int) -> dict:
+    """並列セッションで計測し、集計結果を返す"""
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+
+    from app.agents import stub_backends
+    from app.agents.unified_nutrition_agent import create_unified_nutrition_agent
+
+    agent = create_unified_nutrition_agent()
+    session_service = InMemorySessionService()
+    runner = Runner(app_name=agent.name, agent=agent, session_service=session_service)
+
+    stub_backends.reset_stub_stats()
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            run_session(runner, session_service, f"user-{i}", turns)
+            for i in range(concurrency)
+        )
+    )
+    wall = time.perf_counter() - start
+
+    latencies = [latency for session in results for latency in session]
+    stats = stub_backends.get_stub_stats()
+    simulated = stats["llm_seconds"] + stats["search_seconds"]
+    total = sum(latencies)
+    return {
+        "turns": len(latencies),
+        "wall": wall,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "simulated": simulated,
+        "overhead_per_turn": (total - simulated) / len(latencies),
+        "stats": stats,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--turns", type=int, default=8, help="1セッションあたりのターン数"
+    )
+    parser.add_argument("--concurrency", type=int, default=1, help="並列セッション数")
+    parser.add_argument("--tokens-per-second", type=float, help="スタブの生成速度")
+    parser.add_argument(
+        "--first-token-delay", type=float, help="スタブの初回トークン遅延(秒)"
+    )
+    parser.add_argument("--search-latency", type=float, help="スタブ検索の遅延(秒)")
+    args = parser.parse_args()
+
+    os.environ["AGENT_BACKEND"] = "stub"
+    for name, value in (
+        ("STUB_LLM_TOKENS_PER_SECOND", args.tokens_per_second),
+        ("STUB_LLM_FIRST_TOKEN_DELAY", args.first_token_delay),
+        ("STUB_SEARCH_LATENCY", args.search_latency),
+    ):
+        if value is not None:
+            os.environ[name] = str(value)
+
+    result = asyncio.run(measure(args.turns, args.concurrency))
+    stats = result["stats"]
+
+    print(f"ターン数: {result['turns']}  並列数: {args.concurrency}")
+    print(f"総経過時間: {result['wall']:.2f}s")
+    print(
+        f"ターン処理時間: p50 {result['p50'] * 1000:.0f}ms / "
+        f"p95 {result['p95'] * 1000:.0f}ms"
+    )
+    print(
+        f"模擬時間: LLM {stats['llm_calls']}回 {stats['llm_seconds']:.2f}s / "
+        f"検索 {stats['searches']}回 {stats['search_seconds']:.2f}s"
+    )
+    print(
+        f"フレームワークのオーバーヘッド: {result['overhead_per_turn'] * 1000:.1f}ms/ターン"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+ローカルスタック（スタブバックエンド）の負荷テスト
+
+`make dev-backend-stub` で起動したストリーミングAPI（localhost:8082）に対して、
+セッション作成→初回相談→追加質問の会話を送ります。モデルと検索はスタブの
+ため、計測値はストリーミング関数とADKのオーバーヘッドを表します。
+"""
+
+import json
+import logging
+import os
+import time
+
+from locust import HttpUser, between, task
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+BASE_URL = os.environ.get("LOCAL_STACK_URL", "http://localhost:8082")
+
+CONSULTATION = (
+    "1歳8ヶ月の子どもの食事内容です。朝食: パン、バナナ、牛乳 "
+    "昼食: うどん、にんじん 夕食: ご飯、鮭。栄養分析をお願いします"
+)
+FOLLOW_UPS = ["小松菜は何分茹でればいい？", "鉄分を摂れる他の食材は？"]
+
+
+class LocalChatUser(HttpUser):
+    """ローカルのチャットAPIで会話するユーザー"""
+
+    wait_time = between(0.5, 1.5)
+    host = BASE_URL
+
+    def on_start(self) -> None:
+        """ユーザーごとにセッションを作成"""
+        response = self.client.post("/api/sessions", json={}, name="/api/sessions")
+        self.session_id = response.json().get("sessionId", "default")
+
+    def _chat(self, message: str, name: str) -> None:
+        """チャットを送信し、初回チャンクまでと完了までの時間を記録"""
+        start = time.time()
+        first_chunk = None
+        with self.client.post(
+            "/api/chat/stream",
+            json={"message": message, "sessionId": self.session_id},
+            name=name,
+            stream=True,
+            catch_response=True,
+        ) as response:
+            body = ""
+            for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                body += chunk
+                if first_chunk is None and '"type": "chunk"' in body:
+                    first_chunk = time.time()
+            # ローカルハンドラーは区切りをエスケープ済みの "\\n\\n" で送るため両方に対応
+            for raw in body.replace("\\n\\n", "\n\n").split("\n\n"):
+                if not raw.startswith("data: "):
+                    continue
+                event = json.loads(raw[6:])
+                if event.get("type") == "error":
+                    response.failure(event.get("content"))
+                    return
+            response.success()
+
+        if first_chunk is not None:
+            self.environment.events.request.fire(
+                request_type="SSE",
+                name=f"{name} (first chunk)",
+                response_time=(first_chunk - start) * 1000,
+                response_length=0,
+                response=None,
+                context={},
+                exception=None,
+            )
+
+    @task
+    def conversation(self) -> None:
+        """初回相談と追加質問を送信"""
+        self._chat(CONSULTATION, "consultation")
+        for message in FOLLOW_UPS:
+            self._chat(message, "follow_up")
@@ -0,0 +1,151 @@
+"""app/agent_engine_app.pyのワーカー並列設定のユニットテスト"""
+
+import threading
+
+import pytest
+import vertexai
+from opentelemetry.sdk.trace import SpanProcessor
+
+from app import agent_engine_app
+from app.agent_engine_app import (
+    AgentEngineApp,
+    LocalLoggingClient,
+    WorkerLocalSpanProcessor,
+    get_worker_concurrency,
+    validate_worker_settings,
+)
+
+
+@pytest.fixture
+def stub_env(monkeypatch):
+    monkeypatch.setenv("AGENT_BACKEND", "stub")
+    monkeypatch.setenv("DISABLE_TRACING", "true")
+    monkeypatch.setenv("STUB_LLM_FIRST_TOKEN_DELAY", "0")
+    monkeypatch.setenv("STUB_SEARCH_LATENCY", "0")
+    # プロジェクトIDの解決（Resource Manager API呼び出し）を避ける
+    vertexai.init(project="stub-project", location="us-central1")
+
+
+def _stub_agent():
+    from app.agents.unified_nutrition_agent import create_unified_nutrition_agent
+
+    return create_unified_nutrition_agent()
+
+
+@pytest.mark.parametrize("num_workers,concurrency", [(0, 4), (9, 4), (1, 0), (1, 33)])
+def test_invalid_worker_settings(num_workers, concurrency):
+    """範囲外のワーカー設定がエラーになることのテスト"""
+    with pytest.raises(ValueError):
+        validate_worker_settings(num_workers, concurrency)
+
+
+def test_worker_concurrency_from_env(monkeypatch):
+    """WORKER_CONCURRENCY の読み取りと既定値のテスト"""
+    monkeypatch.delenv("WORKER_CONCURRENCY", raising=False)
+    assert get_worker_concurrency() == agent_engine_app.DEFAULT_WORKER_CONCURRENCY
+    monkeypatch.setenv("WORKER_CONCURRENCY", "2")
+    assert get_worker_concurrency() == 2
+
+
+def test_span_processor_rebuilt_per_process(monkeypatch):
+    """PIDが変わると下位プロセッサが作り直されることのテスト"""
+    created = []
+
+    def factory():
+        created.append(SpanProcessor())
+        return created[-1]
+
+    processor = WorkerLocalSpanProcessor(factory)
+    monkeypatch.setattr(agent_engine_app.os, "getpid", lambda: 100)
+    processor.on_end(None)
+    processor.on_end(None)
+    monkeypatch.setattr(agent_engine_app.os, "getpid", lambda: 101)
+    processor.on_end(None)
+    assert len(created) == 2
+
+
+def test_set_up_shares_logging_client_per_process(stub_env):
+    """同一プロセス内のクローンがロギングクライアントを共有することのテスト"""
+    app = AgentEngineApp(agent=_stub_agent())
+    app.set_up()
+    clone = app.clone()
+    clone.set_up()
+    assert app.logger.client is clone.logger.client
+    assert app._request_slots is clone._request_slots
+    assert app._tmpl_attrs["runner"] is not clone._tmpl_attrs["runner"]
+
+
+def test_request_slots_rebuilt_per_process(monkeypatch):
+    """PIDが変わると同時実行数制限のセマフォが作り直されることのテスト"""
+    monkeypatch.setattr(agent_engine_app, "_worker_request_slots", {})
+    monkeypatch.setattr(agent_engine_app.os, "getpid", lambda: 100)
+    slots = agent_engine_app._get_worker_request_slots()
+    assert agent_engine_app._get_worker_request_slots() is slots
+    monkeypatch.setattr(agent_engine_app.os, "getpid", lambda: 101)
+    assert agent_engine_app._get_worker_request_slots() is not slots
+    assert list(agent_engine_app._worker_request_slots) == [101]
+
+
+def test_stub_backend_needs_no_cloud_logging(stub_env, monkeypatch):
+    """スタブバックエンドではCloud Loggingのクライアントを作らないことのテスト"""
+
+    def cloud_client():
+        raise AssertionError("Cloud Logging client should not be created")
+
+    monkeypatch.setattr(agent_engine_app, "_worker_logging_clients", {})
+    monkeypatch.setattr(agent_engine_app, "_worker_feedback_writers", {})
+    monkeypatch.setattr(agent_engine_app.google_cloud_logging, "Client", cloud_client)
+    app = AgentEngineApp(agent=_stub_agent())
+    app.set_up()
+
+    assert isinstance(app.logger.client, LocalLoggingClient)
+
+
+def test_clone_shares_agent_definition(stub_env):
+    """cloneがエージェントを共有し、実行時の状態を引き継がないことのテスト"""
+    app = AgentEngineApp(agent=_stub_agent(), env_vars={"KEY": "value"})
+    app.set_up()
+    clone = app.clone()
+
+    assert clone._tmpl_attrs["agent"] is app._tmpl_attrs["agent"]
+    assert clone._tmpl_attrs["env_vars"] == {"KEY": "value"}
+    assert clone._tmpl_attrs["env_vars"] is not app._tmpl_attrs["env_vars"]
+    assert "runner" not in clone._tmpl_attrs
+    assert not hasattr(clone, "logger")
+
+
+def test_stream_query_respects_concurrency(stub_env, monkeypatch):
+    """同時実行数が WORKER_CONCURRENCY 以下に制限されることのテスト"""
+    monkeypatch.setenv("WORKER_CONCURRENCY", "2")
+    monkeypatch.setenv("STUB_LLM_FIRST_TOKEN_DELAY", "0.05")
+    app = AgentEngineApp(agent=_stub_agent())
+    app.set_up()
+
+    active, peak, lock = 0, 0, threading.Lock()
+    original = agent_engine_app.AdkApp.stream_query
+
+    def tracked(self, **kwargs):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        try:
+            yield from original(self, **kwargs)
+        finally:
+            with lock:
+                active -= 1
+
+    monkeypatch.setattr(agent_engine_app.AdkApp, "stream_query", tracked)
+    threads = [
+        threading.Thread(
+            target=lambda i=i: list(
+                app.stream_query(message="ありがとう", user_id=f"u{i}")
+            )
+        )
+        for i in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak == 2
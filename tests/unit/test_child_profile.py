@@ -0,0 +1,96 @@
+"""app/agents/child_profile.pyのユニットテスト"""
+
+from types import SimpleNamespace
+
+from google.adk.events import Event, EventActions
+from google.adk.models.llm_request import LlmRequest
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools import FunctionTool
+from google.genai import types
+
+from app.agents import child_profile
+from app.agents.callback_utils import chain_tool_callbacks
+from app.agents.child_profile import STATE_KEY, ChildProfile, load_profile
+
+PROFILE = {
+    "name": "はな",
+    "age_months": 20,
+    "allergens": ["卵"],
+    "dislikes": ["ピーマン"],
+}
+
+
+def analyze_meal(
+    breakfast: str, age_group: str = "1-2歳", allergens: list[str] | None = None
+):
+    """テスト用の食事分析ツール"""
+    return {"age_group": age_group, "allergens": allergens}
+
+
+def test_profile_header():
+    """プロフィールヘッダーの内容のテスト"""
+    profile = ChildProfile.model_validate(PROFILE)
+    assert profile.age_group == "1-2歳"
+    assert profile.to_header() == (
+        "## 【お子さまのプロフィール】\n"
+        "年齢: 1歳8ヶ月（1-2歳） / アレルギー: 卵 / 苦手: ピーマン"
+    )
+
+
+def test_header_distinguishes_unknown_and_no_allergies():
+    """アレルギー未入力（不明）と「なし」の入力をヘッダーで区別することのテスト"""
+    unknown = ChildProfile(age_months=20)
+    declared_none = ChildProfile(age_months=20, allergens=[])
+
+    assert "アレルギー: 不明（未確認）" in unknown.to_header()
+    assert "アレルギー: なし" in declared_none.to_header()
+
+
+def test_header_added_to_prompt():
+    """システム指示にヘッダーが追加されることのテスト"""
+    request = LlmRequest(config=types.GenerateContentConfig())
+    child_profile.before_model_callback(
+        SimpleNamespace(state={STATE_KEY: PROFILE}), request
+    )
+    assert "1歳8ヶ月" in request.config.system_instruction
+
+
+def test_tool_args_injected():
+    """age_group / allergens がツール引数に注入されることのテスト"""
+    tool = FunctionTool(func=analyze_meal)
+    args = {"breakfast": "パン", "allergens": ["小麦"]}
+    tool_context = SimpleNamespace(state={STATE_KEY: {**PROFILE, "age_months": 40}})
+
+    chained = chain_tool_callbacks(child_profile.before_tool_callback)
+    assert chained(tool=tool, args=args, tool_context=tool_context) is None
+    assert args == {
+        "breakfast": "パン",
+        "age_group": "3歳",
+        "allergens": ["卵", "小麦"],
+    }
+
+
+def test_no_profile_leaves_args():
+    """プロフィール未設定時は引数を変更しないことのテスト"""
+    args = {"breakfast": "パン"}
+    child_profile.before_tool_callback(
+        FunctionTool(func=analyze_meal), args, SimpleNamespace(state={})
+    )
+    assert args == {"breakfast": "パン"}
+
+
+def test_state_delta_updates_session():
+    """状態差分のイベント追記でプロフィールが保存されることのテスト"""
+    service = InMemorySessionService()
+    session = service.create_session(app_name="app", user_id="u")
+    service.append_event(
+        session,
+        Event(
+            invocation_id="state-1",
+            author="user",
+            actions=EventActions(state_delta={STATE_KEY: PROFILE}),
+        ),
+    )
+
+    stored = service.get_session(app_name="app", user_id="u", session_id=session.id)
+    assert load_profile(stored.state) == ChildProfile.model_validate(PROFILE)
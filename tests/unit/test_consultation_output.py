@@ -0,0 +1,154 @@
+"""初回相談の構造化出力（スキーマ設定・ストリーミング整形）のユニットテスト"""
+
+import importlib.util
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+from app.agents import consultation_output
+from app.agents.consultation_output import ConsultationReport
+
+_RENDERER_PATH = (
+    Path(__file__).resolve().parents[2]
+    / "cloud_functions"
+    / "agent_engine_stream"
+    / "utils"
+    / "consultation_renderer.py"
+)
+_spec = importlib.util.spec_from_file_location("consultation_renderer", _RENDERER_PATH)
+renderer_module = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(renderer_module)
+
+REPORT = {
+    "age": "1歳8ヶ月",
+    "praise": "牛乳とバナナでカルシウムが摂れています",
+    "concern": "ただし鉄分がもう少し必要かもしれません",
+    "suggestion": "夕食に小松菜を刻んで混ぜると鉄分が補えますよ",
+    "nutrients": [
+        {
+            "name": "鉄分",
+            "reason": "鉄分を含む食材がありません",
+            "foods": ["小松菜", "納豆", "牛赤身肉"],
+        },
+        {
+            "name": "ビタミンC",
+            "reason": "野菜が少なめです",
+            "foods": ["いちご", "ブロッコリー", "みかん"],
+        },
+    ],
+}
+
+
+class TestConsultationSchemaCallback:
+    """レスポンススキーマ設定のテスト"""
+
+    def _request(self) -> LlmRequest:
+        return LlmRequest(
+            config=types.GenerateContentConfig(
+                tools=[
+                    types.Tool(
+                        retrieval=types.Retrieval(
+                            vertex_ai_search=types.VertexAISearch(datastore="ds")
+                        )
+                    )
+                ]
+            )
+        )
+
+    def test_schema_set_for_consultation(self, monkeypatch):
+        """構造化モードの検索不要な初回相談でスキーマが設定されることのテスト"""
+        monkeypatch.setenv("CONSULTATION_OUTPUT_MODE", "structured")
+        request = self._request()
+        consultation_output.before_model_callback(
+            SimpleNamespace(
+                state={"turn_type": "consultation", "needs_grounding": False}
+            ),
+            request,
+        )
+
+        assert request.config.response_schema is ConsultationReport
+        assert request.config.response_mime_type == "application/json"
+        assert not request.config.tools
+
+    def test_grounded_consultation_keeps_retrieval(self, monkeypatch):
+        """検索が必要な初回相談ではリトリーバルを残しスキーマを設定しないことのテスト"""
+        monkeypatch.setenv("CONSULTATION_OUTPUT_MODE", "structured")
+        request = self._request()
+        consultation_output.before_model_callback(
+            SimpleNamespace(
+                state={"turn_type": "consultation", "needs_grounding": True}
+            ),
+            request,
+        )
+
+        assert request.config.response_schema is None
+        assert request.config.tools
+
+    def test_markdown_mode_untouched(self, monkeypatch):
+        """既定（マークダウン）モードでは変更しないことのテスト"""
+        monkeypatch.delenv("CONSULTATION_OUTPUT_MODE", raising=False)
+        request = self._request()
+        consultation_output.before_model_callback(
+            SimpleNamespace(state={"turn_type": "consultation"}), request
+        )
+
+        assert request.config.response_schema is None
+        assert request.config.tools
+
+
+class TestConsultationRenderer:
+    """ストリーミング整形のテスト"""
+
+    def test_partial_json_keeps_only_complete_values(self):
+        """途中までのJSONで確定した値のみが解析されることのテスト"""
+        parsed, complete = renderer_module.parse_partial_json(
+            '{"age": "1歳8ヶ月", "praise": "牛乳と'
+        )
+        assert parsed == {"age": "1歳8ヶ月"}
+        assert complete is False
+
+    def test_streamed_output_matches_full_render(self):
+        """断片ごとの出力を連結すると一括整形と一致することのテスト"""
+        text = json.dumps(REPORT, ensure_ascii=False)
+        renderer = renderer_module.ConsultationStreamRenderer(enabled=True)
+        deltas = [renderer.feed(text[i : i + 7]) for i in range(0, len(text), 7)]
+        deltas.append(renderer.finish())
+
+        expected = renderer_module.render_consultation_markdown(REPORT)
+        assert "".join(deltas) == expected
+        assert expected.startswith("🥗 **栄養アドバイザーより**")
+        assert "→ 小松菜/納豆/牛赤身肉" in expected
+        # 受信途中から表示が始まる
+        assert sum(1 for delta in deltas if delta) > 3
+
+    def test_plain_text_passes_through(self):
+        """JSONでない応答はそのまま出力されることのテスト"""
+        renderer = renderer_module.ConsultationStreamRenderer(enabled=True)
+        assert renderer.feed("1歳なら") == "1歳なら"
+        assert renderer.feed("2-3分茹でてください") == "2-3分茹でてください"
+        assert renderer.finish() == ""
+
+    def test_invalid_json_tail_is_sent_raw(self):
+        """整形後に解析できなくなった場合も受信したテキストを失わないことのテスト"""
+        renderer = renderer_module.ConsultationStreamRenderer(enabled=True)
+        text = '{"age": "1歳8ヶ月", "praise": "よく食べています", "concern": "鉄分'
+        streamed = renderer.feed(text)
+        assert "1歳8ヶ月" in streamed
+
+        tail = renderer.finish()
+        assert tail.endswith(text)
+        assert tail.startswith("\n\n")
+
+    def test_diverged_render_resends_full_text(self):
+        """整形結果が送信済みの内容と食い違っても出力が止まらないことのテスト"""
+        renderer = renderer_module.ConsultationStreamRenderer(enabled=True)
+        first = renderer._emit("🥗 A\n")
+        resent = renderer._emit("🥗 B\n")
+        following = renderer._emit("🥗 B\nC\n")
+
+        assert first == "🥗 A\n"
+        assert resent == "\n\n🥗 B\n"
+        assert following == "C\n"
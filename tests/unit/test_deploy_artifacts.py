@@ -0,0 +1,215 @@
+"""app/utils/deploy_artifacts.pyとデプロイ処理のユニットテスト（GCSはフェイク）"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+from google.api_core import exceptions
+
+from app import agent_engine_app
+from app.utils.deploy_artifacts import (
+    LAYER_URI_FIELDS,
+    build_package_archive,
+    content_digest,
+)
+from app.utils.gcs import create_bucket_if_not_exists
+
+FILENAMES = {
+    "agent_engine": "agent_engine.pkl",
+    "requirements": "requirements.txt",
+    "extra_packages": "dependencies.tar.gz",
+}
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+
+    def exists(self):
+        return self.name in self.bucket.objects
+
+    def upload_from_string(self, data, content_type=None):
+        self.bucket.objects[self.name] = data
+
+    def download_as_text(self):
+        return self.bucket.objects[self.name]
+
+
+class FakeBucket:
+    def __init__(self, name, location=None):
+        self.name = name
+        self.location = location
+        self.objects = {}
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+
+class FakeStorageClient:
+    def __init__(self):
+        self.buckets = {}
+
+    def get_bucket(self, name):
+        if name not in self.buckets:
+            raise exceptions.NotFound(name)
+        return self.buckets[name]
+
+    def create_bucket(self, name, location=None, project=None):
+        self.buckets[name] = FakeBucket(name, location)
+        return self.buckets[name]
+
+
+class FakeRemoteAgent:
+    """デプロイ済みエージェント（update時にSDKと同様に成果物を書き込む）"""
+
+    def __init__(self, bucket, resource_name="projects/p/reasoningEngines/1"):
+        self.bucket = bucket
+        self.resource_name = resource_name
+        self.package_spec = SimpleNamespace(
+            pickle_object_gcs_uri="",
+            requirements_gcs_uri="",
+            dependency_files_gcs_uri="",
+        )
+        self.env = []
+        self.updates = []
+
+    @property
+    def gca_resource(self):
+        return SimpleNamespace(
+            spec=SimpleNamespace(
+                package_spec=self.package_spec,
+                deployment_spec=SimpleNamespace(env=self.env),
+            )
+        )
+
+    def apply(self, layers, env_vars, gcs_dir_name):
+        for name in layers:
+            path = f"{gcs_dir_name}/{FILENAMES[name]}"
+            self.bucket.objects[path] = b"artifact"
+            uri = f"gs://{self.bucket.name}/{path}"
+            setattr(self.package_spec, LAYER_URI_FIELDS[name], uri)
+        self.env = [SimpleNamespace(name=k, value=v) for k, v in env_vars.items()]
+
+    def update(self, env_vars, gcs_dir_name, **layers):
+        self.updates.append(sorted(layers))
+        self.apply(layers, env_vars, gcs_dir_name)
+        return self
+
+
+class FakeAgentEngines:
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.agents = []
+        self.created = 0
+
+    def list(self, filter=None):
+        return list(self.agents)
+
+    def create(self, env_vars, gcs_dir_name, **_):
+        remote = FakeRemoteAgent(self.bucket)
+        remote.apply(FILENAMES, env_vars, gcs_dir_name)
+        self.agents.append(remote)
+        self.created += 1
+        return remote
+
+
+class FakeApp:
+    def __init__(self, agent):
+        self.agent = agent
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """ソース・requirements・フェイクGCS/Agent Engineを用意"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("AGENT_BACKEND", "stub")
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "agent.py").write_text("VALUE = 1\n")
+    (tmp_path / "requirements.txt").write_text("google-adk==0.5.0\n")
+
+    storage_client = FakeStorageClient()
+    bucket = create_bucket_if_not_exists(
+        "gs://p-agent-engine", "p", "us-central1", storage_client
+    )
+    engines = FakeAgentEngines(bucket)
+    monkeypatch.setattr(agent_engine_app, "agent_engines", engines)
+    monkeypatch.setattr(agent_engine_app, "get_root_agent", lambda: object())
+    monkeypatch.setattr(agent_engine_app, "AgentEngineApp", FakeApp)
+    monkeypatch.setattr(agent_engine_app.vertexai, "init", lambda **_: None)
+
+    def deploy(**kwargs):
+        return agent_engine_app.deploy_agent_engine_app(
+            project="p",
+            location="us-central1",
+            agent_name="kids-food-advisor",
+            requirements_file="requirements.txt",
+            extra_packages=["pkg"],
+            storage_client=storage_client,
+            **kwargs,
+        )
+
+    return SimpleNamespace(path=tmp_path, engines=engines, bucket=bucket, deploy=deploy)
+
+
+def test_archive_is_reproducible(tmp_path):
+    """タイムスタンプやキャッシュに依存せず同じバイト列になることのテスト"""
+    (tmp_path / "b.py").write_text("b = 2\n")
+    (tmp_path / "a.py").write_text("a = 1\n")
+    first = build_package_archive([str(tmp_path)])
+
+    os.utime(tmp_path / "a.py", (0, 0))
+    (tmp_path / "__pycache__").mkdir()
+    (tmp_path / "__pycache__" / "a.cpython-311.pyc").write_bytes(b"\0")
+    assert build_package_archive([str(tmp_path)]) == first
+
+    (tmp_path / "a.py").write_text("a = 3\n")
+    changed = build_package_archive([str(tmp_path)])
+    assert content_digest(changed) != content_digest(first)
+
+
+def test_bucket_created_once():
+    """既存バケットは再作成しないことのテスト"""
+    client = FakeStorageClient()
+    bucket = create_bucket_if_not_exists("gs://b", "p", "us-central1", client)
+    assert create_bucket_if_not_exists("b", "p", "us-central1", client) is bucket
+
+
+def test_redeploy_without_changes_is_noop(workspace):
+    """変更がなければ更新もアップロードもしないことのテスト"""
+    workspace.deploy()
+    objects = dict(workspace.bucket.objects)
+    workspace.deploy()
+
+    assert workspace.engines.created == 1
+    assert workspace.engines.agents[0].updates == []
+    assert workspace.bucket.objects == objects
+
+
+def test_source_change_uploads_only_package_layers(workspace):
+    """ソース変更時はrequirementsを再アップロードせずその場で更新することのテスト"""
+    workspace.deploy()
+    (workspace.path / "pkg" / "agent.py").write_text("VALUE = 2\n")
+    workspace.deploy()
+
+    remote = workspace.engines.agents[0]
+    assert workspace.engines.created == 1
+    assert remote.updates == [["agent_engine", "extra_packages"]]
+    first_dir = remote.package_spec.requirements_gcs_uri.rsplit("/", 1)[0]
+    assert first_dir != remote.package_spec.dependency_files_gcs_uri.rsplit("/", 1)[0]
+
+    # 部分更新後も各レイヤーの参照先マニフェストから変更なしと判定される
+    workspace.deploy()
+    assert len(remote.updates) == 1
+
+
+def test_env_change_updates_without_upload(workspace):
+    """環境変数のみの変更は成果物をアップロードせず更新することのテスト"""
+    workspace.deploy()
+    objects = dict(workspace.bucket.objects)
+    workspace.deploy(num_workers=2)
+
+    assert workspace.engines.agents[0].updates == [[]]
+    env = {e.name: e.value for e in workspace.engines.agents[0].env}
+    assert env["NUM_WORKERS"] == "2"
+    assert workspace.bucket.objects == objects
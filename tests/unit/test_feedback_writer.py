@@ -0,0 +1,118 @@
+"""app/utils/feedback_writer.pyのユニットテスト"""
+
+import threading
+import time
+
+from app.utils.feedback_writer import FeedbackWriter
+
+
+class FakeBatch:
+    def __init__(self, logger):
+        self._logger = logger
+        self.entries = []
+
+    def log_struct(self, info, severity=None):
+        self.entries.append((info, severity))
+
+    def commit(self):
+        self._logger.commit(self.entries)
+
+
+class FakeLogger:
+    """Cloud Loggingロガーの代替（遅延・失敗を設定可能）"""
+
+    def __init__(self, latency=0.0, failures=0):
+        self.latency = latency
+        self.failures = failures
+        self.commits = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def commit(self, entries):
+        self.gate.wait()
+        time.sleep(self.latency)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("logging unavailable")
+        self.commits.append(list(entries))
+
+
+def _entry(i):
+    return {"invocation_id": f"inv-{i}", "score": 1}
+
+
+def test_batches_by_size():
+    """batch_size件ごとにまとめて書き込まれることのテスト"""
+    fake = FakeLogger()
+    writer = FeedbackWriter(fake, batch_size=3, flush_interval=10)
+    for i in range(7):
+        assert writer.submit(_entry(i))
+    assert writer.flush(timeout=5)
+    assert [len(c) for c in fake.commits] == [3, 3, 1]
+    assert writer.metrics()["written"] == 7
+    writer.close()
+
+
+def test_flushes_by_time():
+    """flush_interval経過でバッチ未満でも書き込まれることのテスト"""
+    fake = FakeLogger()
+    writer = FeedbackWriter(fake, batch_size=100, flush_interval=0.05)
+    writer.submit(_entry(0))
+    deadline = time.monotonic() + 2
+    while not fake.commits and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(fake.commits) == 1
+    writer.close()
+
+
+def test_submit_independent_of_backend_latency():
+    """書き込み先が遅くても送信がブロックしないことのテスト"""
+    fake = FakeLogger(latency=0.5)
+    writer = FeedbackWriter(fake, batch_size=10, flush_interval=0.01)
+    start = time.perf_counter()
+    for i in range(20):
+        writer.submit(_entry(i))
+    assert time.perf_counter() - start < 0.1
+    writer.close()
+    assert writer.metrics()["written"] == 20
+
+
+def test_drops_when_queue_full():
+    """キューが満杯の場合に破棄して計上することのテスト"""
+    fake = FakeLogger()
+    fake.gate.clear()
+    writer = FeedbackWriter(fake, max_queue_size=2, batch_size=1, flush_interval=0.01)
+    results = [writer.submit(_entry(i)) for i in range(10)]
+    assert results.count(False) >= 1
+    assert writer.metrics()["dropped"] == results.count(False)
+    fake.gate.set()
+    writer.close()
+
+
+def test_retries_then_succeeds():
+    """書き込み失敗時に再試行されることのテスト"""
+    fake = FakeLogger(failures=2)
+    writer = FeedbackWriter(
+        fake, batch_size=5, flush_interval=0.01, retry_backoff=0.001
+    )
+    writer.submit(_entry(0))
+    assert writer.flush(timeout=5)
+    metrics = writer.metrics()
+    assert metrics["retries"] == 2
+    assert metrics["written"] == 1
+    assert metrics["failed"] == 0
+    writer.close()
+
+
+def test_close_flushes_remaining():
+    """close時に残りのエントリが書き込まれることのテスト"""
+    fake = FakeLogger()
+    writer = FeedbackWriter(fake, batch_size=100, flush_interval=30)
+    for i in range(5):
+        writer.submit(_entry(i))
+    writer.close(timeout=5)
+    assert sum(len(c) for c in fake.commits) == 5
+    assert not writer.submit(_entry(99))
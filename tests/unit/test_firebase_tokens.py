@@ -0,0 +1,141 @@
+"""app/auth/firebase_tokens.pyのユニットテスト（ローカルで生成した鍵で署名）"""
+
+import asyncio
+import importlib.util
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from app.auth import firebase_tokens
+from app.auth.token_cache import VerifiedTokenCache
+
+PROJECT_ID = "test-project"
+SIGNING_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+CLOUD_FUNCTIONS = Path(__file__).resolve().parents[2] / "cloud_functions"
+
+
+def make_token(uid="user-1"):
+    now = int(time.time())
+    claims = {"aud": PROJECT_ID, "sub": uid, "uid": uid, "iat": now, "exp": now + 3600}
+    return jwt.encode(claims, SIGNING_KEY, algorithm="RS256")
+
+
+class RecordingVerifier:
+    """署名を検証し、実行されたスレッドを記録する"""
+
+    def __init__(self):
+        self.threads = []
+
+    def __call__(self, token):
+        self.threads.append(threading.current_thread())
+        return jwt.decode(
+            token, SIGNING_KEY.public_key(), algorithms=["RS256"], audience=PROJECT_ID
+        )
+
+
+@pytest.fixture
+def verifier(monkeypatch):
+    verifier = RecordingVerifier()
+    monkeypatch.delenv("DEVELOPMENT_MODE", raising=False)
+    monkeypatch.setattr(firebase_tokens, "token_cache", VerifiedTokenCache(verifier))
+    return verifier
+
+
+def _request(token=None):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    return SimpleNamespace(headers=headers)
+
+
+def test_async_verification_offloaded(verifier):
+    """署名検証はイベントループ外で行い、キャッシュ済みならその場で返すことのテスト"""
+    token = make_token()
+
+    async def run():
+        first = await firebase_tokens.verify_id_token_async(token)
+        second = await firebase_tokens.verify_id_token_async(token)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first["uid"] == second["uid"] == "user-1"
+    assert len(verifier.threads) == 1
+    assert verifier.threads[0].name.startswith("firebase-auth")
+    assert firebase_tokens.token_cache.stats()["hits"] == 1
+
+
+def test_event_loop_not_blocked_by_verification(monkeypatch):
+    """検証に時間がかかってもイベントループの他の処理が進むことのテスト"""
+
+    def slow_verifier(token):
+        time.sleep(0.2)
+        return {"uid": token, "exp": time.time() + 3600}
+
+    monkeypatch.setattr(
+        firebase_tokens, "token_cache", VerifiedTokenCache(slow_verifier)
+    )
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await asyncio.gather(
+            *(firebase_tokens.verify_id_token_async(f"user-{i}") for i in range(4))
+        )
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(run()) >= 10
+
+
+def test_authenticate_request(verifier):
+    """同期・非同期の認証が同じ結果を返すことのテスト"""
+    token = make_token()
+
+    user, error = firebase_tokens.authenticate_request(_request(token))
+    assert error is None
+    assert user["uid"] == "user-1"
+    assert asyncio.run(firebase_tokens.authenticate_request_async(_request(token))) == (
+        user,
+        None,
+    )
+
+    user, error = firebase_tokens.authenticate_request(_request())
+    assert user is None
+    assert error["error"] == "Authorization header missing or invalid"
+
+    user, error = asyncio.run(
+        firebase_tokens.authenticate_request_async(_request("not-a-token"))
+    )
+    assert user is None
+    assert error["error"] == "Invalid authentication token"
+
+
+def test_development_mode_skips_auth(verifier, monkeypatch):
+    """DEVELOPMENT_MODE=adk では認証をスキップすることのテスト"""
+    monkeypatch.setenv("DEVELOPMENT_MODE", "adk")
+    user, error = firebase_tokens.authenticate_request(_request())
+    assert error is None
+    assert user["uid"] == "dev_user"
+    assert verifier.threads == []
+
+
+@pytest.mark.parametrize("function", ["agent_engine_stream", "image_recognition"])
+def test_cloud_functions_share_auth_package(function):
+    """Cloud Functionsの認証ユーティリティが共通パッケージを使うことのテスト"""
+    path = CLOUD_FUNCTIONS / function / "firebase_auth_utils.py"
+    spec = importlib.util.spec_from_file_location(f"{function}_firebase_auth", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    assert module.authenticate_request is firebase_tokens.authenticate_request
+    assert module.token_cache is firebase_tokens.token_cache
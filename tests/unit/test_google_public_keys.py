@@ -0,0 +1,217 @@
+"""app/auth/google_public_keys.pyのユニットテスト（ローカルの鍵サーバーを使用）"""
+
+import datetime
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from firebase_admin import auth
+
+from app.auth import firebase_tokens
+from app.auth.google_public_keys import (
+    FirebaseTokenVerifier,
+    GooglePublicKeyStore,
+    parse_max_age,
+)
+
+PROJECT_ID = "test-project"
+
+
+def make_key_pair():
+    """署名鍵と、その公開鍵の自己署名証明書（PEM）を作成"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    return key, certificate.public_bytes(serialization.Encoding.PEM).decode()
+
+
+KEY_A, CERT_A = make_key_pair()
+KEY_B, CERT_B = make_key_pair()
+
+
+def make_token(key=KEY_A, kid="a", lifetime=3600, audience=PROJECT_ID):
+    now = int(time.time())
+    claims = {
+        "iss": f"https://securetoken.google.com/{PROJECT_ID}",
+        "aud": audience,
+        "sub": "user-1",
+        "iat": now,
+        "auth_time": now,
+        "exp": now + lifetime,
+    }
+    return jwt.encode(claims, key, algorithm="RS256", headers={"kid": kid})
+
+
+class KeyServer:
+    """Googleの証明書エンドポイントの代わりになるローカルHTTPサーバー"""
+
+    def __init__(self, certificates, max_age=3600):
+        self.certificates = certificates
+        self.max_age = max_age
+        self.status = 200
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                body = json.dumps(server.certificates).encode()
+                self.send_response(server.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Cache-Control", f"public, max-age={server.max_age}")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_port}/certs"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def key_server():
+    server = KeyServer({"a": CERT_A})
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def make_verifier(key_server):
+    stores = []
+
+    def factory(**kwargs):
+        store = GooglePublicKeyStore(url=key_server.url, **kwargs)
+        stores.append(store)
+        return FirebaseTokenVerifier(PROJECT_ID, key_store=store)
+
+    yield factory
+    for store in stores:
+        store.close()
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_parse_max_age():
+    """Cache-ControlのmaxageからAgeを引いた秒数になることのテスト"""
+    assert parse_max_age({"Cache-Control": "public, max-age=19845"}) == 19845
+    assert parse_max_age({"Cache-Control": "max-age=100", "Age": "30"}) == 70
+    assert parse_max_age({}) == 3600
+
+
+def test_verification_is_local_after_first_fetch(key_server, make_verifier):
+    """鍵の取得後は通信せずに検証することのテスト"""
+    verifier = make_verifier()
+    for _ in range(5):
+        claims = verifier.verify(make_token())
+        assert claims["uid"] == "user-1"
+    assert key_server.requests == 1
+    assert verifier.key_store.stats()["keys"] == 1
+
+
+def test_background_refresh_picks_up_rotated_keys(key_server, make_verifier):
+    """期限前にバックグラウンドで更新し、新しい鍵のトークンを通信なしで検証することのテスト"""
+    key_server.max_age = 1
+    verifier = make_verifier(refresh_margin=0.5)
+    verifier.verify(make_token())
+
+    key_server.certificates = {"a": CERT_A, "b": CERT_B}
+    _wait_for(lambda: verifier.key_store.stats()["keys"] == 2)
+
+    assert verifier.verify(make_token(key=KEY_B, kid="b"))["uid"] == "user-1"
+    stats = verifier.key_store.stats()
+    assert stats["foreground_refreshes"] == 1
+    assert stats["refreshes"] >= 2
+
+
+def test_failed_refresh_keeps_keys(key_server, make_verifier):
+    """更新に失敗しても保持している鍵で検証を続けることのテスト"""
+    key_server.max_age = 1
+    verifier = make_verifier(refresh_margin=0.5, retry_interval=0.1)
+    verifier.verify(make_token())
+
+    key_server.status = 500
+    _wait_for(lambda: verifier.key_store.stats()["refresh_failures"] >= 1)
+    assert verifier.verify(make_token())["uid"] == "user-1"
+
+
+def test_unknown_kid_refresh_rate_limited(key_server, make_verifier):
+    """未知のkidによる鍵の再取得が最短間隔で制限されることのテスト"""
+    verifier = make_verifier(min_refresh_interval=60)
+    verifier.verify(make_token())
+
+    for _ in range(3):
+        with pytest.raises(auth.InvalidIdTokenError):
+            verifier.verify(make_token(key=KEY_B, kid="b"))
+    assert key_server.requests == 1
+
+
+def test_invalid_tokens_rejected(make_verifier):
+    """期限切れ・audience違い・署名違いがfirebase_adminと同じ例外になることのテスト"""
+    verifier = make_verifier()
+    with pytest.raises(auth.ExpiredIdTokenError):
+        verifier.verify(make_token(lifetime=-10))
+    with pytest.raises(auth.InvalidIdTokenError):
+        verifier.verify(make_token(audience="other-project"))
+    with pytest.raises(auth.InvalidIdTokenError):
+        verifier.verify(make_token(key=KEY_B, kid="a"))
+    with pytest.raises(auth.InvalidIdTokenError):
+        verifier.verify("not-a-token")
+
+
+def test_firebase_auth_uses_local_verifier(monkeypatch, make_verifier):
+    """認証モジュールが公開鍵キャッシュで検証することのテスト"""
+    verifier = make_verifier()
+    monkeypatch.setattr(firebase_tokens, "_firebase_app", object())
+    monkeypatch.setattr(firebase_tokens, "_local_verifier", verifier)
+
+    def admin_verify(token):
+        raise AssertionError("Firebase Admin SDK should not be called")
+
+    monkeypatch.setattr(firebase_tokens.auth, "verify_id_token", admin_verify)
+    assert firebase_tokens._verify_id_token(make_token())["uid"] == "user-1"
+
+
+def test_stale_keys_fail_closed(key_server, make_verifier):
+    """更新に失敗し続けて鍵が古くなりすぎたら検証を拒否することのテスト"""
+    key_server.max_age = 1
+    verifier = make_verifier(refresh_margin=0.5, retry_interval=0.1, max_stale_age=1)
+    verifier.verify(make_token())
+
+    key_server.status = 500
+    _wait_for(verifier.key_store.is_stale)
+    with pytest.raises(auth.InvalidIdTokenError, match="stale"):
+        verifier.verify(make_token())
+    assert verifier.key_store.stats()["stale"] is True
+
+    # 更新できるようになれば再び検証できる
+    key_server.status = 200
+    _wait_for(lambda: not verifier.key_store.is_stale())
+    assert verifier.verify(make_token())["uid"] == "user-1"
@@ -0,0 +1,151 @@
+"""app/agents/history_compaction.pyのユニットテスト"""
+
+from collections.abc import AsyncGenerator
+
+import pytest
+from google.adk.agents import LlmAgent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+from pydantic import Field
+
+from app.agents.history_compaction import (
+    STATE_KEY,
+    HistoryCompactor,
+    _empty_summary,
+    fold_turn,
+    format_summary,
+)
+
+FIRST_MESSAGE = (
+    "はなちゃん（1歳8ヶ月）の栄養分析をお願いします。\n"
+    "朝食: パン、バナナ\n昼食: うどん\nアレルギー: 卵\n特別な事情: なし"
+)
+FOLLOW_UPS = [
+    "野菜を全然食べてくれません",
+    "小松菜の茹で時間は？",
+    "鉄分の多い食材をもう一度",
+    "量はどのくらいですか",
+    "冷凍してもいいですか",
+    "おやつは何がいいですか",
+    "ありがとうございます",
+    "味付けは薄めがいいですか",
+    "スプーンを嫌がります",
+    "カルシウムはどうですか",
+    "わかりました",
+]
+RESPONSE = "ほうれん草を茹でて細かく刻むと鉄分が補えますよ\n→ 小松菜/納豆/しらす"
+
+
+class StubLlm(BaseLlm):
+    """リクエストを記録して固定の応答を返すスタブモデル"""
+
+    model: str = "stub-llm"
+    requests: list[LlmRequest] = Field(default_factory=list)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        self.requests.append(llm_request.model_copy(deep=True))
+        yield LlmResponse(
+            content=types.Content(
+                role="model",
+                parts=[types.Part(text=RESPONSE)],
+            )
+        )
+
+
+def _prompt_size(request: LlmRequest) -> int:
+    """モデルに送られる文字数（履歴＋システム指示）"""
+    history = sum(
+        len(part.text or "") for content in request.contents for part in content.parts
+    )
+    return history + len(request.config.system_instruction or "")
+
+
+@pytest.mark.asyncio
+async def test_prompt_size_bounded_and_facts_kept():
+    """長い会話でもプロンプトサイズが一定に収まり、重要な情報が保持されることのテスト"""
+    llm = StubLlm(requests=[])
+    agent = LlmAgent(
+        model=llm,
+        name="KidsFoodAdvisor",
+        instruction="幼児栄養の相談に答えてください",
+        before_model_callback=HistoryCompactor(keep_turns=3),
+    )
+    session_service = InMemorySessionService()
+    runner = Runner(app_name="app", agent=agent, session_service=session_service)
+    session = session_service.create_session(app_name="app", user_id="u")
+
+    for message in [FIRST_MESSAGE, *FOLLOW_UPS]:
+        content = types.Content(role="user", parts=[types.Part(text=message)])
+        async for _ in runner.run_async(
+            user_id="u", session_id=session.id, new_message=content
+        ):
+            pass
+
+    sizes = [_prompt_size(request) for request in llm.requests]
+    turn_counts = [
+        sum(1 for c in request.contents if c.role == "user") for request in llm.requests
+    ]
+    # 直近3ターンのみが渡される
+    assert max(turn_counts) == 3
+    # 畳み込みが始まった後はサイズが増え続けない
+    assert max(sizes[4:]) <= max(sizes[:4]) * 1.5
+    # 全履歴をそのまま送る場合の半分以下
+    full_history = sum(len(m) for m in [FIRST_MESSAGE, *FOLLOW_UPS]) + len(
+        FOLLOW_UPS
+    ) * len(RESPONSE)
+    assert sizes[-1] < full_history / 2
+
+    final_instruction = llm.requests[-1].config.system_instruction
+    assert "1歳8ヶ月" in final_instruction
+    assert "アレルギー: 卵" in final_instruction
+    assert "小松菜" in final_instruction
+
+    state = session_service.get_session(
+        app_name="app", user_id="u", session_id=session.id
+    ).state
+    assert state[STATE_KEY]["folded_turns"] == len(FOLLOW_UPS) + 1 - 3
+    assert state[STATE_KEY]["child_age"] == "1歳8ヶ月"
+    assert "野菜を全然食べてくれません" in state[STATE_KEY]["open_concerns"]
+
+
+def _fold_user_message(text: str) -> dict:
+    content = types.Content(role="user", parts=[types.Part(text=text)])
+    return fold_turn(_empty_summary(), [content], max_items=5)
+
+
+@pytest.mark.parametrize(
+    ("message", "allergens"),
+    [
+        ("うちの子は卵アレルギーがあります", ["卵"]),
+        ("息子は小麦アレルギーです", ["小麦"]),
+        ("娘は卵と小麦のアレルギーがあります", ["卵", "小麦"]),
+        ("牛乳は好きですがえびアレルギー持ちです", ["えび"]),
+        ("アレルギー: 卵、乳", ["卵", "乳"]),
+    ],
+)
+def test_allergen_extracted_without_subject(message, allergens):
+    """主語を含む文からアレルゲンだけを抽出することのテスト"""
+    summary = _fold_user_message(message)
+
+    assert summary["allergens"] == allergens
+    assert f"- アレルギー: {'、'.join(allergens)}" in format_summary(summary)
+
+
+@pytest.mark.parametrize("message", ["アレルギー: なし", "アレルギーはありません"])
+def test_declared_no_allergies(message):
+    """保護者が「なし」と明言した場合だけアレルギーなしと要約することのテスト"""
+    assert "- アレルギー: なし" in format_summary(_fold_user_message(message))
+
+
+def test_unknown_allergies_not_reported_as_none():
+    """アレルギーに触れていない会話は「なし」ではなく不明として要約することのテスト"""
+    summary = _fold_user_message("野菜を全然食べてくれません")
+
+    assert summary["allergens"] == []
+    assert "- アレルギー: 不明（未確認）" in format_summary(summary)
@@ -0,0 +1,104 @@
+"""agent_engine_stream の共有HTTPクライアントのユニットテスト"""
+
+import importlib.util
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+_MODULE_PATH = (
+    Path(__file__).resolve().parents[2]
+    / "cloud_functions"
+    / "agent_engine_stream"
+    / "utils"
+    / "http_client.py"
+)
+
+
+@pytest.fixture
+def http_client(monkeypatch):
+    monkeypatch.setenv("HTTP_CLIENT_MAX_CONNECTIONS", "16")
+    spec = importlib.util.spec_from_file_location("stream_http_client", _MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    yield module
+    module.close_http_client()
+
+
+class LocalServer:
+    """接続数を数えるkeep-alive対応のローカルHTTPサーバー"""
+
+    def __init__(self):
+        self.connections = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                server.connections += 1
+                super().setup()
+
+            def do_GET(self):
+                body = b'{"ok": true}'
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._httpd.server_port}/sessions"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def local_server():
+    server = LocalServer()
+    yield server
+    server.close()
+
+
+def test_client_shared_and_connections_reused(http_client, local_server):
+    """スレッド間で同じクライアントを使い、接続を再利用することのテスト"""
+    clients = set()
+
+    def call(_):
+        client = http_client.get_http_client()
+        clients.add(id(client))
+        return client.get(local_server.url, timeout=5.0).status_code
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        statuses = list(executor.map(call, range(40)))
+
+    assert statuses == [200] * 40
+    assert len(clients) == 1
+    assert local_server.connections <= 8
+
+    stats = http_client.get_http_client_stats()
+    assert stats["created"] is True
+    assert stats["requests"] == 40
+    assert stats["max_connections"] == 16
+
+
+def test_close_recreates_client(http_client, local_server):
+    """close_http_client 後は新しいクライアントが作られることのテスト"""
+    first = http_client.get_http_client()
+    first.get(local_server.url, timeout=5.0)
+    http_client.close_http_client()
+
+    assert first.is_closed
+    assert http_client.get_http_client_stats()["created"] is False
+    second = http_client.get_http_client()
+    assert second is not first
+    assert second.get(local_server.url, timeout=5.0).status_code == 200
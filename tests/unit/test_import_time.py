@@ -0,0 +1,78 @@
+"""appパッケージのインポート時間の予算テスト
+
+python -X importtime の計測結果で、import app / app.vertex_ai_agent が
+ADK・genai・認証の読み込みやエージェント構築を伴わないことを確認する。
+予算は環境変数 APP_IMPORT_BUDGET_MS で変更できる。
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+BUDGET_MS = float(os.environ.get("APP_IMPORT_BUDGET_MS", "100"))
+# インポート時に読み込まれてはならない重いモジュール
+DEFERRED_MODULES = ("google.adk", "google.genai", "google.auth", "vertexai")
+
+
+def _import_profile(module: str) -> dict[str, int]:
+    """新しいプロセスでモジュールをインポートし、モジュールごとの累積時間(us)を取得"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, us, name = line.split("|")
+        cumulative[name.strip()] = int(us)
+    return cumulative
+
+
+@pytest.mark.parametrize("module", ["app", "app.vertex_ai_agent"])
+def test_import_within_budget(module):
+    """インポート時間が予算内に収まることのテスト"""
+    profile = _import_profile(module)
+    elapsed_ms = profile[module] / 1000
+    assert elapsed_ms <= BUDGET_MS, (
+        f"import {module} took {elapsed_ms:.1f}ms (budget {BUDGET_MS:.0f}ms)"
+    )
+
+
+@pytest.mark.parametrize("module", ["app", "app.vertex_ai_agent"])
+def test_heavy_imports_deferred(module):
+    """ADK/genai/認証のインポートが初回利用まで遅延されることのテスト"""
+    loaded = [
+        name for name in _import_profile(module) if name.startswith(DEFERRED_MODULES)
+    ]
+    assert loaded == []
+
+
+@pytest.fixture
+def stub_agent_cache(monkeypatch):
+    """スタブバックエンドで構築し、共有インスタンスのキャッシュを前後で破棄"""
+    from app.agents.unified_nutrition_agent import get_unified_nutrition_agent
+    from app.vertex_ai_agent import get_root_agent
+
+    monkeypatch.setenv("AGENT_BACKEND", "stub")
+    get_unified_nutrition_agent.cache_clear()
+    get_root_agent.cache_clear()
+    yield
+    get_unified_nutrition_agent.cache_clear()
+    get_root_agent.cache_clear()
+
+
+def test_root_agent_is_shared(stub_agent_cache):
+    """root_agentとunified_nutrition_agentが同一インスタンスであることのテスト"""
+    from app.agents.unified_nutrition_agent import unified_nutrition_agent
+    from app.vertex_ai_agent import get_root_agent, root_agent
+
+    assert root_agent is get_root_agent()
+    assert root_agent is unified_nutrition_agent
@@ -0,0 +1,84 @@
+"""app/agents/intent_router.pyのユニットテスト"""
+
+from types import SimpleNamespace
+
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+from app.agents import intent_router
+from app.agents.intent_router import CONSULTATION, FOLLOW_UP, get_intent_router
+
+
+def _context(text: str) -> SimpleNamespace:
+    """コールバックコンテキストの簡易版を作成"""
+    return SimpleNamespace(
+        state={},
+        user_content=types.Content(role="user", parts=[types.Part(text=text)]),
+    )
+
+
+def _retrieval_request() -> LlmRequest:
+    """リトリーバル設定付きのリクエストを作成"""
+    return LlmRequest(
+        config=types.GenerateContentConfig(
+            tools=[
+                types.Tool(
+                    retrieval=types.Retrieval(
+                        vertex_ai_search=types.VertexAISearch(datastore="ds")
+                    )
+                )
+            ]
+        )
+    )
+
+
+class TestIntentRouter:
+    """発話分類のテスト"""
+
+    def test_consultation_template(self):
+        """フロントエンドの相談フォーマットが初回相談と判定されることのテスト"""
+        decision = get_intent_router().classify(
+            "お子さま（1歳8ヶ月）の栄養分析をお願いします。\n\n年齢: 1-2歳\n"
+            "朝食: パン\n昼食: うどん\nアレルギー: なし"
+        )
+        assert decision.turn_type == CONSULTATION
+        assert decision.needs_grounding is True
+
+    def test_nutrient_follow_up_needs_grounding(self):
+        """栄養素の質問はPDF検索が必要と判定されることのテスト"""
+        decision = get_intent_router().classify("カルシウムはどんな食べ物に多いですか")
+        assert decision.turn_type == FOLLOW_UP
+        assert decision.needs_grounding is True
+
+    def test_small_talk_skips_grounding(self):
+        """あいさつ・調理法の質問はPDF検索不要と判定されることのテスト"""
+        router = get_intent_router()
+        assert router.classify("ありがとうございました！").needs_grounding is False
+        assert (
+            router.classify("にんじんは何分くらい茹でますか").needs_grounding is False
+        )
+
+
+class TestIntentCallbacks:
+    """コールバックのテスト"""
+
+    def test_retrieval_removed_when_not_needed(self):
+        """検索不要な発話ではリトリーバルが外されることのテスト"""
+        context = _context("わかりました、やってみます")
+        intent_router.before_agent_callback(context)
+        request = _retrieval_request()
+        intent_router.before_model_callback(context, request)
+
+        assert context.state == {"turn_type": FOLLOW_UP, "needs_grounding": False}
+        assert not request.config.tools
+        assert "会話モード" in request.config.system_instruction
+
+    def test_retrieval_kept_when_needed(self):
+        """検索が必要な発話ではリトリーバルが残ることのテスト"""
+        context = _context("鉄分って何に含まれてますか？")
+        intent_router.before_agent_callback(context)
+        request = _retrieval_request()
+        intent_router.before_model_callback(context, request)
+
+        assert context.state["needs_grounding"] is True
+        assert request.config.tools
@@ -1,5 +1,7 @@
 """app/agents/unified_nutrition_agent.pyのユニットテスト"""
 
+import os
+
 import pytest
 
 from app.agents.unified_nutrition_agent import (
@@ -111,6 +113,24 @@ class TestUnifiedNutritionAgentConfiguration:
         except Exception as e:
             pytest.fail(f"エージェント作成中にエラーが発生しました: {e}")
 
+    def test_agent_creation_sets_vertex_ai_defaults(self, monkeypatch):
+        """直接作成した場合もVertex AI利用の環境変数が設定されることのテスト"""
+        monkeypatch.delenv("AGENT_BACKEND", raising=False)
+        for name in (
+            "GOOGLE_GENAI_USE_VERTEXAI",
+            "GOOGLE_CLOUD_LOCATION",
+            "GOOGLE_CLOUD_PROJECT",
+        ):
+            # 元の値をテスト後に戻すため、一度設定してから削除する
+            monkeypatch.setenv(name, "")
+            monkeypatch.delenv(name)
+
+        create_unified_nutrition_agent()
+
+        assert os.environ["GOOGLE_GENAI_USE_VERTEXAI"] == "True"
+        assert os.environ["GOOGLE_CLOUD_LOCATION"] == "global"
+        assert os.environ["GOOGLE_CLOUD_PROJECT"]
+
     def test_agent_description(self):
         """エージェントの説明テスト"""
         agent = create_unified_nutrition_agent()
@@ -0,0 +1,122 @@
+"""app/utils/local_tracing.pyのユニットテスト"""
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.trace import Status, StatusCode
+
+from app.utils.local_tracing import (
+    LocalJsonlSpanExporter,
+    iter_records,
+    list_segments,
+    main,
+    summarize_latency,
+    summarize_stacks,
+)
+
+
+def _tracer(exporter):
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    return provider.get_tracer("test")
+
+
+def _run_invocation(tracer, prompt="質問", error=False):
+    with tracer.start_as_current_span("invocation"):
+        with tracer.start_as_current_span("agent_run [nutrition]"):
+            with tracer.start_as_current_span("call_llm") as span:
+                span.set_attribute("gcp.vertex.agent.llm_request", prompt)
+                if error:
+                    span.set_status(Status(StatusCode.ERROR))
+
+
+def test_records_readable_while_segment_open(tmp_path):
+    """書き込み中のセグメントから記録済みのスパンを読めることのテスト"""
+    exporter = LocalJsonlSpanExporter(tmp_path, max_attribute_chars=5)
+    _run_invocation(_tracer(exporter), prompt="あ" * 10)
+    exporter.force_flush()
+
+    records = list(iter_records(tmp_path))
+    assert [r["name"] for r in records] == [
+        "call_llm",
+        "agent_run [nutrition]",
+        "invocation",
+    ]
+    assert records[0]["attributes"]["gcp.vertex.agent.llm_request"] == (
+        "あああああ...[truncated 5 chars]"
+    )
+    exporter.shutdown()
+    assert list(iter_records(tmp_path)) == records
+
+
+def test_rotation_bounds_disk_use(tmp_path):
+    """セグメント数とサイズが上限に収まることのテスト"""
+    exporter = LocalJsonlSpanExporter(tmp_path, segment_bytes=2048, max_segments=3)
+    tracer = _tracer(exporter)
+    for _ in range(50):
+        _run_invocation(tracer, prompt="x" * 200)
+    exporter.shutdown()
+
+    segments = list_segments(tmp_path)
+    assert len(segments) == 3
+    assert all(path.stat().st_size <= 2048 for path in segments)
+    # 古いスパンは削除され、新しいスパンが残る
+    assert 0 < len(list(iter_records(tmp_path))) < 150
+
+    # 再起動後は続きの番号から書き込む
+    restarted = LocalJsonlSpanExporter(tmp_path, segment_bytes=2048, max_segments=3)
+    _run_invocation(_tracer(restarted))
+    restarted.shutdown()
+    assert list_segments(tmp_path)[-1].name > segments[-1].name
+
+
+def test_oversized_span_dropped(tmp_path):
+    """1セグメントに収まらないスパンは破棄して数えることのテスト"""
+    exporter = LocalJsonlSpanExporter(
+        tmp_path, segment_bytes=512, max_attribute_chars=10_000
+    )
+    _run_invocation(_tracer(exporter), prompt="x" * 1000)
+    exporter.shutdown()
+    assert exporter.dropped == 1
+    assert len(list(iter_records(tmp_path))) == 2
+
+
+def test_latency_and_stack_summaries():
+    """スパン名ごとのパーセンタイルと階層ごとの自己時間の集計テスト"""
+    records = [
+        {"name": "invocation", "trace_id": "t", "span_id": "a", "parent_id": None,
+         "duration_ms": 100.0, "status": "UNSET"},
+        {"name": "call_llm", "trace_id": "t", "span_id": "b", "parent_id": "a",
+         "duration_ms": 60.0, "status": "ERROR"},
+        {"name": "call_llm", "trace_id": "t", "span_id": "c", "parent_id": "a",
+         "duration_ms": 30.0, "status": "UNSET"},
+    ]  # fmt: skip
+
+    rows = {row["name"]: row for row in summarize_latency(records)}
+    assert rows["call_llm"]["count"] == 2
+    assert rows["call_llm"]["errors"] == 1
+    assert rows["call_llm"]["p50"] == 30.0
+    assert rows["call_llm"]["max"] == 60.0
+
+    stacks = summarize_stacks(records)
+    assert stacks[("invocation",)]["self"] == 10.0
+    assert stacks[("invocation", "call_llm")] == {
+        "count": 2,
+        "total": 90.0,
+        "self": 90.0,
+    }
+
+
+def test_cli_prints_reports(tmp_path, capsys):
+    """集計CLIの出力テスト"""
+    exporter = LocalJsonlSpanExporter(tmp_path)
+    _run_invocation(_tracer(exporter))
+    exporter.shutdown()
+
+    main(["summary", str(tmp_path)])
+    assert "call_llm" in capsys.readouterr().out
+
+    main(["flame", str(tmp_path), "--collapsed"])
+    lines = capsys.readouterr().out.splitlines()
+    assert any(
+        line.startswith("invocation;agent_run [nutrition];call_llm ") for line in lines
+    )
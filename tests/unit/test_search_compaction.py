@@ -0,0 +1,82 @@
+"""app/tools/search_compaction.pyのユニットテスト"""
+
+from app.tools.search_compaction import (
+    compact_nutrition_knowledge,
+    compact_search_result,
+    estimate_tokens,
+    extract_passages,
+)
+
+SAMPLE_RESULT = {
+    "results": [
+        {
+            "document": {
+                "derivedStructData": {
+                    "title": "食事摂取基準",
+                    "link": "gs://bucket/MHLW_DietaryReferenceIntakes_2025_InfantChild.pdf",
+                    "snippets": [
+                        {"snippet": "1〜2歳の鉄の推奨量は4.5mgです。" * 20},
+                        {"snippet": "鉄は赤身肉やレバーに多く含まれます。"},
+                    ],
+                }
+            }
+        },
+        {
+            "document": {
+                "derivedStructData": {
+                    "link": "gs://bucket/MHLW_NurserySchool_MealProvisionGuideline_2012.pdf",
+                    "snippets": [{"snippet": "保育所での食事提供の留意点"}],
+                }
+            }
+        },
+    ]
+}
+
+
+class TestExtractPassages:
+    """抜粋抽出のテスト"""
+
+    def test_extract_in_ranking_order_with_sources(self):
+        """ランキング順に出典付きで抽出されることのテスト"""
+        passages = extract_passages(SAMPLE_RESULT)
+
+        assert len(passages) == 3
+        assert passages[1]["text"] == "鉄は赤身肉やレバーに多く含まれます。"
+        assert passages[2]["uri"].endswith("Guideline_2012.pdf")
+
+    def test_extract_plain_string(self):
+        """文字列の結果をそのまま1件の抜粋として扱うことのテスト"""
+        assert extract_passages("  テキスト  ") == [
+            {"text": "テキスト", "title": None, "uri": None}
+        ]
+
+
+class TestCompactSearchResult:
+    """コンパクション処理のテスト"""
+
+    def test_top_n_and_token_budget(self):
+        """上位N件とトークン予算で切り詰められることのテスト"""
+        compacted = compact_search_result(
+            SAMPLE_RESULT, max_passages=2, token_budget=50
+        )
+
+        assert compacted["total_passages"] == 3
+        assert compacted["truncated"] is True
+        assert len(compacted["passages"]) <= 2
+        total = sum(estimate_tokens(p["text"]) for p in compacted["passages"])
+        assert total <= 51  # 省略記号の分を許容
+
+    def test_source_reference_uses_display_name(self):
+        """出典がPDFの表示名に変換されることのテスト"""
+        compacted = compact_search_result(SAMPLE_RESULT, max_passages=3)
+
+        assert compacted["passages"][0]["source"] == "日本人の食事摂取基準（2025年版）"
+
+    def test_compact_all_queries(self):
+        """クエリ種別ごとにコンパクト化されることのテスト"""
+        compacted = compact_nutrition_knowledge(
+            {"nutrition_balance": SAMPLE_RESULT, "age_specific": None}
+        )
+
+        assert set(compacted) == {"nutrition_balance", "age_specific"}
+        assert compacted["age_specific"]["passages"] == []
@@ -2,8 +2,15 @@
 セキュリティ機能のユニットテスト
 """
 
+import csv
+import io
+import time
+from typing import ClassVar
+
 from app.utils.input_validation import (
+    MealRejection,
     escape_html,
+    iter_meal_rejections,
     sanitize_input,
     validate_chat_message,
     validate_food_name,
@@ -306,3 +313,145 @@ class TestXSSProtection:
             for word in key_words:
                 if len(word) > 1:  # 短すぎる単語は除外
                     assert word in sanitized or any(char in sanitized for char in word)
+
+
+class TestSanitizerComplexity:
+    """細工された入力に対するサニタイズの計算量のテスト"""
+
+    # 先頭の '=' / ':' はイベントハンドラーとJavaScript URLの走査を省略させないため
+    ADVERSARIAL: ClassVar[dict[str, tuple[str, str]]] = {
+        "unclosed_brackets": ("", "<"),
+        "unclosed_scripts": ("", "<script>"),
+        "event_handler_prefixes": ("=", "on"),
+        "script_without_close": ("<script>", "<a"),
+        "javascript_fragments": (":", "javascript"),
+    }
+
+    @staticmethod
+    def _best_time(text, repeat=5):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            sanitize_input(text)
+            validate_chat_message(text)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    def test_linear_time_on_adversarial_input(self):
+        """入力長を64倍にしても処理時間が二乗（4096倍）に比例して増えないことのテスト
+
+        線形なら約64倍、二乗なら約4096倍になるため、その間（512倍）を上限にして
+        実行環境の揺らぎで失敗しないようにする
+        """
+        for name, (prefix, unit) in self.ADVERSARIAL.items():
+            small = prefix + unit * (1000 // len(unit))
+            large = prefix + unit * (64000 // len(unit))
+            ratio = self._best_time(large) / max(self._best_time(small), 1e-6)
+            assert ratio < 512, f"{name}: x{ratio:.1f}"
+
+    def test_stray_bracket_before_script(self):
+        """scriptタグの前に余分な '<' があっても内容が除去されることのテスト"""
+        result = sanitize_input("<<script>alert('xss')</script>こんにちは")
+        assert "alert" not in result
+        assert "こんにちは" in result
+
+    def test_handler_revealed_by_removal(self):
+        """JavaScript URLの除去で現れたイベントハンドラーも除去されることのテスト"""
+        result = sanitize_input("onjavascript:click=alert(1)")
+        assert "onclick" not in result.lower()
+
+    def test_case_changing_characters(self):
+        """小文字化で長さが変わる文字を含んでもタグ位置がずれないことのテスト"""
+        assert sanitize_input("İİ<SCRIPT>x</SCRIPT>食事") == "İİ食事"
+
+    def test_string_pattern_still_supported(self):
+        """文字列の許可パターンも引き続き使えることのテスト"""
+        assert validate_text_input("abc", allowed_pattern=r"^[a-z]+$")["is_valid"]
+        assert not validate_text_input("ABC", allowed_pattern=r"^[a-z]+$")["is_valid"]
+
+
+class TestBulkMealValidation:
+    """食事記録の一括検証のテスト"""
+
+    RECORDS: ClassVar[list[dict]] = [
+        {"type": "breakfast", "foods": [{"name": "ご飯", "quantity": 100}]},
+        {"type": "brunch", "foods": [{"name": "ご飯", "quantity": 100}]},
+        {"type": "lunch", "foods": []},
+        {"type": "lunch", "foods": [{"name": "<b>パン</b>", "quantity": 50}]},
+        {"type": "dinner", "foods": [{"name": "ご飯", "quantity": 0}]},
+        {"type": "dinner", "foods": [{"name": "ご飯", "quantity": "たくさん"}]},
+        {"type": "snack", "foods": [{"name": "りんご", "quantity": "50"}]},
+        {"type": "snack", "foods": [{"name": "りんご", "quantity": 50}],
+         "notes": "x" * 501},
+        {"type": "snack", "foods": [{"name": "ご飯", "quantity": 100}],
+         "notes": "よく食べました"},
+    ]  # fmt: skip
+
+    def test_same_rows_as_validate_meal_data(self):
+        """validate_meal_data と同じ行が不合格になることのテスト"""
+        expected = [
+            row
+            for row, record in enumerate(self.RECORDS)
+            if not validate_meal_data(record)["is_valid"]
+        ]
+        rejections = list(iter_meal_rejections(self.RECORDS))
+        assert [rejection.row for rejection in rejections] == expected
+        assert expected == [1, 2, 3, 4, 5, 7]
+
+    def test_error_codes_and_fields(self):
+        """エラーコードとフィールド名が返ることのテスト"""
+        errors = {r.row: r.errors for r in iter_meal_rejections(self.RECORDS)}
+        assert errors[1] == (("invalid_meal_type", "type"),)
+        assert errors[2] == (("no_foods", "foods"),)
+        assert errors[3] == (("food_name_invalid_chars", "foods[0].name"),)
+        assert errors[4] == (("quantity_out_of_range", "foods[0].quantity"),)
+        assert errors[5] == (("quantity_not_number", "foods[0].quantity"),)
+        assert errors[7] == (("notes_too_long", "notes"),)
+
+        rejection = MealRejection(row=0, errors=errors[1])
+        assert rejection.messages == ["type: 有効な食事タイプを選択してください"]
+
+    def test_csv_rows(self):
+        """csv.DictReader の1行1食材の行を検証できることのテスト"""
+        content = (
+            "type,food_name,quantity,unit,notes\n"
+            "lunch,ご飯,100,g,\n"
+            "lunch,ご飯,100,g,よく食べました\n"
+            "lunch,,100,g,\n"
+            "lunch,ご飯,2000,g,\n"
+            "lunch,ご飯,nan,g,\n"
+        )
+        rejections = list(iter_meal_rejections(csv.DictReader(io.StringIO(content))))
+        assert [(r.row, r.errors) for r in rejections] == [
+            (2, (("food_name_required", "food.name"),)),
+            (3, (("quantity_out_of_range", "food.quantity"),)),
+            (4, (("quantity_out_of_range", "food.quantity"),)),
+        ]
+
+    def test_cached_values_still_checked(self):
+        """合格済みの値を覚えていても不正な値は不合格になることのテスト"""
+        records = [
+            {"type": "lunch", "foods": [{"name": "ご飯", "quantity": "100"}]},
+            {"type": "lunch", "foods": [{"name": "ご飯", "quantity": "100"}]},
+            {"type": "lunch", "foods": [{"name": ["ご飯"], "quantity": ["100"]}]},
+        ]
+        rejections = list(iter_meal_rejections(records))
+        assert [r.row for r in rejections] == [2]
+        assert rejections[0].errors == (
+            ("food_name_invalid_chars", "foods[0].name"),
+            ("quantity_not_number", "foods[0].quantity"),
+        )
+
+    def test_cached_numeric_quantities(self):
+        """合格済みの数値の数量とハッシュできない値を扱えることのテスト"""
+        records = [
+            {"type": "lunch", "foods": [{"name": "ご飯", "quantity": 100}]},
+            {"type": "lunch", "foods": [{"name": "ご飯", "quantity": 100.0}]},
+            {"type": "lunch", "foods": [{"name": "ご飯", "quantity": 1000.5}]},
+            {"type": ["lunch"], "foods": [{"name": "ご飯", "quantity": 100}]},
+        ]
+        rejections = list(iter_meal_rejections(records))
+        assert [(r.row, r.errors) for r in rejections] == [
+            (2, (("quantity_out_of_range", "foods[0].quantity"),)),
+            (3, (("invalid_meal_type", "type"),)),
+        ]
@@ -0,0 +1,101 @@
+"""agent_engine_stream のセッションルーターの上流呼び出しのユニットテスト"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+_FUNCTION_DIR = (
+    Path(__file__).resolve().parents[2] / "cloud_functions" / "agent_engine_stream"
+)
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    monkeypatch.syspath_prepend(str(_FUNCTION_DIR))
+    from routers import sessions
+
+    yield sessions
+
+    # 他のテストに影響しないよう、読み込んだ関数のモジュールを破棄する
+    for name, module in list(sys.modules.items()):
+        if str(getattr(module, "__file__", "") or "").startswith(str(_FUNCTION_DIR)):
+            del sys.modules[name]
+
+
+class RecordingClient:
+    """呼び出しを記録し、同時呼び出しが重なるよう少し待ってから応答するクライアント"""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        with self._lock:
+            self.calls.append((url, params))
+        time.sleep(0.05)
+        return f"{url}?{params}"
+
+
+def _get_concurrently(sessions, client, requests):
+    results = [None] * len(requests)
+    barrier = threading.Barrier(len(requests))
+
+    def call(i, uid, params):
+        barrier.wait()
+        results[i] = sessions._get_upstream(
+            client, "https://example.com/sessions", {}, uid=uid, params=params
+        )
+
+    threads = [
+        threading.Thread(target=call, args=(i, uid, params))
+        for i, (uid, params) in enumerate(requests)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_users_differing_only_by_case_do_not_share(sessions):
+    """大文字/小文字だけが異なるユーザーIDの一覧取得を共有しないことのテスト"""
+    client = RecordingClient()
+    results = _get_concurrently(
+        sessions,
+        client,
+        [
+            ("UserA", {"filter": "userId=UserA"}),
+            ("usera", {"filter": "userId=usera"}),
+        ],
+    )
+
+    assert len(client.calls) == 2
+    assert "UserA" in results[0]
+    assert "usera" in results[1]
+
+
+def test_same_user_page_tokens_kept_exact(sessions):
+    """ページトークンの大文字/小文字を区別することのテスト"""
+    client = RecordingClient()
+    _get_concurrently(
+        sessions,
+        client,
+        [("user-1", {"pageToken": "AbC"}), ("user-1", {"pageToken": "abc"})],
+    )
+
+    assert len(client.calls) == 2
+
+
+def test_identical_requests_share_one_call(sessions):
+    """同一ユーザーの同一リクエストは1回の上流呼び出しにまとめることのテスト"""
+    client = RecordingClient()
+    params = {"filter": "userId=user-1", "pageSize": 20}
+    results = _get_concurrently(
+        sessions, client, [("user-1", dict(params)), ("user-1", dict(params))]
+    )
+
+    assert len(client.calls) == 1
+    assert results[0] == results[1]
@@ -0,0 +1,89 @@
+"""app/utils/single_flight.pyのユニットテスト"""
+
+import threading
+import time
+
+import pytest
+
+from app.utils.single_flight import SingleFlight, normalize_key
+
+
+class TestNormalizeKey:
+    """キー正規化のテスト"""
+
+    def test_normalize_width_case_and_spaces(self):
+        """全角/半角・大文字小文字・空白の違いを吸収することのテスト"""
+        assert normalize_key("１歳　鉄分  ABC") == normalize_key("1歳 鉄分 abc")
+
+    def test_normalize_dict_order(self):
+        """dictのキー順序に依存しないことのテスト"""
+        assert normalize_key({"a": 1, "b": 2}) == normalize_key({"b": 2, "a": 1})
+
+    def test_different_parts_are_distinct(self):
+        """構成要素の区切りが保持されることのテスト"""
+        assert normalize_key("ab", "c") != normalize_key("a", "bc")
+
+
+class TestSingleFlight:
+    """シングルフライトのテスト"""
+
+    def test_concurrent_duplicates_collapse(self):
+        """同時の同一キー呼び出しが1回の実行にまとまることのテスト"""
+        flight = SingleFlight("test")
+        started = threading.Event()
+        release = threading.Event()
+        executions = []
+
+        def slow_call():
+            executions.append(1)
+            started.set()
+            release.wait(timeout=5)
+            return {"result": "ok"}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do("k", slow_call)))
+            for _ in range(5)
+        ]
+        threads[0].start()
+        started.wait(timeout=5)
+        for thread in threads[1:]:
+            thread.start()
+        # 後続スレッドが待機状態に入るまで待つ
+        deadline = time.time() + 5
+        while flight.stats()["calls"] < 5 and time.time() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert len(executions) == 1
+        assert results == [{"result": "ok"}] * 5
+        stats = flight.stats()
+        assert stats["executions"] == 1
+        assert stats["collapsed"] == 4
+        assert stats["collapse_ratio"] == pytest.approx(0.8)
+        assert stats["in_flight"] == 0
+
+    def test_sequential_calls_are_not_collapsed(self):
+        """完了後の呼び出しは再実行されることのテスト"""
+        flight = SingleFlight()
+        counter = []
+        for _ in range(3):
+            flight.do("k", lambda: counter.append(1))
+
+        assert len(counter) == 3
+        assert flight.stats()["collapse_ratio"] == 0.0
+
+    def test_exception_propagates_and_releases_key(self):
+        """例外が伝播し、キーが解放されることのテスト"""
+        flight = SingleFlight()
+
+        def failing():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            flight.do("k", failing)
+
+        assert flight.do("k", lambda: "recovered") == "recovered"
+        assert flight.stats()["in_flight"] == 0
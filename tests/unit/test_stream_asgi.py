@@ -0,0 +1,225 @@
+"""agent_engine_stream のASGIエントリポイント（route_request_async）のユニットテスト"""
+
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import ClassVar
+
+import flask
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.auth import firebase_tokens
+from app.auth.token_cache import VerifiedTokenCache
+
+_FUNCTION_DIR = (
+    Path(__file__).resolve().parents[2] / "cloud_functions" / "agent_engine_stream"
+)
+_METHODS = ["GET", "POST", "DELETE"]
+
+AGENT_ENGINE_LINES = [
+    {"author": "lifestyle_advisor", "content": {"parts": [{"text": "朝ごはんには"}]}},
+    {"author": "lifestyle_advisor", "content": {"parts": [{"text": "納豆ごはんがおすすめです。"}]}},
+    {"content": {"role": "model"}},
+]  # fmt: skip
+
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    """Agent Engine の stream_query・Sessions API・画像認識関数の代わりのサーバー"""
+
+    protocol_version = "HTTP/1.1"
+    # セッションID -> 所有者のユーザーID
+    owners: ClassVar[dict[str, str]] = {"s1": "user-1", "s2": "user-2"}
+    appended: ClassVar[list[str]] = []
+
+    def do_GET(self):
+        session_id = self.path.rsplit("/", 1)[-1]
+        if session_id in self.owners:
+            self._send(200, {"name": session_id, "userId": self.owners[session_id]})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        received = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.endswith(":appendEvent"):
+            self.appended.append(self.path.split("/")[-1].split(":")[0])
+            self._send(200, {})
+            return
+        if self.path == "/streamQuery":
+            lines = [
+                json.dumps(line, ensure_ascii=False) for line in AGENT_ENGINE_LINES
+            ]
+            body = ("\n".join(lines) + "\n").encode()
+        else:
+            content_type = self.headers.get("Content-Type", "").split(";")[0]
+            body = json.dumps(
+                {"content_type": content_type, "has_file": b"image-bytes" in received}
+            ).encode()
+        self._send_body(200, body)
+
+    def _send(self, status: int, payload: dict) -> None:
+        self._send_body(status, json.dumps(payload).encode())
+
+    def _send_body(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    UpstreamHandler.appended.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), UpstreamHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def stream_function(monkeypatch, upstream):
+    """関数のモジュールを読み込み、上流をローカルサーバーに向けたハンドラーを返す"""
+    monkeypatch.setenv("AGENT_BACKEND", "stub")
+    monkeypatch.setenv("IMAGE_RECOGNITION_URL", f"{upstream}/image")
+    monkeypatch.delenv("DEVELOPMENT_MODE", raising=False)
+    monkeypatch.syspath_prepend(str(_FUNCTION_DIR))
+    monkeypatch.setattr(
+        firebase_tokens,
+        "token_cache",
+        VerifiedTokenCache(lambda token: {"uid": "user-1", "exp": time.time() + 3600}),
+    )
+
+    from environment_config import StagingConfig
+    from handlers import RemoteChatHandler
+    from utils import routing
+
+    class LocalUpstreamConfig(StagingConfig):
+        def get_vertex_ai_urls(self):
+            return {
+                "agent_engine_url": f"{upstream}/streamQuery",
+                "sessions_base_url": f"{upstream}/sessions",
+                "operations_base_url": upstream,
+            }
+
+    config = LocalUpstreamConfig()
+    yield routing, config, RemoteChatHandler(config)
+
+    # 他のテストに影響しないよう、読み込んだ関数のモジュールを破棄する
+    for name, module in list(sys.modules.items()):
+        if str(getattr(module, "__file__", "") or "").startswith(str(_FUNCTION_DIR)):
+            del sys.modules[name]
+
+
+@pytest.fixture
+def clients(stream_function):
+    """同じハンドラーを使う Flask版・ASGI版のテストクライアント"""
+    routing, config, chat_handler = stream_function
+
+    flask_app = flask.Flask(__name__)
+
+    @flask_app.route("/<path:path>", methods=_METHODS)
+    def flask_view(path):
+        return routing.route_request(flask.request, {}, config, chat_handler, False)
+
+    async def asgi_view(request):
+        return await routing.route_request_async(
+            request, {}, config, chat_handler, False
+        )
+
+    asgi_app = Starlette(routes=[Route("/{path:path}", asgi_view, methods=_METHODS)])
+    with TestClient(asgi_app) as asgi_client:
+        yield flask_app.test_client(), asgi_client
+
+
+AUTH = {"Authorization": "Bearer token"}
+
+
+def test_chat_stream_matches_flask(clients):
+    """ASGI版のチャットストリームがFlask版と同じイベントを返すことのテスト"""
+    flask_client, asgi_client = clients
+    payload = {"message": "朝ごはんは？", "sessionId": "s1"}
+
+    expected = flask_client.post("/api/chat/stream", json=payload, headers=AUTH)
+    actual = asgi_client.post("/api/chat/stream", json=payload, headers=AUTH)
+
+    assert actual.status_code == expected.status_code == 200
+    assert actual.headers["content-type"].startswith("text/event-stream")
+    assert actual.text == expected.get_data(as_text=True)
+    assert "納豆ごはんがおすすめです。" in actual.text
+    assert actual.text.endswith('data: {"type": "stream_end"}\\n\\n')
+
+
+@pytest.mark.parametrize("entry_point", ["flask", "asgi"])
+@pytest.mark.parametrize(
+    ("session_id", "appended"), [("s1", ["s1"]), ("s2", []), ("missing", [])]
+)
+def test_child_profile_only_written_to_own_session(
+    clients, entry_point, session_id, appended
+):
+    """childProfileは自分のセッションにだけ書き込むことのテスト"""
+    client = dict(zip(["flask", "asgi"], clients, strict=True))[entry_point]
+    payload = {
+        "message": "hi",
+        "sessionId": session_id,
+        "childProfile": {"ageMonths": 20},
+    }
+
+    response = client.post("/api/chat/stream", json=payload, headers=AUTH)
+
+    assert response.status_code == 200
+    assert UpstreamHandler.appended == appended
+
+
+@pytest.mark.parametrize(
+    ("method", "path", "kwargs", "status"),
+    [
+        ("POST", "/api/chat/stream", {"json": {"sessionId": "s1"}}, 400),
+        ("POST", "/api/chat/stream", {"data": {"message": "hi"}}, 400),
+        ("POST", "/api/chat/stream", {"json": {"message": "hi", "childProfile": {"ageMonths": -1}}}, 400),
+        ("GET", "/api/unknown", {}, 404),
+    ],
+)  # fmt: skip
+def test_errors_match_flask(clients, method, path, kwargs, status):
+    """検証エラーと未知のパスでFlask版と同じレスポンスを返すことのテスト"""
+    flask_client, asgi_client = clients
+
+    expected = flask_client.open(path, method=method, headers=AUTH, **kwargs)
+    actual = asgi_client.request(method, path, headers=AUTH, **kwargs)
+
+    assert actual.status_code == expected.status_code == status
+    assert actual.json() == expected.get_json()
+
+
+def test_unauthenticated_request_rejected(clients):
+    """Authorizationヘッダーがない場合に401を返すことのテスト"""
+    _, asgi_client = clients
+
+    response = asgi_client.post("/api/chat/stream", json={"message": "hi"})
+
+    assert response.status_code == 401
+    assert response.json()["success"] is False
+
+
+def test_sync_router_runs_with_converted_request(clients):
+    """同期ルーターに変換したリクエストの本文とファイルが渡ることのテスト"""
+    _, asgi_client = clients
+
+    response = asgi_client.post(
+        "/api/image/analyze",
+        files={"image": ("meal.jpg", b"image-bytes", "image/jpeg")},
+        headers=AUTH,
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"content_type": "multipart/form-data", "has_file": True}
@@ -0,0 +1,137 @@
+"""app/agents/stub_backends.pyのユニットテスト"""
+
+import asyncio
+
+import pytest
+from google.adk.models.llm_request import LlmRequest
+from google.adk.runners import RunConfig, Runner, StreamingMode
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from app.agents import stub_backends
+from app.agents.callback_utils import extract_text, has_retrieval_tool
+from app.agents.consultation_output import ConsultationReport
+from app.agents.stub_backends import (
+    FOLLOW_UP_RESPONSES,
+    FakeSearchBackend,
+    FakeVertexAiSearchTool,
+    ScriptedLlm,
+)
+
+CONSULTATION = (
+    "1歳8ヶ月の子どもの食事内容です。朝食: パン、牛乳。栄養分析をお願いします"
+)
+
+
+def _request(text: str, **config) -> LlmRequest:
+    return LlmRequest(
+        contents=[types.UserContent(parts=[types.Part.from_text(text=text)])],
+        config=types.GenerateContentConfig(**config),
+    )
+
+
+def _collect(llm: ScriptedLlm, request: LlmRequest, stream: bool):
+    async def run():
+        return [r async for r in llm.generate_content_async(request, stream=stream)]
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def fast_llm():
+    stub_backends.reset_stub_stats()
+    return ScriptedLlm(
+        tokens_per_second=1e6,
+        first_token_delay=0,
+        search_backend=FakeSearchBackend(latency=0),
+    )
+
+
+def test_streaming_chunks_aggregate(fast_llm):
+    """部分応答の連結が最終応答と一致することのテスト"""
+    responses = _collect(fast_llm, _request(CONSULTATION), stream=True)
+    partials = [r for r in responses if r.partial]
+    assert len(partials) > 1
+    assert "".join(extract_text(r.content) for r in partials) == extract_text(
+        responses[-1].content
+    )
+    assert not responses[-1].partial
+    assert "📈 補強したい栄養素" in extract_text(responses[-1].content)
+
+
+def test_responses_are_deterministic(fast_llm):
+    """同じ入力には同じ応答を返すことのテスト"""
+    first = _collect(fast_llm, _request("何分茹でればいい？"), stream=False)
+    second = _collect(fast_llm, _request("何分茹でればいい？"), stream=False)
+    assert extract_text(first[0].content) == extract_text(second[0].content)
+    assert extract_text(first[0].content) in FOLLOW_UP_RESPONSES
+
+
+def test_structured_response_matches_schema(fast_llm):
+    """出力スキーマ指定時はスキーマに合うJSONを返すことのテスト"""
+    request = _request(CONSULTATION)
+    request.set_output_schema(ConsultationReport)
+    (response,) = _collect(fast_llm, request, stream=False)
+    report = ConsultationReport.model_validate_json(extract_text(response.content))
+    assert report.nutrients[0].name == "鉄分"
+
+
+def test_fake_search_grounding(fast_llm):
+    """リトリーバル設定時に固定コーパスのグラウンディング結果を付与することのテスト"""
+    request = _request("鉄分を摂れる食材は？")
+    asyncio.run(
+        FakeVertexAiSearchTool().process_llm_request(
+            tool_context=None, llm_request=request
+        )
+    )
+    assert has_retrieval_tool(request)
+
+    (response,) = _collect(fast_llm, request, stream=False)
+    chunks = response.grounding_metadata.grounding_chunks
+    assert chunks[0].retrieved_context.text.startswith("鉄の推奨量")
+    assert stub_backends.get_stub_stats()["searches"] == 1
+
+
+def test_simulated_time_recorded():
+    """シミュレートした生成時間が統計に記録されることのテスト"""
+    stub_backends.reset_stub_stats()
+    llm = ScriptedLlm(tokens_per_second=1000, first_token_delay=0.01)
+    _collect(llm, _request("ありがとう"), stream=False)
+    stats = stub_backends.get_stub_stats()
+    assert stats["llm_calls"] == 1
+    assert stats["llm_seconds"] > 0.01
+
+
+def test_agent_runs_offline(monkeypatch):
+    """AGENT_BACKEND=stub でエージェント全体が認証なしで動作することのテスト"""
+    monkeypatch.setenv("AGENT_BACKEND", "stub")
+    monkeypatch.setenv("STUB_LLM_FIRST_TOKEN_DELAY", "0")
+    monkeypatch.setenv("STUB_LLM_TOKENS_PER_SECOND", "1000000")
+    monkeypatch.setenv("STUB_SEARCH_LATENCY", "0")
+
+    from app.agents.unified_nutrition_agent import create_unified_nutrition_agent
+
+    agent = create_unified_nutrition_agent()
+    assert isinstance(agent.model, ScriptedLlm)
+    assert isinstance(agent.tools[0], FakeVertexAiSearchTool)
+
+    service = InMemorySessionService()
+    session = service.create_session(app_name="app", user_id="u")
+    runner = Runner(app_name="app", agent=agent, session_service=service)
+
+    async def run():
+        return [
+            event
+            async for event in runner.run_async(
+                user_id="u",
+                session_id=session.id,
+                new_message=types.UserContent(
+                    parts=[types.Part.from_text(text=CONSULTATION)]
+                ),
+                run_config=RunConfig(streaming_mode=StreamingMode.SSE),
+            )
+        ]
+
+    events = asyncio.run(run())
+    final = [e for e in events if e.content and not e.partial]
+    assert "栄養アドバイザーより" in extract_text(final[-1].content)
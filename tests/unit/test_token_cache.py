@@ -0,0 +1,213 @@
+"""app/auth/token_cache.pyのユニットテスト（ローカルで生成した鍵で署名）"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.auth import firebase_auth, firebase_tokens
+from app.auth.token_cache import RevokedTokenError, VerifiedTokenCache
+
+PROJECT_ID = "test-project"
+SIGNING_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+OTHER_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def make_token(uid="user-1", lifetime=3600, auth_time=None, key=SIGNING_KEY):
+    now = int(time.time())
+    claims = {
+        "iss": f"https://securetoken.google.com/{PROJECT_ID}",
+        "aud": PROJECT_ID,
+        "sub": uid,
+        "uid": uid,
+        "iat": now,
+        "auth_time": now if auth_time is None else auth_time,
+        "exp": now + lifetime,
+    }
+    return jwt.encode(claims, key, algorithm="RS256")
+
+
+class CountingVerifier:
+    """公開鍵で署名を検証し、呼び出し回数を数える"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, token):
+        self.calls += 1
+        return jwt.decode(
+            token,
+            SIGNING_KEY.public_key(),
+            algorithms=["RS256"],
+            audience=PROJECT_ID,
+        )
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+
+def test_repeat_requests_skip_verification():
+    """同じトークンの2回目以降は署名を検証しないことのテスト"""
+    verifier = CountingVerifier()
+    cache = VerifiedTokenCache(verifier)
+    token = make_token()
+
+    claims = [cache.verify(token) for _ in range(5)]
+    assert verifier.calls == 1
+    assert all(c["uid"] == "user-1" for c in claims)
+    stats = cache.stats()
+    assert stats["hits"] == 4
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+
+def test_concurrent_misses_verify_once():
+    """同じトークンの同時の検証が1回にまとめられることのテスト"""
+    started, release = threading.Event(), threading.Event()
+    counting = CountingVerifier()
+
+    def verifier(token):
+        started.set()
+        release.wait(5)
+        return counting(token)
+
+    cache = VerifiedTokenCache(verifier)
+    token = make_token()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(cache.verify, token)
+        started.wait(5)
+        followers = [pool.submit(cache.verify, token) for _ in range(3)]
+        # 後続の呼び出しが先行の検証を待つまで待機
+        while cache.stats()["collapsed_verifications"] < 3:
+            time.sleep(0.001)
+        release.set()
+        results = [leader.result(), *(f.result() for f in followers)]
+
+    assert counting.calls == 1
+    assert all(claims["uid"] == "user-1" for claims in results)
+
+
+def test_entry_expires_before_exp():
+    """expから余裕を引いた時刻を過ぎると再検証することのテスト"""
+    verifier, clock = CountingVerifier(), FakeClock()
+    cache = VerifiedTokenCache(verifier, skew_seconds=30, clock=clock)
+    token = make_token(lifetime=100)
+
+    cache.verify(token)
+    clock.now += 69
+    cache.verify(token)
+    assert verifier.calls == 1
+
+    clock.now += 2
+    cache.verify(token)
+    assert verifier.calls == 2
+    assert cache.stats()["expired"] == 1
+
+
+def test_invalid_token_not_cached():
+    """署名が不正なトークンは例外になりキャッシュされないことのテスト"""
+    verifier = CountingVerifier()
+    cache = VerifiedTokenCache(verifier)
+    token = make_token(key=OTHER_KEY)
+
+    for _ in range(2):
+        with pytest.raises(jwt.InvalidSignatureError):
+            cache.verify(token)
+    assert verifier.calls == 2
+    assert cache.stats()["size"] == 0
+
+
+def test_cache_bounded():
+    """上限を超えると最も古く使われたトークンから破棄されることのテスト"""
+    verifier = CountingVerifier()
+    cache = VerifiedTokenCache(verifier, max_entries=2)
+    tokens = [make_token(uid=f"user-{i}") for i in range(3)]
+
+    cache.verify(tokens[0])
+    cache.verify(tokens[1])
+    cache.verify(tokens[0])
+    cache.verify(tokens[2])
+    assert cache.stats()["evictions"] == 1
+
+    cache.verify(tokens[0])
+    assert verifier.calls == 3
+    cache.verify(tokens[1])
+    assert verifier.calls == 4
+
+
+def test_revoke_user():
+    """失効させたユーザーの以前のトークンが拒否されることのテスト"""
+    verifier, clock = CountingVerifier(), FakeClock()
+    cache = VerifiedTokenCache(verifier, clock=clock)
+    old_token = make_token(auth_time=int(clock.now) - 10)
+    cache.verify(old_token)
+
+    cache.revoke_user("user-1")
+    with pytest.raises(RevokedTokenError):
+        cache.verify(old_token)
+
+    # 失効後に再ログインしたトークンは受け付ける
+    new_token = make_token(auth_time=int(clock.now) + 1)
+    assert cache.verify(new_token)["uid"] == "user-1"
+    assert cache.stats()["revoked"] == 1
+
+
+def test_revocation_check_hook():
+    """失効確認はキャッシュ時と間隔経過後にだけ呼ばれることのテスト"""
+    verifier, clock = CountingVerifier(), FakeClock()
+    revoked_uids = set()
+    checked = []
+
+    def revocation_check(claims):
+        checked.append(claims["uid"])
+        return claims["uid"] in revoked_uids
+
+    cache = VerifiedTokenCache(
+        verifier,
+        revocation_check=revocation_check,
+        revocation_check_interval=60,
+        clock=clock,
+    )
+    token = make_token()
+    cache.verify(token)
+    cache.verify(token)
+    assert len(checked) == 1
+
+    revoked_uids.add("user-1")
+    clock.now += 61
+    with pytest.raises(RevokedTokenError):
+        cache.verify(token)
+    assert verifier.calls == 1
+    assert cache.stats()["revocation_checks"] == 2
+    assert cache.stats()["size"] == 0
+
+
+def test_get_current_user_uses_cache(monkeypatch):
+    """FastAPIの認証依存関数が検証済みトークンをキャッシュから取得することのテスト"""
+    verifier = CountingVerifier()
+    monkeypatch.setenv("FIREBASE_LOCAL_TOKEN_VERIFY", "false")
+    monkeypatch.setattr(firebase_tokens, "_firebase_app", object())
+    monkeypatch.setattr(firebase_tokens.auth, "verify_id_token", verifier)
+    monkeypatch.setattr(
+        firebase_tokens,
+        "token_cache",
+        VerifiedTokenCache(firebase_tokens._verify_id_token),
+    )
+    credentials = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=make_token()
+    )
+
+    for _ in range(3):
+        user = asyncio.run(firebase_auth.get_current_user(credentials))
+        assert user["uid"] == "user-1"
+    assert verifier.calls == 1
@@ -0,0 +1,200 @@
+"""app/agents/tool_cache.pyのユニットテスト"""
+
+from types import SimpleNamespace
+
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from app.agents.tool_cache import SessionToolCache, query_key
+
+
+def _context(
+    text: str, state: dict | None = None, invocation_id: str = "inv-1"
+) -> SimpleNamespace:
+    """コールバックコンテキストの簡易版を作成"""
+    return SimpleNamespace(
+        state={} if state is None else state,
+        user_content=types.Content(role="user", parts=[types.Part(text=text)]),
+        invocation_id=invocation_id,
+    )
+
+
+def _retrieval_request() -> LlmRequest:
+    """リトリーバル設定付きのリクエストを作成"""
+    return LlmRequest(
+        config=types.GenerateContentConfig(
+            tools=[
+                types.Tool(
+                    retrieval=types.Retrieval(
+                        vertex_ai_search=types.VertexAISearch(datastore="ds")
+                    )
+                )
+            ]
+        )
+    )
+
+
+def _grounded_response() -> LlmResponse:
+    """グラウンディング結果付きの応答を作成"""
+    return LlmResponse(
+        grounding_metadata=types.GroundingMetadata(
+            grounding_chunks=[
+                types.GroundingChunk(
+                    retrieved_context=types.GroundingChunkRetrievedContext(
+                        uri="gs://bucket/kaisetsu.pdf",
+                        title="kaisetsu.pdf",
+                        text="レバーや赤身の魚は鉄分が豊富です",
+                    )
+                )
+            ]
+        )
+    )
+
+
+class TestQueryKey:
+    """キャッシュキーのテスト"""
+
+    def test_rephrased_questions_share_key(self):
+        """助詞・文末表現・表記ゆれだけが違う質問は同じキーになることのテスト"""
+        assert query_key("vertex_ai_search", "鉄分って何に含まれてますか？") == (
+            query_key("vertex_ai_search", "鉄は何に含まれていますか")
+        )
+
+    def test_same_topic_and_aspect_share_key(self):
+        """栄養素と質問の観点が同じなら言い回しが違っても同じキーになることのテスト"""
+        assert query_key("vertex_ai_search", "鉄分って何に含まれてますか？") == (
+            query_key("vertex_ai_search", "鉄分の多い食材をもう一度")
+        )
+        assert query_key("vertex_ai_search", "ビタミンCの多い食べ物") == (
+            query_key("vertex_ai_search", "ビタミンcは何に含まれていますか")
+        )
+
+    def test_ending_stripped_once(self):
+        """文末表現は1回だけ取り除くことのテスト"""
+        assert query_key("t", "ゆでたまごよ") == query_key("t", "ゆでたまご")
+        assert query_key("t", "ゆでたまごよよ") != query_key("t", "ゆでたまご")
+
+    def test_different_questions_on_same_nutrient_differ(self):
+        """同じ栄養素でも質問内容が違えば別のキーになることのテスト"""
+        assert query_key("vertex_ai_search", "鉄分は何歳から？") != query_key(
+            "vertex_ai_search", "鉄分って何に含まれてますか"
+        )
+
+    def test_different_topics_differ(self):
+        """主題が異なれば別のキーになることのテスト"""
+        assert query_key("vertex_ai_search", "鉄分について") != query_key(
+            "vertex_ai_search", "カルシウムについて"
+        )
+
+
+class TestSessionToolCache:
+    """セッションキャッシュのテスト"""
+
+    def test_retrieval_served_from_cache_on_follow_up(self):
+        """追加質問でリトリーバルを外し、保存済みの抜粋を使うことのテスト"""
+        cache = SessionToolCache()
+        state: dict = {}
+
+        first = _retrieval_request()
+        cache.before_model_callback(
+            _context("鉄分って何に含まれてますか？", state), first
+        )
+        cache.after_model_callback(
+            _context("鉄分って何に含まれてますか？", state), _grounded_response()
+        )
+        assert first.config.tools
+
+        follow_up = _retrieval_request()
+        cache.before_model_callback(
+            _context("鉄は何に含まれていますか", state, "inv-2"), follow_up
+        )
+
+        assert not follow_up.config.tools
+        assert "レバーや赤身の魚" in follow_up.config.system_instruction
+        assert SessionToolCache.stats(state) == {
+            "hits": 1,
+            "misses": 1,
+            "hit_rate": 0.5,
+            "entries": 1,
+        }
+
+    def test_example_follow_up_served_from_cache(self):
+        """「鉄分の多い食材をもう一度」が先の検索結果で答えられることのテスト"""
+        cache = SessionToolCache()
+        state: dict = {}
+        cache.before_model_callback(
+            _context("鉄分って何に含まれてますか？", state), _retrieval_request()
+        )
+        cache.after_model_callback(
+            _context("鉄分って何に含まれてますか？", state), _grounded_response()
+        )
+
+        follow_up = _retrieval_request()
+        cache.before_model_callback(
+            _context("鉄分の多い食材をもう一度", state, "inv-2"), follow_up
+        )
+
+        assert not follow_up.config.tools
+        assert SessionToolCache.stats(state)["hits"] == 1
+
+    def test_different_question_not_served_from_cache(self):
+        """同じ栄養素の別の質問ではリトリーバルを外さないことのテスト"""
+        cache = SessionToolCache()
+        state: dict = {}
+        cache.before_model_callback(
+            _context("鉄分って何に含まれてますか", state), _retrieval_request()
+        )
+        cache.after_model_callback(
+            _context("鉄分って何に含まれてますか", state), _grounded_response()
+        )
+
+        follow_up = _retrieval_request()
+        cache.before_model_callback(
+            _context("鉄分は何歳から？", state, "inv-2"), follow_up
+        )
+
+        assert follow_up.config.tools
+        assert SessionToolCache.stats(state)["hits"] == 0
+
+    def test_repeated_model_calls_counted_once(self):
+        """同じ呼び出し内のモデル呼び出しは1回のミスとして数えることのテスト"""
+        cache = SessionToolCache()
+        state: dict = {}
+        for _ in range(3):
+            cache.before_model_callback(
+                _context("鉄分は何歳から？", state), _retrieval_request()
+            )
+
+        assert SessionToolCache.stats(state)["misses"] == 1
+
+    def test_function_tool_cache(self):
+        """関数ツールの結果が再利用されることのテスト"""
+        cache = SessionToolCache(cacheable_tools=("search_nutrition_knowledge",))
+        tool = SimpleNamespace(name="search_nutrition_knowledge")
+        tool_context = SimpleNamespace(state={}, invocation_id="inv-1")
+
+        args = {"query": "カルシウム 食材"}
+        assert cache.before_tool_callback(tool, args, tool_context) is None
+        cache.after_tool_callback(tool, args, tool_context, {"result": "小魚"})
+
+        assert cache.before_tool_callback(
+            tool, {"query": "カルシウム、食材"}, tool_context
+        ) == {"result": "小魚"}
+
+    def test_size_limits(self):
+        """エントリ数・エントリサイズの上限が守られることのテスト"""
+        cache = SessionToolCache(
+            cacheable_tools=("t",), max_entries=2, max_entry_chars=50
+        )
+        tool = SimpleNamespace(name="t")
+        tool_context = SimpleNamespace(state={}, invocation_id="inv-1")
+
+        for query in ("鉄分", "カルシウム", "亜鉛"):
+            cache.after_tool_callback(tool, {"q": query}, tool_context, {"r": 1})
+        cache.after_tool_callback(tool, {"q": "脂質"}, tool_context, {"r": "x" * 100})
+
+        entries = tool_context.state["tool_cache"]["entries"]
+        assert len(entries) == 2
+        assert query_key("t", "鉄分") not in entries
+        assert query_key("t", "脂質") not in entries
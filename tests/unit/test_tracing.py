@@ -0,0 +1,345 @@
+"""app/utils/tracing.pyのユニットテスト（クライアントはフェイク）"""
+
+import gzip
+import json
+import threading
+import time
+
+import pytest
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor, SpanExportResult
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import Link, Status, StatusCode
+
+from app.utils.tracing import (
+    MAX_LOG_ATTRIBUTES_BYTES,
+    CloudTraceLoggingSpanExporter,
+    TailSamplingSpanProcessor,
+    estimate_attributes_size,
+    span_to_dict,
+)
+
+
+class FakeLogger:
+    def __init__(self, latency=0.0, fail=False):
+        self.latency = latency
+        self.fail = fail
+        self.commits = []
+
+    def batch(self):
+        logger = self
+
+        class Batch:
+            def __init__(self):
+                self.entries = []
+
+            def log_struct(self, info, **kwargs):
+                self.entries.append(info)
+
+            def commit(self):
+                time.sleep(logger.latency)
+                if logger.fail:
+                    raise ConnectionError("logging unavailable")
+                logger.commits.append(self.entries)
+
+        return Batch()
+
+
+class FakeLoggingClient:
+    def __init__(self, logger):
+        self._logger = logger
+
+    def logger(self, name):
+        return self._logger
+
+
+class FakeTraceClient:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = []
+
+    def batch_write_spans(self, request):
+        time.sleep(self.latency)
+        self.requests.append(request)
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.content_encoding = None
+
+    def upload_from_string(self, content, content_type=None):
+        self.bucket.release.wait(timeout=5)
+        if self.bucket.fail:
+            raise ConnectionError("storage unavailable")
+        self.bucket.uploads[self.name] = (content, self.content_encoding)
+
+
+class FakeBucket:
+    def __init__(self):
+        self.uploads = {}
+        self.exists_calls = 0
+        self.fail = False
+        self.missing = False
+        self.release = threading.Event()
+        self.release.set()
+
+    def exists(self):
+        self.exists_calls += 1
+        return not self.missing
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+
+class FakeStorageClient:
+    def __init__(self):
+        self._bucket = FakeBucket()
+
+    def bucket(self, name):
+        return self._bucket
+
+
+def _spans(count):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    tracer = provider.get_tracer("test")
+    for i in range(count):
+        with tracer.start_as_current_span(f"span-{i}") as span:
+            span.set_attribute("gen_ai.request.model", "gemini-2.0-flash")
+    return list(exporter.get_finished_spans())
+
+
+def _exporter(logger, trace_client, **kwargs):
+    return CloudTraceLoggingSpanExporter(
+        project_id="test-project",
+        client=trace_client,
+        logging_client=FakeLoggingClient(logger),
+        storage_client=FakeStorageClient(),
+        bucket_name="test-bucket",
+        **kwargs,
+    )
+
+
+def _large_span_dict():
+    return {
+        "attributes": {
+            "llm_request": "x" * (MAX_LOG_ATTRIBUTES_BYTES + 1),
+            "gen_ai.request.model": "gemini-2.0-flash",
+        }
+    }
+
+
+@pytest.fixture
+def spans():
+    return _spans(10)
+
+
+def test_single_batched_log_write(spans):
+    """1回のexportでログ書き込みが1回にまとまることのテスト"""
+    logger, trace_client = FakeLogger(), FakeTraceClient()
+    exporter = _exporter(logger, trace_client)
+
+    assert exporter.export(spans) == SpanExportResult.SUCCESS
+    assert len(logger.commits) == 1
+    assert len(logger.commits[0]) == 10
+    assert logger.commits[0][0]["trace"].startswith("projects/test-project/traces/")
+    assert len(trace_client.requests) == 1
+    exporter.shutdown()
+
+
+def test_logging_and_trace_run_in_parallel(spans):
+    """ログ書き込みとCloud Traceへの書き込みが並行することのテスト"""
+    exporter = _exporter(FakeLogger(latency=0.2), FakeTraceClient(latency=0.2))
+    start = time.perf_counter()
+    exporter.export(spans)
+    assert time.perf_counter() - start < 0.35
+    exporter.shutdown()
+
+
+def test_logging_failure_reported(spans):
+    """ログ書き込みの失敗がFAILUREとして返ることのテスト"""
+    trace_client = FakeTraceClient()
+    exporter = _exporter(FakeLogger(fail=True), trace_client)
+    assert exporter.export(spans) == SpanExportResult.FAILURE
+    assert len(trace_client.requests) == 1
+    exporter.shutdown()
+
+
+def test_span_to_dict_matches_to_json():
+    """直接変換した辞書がto_jsonの結果と一致することのテスト"""
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    tracer = provider.get_tracer("test")
+    with tracer.start_as_current_span("parent") as parent:
+        link = Link(parent.get_span_context(), {"weight": 1})
+        with tracer.start_as_current_span("child", links=[link]) as child:
+            child.set_attribute("tags", ["朝食", "野菜"])
+            child.add_event("retry", {"attempts": (1, 2)})
+            child.set_status(Status(StatusCode.ERROR, "timeout"))
+
+    for span in exporter.get_finished_spans():
+        assert span_to_dict(span) == json.loads(span.to_json())
+
+
+def test_attribute_size_estimate_stops_at_limit():
+    """サイズ見積もりが上限を超えた時点で打ち切られることのテスト"""
+    attributes = {"small": "abc", "count": 3}
+    assert estimate_attributes_size(attributes, 1024) < 1024
+
+    large = {f"key{i}": "食" * 1000 for i in range(100)}
+    assert estimate_attributes_size(large, 10_000) <= 10_000 + 3 * 1000 + 16
+
+
+def test_large_attributes_serialized_once(monkeypatch):
+    """上限を超える属性は1回だけシリアライズしてgzip圧縮でGCSへ保存されることのテスト"""
+    exporter = _exporter(FakeLogger(), FakeTraceClient())
+    dumps_calls = []
+    real_dumps = json.dumps
+    monkeypatch.setattr(
+        json, "dumps", lambda *a, **k: dumps_calls.append(1) or real_dumps(*a, **k)
+    )
+
+    result = exporter._process_large_attributes(_large_span_dict(), span_id="abc")
+    exporter.shutdown()
+
+    assert len(dumps_calls) == 1
+    assert set(result["attributes"]) == {"uri_payload", "url_payload"}
+    assert result["attributes"]["uri_payload"] == "gs://test-bucket/spans/abc.json"
+    content, encoding = exporter.bucket.uploads["spans/abc.json"]
+    assert encoding == "gzip"
+    assert json.loads(gzip.decompress(content))["gen_ai.request.model"] == (
+        "gemini-2.0-flash"
+    )
+    assert exporter.upload_metrics()["uploaded"] == 1
+
+
+def test_bucket_check_cached():
+    """バケットの存在確認がTTLの間キャッシュされることのテスト"""
+    exporter = _exporter(FakeLogger(), FakeTraceClient(), bucket_check_ttl=60)
+    for i in range(3):
+        exporter._process_large_attributes(_large_span_dict(), span_id=f"s{i}")
+    assert exporter.bucket.exists_calls == 1
+
+    exporter._bucket_check_ttl = 0
+    exporter._process_large_attributes(_large_span_dict(), span_id="s3")
+    assert exporter.bucket.exists_calls == 2
+    exporter.shutdown()
+
+
+def test_upload_failures_counted():
+    """アップロードの失敗がエクスポートを止めずに集計されることのテスト"""
+    exporter = _exporter(FakeLogger(), FakeTraceClient())
+    exporter.bucket.fail = True
+    result = exporter._process_large_attributes(_large_span_dict(), span_id="abc")
+    exporter.shutdown()
+
+    assert result["attributes"]["uri_payload"] == "gs://test-bucket/spans/abc.json"
+    assert exporter.upload_metrics() == {"uploaded": 0, "failed": 1, "dropped": 0}
+
+
+def test_missing_bucket_has_no_payload_url():
+    """バケットがない場合はアップロード先のURLを付けないことのテスト"""
+    exporter = _exporter(FakeLogger(), FakeTraceClient())
+    exporter.bucket.missing = True
+    result = exporter._process_large_attributes(_large_span_dict(), span_id="abc")
+    exporter.shutdown()
+
+    assert result["attributes"] == {"uri_payload": "GCS bucket not found"}
+    assert exporter.bucket.uploads == {}
+
+
+def test_pending_uploads_bounded():
+    """待機中のアップロードが上限を超えると破棄して集計されることのテスト"""
+    exporter = _exporter(
+        FakeLogger(), FakeTraceClient(), max_upload_workers=1, max_pending_uploads=2
+    )
+    exporter.bucket.release.clear()
+    results = [
+        exporter._process_large_attributes(_large_span_dict(), span_id=f"s{i}")
+        for i in range(3)
+    ]
+    exporter.bucket.release.set()
+    exporter.shutdown()
+
+    assert results[2]["attributes"] == {"uri_payload": "GCS upload dropped"}
+    assert exporter.upload_metrics() == {"uploaded": 2, "failed": 0, "dropped": 1}
+
+
+def _sampled_tracer(**kwargs):
+    exporter = InMemorySpanExporter()
+    sampler = TailSamplingSpanProcessor(SimpleSpanProcessor(exporter), **kwargs)
+    provider = TracerProvider()
+    provider.add_span_processor(sampler)
+    return provider.get_tracer("test"), sampler, exporter
+
+
+def _run_invocation(tracer, error=False, prompt="質問"):
+    with tracer.start_as_current_span("invocation"):
+        with tracer.start_as_current_span("call_llm") as span:
+            span.set_attribute("gcp.vertex.agent.llm_request", prompt)
+            if error:
+                span.set_status(Status(StatusCode.ERROR, "quota exceeded"))
+
+
+def test_tail_sampling_keeps_errors_and_drops_rest():
+    """エラーのあるトレースは常に保持し、それ以外は率に従うことのテスト"""
+    tracer, sampler, exporter = _sampled_tracer(sample_rate=0.0)
+    _run_invocation(tracer)
+    assert exporter.get_finished_spans() == ()
+
+    _run_invocation(tracer, error=True)
+    assert [s.name for s in exporter.get_finished_spans()] == ["call_llm", "invocation"]
+
+    stats = sampler.stats()
+    assert stats["traces_kept_error"] == 1
+    assert stats["traces_dropped"] == 1
+    assert stats["spans_dropped"] == 2
+    assert stats["traces_buffered"] == 0
+
+
+def test_tail_sampling_keeps_slow_and_sampled_traces():
+    """遅いトレースと率で選ばれたトレースが保持されることのテスト"""
+    tracer, sampler, exporter = _sampled_tracer(sample_rate=0.0, latency_threshold=0)
+    _run_invocation(tracer)
+    assert sampler.stats()["traces_kept_latency"] == 1
+
+    tracer, sampler, exporter = _sampled_tracer(sample_rate=1.0)
+    for _ in range(5):
+        _run_invocation(tracer)
+    assert sampler.stats()["traces_kept_sampled"] == 5
+    assert len(exporter.get_finished_spans()) == 10
+
+
+def test_tail_sampling_truncates_prompts():
+    """プロンプト属性が予算の文字数に切り詰められることのテスト"""
+    tracer, sampler, exporter = _sampled_tracer(sample_rate=1.0, attribute_budget=10)
+    _run_invocation(tracer, prompt="あ" * 100)
+
+    call_llm = exporter.get_finished_spans()[0]
+    assert call_llm.attributes["gcp.vertex.agent.llm_request"] == (
+        "あ" * 10 + "...[truncated 90 chars]"
+    )
+    assert sampler.stats()["attributes_truncated"] == 1
+
+
+def test_tail_sampling_buffer_bounded():
+    """ルートが終わらないトレースも上限を超えると判定されることのテスト"""
+    tracer, sampler, exporter = _sampled_tracer(sample_rate=1.0, max_buffered_traces=1)
+    roots = [tracer.start_span("invocation") for _ in range(3)]
+    for root in roots:
+        with trace.use_span(root, end_on_exit=False):
+            tracer.start_span("call_llm").end()
+
+    stats = sampler.stats()
+    assert stats["traces_decided_early"] == 2
+    assert stats["traces_buffered"] == 1
+    assert len(exporter.get_finished_spans()) == 2
+
+    sampler.force_flush()
+    assert sampler.stats()["traces_buffered"] == 0
+    assert len(exporter.get_finished_spans()) == 3